@@ -1,51 +1,17 @@
 # add_pathology.py - Enhanced with refresh system and responsive design
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk
 from tkcalendar import DateEntry
-import sqlite3
+import database
+import measurements
+import reference_data
+import ui_profiler
+from form_toolkit import (calculate_optimal_size, center_window, show_nice_error, show_nice_success,
+                          show_nice_warning, safe_database_operation, TextValue, CollapsibleSection)
 from datetime import datetime, date, timedelta
 import re
 
-# Import responsive window manager
-def get_screen_dimensions():
-    """Get screen dimensions safely"""
-    try:
-        root = tk._default_root
-        if root is None:
-            root = tk.Tk()
-            root.withdraw()
-            screen_width = root.winfo_screenwidth()
-            screen_height = root.winfo_screenheight()
-            root.destroy()
-        else:
-            screen_width = root.winfo_screenwidth()
-            screen_height = root.winfo_screenheight()
-    except:
-        screen_width, screen_height = 1920, 1080
-    return screen_width, screen_height
-
-def calculate_optimal_size(min_width=400, min_height=300, max_width_percent=0.7, max_height_percent=0.8):
-    """Calculate optimal window size"""
-    screen_width, screen_height = get_screen_dimensions()
-    max_width = int(screen_width * max_width_percent)
-    max_height = int(screen_height * max_height_percent)
-    optimal_width = max(min_width, min(max_width, 700))
-    optimal_height = max(min_height, min(max_height, 800))
-    return optimal_width, optimal_height
-
-def center_window(window, width=None, height=None):
-    """Center window on screen"""
-    if width is None or height is None:
-        width, height = calculate_optimal_size()
-    screen_width, screen_height = get_screen_dimensions()
-    x = (screen_width - width) // 2
-    y = (screen_height - height) // 2
-    x = max(0, x)
-    y = max(0, y)
-    window.geometry(f"{width}x{height}+{x}+{y}")
-    return width, height
-
 def is_good_date(date_obj):
     """Check if a pathology date makes sense"""
     if not date_obj:
@@ -62,11 +28,8 @@ def is_good_eosinophil_count(count_text):
     if not count_text or count_text.strip() == "":
         return True  # Optional field
     
-    try:
-        count = float(count_text.strip())
-        return 0 <= count <= 1000  # Reasonable range for eosinophils per hpf
-    except:
-        return False
+    # Reasonable range for eosinophils per hpf - same rule as tblPathology.EosinophilValue
+    return measurements.parse(count_text, 0, 1000) is not None
 
 def is_valid_risk_score(risk_text):
     """Check if risk score text looks reasonable"""
@@ -94,32 +57,7 @@ def eoe_makes_sense(has_eoe, eosinophil_count):
             pass
     return True
 
-def show_nice_error(title, message):
-    """Show a nice error message"""
-    messagebox.showerror(title, message)
-
-def show_nice_success(message):
-    """Show a nice success message"""
-    messagebox.showinfo("Success!", message)
-
-def show_nice_warning(title, message):
-    """Show a warning message"""
-    return messagebox.askyesno(title, f"{message}\n\nDo you want to continue anyway?")
-
-def safe_database_operation(operation_name, operation_function):
-    """Safely do database operations with nice error handling"""
-    try:
-        return operation_function()
-    except sqlite3.IntegrityError as e:
-        show_nice_error("Data Problem", f"There's a problem with the data: {str(e)}")
-        return False
-    except sqlite3.OperationalError as e:
-        show_nice_error("Database Problem", f"The database had a problem: {str(e)}")
-        return False
-    except Exception as e:
-        show_nice_error("Unexpected Problem", f"Something unexpected happened: {str(e)}")
-        return False
-
+@ui_profiler.profiled("form:add_pathology")
 def open_add_pathology(patient_id, refresh_callback):
     """Open add pathology window with enhanced refresh system"""
     
@@ -129,7 +67,7 @@ def open_add_pathology(patient_id, refresh_callback):
     popup.grab_set()
     
     # Use responsive sizing
-    width, height = calculate_optimal_size(550, 700)
+    width, height = calculate_optimal_size(550, 700, 0.7, 0.8, preferred_width=700, preferred_height=800)
     center_window(popup, width, height)
     
     # Make resizable with constraints
@@ -179,8 +117,8 @@ def open_add_pathology(patient_id, refresh_callback):
             errors.append("Please select at least one test type (Biopsy, WATS3D, EsoPredict, or TissueCypher)")
         
         # Check risk scores
-        eso_risk = entry_esopredict.get().strip()
-        tc_risk = entry_tissuecypher.get().strip()
+        eso_risk = var_esopredict_risk.get().strip()
+        tc_risk = var_tissuecypher_risk.get().strip()
         
         if var_esopredict.get() and not eso_risk:
             warnings.append("EsoPredict was performed but no risk score entered")
@@ -252,7 +190,7 @@ def open_add_pathology(patient_id, refresh_callback):
 
     tk.Label(barrett_frame, text="Dysplasia Grade:", font=("Arial", 10)).pack(side="left", padx=(20, 5))
     cbo_dysplasia = ttk.Combobox(barrett_frame,
-        values=["", "NGIM", "No Dysplasia", "Indeterminate", "Low Grade", "High Grade"],
+        values=reference_data.options("dysplasia_grade", blank=True),
         state="disabled", width=17)
     cbo_dysplasia.pack(side="left", padx=5)
 
@@ -287,28 +225,31 @@ def open_add_pathology(patient_id, refresh_callback):
     entry_other = tk.Entry(other_entry_frame, width=50)
     entry_other.pack(fill="x", pady=2)
 
-    # Risk scores section
-    risk_frame = tk.LabelFrame(main_frame, text="Risk Assessment Scores", font=("Arial", 10, "bold"), padx=10, pady=10)
-    risk_frame.pack(fill="x", pady=(0, 15))
-
-    eso_risk_frame = tk.Frame(risk_frame)
-    eso_risk_frame.pack(fill="x", pady=5)
-    tk.Label(eso_risk_frame, text="EsoPredict Risk:", font=("Arial", 10)).pack(anchor="w")
-    entry_esopredict = tk.Entry(eso_risk_frame, width=50)
-    entry_esopredict.pack(fill="x", pady=2)
-
-    tc_risk_frame = tk.Frame(risk_frame)
-    tc_risk_frame.pack(fill="x", pady=5)
-    tk.Label(tc_risk_frame, text="TissueCypher Risk:", font=("Arial", 10)).pack(anchor="w")
-    entry_tissuecypher = tk.Entry(tc_risk_frame, width=50)
-    entry_tissuecypher.pack(fill="x", pady=2)
-
-    # Notes section
-    notes_frame = tk.Frame(main_frame)
-    notes_frame.pack(fill="x", pady=(0, 15))
-    tk.Label(notes_frame, text="Additional Notes:", font=("Arial", 10, "bold")).pack(anchor="w")
-    txt_notes = tk.Text(notes_frame, width=50, height=4, wrap="word")
-    txt_notes.pack(fill="x", pady=5)
+    # Risk scores and notes are built when opened; their values live in variables
+    var_esopredict_risk = tk.StringVar()
+    var_tissuecypher_risk = tk.StringVar()
+    notes_value = TextValue()
+
+    def build_risk_scores(frame):
+        tk.Label(frame, text="EsoPredict Risk:", font=("Arial", 10)).pack(anchor="w")
+        tk.Entry(frame, textvariable=var_esopredict_risk, width=50).pack(fill="x", pady=2)
+        tk.Label(frame, text="TissueCypher Risk:", font=("Arial", 10)).pack(anchor="w", pady=(5, 0))
+        tk.Entry(frame, textvariable=var_tissuecypher_risk, width=50).pack(fill="x", pady=2)
+
+    def build_notes(frame):
+        notes_value.attach(frame, width=50, height=4).pack(fill="x", pady=5)
+
+    risk_section = CollapsibleSection(main_frame, "Risk Assessment Scores", build_risk_scores)
+    risk_section.pack(fill="x", pady=(0, 15))
+
+    # Open the risk scores as soon as a test that produces one is ticked
+    def open_risk_section(*args):
+        if (var_esopredict.get() or var_tissuecypher.get()) and not risk_section.expanded:
+            risk_section.expand()
+    var_esopredict.trace_add("write", open_risk_section)
+    var_tissuecypher.trace_add("write", open_risk_section)
+
+    CollapsibleSection(main_frame, "Additional Notes", build_notes).pack(fill="x", pady=(0, 15))
 
     def toggle_dysplasia():
         """Enable/disable dysplasia dropdown based on Barrett's checkbox"""
@@ -386,12 +327,12 @@ def open_add_pathology(patient_id, refresh_callback):
                 "EoE": var_eoe.get(),
                 "EosinophilCount": eos_count,
                 "OtherFinding": entry_other.get().strip(),
-                "EsoPredictRisk": entry_esopredict.get().strip(),
-                "TissueCypherRisk": entry_tissuecypher.get().strip(),
-                "Notes": txt_notes.get("1.0", tk.END).strip()
+                "EsoPredictRisk": var_esopredict_risk.get().strip(),
+                "TissueCypherRisk": var_tissuecypher_risk.get().strip(),
+                "Notes": notes_value.get()
             }
 
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
 
             cursor.execute("""
@@ -4,6 +4,9 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 from tkcalendar import DateEntry
 import sqlite3
+import database
+import reference_data
+import ui_profiler
 from datetime import date
 import re
 
@@ -68,6 +71,7 @@ def safe_database_operation(operation_name, operation_function):
         show_nice_error("Unexpected Problem", f"Something unexpected happened: {str(e)}")
         return False
 
+@ui_profiler.profiled("form:add_patient")
 def build(on_save_callback=None):
     """Build the add patient window - now with SUPER protection!"""
     
@@ -88,12 +92,12 @@ def build(on_save_callback=None):
         tk.Label(window, text=label).grid(row=i, column=0, sticky="w", padx=10, pady=5)
 
         if label == "Gender":
-            combo = ttk.Combobox(window, values=["Male", "Female", "Other"])
+            combo = ttk.Combobox(window, values=reference_data.options("gender"))
             combo.grid(row=i, column=1, padx=10)
             entries[label] = combo
 
         elif label == "Referral Source":
-            combo = ttk.Combobox(window, values=["Self", "Physician", "Patient", "Other"])
+            combo = ttk.Combobox(window, values=reference_data.options("referral_source"))
             combo.grid(row=i, column=1, padx=10)
             entries[label] = combo
 
@@ -163,7 +167,7 @@ def build(on_save_callback=None):
         # Now safely save to database
         def do_the_database_save():
             """The actual database saving (wrapped in safety)"""
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             try:
                 cursor = conn.cursor()
                 
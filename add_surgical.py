@@ -1,48 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk
 from tkcalendar import DateEntry
-import sqlite3
+import database
+import reference_data
+import ui_profiler
+from form_toolkit import (calculate_optimal_size, center_window, show_nice_error, show_nice_success,
+                          show_nice_warning, safe_database_operation, CollapsibleSection)
+from scrollable_frame import ScrollableFrame
 from datetime import datetime, date
 
-# Import responsive window utilities
-def get_screen_dimensions():
-    """Get screen dimensions safely"""
-    try:
-        root = tk._default_root
-        if root is None:
-            root = tk.Tk()
-            root.withdraw()
-            screen_width = root.winfo_screenwidth()
-            screen_height = root.winfo_screenheight()
-            root.destroy()
-        else:
-            screen_width = root.winfo_screenwidth()
-            screen_height = root.winfo_screenheight()
-    except:
-        screen_width, screen_height = 1920, 1080
-    return screen_width, screen_height
-
-def calculate_optimal_size(min_width=700, min_height=600, max_width_percent=0.8, max_height_percent=0.9):
-    """Calculate optimal window size"""
-    screen_width, screen_height = get_screen_dimensions()
-    max_width = int(screen_width * max_width_percent)
-    max_height = int(screen_height * max_height_percent)
-    optimal_width = max(min_width, min(max_width, 900))
-    optimal_height = max(min_height, min(max_height, 700))
-    return optimal_width, optimal_height
-
-def center_window(window, width=None, height=None):
-    """Center window on screen"""
-    if width is None or height is None:
-        width, height = calculate_optimal_size()
-    screen_width, screen_height = get_screen_dimensions()
-    x = (screen_width - width) // 2
-    y = (screen_height - height) // 2
-    x = max(0, x)
-    y = max(0, y)
-    window.geometry(f"{width}x{height}+{x}+{y}")
-    return width, height
-
 def is_good_surgery_date(date_obj):
     """Check if a surgery date makes sense"""
     if not date_obj:
@@ -134,32 +100,7 @@ def is_valid_surgeon(surgeon_name):
     import re
     return bool(re.match(r"^[A-Za-z\s\.,'-]+$", surgeon_name.strip()))
 
-def show_nice_error(title, message):
-    """Show a nice error message"""
-    messagebox.showerror(title, message)
-
-def show_nice_success(message):
-    """Show a nice success message"""
-    messagebox.showinfo("Success!", message)
-
-def show_nice_warning(title, message):
-    """Show a warning message"""
-    return messagebox.askyesno(title, f"{message}\n\nDo you want to continue anyway?")
-
-def safe_database_operation(operation_name, operation_function):
-    """Safely do database operations with nice error handling"""
-    try:
-        return operation_function()
-    except sqlite3.IntegrityError as e:
-        show_nice_error("Data Problem", f"There's a problem with the data: {str(e)}")
-        return False
-    except sqlite3.OperationalError as e:
-        show_nice_error("Database Problem", f"The database had a problem: {str(e)}")
-        return False
-    except Exception as e:
-        show_nice_error("Unexpected Problem", f"Something unexpected happened: {str(e)}")
-        return False
-
+@ui_profiler.profiled("form:add_surgical")
 def open_add_surgical(tab_frame, patient_id, refresh_callback=None):
     """Open add surgical window with enhanced refresh system"""
     
@@ -169,46 +110,17 @@ def open_add_surgical(tab_frame, patient_id, refresh_callback=None):
     popup.grab_set()
     
     # Use responsive sizing
-    width, height = calculate_optimal_size(700, 600)
+    width, height = calculate_optimal_size(700, 600, 0.8, 0.9, preferred_width=900, preferred_height=700)
     center_window(popup, width, height)
     
     # Make resizable with constraints
     popup.minsize(600, 500)
     popup.resizable(True, True)
     
-    # Create main frame with scrollbar
-    main_frame = tk.Frame(popup)
-    main_frame.pack(fill="both", expand=True, padx=10, pady=10)
-    
-    # Create canvas and scrollbar
-    canvas = tk.Canvas(main_frame)
-    scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=canvas.yview)
-    scrollable_frame = tk.Frame(canvas)
-    
-    scrollable_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-    )
-    
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-    
-    # Pack canvas and scrollbar
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
-    
-    # Enable mousewheel scrolling
-    def _on_mousewheel(event):
-        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-    
-    def bind_mousewheel(event):
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
-    
-    def unbind_mousewheel(event):
-        canvas.unbind_all("<MouseWheel>")
-    
-    canvas.bind("<Enter>", bind_mousewheel)
-    canvas.bind("<Leave>", unbind_mousewheel)
+    # Create main scrollable frame
+    scroll = ScrollableFrame(popup, fit_width=True)
+    scroll.pack(fill="both", expand=True, padx=10, pady=10)
+    scrollable_frame = scroll.scrollable_frame
 
     def check_all_surgical_data():
         """Check if all the surgical data makes sense"""
@@ -261,26 +173,13 @@ def open_add_surgical(tab_frame, patient_id, refresh_callback=None):
     surgeon_frame.pack(fill="x", pady=8)
     tk.Label(surgeon_frame, text="Surgeon:", font=("Arial", 10, "bold")).pack(anchor="w")
     
-    def get_surgeon_list():
-        """Get list of surgeons safely"""
-        conn = sqlite3.connect("gerd_center.db")
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT SurgeonName FROM tblSurgeons ORDER BY SurgeonName")
-            return [row[0] for row in cursor.fetchall()]
-        except:
-            return []  # Return empty list if table doesn't exist
-        finally:
-            conn.close()
-    
-    surgeon_names = safe_database_operation("Load surgeon list", get_surgeon_list) or []
+    surgeon_names = reference_data.surgeons()
     cbo_surgeon = ttk.Combobox(surgeon_frame, values=surgeon_names, state="readonly", width=30)
     cbo_surgeon.pack(anchor="w", pady=5)
 
     # Procedures section
-    procedure_frame = tk.LabelFrame(scrollable_frame, text="Surgical Procedures Performed", 
-                                   font=("Arial", 11, "bold"), padx=15, pady=15)
-    procedure_frame.pack(fill="x", pady=15)
+    tk.Label(scrollable_frame, text="Surgical Procedures Performed",
+             font=("Arial", 11, "bold")).pack(anchor="w", pady=(15, 5))
 
     # Define procedures with medical groupings and descriptions
     procedure_groups = [
@@ -321,34 +220,37 @@ def open_add_surgical(tab_frame, patient_id, refresh_callback=None):
         ]),
     ]
 
-    check_vars = {}
-    current_row = 0
+    # Checkbox state lives in variables; each group's checkboxes are built when it is opened
+    check_vars = {proc_key: tk.IntVar() for _, procedures in procedure_groups for proc_key, _ in procedures}
 
-    for group_name, procedures in procedure_groups:
-        # Group header
-        group_label = tk.Label(procedure_frame, text=group_name, font=("Arial", 10, "bold"), fg="blue")
-        group_label.grid(row=current_row, column=0, columnspan=2, sticky="w", pady=(10, 2))
-        current_row += 1
-        
-        # Procedures in this group
-        for proc_key, proc_display in procedures:
-            var = tk.IntVar()
-            check_vars[proc_key] = var
-            
-            # Color code mutually exclusive groups
-            if "Choose One" in group_name:
-                cb = tk.Checkbutton(procedure_frame, text=proc_display, variable=var, fg="red")
-            else:
-                cb = tk.Checkbutton(procedure_frame, text=proc_display, variable=var)
-            
-            cb.grid(row=current_row, column=0, sticky="w", padx=20, pady=1)
-            current_row += 1
-        
-        # Add some spacing between groups
-        current_row += 1
+    def group_builder(group_name, procedures):
+        def build_group(frame):
+            for proc_key, proc_display in procedures:
+                # Color code mutually exclusive groups
+                if "Choose One" in group_name:
+                    cb = tk.Checkbutton(frame, text=proc_display, variable=check_vars[proc_key], fg="red")
+                else:
+                    cb = tk.Checkbutton(frame, text=proc_display, variable=check_vars[proc_key])
+                cb.pack(anchor="w", padx=20, pady=1)
+        return build_group
+
+    def group_section(parent, group_name, procedures, expanded):
+        section = CollapsibleSection(parent, group_name, group_builder(group_name, procedures),
+                                     expanded=expanded, bd=0, relief="flat")
+        section.toggle_btn.config(fg="blue", relief="flat")
+        return section
+
+    # Groups below the fold are only built once they scroll near the viewport
+    for index, (group_name, procedures) in enumerate(procedure_groups):
+        scroll.add_child(lambda parent, group_name=group_name, procedures=procedures, expanded=index == 0:
+                         group_section(parent, group_name, procedures, expanded),
+                         height_hint=40, padx=15, pady=2)
+
+    # Notes and the save button follow the groups, so they are a child too - built now
+    footer = scroll.child(scroll.add_child(tk.Frame, height_hint=200))
 
     # Notes section
-    notes_frame = tk.Frame(scrollable_frame)
+    notes_frame = tk.Frame(footer)
     notes_frame.pack(fill="x", pady=15)
     tk.Label(notes_frame, text="Operative Notes:", font=("Arial", 10, "bold")).pack(anchor="w")
     txt_notes = tk.Text(notes_frame, width=50, height=4, wrap="word")
@@ -424,7 +326,7 @@ def open_add_surgical(tab_frame, patient_id, refresh_callback=None):
             for proc_name in procedure_names:
                 procedure_values.append(check_vars[proc_name].get())
 
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             
             # Build the SQL dynamically
@@ -476,7 +378,7 @@ def open_add_surgical(tab_frame, patient_id, refresh_callback=None):
                 pass
 
     # Save button
-    save_frame = tk.Frame(scrollable_frame)
+    save_frame = tk.Frame(footer)
     save_frame.pack(pady=20)
     
     tk.Button(save_frame, text="💾 Save Surgical Procedure", command=save, 
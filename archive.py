@@ -0,0 +1,182 @@
+# archive.py - Moves finished recalls and superseded surveillance plans out of the hot tables
+#
+# Completed recalls and surveillance plans that have been replaced by a newer
+# plan are only read by historical reports, yet every worklist query scans
+# them. archive_rows() moves those older than a horizon into a separate
+# SQLite file ATTACHed as "archive", in one transaction, so the hot tables
+# keep only what the worklists need. The file sits next to the database
+# (gerd_center_archive.db) and backup.py snapshots and restores it with it.
+#
+# Reports that want history read the TEMP views instead of the base tables:
+#     vwRecallAll        - tblRecall plus archived recalls
+#     vwSurveillanceAll  - tblSurveillance plus archived plans
+# Both have the base table's columns plus Archived (0/1). Call attach(conn)
+# once on a connection before using them.
+#
+#     python archive.py run --days 730
+#     python archive.py status
+
+import os
+import argparse
+
+import database
+import change_journal
+
+ARCHIVE_PATH = os.environ.get("GERD_ARCHIVE_PATH") or \
+    os.path.splitext(database.DB_PATH)[0] + "_archive.db"
+DEFAULT_HORIZON_DAYS = 365
+# Journal entries for the moves carry this Session - sync.py doesn't export them,
+# since every workstation archives its own copy
+ARCHIVE_SESSION = "archive:"
+
+# table: (key column, view name, rows that may be archived, date column for the horizon)
+ARCHIVED_TABLES = {
+    "tblRecall": ("RecallID", "vwRecallAll", "Completed = 1", "RecallDate"),
+    # Superseded = not the patient's newest plan (the one the worklists read)
+    "tblSurveillance": ("SurveillanceID", "vwSurveillanceAll", """EXISTS (
+        SELECT 1 FROM main.tblSurveillance Newer
+        WHERE Newer.PatientID = tblSurveillance.PatientID
+          AND (Newer.LastModified > tblSurveillance.LastModified
+               OR (Newer.LastModified = tblSurveillance.LastModified
+                   AND Newer.SurveillanceID > tblSurveillance.SurveillanceID)))""", "LastModified"),
+}
+
+
+def path_for(db_path):
+    """Archive file that goes with the database at db_path"""
+    if not db_path or os.path.abspath(db_path) == os.path.abspath(database.DB_PATH):
+        return ARCHIVE_PATH
+    return os.path.splitext(db_path)[0] + "_archive.db"
+
+
+def conn_archive_path(conn):
+    main = next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+    return path_for(main)
+
+
+def columns_of(conn, schema_name, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema_name}.table_info({table})")]
+
+
+def is_attached(conn):
+    return any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+
+
+def attach(conn, path=None):
+    """ATTACH the archive to conn (creating it if needed) and define the *All views"""
+    if is_attached(conn):
+        return
+    conn.execute("ATTACH DATABASE ? AS archive", (path or conn_archive_path(conn),))
+    for table, (key, view, _, _) in ARCHIVED_TABLES.items():
+        hot = columns_of(conn, "main", table)
+        # Same columns as the hot table, keyed the same way, plus when it moved
+        conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} ({key} INTEGER PRIMARY KEY, ArchivedAt TEXT)")
+        existing = set(columns_of(conn, "archive", table))
+        for column in hot:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_patient ON {table}(PatientID)")
+        column_list = ", ".join(hot)
+        conn.execute(f"DROP VIEW IF EXISTS temp.{view}")
+        conn.execute(f"""
+            CREATE TEMP VIEW {view} AS
+            SELECT {column_list}, 0 AS Archived FROM main.{table}
+            UNION ALL
+            SELECT {column_list}, 1 AS Archived FROM archive.{table}
+        """)
+    conn.commit()
+
+
+def candidates(conn, table, horizon_days):
+    """WHERE clause and params selecting the rows of table due for archiving"""
+    _, _, finished, date_column = ARCHIVED_TABLES[table]
+    return (f"{finished} AND {date_column} IS NOT NULL AND {date_column} != '' "
+            f"AND {date_column} < date('now', ?)", [f"-{int(horizon_days)} days"])
+
+
+def archive_rows(conn, horizon_days=DEFAULT_HORIZON_DAYS, dry_run=False):
+    """Move archivable rows older than horizon_days; returns {table: rows moved}"""
+    attach(conn)
+    moved = {}
+    before = change_journal.latest_id(conn)
+    try:
+        if dry_run:
+            for table in ARCHIVED_TABLES:
+                where, params = candidates(conn, table, horizon_days)
+                moved[table] = conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {where}", params).fetchone()[0]
+            return moved
+        # Moving a row is not patient activity - put the affected patients'
+        # last-activity entries back as they were afterwards
+        saved = []
+        for table in ARCHIVED_TABLES:
+            where, params = candidates(conn, table, horizon_days)
+            saved.extend(conn.execute(f"""
+                SELECT LastActivity, LastTable, PatientID FROM tblPatientActivity
+                WHERE PatientID IN (SELECT PatientID FROM main.{table} WHERE {where})
+            """, params).fetchall())
+        for table in ARCHIVED_TABLES:
+            where, params = candidates(conn, table, horizon_days)
+            column_list = ", ".join(columns_of(conn, "main", table))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.{table} ({column_list}, ArchivedAt)
+                SELECT {column_list}, datetime('now', 'localtime') FROM main.{table} WHERE {where}
+            """, params)
+            moved[table] = conn.execute(f"DELETE FROM main.{table} WHERE {where}", params).rowcount
+        conn.executemany("UPDATE tblPatientActivity SET LastActivity = ?, LastTable = ? WHERE PatientID = ?",
+                         saved)
+        conn.execute("UPDATE tblActivityLog SET Session = ? WHERE ActivityID > ?",
+                     (ARCHIVE_SESSION + database.SESSION_ID, before))
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    return moved
+
+
+def delete_patient(conn, patient_id):
+    """Remove a patient's archived rows (part of deleting the patient; caller commits)"""
+    if not is_attached(conn) and not os.path.exists(conn_archive_path(conn)):
+        return
+    attach(conn)
+    for table in ARCHIVED_TABLES:
+        conn.execute(f"DELETE FROM archive.{table} WHERE PatientID = ?", (patient_id,))
+
+
+def status(conn, horizon_days=DEFAULT_HORIZON_DAYS):
+    """{table: (hot rows, archived rows, due for archiving)}"""
+    attach(conn)
+    result = {}
+    for table in ARCHIVED_TABLES:
+        where, params = candidates(conn, table, horizon_days)
+        result[table] = (conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0],
+                         conn.execute(f"SELECT COUNT(*) FROM archive.{table}").fetchone()[0],
+                         conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {where}", params).fetchone()[0])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive completed recalls and superseded surveillance plans")
+    parser.add_argument("--days", type=int, default=DEFAULT_HORIZON_DAYS,
+                        help=f"Only archive rows older than this (default: {DEFAULT_HORIZON_DAYS})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="Move archivable rows to the archive")
+    run_parser.add_argument("--dry-run", action="store_true", help="Only count what would move")
+    sub.add_parser("status", help="Row counts in the hot tables and the archive")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        if args.command == "run":
+            moved = archive_rows(conn, args.days, args.dry_run)
+            verb = "Would move" if args.dry_run else "Moved"
+            for table, count in moved.items():
+                print(f"{verb} {count} row(s) from {table} to {ARCHIVE_PATH}")
+        elif args.command == "status":
+            for table, (hot, archived, due) in status(conn, args.days).items():
+                print(f"{table}: {hot} hot, {archived} archived, {due} due for archiving")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
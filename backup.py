@@ -0,0 +1,252 @@
+# backup.py - Online backups of gerd_center.db through the SQLite backup API
+#
+# A plain file copy taken while the apps are open can catch a half-written
+# transaction. Connection.backup copies pages under SQLite's own locking, a
+# batch at a time with a pause in between, so clinicians' saves go through
+# while a backup of even a large database is running. Each snapshot is
+# written under a .partial name, checked with PRAGMA integrity_check and only
+# then given its final name, and old snapshots are rotated out. The archive
+# database (archive.py) is snapshotted alongside, as <snapshot>_archive.db.
+#
+#     python backup.py run --dest backups            # one snapshot now
+#     python backup.py schedule --dest backups --every 60
+#     python backup.py list --dest backups
+#     python backup.py verify backups/gerd_center-20260101-120000.db
+#     python backup.py restore backups/gerd_center-20260101-120000.db
+
+import os
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+import archive
+import database
+
+DEFAULT_DEST = "backups"
+DEFAULT_KEEP = 14
+# Pages copied per step (4 KB each by default) and the pause between steps
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.05
+# Writes from other connections restart a copy; stop pausing after this many
+MAX_RESTARTS = 3
+SNAPSHOT_SUFFIX = ".db"
+ARCHIVE_SUFFIX = "_archive.db"
+# Label of the copy restore() takes first; rotate() leaves these alone
+SAFETY_LABEL = "pre-restore"
+
+
+def snapshot_name(db_path, label=None):
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"{stem}-{label}-{stamp}{SNAPSHOT_SUFFIX}" if label else f"{stem}-{stamp}{SNAPSHOT_SUFFIX}"
+
+
+def copy_database(source, target, pages=PAGES_PER_STEP, sleep=STEP_SLEEP, progress=None):
+    """Copy an open database into another open connection in page batches.
+
+    progress(remaining, total) is called after each step. If another
+    connection writes to the source mid-copy SQLite restarts the copy, so the
+    result is always a consistent snapshot; after MAX_RESTARTS restarts the
+    pauses are dropped so a busy database still gets backed up.
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    def step_done(status, remaining, total):
+        if progress:
+            progress(remaining, total)
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+        state["remaining"] = remaining
+        # backup()'s own sleep only applies when the source is busy - pause
+        # after every step so writers get the database in between
+        if remaining and sleep and state["restarts"] < MAX_RESTARTS:
+            time.sleep(sleep)
+
+    source.backup(target, pages=pages, progress=step_done, sleep=sleep)
+
+
+def verify(path, quick=False, table="tblPatients"):
+    """Problems PRAGMA integrity_check (or quick_check) finds in a snapshot; [] means it is sound"""
+    if not os.path.exists(path):
+        return [f"{path} does not exist"]
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            pragma = "quick_check" if quick else "integrity_check"
+            rows = [row[0] for row in conn.execute(f"PRAGMA {pragma}")]
+            conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    return [] if rows == ["ok"] else rows
+
+
+def snapshots(dest=DEFAULT_DEST, db_path=None):
+    """Finished snapshots of the database in dest, newest first"""
+    stem = os.path.splitext(os.path.basename(db_path or database.DB_PATH))[0]
+    if not os.path.isdir(dest):
+        return []
+    names = [name for name in os.listdir(dest)
+             if name.startswith(stem + "-") and name.endswith(SNAPSHOT_SUFFIX) and not name.endswith(ARCHIVE_SUFFIX)]
+    paths = [os.path.join(dest, name) for name in names]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def rotate(dest=DEFAULT_DEST, keep=DEFAULT_KEEP, db_path=None):
+    """Delete all but the newest keep snapshots (and their archives); returns the paths removed"""
+    stem = os.path.splitext(os.path.basename(db_path or database.DB_PATH))[0]
+    rotated = [path for path in snapshots(dest, db_path)
+               if not os.path.basename(path).startswith(f"{stem}-{SAFETY_LABEL}-")]
+    removed = []
+    for path in rotated[keep:]:
+        for part in (path, archive_snapshot(path)):
+            if os.path.exists(part):
+                os.remove(part)
+                removed.append(part)
+    return removed
+
+
+def archive_snapshot(path):
+    """Where the archive database of the snapshot at path is kept"""
+    return os.path.splitext(path)[0] + ARCHIVE_SUFFIX
+
+
+def snapshot_file(source_path, target_path, table, pages=PAGES_PER_STEP, sleep=STEP_SLEEP, progress=None):
+    """Copy one database file to target_path through a verified .partial file"""
+    partial = target_path + ".partial"
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(partial)
+    try:
+        copy_database(source, target, pages, sleep, progress)
+    finally:
+        target.close()
+        source.close()
+
+    problems = verify(partial, table=table)
+    if problems:
+        os.remove(partial)
+        raise RuntimeError(f"Backup of {source_path} failed its integrity check: {'; '.join(problems[:5])}")
+    os.replace(partial, target_path)
+
+
+def backup(db_path=None, dest=DEFAULT_DEST, keep=DEFAULT_KEEP, label=None,
+           pages=PAGES_PER_STEP, sleep=STEP_SLEEP, progress=None):
+    """Take one verified snapshot of the live database and its archive; returns its path.
+
+    Raises RuntimeError (and leaves nothing behind) if a copy fails its
+    integrity check.
+    """
+    db_path = db_path or database.DB_PATH
+    os.makedirs(dest, exist_ok=True)
+    final = os.path.join(dest, snapshot_name(db_path, label))
+    archive_path = archive.path_for(db_path)
+
+    # The archive is copied second: a move that lands in between then shows up
+    # in both copies rather than in neither
+    snapshot_file(db_path, final, "tblPatients", pages, sleep, progress)
+    if os.path.exists(archive_path):
+        try:
+            snapshot_file(archive_path, archive_snapshot(final), "tblRecall", pages, sleep, progress)
+        except Exception:
+            os.remove(final)
+            raise
+    if keep:
+        rotate(dest, keep, db_path)
+    return final
+
+
+def restore(snapshot, db_path=None, dest=DEFAULT_DEST):
+    """Put a snapshot back in place of the live database.
+
+    The snapshot (and its archive, if it has one) is verified first and the
+    current database is backed up (labelled pre-restore, never rotated away)
+    before anything is overwritten. The copy goes through the
+    backup API into the live file, so apps that have it open see either the
+    old or the restored database, never a mix. Returns the path of the
+    pre-restore backup.
+    """
+    db_path = db_path or database.DB_PATH
+    problems = verify(snapshot)
+    saved_archive = archive_snapshot(snapshot)
+    if os.path.exists(saved_archive):
+        problems += verify(saved_archive, table="tblRecall")
+    if problems:
+        raise RuntimeError(f"Snapshot failed its integrity check: {'; '.join(problems[:5])}")
+
+    safety = backup(db_path, dest, keep=0, label=SAFETY_LABEL) if os.path.exists(db_path) else None
+    restores = [(snapshot, db_path)]
+    if os.path.exists(saved_archive):
+        restores.append((saved_archive, archive.path_for(db_path)))
+    for source_path, target_path in restores:
+        source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            # One pass: the live file must not be left half restored
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    if not os.path.exists(saved_archive) and os.path.exists(archive.path_for(db_path)):
+        # Nothing had been archived when the snapshot was taken, so its rows are all in the main file
+        conn = sqlite3.connect(archive.path_for(db_path), timeout=30)
+        try:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in archive.ARCHIVED_TABLES:
+                if table in existing:
+                    conn.execute(f"DELETE FROM {table}")
+            conn.commit()
+        finally:
+            conn.close()
+    return safety
+
+
+def schedule(db_path=None, dest=DEFAULT_DEST, every_minutes=60, keep=DEFAULT_KEEP):
+    """Take a snapshot every every_minutes until interrupted"""
+    while True:
+        started = time.monotonic()
+        try:
+            path = backup(db_path, dest, keep)
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} backed up to {path}")
+        except Exception as e:
+            # Keep the schedule going - a locked or busy moment shouldn't end it
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} backup failed: {e}")
+        time.sleep(max(0, every_minutes * 60 - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backups of gerd_center.db")
+    parser.add_argument("--db", default=None, help="Database path (default: GERD_DB_PATH or gerd_center.db)")
+    parser.add_argument("--dest", default=DEFAULT_DEST, help=f"Snapshot folder (default: {DEFAULT_DEST})")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Snapshots to keep (0 = keep all)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="Take one snapshot now")
+    schedule_parser = sub.add_parser("schedule", help="Take a snapshot at a fixed interval")
+    schedule_parser.add_argument("--every", type=float, default=60, help="Minutes between snapshots")
+    sub.add_parser("list", help="List snapshots, newest first")
+    verify_parser = sub.add_parser("verify", help="Integrity-check a snapshot")
+    verify_parser.add_argument("snapshot")
+    restore_parser = sub.add_parser("restore", help="Replace the live database with a snapshot")
+    restore_parser.add_argument("snapshot")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print(backup(args.db, args.dest, args.keep))
+    elif args.command == "schedule":
+        schedule(args.db, args.dest, args.every, args.keep)
+    elif args.command == "list":
+        for path in snapshots(args.dest, args.db):
+            size = os.path.getsize(path) / (1024 * 1024)
+            print(f"{datetime.fromtimestamp(os.path.getmtime(path)):%Y-%m-%d %H:%M:%S}  {size:8.1f} MB  {path}")
+    elif args.command == "verify":
+        problems = verify(args.snapshot)
+        print("ok" if not problems else "\n".join(problems))
+    elif args.command == "restore":
+        safety = restore(args.snapshot, args.db, args.dest)
+        print(f"Restored {args.snapshot}" + (f" (previous database saved to {safety})" if safety else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# barrett_length.py - Barrett's segment length pulled out of the endoscopy findings once
+#
+# The 3- versus 5-year interval for non-dysplastic Barrett's depends on the
+# segment length, which only exists as free text in EndoscopyFindings
+# ("C2M5", "4 cm Barrett's segment"). Rather than running a regex over a
+# patient's findings on every render, the length and Prague C/M are parsed
+# when a diagnostic is saved and kept in tblBarrettSegments, one row per
+# endoscopy, indexed by patient and by length:
+#
+#     SELECT PatientID FROM tblBarrettSegments WHERE LengthCm >= 3
+#
+# A row is only trusted while the findings it came from are unchanged:
+# schema.py's triggers delete it when the diagnostic's findings, date or
+# endoscopy flag change, or the diagnostic is deleted. Endoscopies without a
+# row are "pending"; extract_pending() parses them in one batch (the first
+# time a database is opened and after a sync). Every form that saves an
+# endoscopy calls extract(), so reading a length never writes.
+# tblBarrettSegments is derived data, so filling it never touches
+# tblDiagnostics, the activity log or the change journal.
+
+import re
+
+# Plausible segment lengths; anything outside is a typo or another measurement
+MAX_LENGTH_CM = 20
+BATCH_SIZE = 5000
+
+_PRAGUE = re.compile(r"\bC\s*(\d+(?:\.\d+)?)\s*[,/]?\s*M\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+_LENGTH = re.compile(r"(\d+(?:\.\d+)?)\s*cm", re.IGNORECASE)
+# Sentence breaks - a full stop that isn't a decimal point
+_SENTENCE = re.compile(r"(?<!\d)\.|\.(?!\d)|[;\n]")
+
+# A length counts while it is from one of the patient's last few endoscopies -
+# an old measurement shouldn't outlive several EGDs that didn't repeat it
+RECENT_ENDOSCOPIES = 3
+
+# latest() for every patient at once, for joining into cohort-wide queries
+LATEST_LENGTH_SQL = f"""
+    SELECT PatientID, TestDate, LengthCm, PragueC, PragueM
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY PatientID ORDER BY TestDate DESC, DiagnosticID DESC) AS pick
+        FROM (
+            SELECT B.*, ROW_NUMBER() OVER (PARTITION BY PatientID ORDER BY TestDate DESC, DiagnosticID DESC) AS rn
+            FROM tblBarrettSegments B
+        )
+        WHERE rn <= {RECENT_ENDOSCOPIES} AND LengthCm IS NOT NULL
+    )
+    WHERE pick = 1
+"""
+
+# One patient's newest length among their last few endoscopies (see latest)
+PATIENT_LENGTH_SQL = """
+    SELECT TestDate, LengthCm, PragueC, PragueM
+    FROM (
+        SELECT DiagnosticID, TestDate, LengthCm, PragueC, PragueM
+        FROM tblBarrettSegments
+        WHERE PatientID = ?
+        ORDER BY TestDate DESC, DiagnosticID DESC
+        LIMIT ?
+    )
+    WHERE LengthCm IS NOT NULL
+    ORDER BY TestDate DESC, DiagnosticID DESC
+    LIMIT 1
+"""
+
+
+def _length(text):
+    value = float(text)
+    return value if 0 < value <= MAX_LENGTH_CM else None
+
+
+def parse(findings):
+    """(length cm, Prague C, Prague M) from endoscopy findings; each None if not found.
+
+    Prague M is the maximal extent, so it is the length when given. Otherwise
+    the first "N cm" in a sentence mentioning Barrett's is used, then the
+    first "N cm" anywhere (what the surveillance tab has always read).
+    """
+    if not findings:
+        return None, None, None
+    prague = _PRAGUE.search(findings)
+    if prague:
+        c, m = float(prague.group(1)), _length(prague.group(2))
+        if m is not None and c <= m:
+            return m, c, m
+    for sentence in _SENTENCE.split(findings):
+        if "barrett" in sentence.lower():
+            match = _LENGTH.search(sentence)
+            if match and _length(match.group(1)):
+                return _length(match.group(1)), None, None
+    match = _LENGTH.search(findings)
+    if match:
+        return _length(match.group(1)), None, None
+    return None, None, None
+
+
+def store(conn, rows):
+    """Parse and save [(DiagnosticID, PatientID, TestDate, EndoscopyFindings)]; caller commits"""
+    conn.executemany("""
+        INSERT OR REPLACE INTO tblBarrettSegments (DiagnosticID, PatientID, TestDate, LengthCm, PragueC, PragueM)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(diagnostic_id, patient_id, test_date) + parse(findings)
+          for diagnostic_id, patient_id, test_date, findings in rows])
+
+
+def extract(conn, diagnostic_id):
+    """Parse one diagnostic just saved on conn (part of the caller's transaction)"""
+    rows = conn.execute("""
+        SELECT DiagnosticID, PatientID, TestDate, EndoscopyFindings
+        FROM tblDiagnostics
+        WHERE DiagnosticID = ? AND Endoscopy = 1
+    """, (diagnostic_id,)).fetchall()
+    conn.execute("DELETE FROM tblBarrettSegments WHERE DiagnosticID = ?", (diagnostic_id,))
+    store(conn, rows)
+
+
+def extract_pending(conn, patient_id=None, batch_size=BATCH_SIZE):
+    """Parse every endoscopy that has no tblBarrettSegments row yet (optionally
+    one patient's); returns the number parsed. Commits per batch."""
+    where, params = "", []
+    if patient_id is not None:
+        where, params = "AND D.PatientID = ?", [patient_id]
+    parsed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT D.DiagnosticID, D.PatientID, D.TestDate, D.EndoscopyFindings
+            FROM tblDiagnostics D
+            WHERE D.Endoscopy = 1 AND D.DiagnosticID > ? {where}
+              AND NOT EXISTS (SELECT 1 FROM tblBarrettSegments B WHERE B.DiagnosticID = D.DiagnosticID)
+            ORDER BY D.DiagnosticID
+            LIMIT ?
+        """, [last_id] + params + [batch_size]).fetchall()
+        if not rows:
+            break
+        store(conn, rows)
+        conn.commit()
+        parsed += len(rows)
+        last_id = rows[-1][0]
+    return parsed
+
+
+def latest(conn, patient_id, recent=RECENT_ENDOSCOPIES):
+    """(TestDate, LengthCm, PragueC, PragueM) from the newest of the patient's
+    last `recent` endoscopies that has a length, or None"""
+    return conn.execute(PATIENT_LENGTH_SQL, (patient_id, recent)).fetchone()
+
+
+def describe(length_cm, prague_c=None, prague_m=None):
+    """"C1M3" when the Prague grade is known, otherwise "3cm" """
+    if prague_m is not None:
+        return f"C{prague_c:g}M{prague_m:g}"
+    return f"{length_cm:g}cm" if length_cm is not None else None
@@ -1,4 +1,6 @@
-import sqlite3
+import barrett_length
+import database
+import reference_data
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, timedelta, date
@@ -13,7 +15,37 @@ import tempfile
 import webbrowser
 import csv
 
-DB_PATH = "gerd_center.db"
+# Latest Barrett's pathology, surveillance plan and segment length per patient;
+# the dysplasia filter and ORDER BY are appended in run_surveillance_analysis
+SURVEILLANCE_SQL = f"""
+    WITH LatestBarrettsPath AS (
+        SELECT p.*,
+               ROW_NUMBER() OVER (PARTITION BY p.PatientID ORDER BY p.PathologyDate DESC) as rn
+        FROM tblPathology p
+        WHERE p.Barretts = 1 AND p.PathologyDate IS NOT NULL
+    ),
+    LatestLength AS ({barrett_length.LATEST_LENGTH_SQL}),
+    CurrentSurveillance AS (
+        SELECT s.PatientID, s.NextBarrettsEGD, s.Undecided,
+               ROW_NUMBER() OVER (PARTITION BY s.PatientID ORDER BY s.LastModified DESC) as rn
+        FROM tblSurveillance s
+    )
+    SELECT DISTINCT
+        pt.PatientID,
+        pt.LastName || ', ' || pt.FirstName AS Name,
+        pt.MRN,
+        lbp.PathologyDate,
+        lbp.DysplasiaGrade,
+        cs.NextBarrettsEGD,
+        cs.Undecided,
+        ll.LengthCm
+    FROM tblPatients pt
+    LEFT JOIN LatestBarrettsPath lbp ON pt.PatientID = lbp.PatientID AND lbp.rn = 1
+    LEFT JOIN CurrentSurveillance cs ON pt.PatientID = cs.PatientID AND cs.rn = 1
+    LEFT JOIN LatestLength ll ON pt.PatientID = ll.PatientID
+    WHERE lbp.PatientID IS NOT NULL
+"""
+
 
 class BarrettsSurveillanceCenter(tk.Frame):
     def __init__(self, master=None):
@@ -72,8 +104,8 @@ class BarrettsSurveillanceCenter(tk.Frame):
         tk.Label(filter_row1, text="Dysplasia Grade:").pack(side="left")
         self.dysplasia_var = tk.StringVar(value="All")
         dysplasia_combo = ttk.Combobox(filter_row1, textvariable=self.dysplasia_var,
-                                     values=["All", "High Grade", "Low Grade", "Indeterminate", 
-                                           "No Dysplasia", "NGIM", "Unknown"],
+                                     # Most severe first
+                                     values=["All"] + reference_data.options("dysplasia_grade")[::-1] + ["Unknown"],
                                      state="readonly", width=15)
         dysplasia_combo.pack(side="left", padx=5)
 
@@ -162,7 +194,7 @@ class BarrettsSurveillanceCenter(tk.Frame):
                 text="💡 Tip: This report shows Barrett's patients based on most recent pathology with Barretts=Yes. Double-click any row to open patient record.",
                 bg="white", fg="gray", font=("Arial", 9), wraplength=800, justify="left").pack(anchor="w")
 
-    def get_surveillance_recommendation(self, dysplasia_grade):
+    def get_surveillance_recommendation(self, dysplasia_grade, length_cm=None):
         """Get surveillance recommendation based on ACG/AGA guidelines"""
         if not dysplasia_grade:
             return 36, "No dysplasia grade - default 3-year interval"
@@ -176,7 +208,11 @@ class BarrettsSurveillanceCenter(tk.Frame):
         elif dysplasia_grade in ["indeterminate"]:
             return 6, "Indeterminate dysplasia - 6-month intervals until clarified"
         elif dysplasia_grade in ["no dysplasia", "ngim"]:
-            return 36, "Barrett's without dysplasia - 3-year intervals per guidelines"
+            if length_cm is not None and length_cm >= 3:
+                return 36, f"Barrett's {length_cm:g}cm without dysplasia - 3-year intervals per guidelines"
+            elif length_cm is not None:
+                return 60, f"Barrett's {length_cm:g}cm without dysplasia - 5-year intervals per guidelines"
+            return 36, "Barrett's without dysplasia - 3-year intervals per guidelines (length unknown)"
         else:
             return 36, f"Unrecognized grade '{dysplasia_grade}' - default 3-year interval"
 
@@ -217,34 +253,10 @@ class BarrettsSurveillanceCenter(tk.Frame):
         today = date.today()
         upcoming_date = today + timedelta(days=days)
 
-        conn = sqlite3.connect(DB_PATH)
+        conn = database.connect()
         
         # Query to get Barrett's surveillance data
-        query = """
-        WITH LatestBarrettsPath AS (
-            SELECT p.*, 
-                   ROW_NUMBER() OVER (PARTITION BY p.PatientID ORDER BY p.PathologyDate DESC) as rn
-            FROM tblPathology p
-            WHERE p.Barretts = 1 AND p.PathologyDate IS NOT NULL
-        ),
-        CurrentSurveillance AS (
-            SELECT s.PatientID, s.NextBarrettsEGD, s.Undecided,
-                   ROW_NUMBER() OVER (PARTITION BY s.PatientID ORDER BY s.LastModified DESC) as rn
-            FROM tblSurveillance s
-        )
-        SELECT DISTINCT
-            pt.PatientID,
-            pt.LastName || ', ' || pt.FirstName AS Name,
-            pt.MRN,
-            lbp.PathologyDate,
-            lbp.DysplasiaGrade,
-            cs.NextBarrettsEGD,
-            cs.Undecided
-        FROM tblPatients pt
-        LEFT JOIN LatestBarrettsPath lbp ON pt.PatientID = lbp.PatientID AND lbp.rn = 1
-        LEFT JOIN CurrentSurveillance cs ON pt.PatientID = cs.PatientID AND cs.rn = 1
-        WHERE lbp.PatientID IS NOT NULL
-        """
+        query = SURVEILLANCE_SQL
 
         # Apply dysplasia filter
         dysplasia_filter = self.dysplasia_var.get()
@@ -275,7 +287,8 @@ class BarrettsSurveillanceCenter(tk.Frame):
         for _, row in df.iterrows():
             # Get surveillance recommendation
             dysplasia_grade = row['DysplasiaGrade'] or "Unknown"
-            rec_months, rec_explanation = self.get_surveillance_recommendation(dysplasia_grade)
+            length_cm = row['LengthCm'] if pd.notna(row['LengthCm']) else None
+            rec_months, rec_explanation = self.get_surveillance_recommendation(dysplasia_grade, length_cm)
             
             # Calculate compliance status
             next_egd = row['NextBarrettsEGD']
@@ -0,0 +1,116 @@
+# change_journal.py - Incremental "what changed since N" feed over tblActivityLog
+#
+# Triggers (schema.py) journal every insert, update and delete on tblPatients
+# and the clinical child tables: table, row id, patient, operation, time and
+# the session that made it. A consumer remembers the last ActivityID it has
+# processed in tblJournalCursors and asks only for what came after it, so a
+# dashboard, export or search index can update the rows that changed instead
+# of rescanning whole tables.
+#
+#     changes = change_journal.read(conn, "recall_dashboard")
+#     for (table, record_id), action in change_journal.changed_rows(changes).items():
+#         ...refresh or drop that row...
+#     change_journal.advance(conn, "recall_dashboard", changes)
+
+import database
+
+JOURNAL_COLUMNS = "ActivityID, TableName, RecordID, PatientID, Action, ActivityTime, Session"
+
+
+def latest_id(conn):
+    """ActivityID of the newest journal entry (0 for an empty journal)"""
+    row = conn.execute("SELECT MAX(ActivityID) FROM tblActivityLog").fetchone()
+    return row[0] or 0
+
+
+def changes_since(conn, since=0, tables=None, limit=None):
+    """Journal entries after ActivityID since, oldest first, as database.Records"""
+    sql = f"SELECT {JOURNAL_COLUMNS} FROM tblActivityLog WHERE ActivityID > ?"
+    params = [since]
+    if tables:
+        sql += f" AND TableName IN ({', '.join('?' * len(tables))})"
+        params.extend(tables)
+    sql += " ORDER BY ActivityID"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return database.fetch_records(conn.execute(sql, params))
+
+
+def changed_rows(changes):
+    """Collapse entries to {(table, record_id): last action} - what a consumer has to redo"""
+    rows = {}
+    for change in changes:
+        rows[(change.TableName, change.RecordID)] = change.Action
+    return rows
+
+
+def get_cursor(conn, consumer):
+    """Last ActivityID the consumer has processed (0 if it has never run)"""
+    row = conn.execute("SELECT LastActivityID FROM tblJournalCursors WHERE Consumer = ?", (consumer,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_cursor(conn, consumer, activity_id):
+    conn.execute("""
+        INSERT INTO tblJournalCursors (Consumer, LastActivityID, UpdatedAt)
+        VALUES (?, ?, datetime('now', 'localtime'))
+        ON CONFLICT(Consumer) DO UPDATE SET
+            LastActivityID = excluded.LastActivityID, UpdatedAt = excluded.UpdatedAt
+    """, (consumer, activity_id))
+    conn.commit()
+
+
+def read(conn, consumer, tables=None, limit=None):
+    """Changes the consumer hasn't processed yet - call advance() once they're handled"""
+    return changes_since(conn, get_cursor(conn, consumer), tables, limit)
+
+
+def advance(conn, consumer, changes):
+    """Move the consumer's cursor past a batch returned by read()"""
+    if changes:
+        set_cursor(conn, consumer, changes[-1].ActivityID)
+
+
+def consume(conn, consumer, handler, tables=None, batch_size=500):
+    """Feed every pending change to handler(changes) in batches, advancing after each.
+
+    Returns the number of entries handled. If handler raises, the cursor stays
+    at the last completed batch and the rest is picked up on the next call.
+    """
+    handled = 0
+    while True:
+        changes = read(conn, consumer, tables, batch_size)
+        if not changes:
+            return handled
+        handler(changes)
+        advance(conn, consumer, changes)
+        handled += len(changes)
+        if len(changes) < batch_size:
+            return handled
+
+
+def compact(conn, upto=None):
+    """Delete entries superseded by a later entry for the same row.
+
+    Only entries at or below upto are removed - by default the slowest
+    consumer's cursor, or the whole journal when nobody is registered. The
+    newest entry for every row is always kept, so changed_rows() over any
+    range still sees each row's final state and MAX(ActivityID) never moves
+    backwards. Returns the number of entries removed.
+    """
+    if upto is None:
+        row = conn.execute("SELECT MIN(LastActivityID) FROM tblJournalCursors").fetchone()
+        upto = row[0] if row[0] is not None else latest_id(conn)
+    cursor = conn.execute("""
+        DELETE FROM tblActivityLog
+        WHERE ActivityID <= ?
+          AND EXISTS (
+              SELECT 1 FROM tblActivityLog Later
+              WHERE Later.TableName = tblActivityLog.TableName
+                AND Later.RecordID = tblActivityLog.RecordID
+                AND Later.ActivityID > tblActivityLog.ActivityID
+          )
+    """, (upto,))
+    conn.commit()
+    return cursor.rowcount
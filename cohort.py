@@ -0,0 +1,300 @@
+# cohort.py - Research cohorts compiled to one set-based query
+#
+# A cohort is a dict of criteria over the patient and their clinical records:
+#
+#     spec = {
+#         "patient": [("Age", ">=", 18)],
+#         "criteria": [
+#             {"source": "surgery", "procedures": {"any_of": ["LINX"]}},
+#             {"source": "diagnostics", "where": [("DeMeesterValue", ">", 30)],
+#              "timing": {"relation": "before", "procedures": {"any_of": ["LINX"]}}},
+#             {"source": "pathology", "where": [("Barretts", "=", 1)],
+#              "timing": {"relation": "after", "procedures": {"any_of": ["LINX"]}}},
+#         ],
+#     }
+#
+# compile_spec() turns it into a single SELECT over tblPatients where every
+# criterion is a semi-join (PatientID IN / NOT IN an uncorrelated subquery),
+# so each one is evaluated once off its own index rather than per patient.
+# estimate() gives a quick size guess from per-criterion counts, and
+# materialize() stores the member list in tblCohortMembers, rebuilding it
+# only when the change journal shows the underlying tables have changed.
+
+import json
+import hashlib
+
+import archive
+import database
+import change_journal
+import procedures
+
+# Criterion source: (table, date column)
+SOURCES = {
+    "diagnostics": ("tblDiagnostics", "TestDate"),
+    "pathology": ("tblPathology", "PathologyDate"),
+    "surgery": ("tblSurgicalHistory", "SurgeryDate"),
+    "recall": ("tblRecall", "RecallDate"),
+}
+
+OPERATORS = {"=", "!=", ">", ">=", "<", "<=", "like", "in", "between", "is null", "not null"}
+
+# Patient-level values that aren't stored columns
+PATIENT_EXPRESSIONS = {
+    "Age": "CAST((julianday('now') - julianday(P.DOB)) / 365.25 AS INTEGER)",
+}
+
+# Both keyed by database file first
+_columns = {}
+_counts = {}
+
+
+class CohortError(ValueError):
+    """Cohort definition refers to an unknown table, column or operator"""
+
+
+def table_columns(conn, table):
+    key = (database.path_of(conn), table)
+    if key not in _columns:
+        # table_xinfo includes the generated columns (ProcedureMask, *Value, *Level)
+        _columns[key] = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+    return _columns[key]
+
+
+def condition_sql(expression, op, value):
+    """(sql, params) for one comparison; expression is trusted SQL"""
+    op = op.lower()
+    if op not in OPERATORS:
+        raise CohortError(f"Unknown operator: {op}")
+    if op == "is null":
+        return f"({expression} IS NULL OR {expression} = '')", []
+    if op == "not null":
+        return f"({expression} IS NOT NULL AND {expression} != '')", []
+    if op == "in":
+        values = list(value)
+        if not values:
+            return "0", []
+        return f"{expression} IN ({', '.join('?' * len(values))})", values
+    if op == "between":
+        return f"{expression} BETWEEN ? AND ?", [value[0], value[1]]
+    return f"{expression} {op.upper()} ?", [value]
+
+
+def column_conditions(conn, table, alias, conditions):
+    clauses, params = [], []
+    columns = table_columns(conn, table)
+    for column, op, value in conditions:
+        if column not in columns:
+            raise CohortError(f"{table} has no column {column}")
+        sql, values = condition_sql(f"{alias}.{column}", op, value)
+        clauses.append(sql)
+        params.extend(values)
+    return clauses, params
+
+
+def criterion_sql(conn, criterion):
+    """(sql, params) selecting the PatientIDs that satisfy one criterion"""
+    if criterion.get("source") not in SOURCES:
+        raise CohortError(f"Unknown source: {criterion.get('source')}")
+    table, date_column = SOURCES[criterion["source"]]
+    clauses, params = column_conditions(conn, table, "X", criterion.get("where", []))
+    clauses.insert(0, "X.PatientID IS NOT NULL")
+
+    if criterion.get("procedures"):
+        sql, values = procedures.where_clause(conn, alias="X", **criterion["procedures"])
+        clauses.append(sql)
+        params.extend(values)
+    if criterion.get("since"):
+        clauses.append(f"X.{date_column} >= ?")
+        params.append(criterion["since"])
+    if criterion.get("until"):
+        clauses.append(f"X.{date_column} <= ?")
+        params.append(criterion["until"])
+
+    join = ""
+    timing = criterion.get("timing")
+    if timing:
+        # Relative to a surgery - "pre-op DeMeester", "Barrett's on follow-up"
+        relation = {"before": "<=", "after": ">"}.get(timing.get("relation"))
+        if relation is None:
+            raise CohortError(f"Unknown timing relation: {timing.get('relation')}")
+        join_clauses = ["S.PatientID = X.PatientID", f"X.{date_column} {relation} S.SurgeryDate"]
+        join_params = []
+        if timing.get("procedures"):
+            sql, values = procedures.where_clause(conn, alias="S", **timing["procedures"])
+            # Unary + keeps the planner on idx_surgical_patient_date (per patient)
+            # instead of walking every matching surgery for each row of X
+            join_clauses.append("+" + sql)
+            join_params.extend(values)
+        join = f"JOIN tblSurgicalHistory S ON {' AND '.join(join_clauses)}"
+        params = join_params + params
+
+    select = f"SELECT X.PatientID FROM {{}} X {join} WHERE {' AND '.join(clauses)}"
+    if table in archive.ARCHIVED_TABLES:
+        # Archived recalls still count as the patient's history. These are the
+        # two halves of vwRecallAll, queried separately: SQLite won't push the
+        # surgery join or PatientID into a UNION ALL view, so each gets its own index
+        archive.attach(conn)
+        return f"{select.format('main.' + table)} UNION ALL {select.format('archive.' + table)}", params + params
+    return select.format(table), params
+
+
+def patient_sql(conn, conditions):
+    """WHERE clauses on tblPatients P"""
+    clauses, params = [], []
+    columns = table_columns(conn, "tblPatients")
+    for column, op, value in conditions:
+        if column in PATIENT_EXPRESSIONS:
+            expression = PATIENT_EXPRESSIONS[column]
+        elif column in columns:
+            expression = f"P.{column}"
+        else:
+            raise CohortError(f"tblPatients has no column {column}")
+        sql, values = condition_sql(expression, op, value)
+        clauses.append(sql)
+        params.extend(values)
+    return clauses, params
+
+
+def compile_spec(conn, spec, columns="P.PatientID"):
+    """(sql, params) for the whole cohort"""
+    clauses, params = patient_sql(conn, spec.get("patient", []))
+    for criterion in spec.get("criteria", []):
+        sql, values = criterion_sql(conn, criterion)
+        clauses.append(f"P.PatientID {'NOT IN' if criterion.get('exclude') else 'IN'} ({sql})")
+        params.extend(values)
+    where = " AND ".join(clauses) if clauses else "1=1"
+    return f"SELECT {columns} FROM tblPatients P WHERE {where}", params
+
+
+def tables_of(spec):
+    """Tables whose changes can alter the cohort"""
+    tables = {"tblPatients"}
+    for criterion in spec.get("criteria", []):
+        tables.add(SOURCES[criterion["source"]][0])
+        if criterion.get("timing") or criterion.get("procedures"):
+            tables.add("tblSurgicalHistory")
+    return sorted(tables)
+
+
+def definition_key(spec):
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def run(conn, spec):
+    """PatientIDs in the cohort"""
+    sql, params = compile_spec(conn, spec)
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def count(conn, spec):
+    sql, params = compile_spec(conn, spec, columns="COUNT(*)")
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def _cached_count(conn, key, sql, params):
+    """Count cached until the journal moves"""
+    key = (database.path_of(conn), key)
+    latest = change_journal.latest_id(conn)
+    cached = _counts.get(key)
+    if cached and cached[0] == latest:
+        return cached[1]
+    value = conn.execute(sql, params).fetchone()[0]
+    _counts[key] = (latest, value)
+    return value
+
+
+def estimate(conn, spec):
+    """Quick size estimate: {"total", "criteria": [(label, patients)], "estimate", "upper_bound"}.
+
+    Each criterion is counted on its own (cheap, and cached), then combined
+    as if the criteria were independent. upper_bound is the smallest
+    single-criterion count, which the real cohort can never exceed.
+    """
+    total = _cached_count(conn, "total", "SELECT COUNT(*) FROM tblPatients", [])
+    parts = []
+    if spec.get("patient"):
+        clauses, params = patient_sql(conn, spec["patient"])
+        sql = f"SELECT COUNT(*) FROM tblPatients P WHERE {' AND '.join(clauses)}"
+        parts.append(("patient", _cached_count(conn, definition_key(spec["patient"]), sql, params)))
+    for criterion in spec.get("criteria", []):
+        sql, params = criterion_sql(conn, criterion)
+        matched = _cached_count(conn, definition_key(dict(criterion, exclude=False)),
+                                f"SELECT COUNT(DISTINCT PatientID) FROM ({sql})", params)
+        parts.append((describe_criterion(criterion), total - matched if criterion.get("exclude") else matched))
+
+    guess = float(total)
+    for _, matched in parts:
+        guess *= (matched / total) if total else 0
+    upper = min([matched for _, matched in parts] + [total])
+    # Independence can multiply a small cohort down to nothing; it isn't empty unless a criterion is
+    rounded = max(int(round(guess)), 1) if upper > 0 else 0
+    return {"total": total, "criteria": parts, "estimate": min(rounded, upper), "upper_bound": upper}
+
+
+def materialize(conn, spec, name=None, force=False):
+    """Store the cohort's members in tblCohortMembers; returns (CohortID, patient count).
+
+    A stored cohort is reused while no journal entry for the tables it reads
+    has appeared since it was built.
+    """
+    key = definition_key(spec)
+    row = conn.execute("SELECT CohortID, JournalMark, PatientCount FROM tblCohorts WHERE DefinitionKey = ?",
+                       (key,)).fetchone()
+    if row and not force and not change_journal.changes_since(conn, row[1], tables_of(spec), limit=1):
+        return row[0], row[2]
+
+    sql, params = compile_spec(conn, spec)
+    mark = change_journal.latest_id(conn)
+    try:
+        if row:
+            cohort_id = row[0]
+            conn.execute("DELETE FROM tblCohortMembers WHERE CohortID = ?", (cohort_id,))
+        else:
+            cohort_id = conn.execute("""
+                INSERT INTO tblCohorts (Name, DefinitionKey, Definition) VALUES (?, ?, ?)
+            """, (name, key, json.dumps(spec, default=str))).lastrowid
+        conn.execute(f"INSERT INTO tblCohortMembers (CohortID, PatientID) SELECT ?, PatientID FROM ({sql})",
+                     [cohort_id] + params)
+        patients = conn.execute("SELECT COUNT(*) FROM tblCohortMembers WHERE CohortID = ?", (cohort_id,)).fetchone()[0]
+        conn.execute("""
+            UPDATE tblCohorts SET Name = COALESCE(?, Name), JournalMark = ?, PatientCount = ?,
+                                  BuiltAt = datetime('now', 'localtime')
+            WHERE CohortID = ?
+        """, (name, mark, patients, cohort_id))
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    return cohort_id, patients
+
+
+def members(conn, cohort_id, limit=None, offset=0):
+    """Patients in a stored cohort, by name, as database.Records"""
+    sql = """
+        SELECT P.PatientID, P.LastName, P.FirstName, P.MRN, P.DOB, P.Gender
+        FROM tblCohortMembers C
+        JOIN tblPatients P ON P.PatientID = C.PatientID
+        WHERE C.CohortID = ?
+        ORDER BY P.LastName, P.FirstName
+    """
+    params = [cohort_id]
+    if limit:
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    return database.fetch_records(conn.execute(sql, params))
+
+
+def describe_criterion(criterion):
+    """Short readable label, e.g. "diagnostics: DeMeesterValue > 30, before LINX" """
+    parts = [f"{column} {op} {value}" if op not in ("is null", "not null") else f"{column} {op}"
+             for column, op, value in criterion.get("where", [])]
+    for key in ("all_of", "any_of", "none_of"):
+        names = (criterion.get("procedures") or {}).get(key)
+        if names:
+            parts.append(f"{key.replace('_', ' ')} {'/'.join(names)}")
+    timing = criterion.get("timing")
+    if timing:
+        names = (timing.get("procedures") or {}).get("any_of") or (timing.get("procedures") or {}).get("all_of")
+        parts.append(f"{timing['relation']} {'/'.join(names) if names else 'surgery'}")
+    label = f"{criterion['source']}: {', '.join(parts)}"
+    return f"not ({label})" if criterion.get("exclude") else label
@@ -0,0 +1,118 @@
+# database.py - Shared SQLite access for the Tk and Streamlit apps
+
+import os
+import sys
+import socket
+import sqlite3
+import threading
+
+import query_trace
+import schema
+
+DB_PATH = os.environ.get("GERD_DB_PATH", "gerd_center.db")
+
+# Databases already brought up to date by schema.ensure_schema in this process
+_schema_checked = set()
+_schema_lock = threading.Lock()
+
+# Written to tblActivityLog.Session for every change made through this process
+SESSION_ID = "{}:{}:{}".format(os.path.splitext(os.path.basename(sys.argv[0] or ""))[0] or "python",
+                               socket.gethostname(), os.getpid())
+
+
+def stamp_session(conn):
+    """Tag journal entries written on this connection with SESSION_ID.
+
+    The journal triggers are persistent and can't see which connection fired
+    them, so each connection adds a TEMP trigger that fills in Session.
+    Changes made from other tools are still journaled, with Session NULL.
+    """
+    session = SESSION_ID.replace("'", "''")
+    conn.execute(f"""
+        CREATE TEMP TRIGGER IF NOT EXISTS trg_activity_session
+        AFTER INSERT ON main.tblActivityLog
+        WHEN NEW.Session IS NULL
+        BEGIN
+            UPDATE tblActivityLog SET Session = '{session}' WHERE ActivityID = NEW.ActivityID;
+        END
+    """)
+
+
+def path_of(conn):
+    """File behind conn's main database, for keying per-database caches
+    (in-memory databases get a key of their own)"""
+    path = next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+    return path or f":memory:{id(conn)}"
+
+
+def connect(path=None, **kwargs):
+    """Open a connection to the clinic database (traced when GERD_QUERY_TRACE is set)"""
+    if query_trace.enabled():
+        kwargs.setdefault("factory", query_trace.TracedConnection)
+    path = path or DB_PATH
+    conn = sqlite3.connect(path, **kwargs)
+
+    key = os.path.abspath(path)
+    if key not in _schema_checked:
+        # One thread upgrades; any other waits rather than running the backfills alongside it
+        with _schema_lock:
+            if key not in _schema_checked:
+                try:
+                    schema.ensure_schema(conn)
+                    _schema_checked.add(key)
+                except sqlite3.DatabaseError:
+                    # Read-only or locked - run against the schema as it is and retry next time
+                    conn.rollback()
+    try:
+        stamp_session(conn)
+    except sqlite3.DatabaseError:
+        # Journal not there yet (schema upgrade failed) - entries go unstamped
+        pass
+    return conn
+
+
+class Record:
+    """Result row readable by column name (row['MRN']), attribute (row.MRN) or position"""
+
+    __slots__ = ("_columns", "_values")
+
+    def __init__(self, columns, values):
+        # columns is one {name: index} dict shared by every row of a result
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._columns[key]]
+        return self._values[key]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._values[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def keys(self):
+        return list(self._columns)
+
+    def get(self, key, default=None):
+        index = self._columns.get(key)
+        return default if index is None else self._values[index]
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={self._values[i]!r}" for name, i in self._columns.items())
+        return f"Record({fields})"
+
+
+def fetch_records(cursor):
+    """Fetch the rest of cursor's result as a list of Records"""
+    columns = {description[0]: i for i, description in enumerate(cursor.description)}
+    return [Record(columns, row) for row in cursor.fetchall()]
@@ -1,8 +1,18 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 from tkcalendar import DateEntry
-import sqlite3
+import database
+import reference_data
+import ui_profiler
 
+PATIENT_SQL = """
+    SELECT FirstName, LastName, MRN, ZipCode, BMI, ReferralSource, ReferralDetails, InitialConsultDate, DOB
+    FROM tblPatients
+    WHERE PatientID = ?
+"""
+
+
+@ui_profiler.profiled("tab:demographics")
 def build(tab_frame, patient_id, tabs=None, on_demographics_updated=None):
     fields = {}
     entries = {}
@@ -21,13 +31,9 @@ def build(tab_frame, patient_id, tabs=None, on_demographics_updated=None):
     ]
 
     def load_data():
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT FirstName, LastName, MRN, ZipCode, BMI, ReferralSource, ReferralDetails, InitialConsultDate, DOB
-            FROM tblPatients
-            WHERE PatientID = ?
-        """, (patient_id,))
+        cursor.execute(PATIENT_SQL, (patient_id,))
         result = cursor.fetchone()
         conn.close()
 
@@ -38,7 +44,7 @@ def build(tab_frame, patient_id, tabs=None, on_demographics_updated=None):
             tk.Label(tab_frame, text=label_text, anchor="w", width=20).grid(row=i, column=0, sticky="w", pady=2)
 
             if key == "ReferralSource":
-                entry = ttk.Combobox(tab_frame, values=["Self", "Physician", "Patient", "Other"], state="readonly", width=37)
+                entry = ttk.Combobox(tab_frame, values=reference_data.options("referral_source"), state="readonly", width=37)
                 entry.set(result[i] if result[i] else "")
                 entry.grid(row=i, column=1, sticky="w", pady=2)
                 entries[key] = entry
@@ -88,7 +94,7 @@ def build(tab_frame, patient_id, tabs=None, on_demographics_updated=None):
 
     def save_changes():
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE tblPatients
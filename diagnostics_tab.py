@@ -1,8 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
+import barrett_length
+import database
+import reference_data
+import ui_profiler
 from add_edit_diagnostic import open_add_edit_window
+from record_list import RecordList
 
+DIAGNOSTICS_SQL = """
+    SELECT DiagnosticID, TestDate, Surgeon,
+           Endoscopy, Bravo, pHImpedance, EndoFLIP,
+           Manometry, GastricEmptying, Imaging, UpperGI
+    FROM tblDiagnostics
+    WHERE PatientID = ?
+    ORDER BY TestDate DESC
+"""
+
+
+@ui_profiler.profiled("tab:diagnostics")
 def build(tab_frame, patient_id, tabs=None):
     for widget in tab_frame.winfo_children():
         widget.destroy()
@@ -10,54 +25,39 @@ def build(tab_frame, patient_id, tabs=None):
     container = tk.Frame(tab_frame)
     container.pack(fill="both", expand=True)
 
-    canvas = tk.Canvas(container)
-    scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-    scrollable_frame = tk.Frame(canvas)
-
-    scrollable_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    toolbar = tk.Frame(container)
+    toolbar.pack(fill="x", padx=5)
+    tk.Button(toolbar, text="Add Diagnostic", command=lambda: open_add_edit_window(
+        tab_frame, patient_id, refresh_callback=lambda: build(tab_frame, patient_id)
+    )).pack(side="left", pady=10)
+
+    records = RecordList(
+        container,
+        columns=[("date", "Date", 120), ("surgeon", "Surgeon", 160), ("tests", "Tests Done", 320)],
+        actions=[
+            ("View", lambda d: expand_entry(d, editable=False)),
+            ("Edit", lambda d: expand_entry(d, editable=True)),
+            None,
+            ("Delete", lambda d: delete_diagnostic(d)),
+        ],
+        on_open=lambda d: expand_entry(d, editable=False),
+        on_delete=lambda d: delete_diagnostic(d),
+        empty_text="No diagnostic studies recorded",
     )
-
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    # Enable mousewheel scrolling
-    def _on_mousewheel(event):
-        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-    scrollable_frame.bind("<Enter>", lambda e: canvas.bind_all("<MouseWheel>", _on_mousewheel))
-    scrollable_frame.bind("<Leave>", lambda e: canvas.unbind_all("<MouseWheel>"))
-
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
+    records.pack(fill="both", expand=True, padx=5, pady=(0, 5))
 
     expanded_frame = None
 
-    tk.Button(scrollable_frame, text="Add Diagnostic", command=lambda: open_add_edit_window(
-        tab_frame, patient_id, refresh_callback=lambda: build(tab_frame, patient_id)
-    )).grid(row=0, column=0, columnspan=4, pady=10, sticky="w")
-
     def load_diagnostics():
-        nonlocal expanded_frame
-
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DiagnosticID, TestDate, Surgeon,
-                   Endoscopy, Bravo, pHImpedance, EndoFLIP,
-                   Manometry, GastricEmptying, Imaging, UpperGI
-            FROM tblDiagnostics
-            WHERE PatientID = ?
-            ORDER BY TestDate DESC
-        """, (patient_id,))
+        cursor.execute(DIAGNOSTICS_SQL, (patient_id,))
         rows = cursor.fetchall()
         conn.close()
+        ui_profiler.note(rows=len(rows))
 
-        headers = ["Date", "Surgeon", "Tests Done", "Actions"]
-        for col, header in enumerate(headers):
-            tk.Label(scrollable_frame, text=header, font=("Arial", 10, "bold"), width=20, anchor="w").grid(row=1, column=col, padx=5, pady=5, sticky="w")
-
-        for i, row in enumerate(rows, start=2):
+        list_rows = []
+        for row in rows:
             diag_id, date, surgeon, endo, bravo, ph, flip, mano, empty, img, ugi = row
             tests = []
             if endo: tests.append("Endo")
@@ -68,22 +68,15 @@ def build(tab_frame, patient_id, tabs=None):
             if empty: tests.append("GE")
             if img: tests.append("Img")
             if ugi: tests.append("UGI")
+            list_rows.append((diag_id, (date, surgeon or "", ", ".join(tests))))
 
-            tk.Label(scrollable_frame, text=date, width=20, anchor="w").grid(row=i, column=0, padx=5, pady=2, sticky="w")
-            tk.Label(scrollable_frame, text=surgeon, width=20, anchor="w").grid(row=i, column=1, padx=5, pady=2, sticky="w")
-            tk.Label(scrollable_frame, text=", ".join(tests), width=20, anchor="w").grid(row=i, column=2, padx=5, pady=2, sticky="w")
-
-            action_frame = tk.Frame(scrollable_frame)
-            action_frame.grid(row=i, column=3, padx=5, pady=2, sticky="w")
-            tk.Button(action_frame, text="View", command=lambda d=diag_id: expand_entry(d, editable=False)).pack(side="left", padx=2)
-            tk.Button(action_frame, text="Edit", command=lambda d=diag_id: expand_entry(d, editable=True)).pack(side="left", padx=2)
-            tk.Button(action_frame, text="Delete", command=lambda d=diag_id: delete_diagnostic(d)).pack(side="left", padx=2)
+        records.set_rows(list_rows)
 
     def delete_diagnostic(diagnostic_id):
         if not messagebox.askyesno("Confirm Delete", "Delete this diagnostic entry?"):
             return
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM tblDiagnostics WHERE DiagnosticID = ?", (diagnostic_id,))
             conn.commit()
@@ -94,14 +87,10 @@ def build(tab_frame, patient_id, tabs=None):
 
     def expand_entry(diagnostic_id, editable=False):
         nonlocal expanded_frame
-        for w in scrollable_frame.winfo_children():
-            if isinstance(w, tk.LabelFrame) and w.cget("text") == "Diagnostic Details":
-                w.destroy()
-
-        expanded_frame = tk.LabelFrame(scrollable_frame, text="Diagnostic Details", padx=10, pady=10)
-        expanded_frame.grid(column=0, columnspan=4, padx=10, pady=10, sticky="ew")
+        records.select(diagnostic_id)
+        expanded_frame = records.show_detail("Diagnostic Details")
 
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM tblDiagnostics WHERE DiagnosticID = ?", (diagnostic_id,))
         row = cursor.fetchone()
@@ -211,8 +200,8 @@ def build(tab_frame, patient_id, tabs=None):
         # Sections - show if they have data or if editing
         make_section("🔍 Endoscopy", ["Endoscopy", "EsophagitisGrade", "HiatalHerniaSize", "EndoscopyFindings"], lambda f: [
             add_checkbox(f, "Endoscopy Completed", "Endoscopy"),
-            create_dropdown(f, "Esophagitis Grade:", ["", "None", "LA A", "LA B", "LA C", "LA D"], data.get("EsophagitisGrade", ""), "EsophagitisGrade"),
-            create_dropdown(f, "Hiatal Hernia Size:", ["", "None", "1 cm", "2 cm", "3 cm", "4 cm", "5 cm", "6 cm", ">6 cm"], data.get("HiatalHerniaSize", ""), "HiatalHerniaSize"),
+            create_dropdown(f, "Esophagitis Grade:", reference_data.options("esophagitis_grade", blank=True), data.get("EsophagitisGrade", ""), "EsophagitisGrade"),
+            create_dropdown(f, "Hiatal Hernia Size:", reference_data.options("hiatal_hernia_size", blank=True), data.get("HiatalHerniaSize", ""), "HiatalHerniaSize"),
             add_textarea(f, "Endoscopy Findings:", data.get("EndoscopyFindings", ""), "EndoscopyFindings")
         ])
 
@@ -255,7 +244,7 @@ def build(tab_frame, patient_id, tabs=None):
 
         def save_changes():
             try:
-                conn = sqlite3.connect("gerd_center.db")
+                conn = database.connect()
                 cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE tblDiagnostics SET
@@ -289,6 +278,7 @@ def build(tab_frame, patient_id, tabs=None):
                     entries["DiagnosticNotes"].get("1.0", tk.END).strip() if "DiagnosticNotes" in entries and hasattr(entries["DiagnosticNotes"], 'get') else "",
                     diagnostic_id
                 ))
+                barrett_length.extract(conn, diagnostic_id)
                 conn.commit()
                 conn.close()
                 messagebox.showinfo("Saved", "Changes saved successfully.")
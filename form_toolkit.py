@@ -0,0 +1,156 @@
+# form_toolkit.py - Shared helpers for the add/edit clinical forms
+
+import tkinter as tk
+from tkinter import messagebox
+import sqlite3
+
+FALLBACK_SCREEN = (1920, 1080)
+
+_screen_size = None
+
+
+def get_screen_dimensions():
+    """Screen size, measured once from the running Tk root"""
+    global _screen_size
+    if _screen_size is None:
+        root = tk._default_root
+        if root is None:
+            # No app window yet - don't spin up a throwaway Tk root just to measure
+            return FALLBACK_SCREEN
+        try:
+            _screen_size = (root.winfo_screenwidth(), root.winfo_screenheight())
+        except tk.TclError:
+            return FALLBACK_SCREEN
+    return _screen_size
+
+
+def calculate_optimal_size(min_width=600, min_height=600, max_width_percent=0.8, max_height_percent=0.9,
+                           preferred_width=800, preferred_height=800):
+    """Calculate optimal window size"""
+    screen_width, screen_height = get_screen_dimensions()
+    max_width = int(screen_width * max_width_percent)
+    max_height = int(screen_height * max_height_percent)
+    optimal_width = max(min_width, min(max_width, preferred_width))
+    optimal_height = max(min_height, min(max_height, preferred_height))
+    return optimal_width, optimal_height
+
+
+def center_window(window, width=None, height=None):
+    """Center window on screen"""
+    if width is None or height is None:
+        width, height = calculate_optimal_size()
+    screen_width, screen_height = get_screen_dimensions()
+    x = max(0, (screen_width - width) // 2)
+    y = max(0, (screen_height - height) // 2)
+    window.geometry(f"{width}x{height}+{x}+{y}")
+    return width, height
+
+
+def show_nice_error(title, message):
+    """Show a nice error message"""
+    messagebox.showerror(title, message)
+
+
+def show_nice_success(message):
+    """Show a nice success message"""
+    messagebox.showinfo("Success!", message)
+
+
+def show_nice_warning(title, message):
+    """Show a warning message"""
+    return messagebox.askyesno(title, f"{message}\n\nDo you want to continue anyway?")
+
+
+def safe_database_operation(operation_name, operation_function):
+    """Safely do database operations with nice error handling"""
+    try:
+        return operation_function()
+    except sqlite3.IntegrityError as e:
+        show_nice_error("Data Problem", f"There's a problem with the data: {str(e)}")
+        return False
+    except sqlite3.OperationalError as e:
+        show_nice_error("Database Problem", f"The database had a problem: {str(e)}")
+        return False
+    except Exception as e:
+        show_nice_error("Unexpected Problem", f"Something unexpected happened: {str(e)}")
+        return False
+
+
+def disable_children(widget):
+    """Disable every input widget below widget"""
+    for child in widget.winfo_children():
+        try:
+            child.configure(state="disabled")
+        except tk.TclError:
+            pass
+        disable_children(child)
+
+
+class TextValue:
+    """Multi-line form value whose tk.Text may not have been built yet"""
+
+    def __init__(self, value=""):
+        self.value = value or ""
+        self.widget = None
+
+    def attach(self, parent, **options):
+        """Create the Text widget holding this value"""
+        options.setdefault("height", 3)
+        options.setdefault("wrap", "word")
+        self.widget = tk.Text(parent, **options)
+        self.widget.insert("1.0", self.value)
+        return self.widget
+
+    def get(self):
+        if self.widget is not None and self.widget.winfo_exists():
+            return self.widget.get("1.0", tk.END).strip()
+        return self.value.strip()
+
+
+class CollapsibleSection(tk.Frame):
+    """Section with a ► / ▼ header whose content is built on first expand.
+
+    build_content(content_frame) is called once, the first time the section
+    opens; later toggles only pack/unpack the existing frame. Keep form state
+    in tk variables / TextValue so it can be read whether or not the section
+    was ever opened.
+    """
+
+    def __init__(self, parent, title, build_content, expanded=False, **kwargs):
+        kwargs.setdefault("bd", 2)
+        kwargs.setdefault("relief", "groove")
+        kwargs.setdefault("padx", 5)
+        kwargs.setdefault("pady", 5)
+        super().__init__(parent, **kwargs)
+
+        self.title = title
+        self.build_content = build_content
+        self.built = False
+        self.expanded = False
+
+        self.toggle_btn = tk.Button(self, text=f"► {title}", anchor="w", font=("Arial", 10, "bold"),
+                                    command=self.toggle)
+        self.toggle_btn.pack(fill="x")
+        self.content = tk.Frame(self)
+
+        if expanded:
+            self.expand()
+
+    def expand(self):
+        if not self.built:
+            self.build_content(self.content)
+            self.built = True
+        self.content.pack(fill="x")
+        self.toggle_btn.config(text=f"▼ {self.title}")
+        self.expanded = True
+
+    def collapse(self):
+        self.content.pack_forget()
+        self.toggle_btn.config(text=f"► {self.title}")
+        self.expanded = False
+
+    def toggle(self):
+        if self.expanded:
+            self.collapse()
+        else:
+            self.expand()
@@ -1,14 +1,33 @@
+import time
+_PROCESS_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import sqlite3
-import recall_report
-import barretts_report
-import print_summary
+import database
+import archive
+import query_trace
 import threading
-import time
+import importlib
 import os
+import sys
 from datetime import datetime, date, timedelta
 
+# Heavy modules (pandas, reportlab, tkcalendar via the reports and tabs) are
+# imported on first use. StartupWarmup preloads the ones that never touch Tk;
+# tkcalendar and the tab/report modules create Tk objects and stay on the main thread.
+WARMUP_MODULES = [
+    "pandas", "reportlab.platypus", "reportlab.pdfgen.canvas",
+    "print_summary", "barrett_length", "procedures", "reference_data", "archive",
+]
+
+SEARCH_PATIENTS_SQL = """
+    SELECT PatientID, FirstName, LastName, MRN
+    FROM tblPatients
+    WHERE FirstName LIKE ? OR LastName LIKE ? OR MRN LIKE ?
+    ORDER BY LastName
+"""
+
+
 class TabRefreshManager:
     """Manages cross-tab refreshes when data changes"""
     
@@ -59,7 +78,8 @@ class TabRefreshManager:
             tab_frame = self.tabs_widget.nametowidget(self.tabs_widget.tabs()[tab_index])
             
             # Rebuild the tab
-            builder(tab_frame, self.patient_id, self.tabs_widget)
+            with query_trace.screen(f"tab:{tab_name}"):
+                builder(tab_frame, self.patient_id, self.tabs_widget)
             
         except Exception as e:
             print(f"Error refreshing {tab_name} tab: {e}")
@@ -249,13 +269,87 @@ class ModernButton(tk.Button):
         
         super().__init__(parent, **final_config)
 
+class StartupWarmup:
+    """Preloads the patient index and heavy modules on a background thread after first paint"""
+
+    POLL_MS = 50
+
+    def __init__(self, app, profile=False):
+        self.app = app
+        self.profile = profile
+        self.timings = {}
+        self.import_timings = []
+        self.patient_index = None
+        self.thread = None
+
+    def mark(self, name):
+        self.timings[name] = round((time.perf_counter() - _PROCESS_START) * 1000, 1)
+
+    def start(self):
+        self.mark("first_paint")
+        # Schema upgrades and backfills run here, before the thread opens its own connection
+        database.connect().close()
+        self.mark("schema_ready")
+        self.thread = threading.Thread(target=self._run, name="startup-warmup", daemon=True)
+        self.thread.start()
+        self.app.after(self.POLL_MS, self._poll)
+
+    def _run(self):
+        # No Tk calls on this thread - results are picked up by _poll on the main thread
+        start = time.perf_counter()
+        try:
+            conn = database.connect()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT PatientID, FirstName, LastName, MRN
+                FROM tblPatients
+                ORDER BY LastName
+            """)
+            self.patient_index = cursor.fetchall()
+            conn.close()
+        except Exception:
+            self.patient_index = []
+        self.timings["patient_index_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.mark("patient_index_ready")
+
+        for module in WARMUP_MODULES:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(module)
+            except Exception:
+                continue
+            self.import_timings.append((module, round((time.perf_counter() - start) * 1000, 1)))
+        self.mark("warmup_done")
+
+    def _poll(self):
+        if self.patient_index is not None:
+            index, self.patient_index = self.patient_index, None
+            self.app.show_patient_index(index)
+        if self.thread.is_alive():
+            self.app.after(self.POLL_MS, self._poll)
+        elif self.profile:
+            self.report()
+
+    def report(self):
+        """Print the startup timings collected for --profile-startup"""
+        print("Startup profile (ms since process start)")
+        for name, value in self.timings.items():
+            print(f"  {name:<22} {value:>9.1f}")
+        print("Deferred imports (warm-up thread, ms each)")
+        for module, ms in self.import_timings:
+            print(f"  {module:<22} {ms:>9.1f}")
+        sys.stdout.flush()
+
+
 class ModernGERDApp(tk.Tk):
     """Modern medical interface for GERD patient management with responsive design"""
     
-    def __init__(self):
+    def __init__(self, profile_startup=False):
         super().__init__()
         
         self.title("Minnesota Reflux & Heartburn Center - Clinical Management System")
+        self.warmup = StartupWarmup(self, profile=profile_startup)
+        self.warmup.mark("imports")
         
         # Setup responsive window
         self.setup_responsive_window()
@@ -267,10 +361,15 @@ class ModernGERDApp(tk.Tk):
         self.results_list = []
         
         self.setup_modern_interface()
-        self.search_patients()
+        self.warmup.mark("window_built")
         
         # Handle window resize events
         self.bind("<Configure>", self.on_window_resize)
+        self.bind("<Control-Q>", lambda e: self.open_query_trace())
+
+        # Runs once the pending redraws are done, i.e. after the first paint;
+        # the patient list is filled from the warm-up thread
+        self.after_idle(self.warmup.start)
 
     def setup_responsive_window(self):
         """Setup responsive window sizing"""
@@ -433,6 +532,11 @@ class ModernGERDApp(tk.Tk):
         
         ModernButton(reports_card.content_frame, text="🔬 Barrett's Surveillance", 
                     style="primary", command=self.load_barretts_report).pack(fill="x")
+        
+        # Query trace viewer - only when tracing is switched on (Ctrl+Shift+Q also opens it)
+        if query_trace.enabled():
+            ModernButton(reports_card.content_frame, text="🐢 Query Trace", 
+                        style="secondary", command=self.open_query_trace).pack(fill="x", pady=(10, 0))
 
     def create_content_area(self, parent):
         """Create modern content area"""
@@ -461,15 +565,11 @@ class ModernGERDApp(tk.Tk):
         """Enhanced patient search with modern styling"""
         search_term = self.search_entry.get().strip()
         self.results_listbox.delete(0, tk.END)
+        query_trace.set_screen("search")
 
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT PatientID, FirstName, LastName, MRN
-            FROM tblPatients
-            WHERE FirstName LIKE ? OR LastName LIKE ? OR MRN LIKE ?
-            ORDER BY LastName
-        """, (f"{search_term}%", f"{search_term}%", f"{search_term}%"))
+        cursor.execute(SEARCH_PATIENTS_SQL, (f"{search_term}%", f"{search_term}%", f"{search_term}%"))
         self.results_list = cursor.fetchall()
         conn.close()
 
@@ -478,6 +578,14 @@ class ModernGERDApp(tk.Tk):
             display = f"{last}, {first} — {mrn}"
             self.results_listbox.insert(tk.END, display)
 
+    def show_patient_index(self, rows):
+        """Fill the results list from the preloaded index unless a search has already run"""
+        if self.search_entry.get().strip() or self.results_list:
+            return
+        self.results_list = rows
+        for pid, first, last, mrn in rows:
+            self.results_listbox.insert(tk.END, f"{last}, {first} — {mrn}")
+
     def load_selected_patient(self):
         """Load selected patient with modern interface and refresh system"""
         selected = self.results_listbox.curselection()
@@ -485,13 +593,14 @@ class ModernGERDApp(tk.Tk):
             return
         idx = selected[0]
         self.patient_id = self.results_list[idx][0]
+        query_trace.set_screen("patient")
 
         # Clear content area
         for widget in self.content_frame.winfo_children():
             widget.destroy()
 
         # Get patient data
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
         cursor.execute("SELECT FirstName, LastName, MRN, DOB FROM tblPatients WHERE PatientID = ?", (self.patient_id,))
         row = cursor.fetchone()
@@ -549,7 +658,7 @@ class ModernGERDApp(tk.Tk):
         
         ModernButton(actions_frame, text="🖨️ Print Summary", 
                     style="success", 
-                    command=lambda: print_summary.generate_pdf(self.patient_id)).pack(pady=(0, 10))
+                    command=self.print_patient_summary).pack(pady=(0, 10))
         
         ModernButton(actions_frame, text="⚡ Quick Actions", 
                     style="warning", 
@@ -606,7 +715,8 @@ class ModernGERDApp(tk.Tk):
             frame.configure(style='Modern.TFrame')
             
             # Build the tab
-            tab_builders[tab_key](frame, self.patient_id, self.tabs)
+            with query_trace.screen(f"tab:{tab_key}"):
+                tab_builders[tab_key](frame, self.patient_id, self.tabs)
             
             self.tabs.add(frame, text=label)
 
@@ -747,7 +857,7 @@ class ModernGERDApp(tk.Tk):
         
         def confirm_delete():
             try:
-                conn = sqlite3.connect("gerd_center.db")
+                conn = database.connect()
                 cursor = conn.cursor()
 
                 delete_queries = [
@@ -759,6 +869,8 @@ class ModernGERDApp(tk.Tk):
                     "DELETE FROM tblPatients WHERE PatientID = ?",
                 ]
                 
+                # Before the deletes: attaching the archive can't happen mid-transaction
+                archive.delete_patient(conn, patient_id)
                 for query in delete_queries:
                     cursor.execute(query, (patient_id,))
 
@@ -788,7 +900,7 @@ class ModernGERDApp(tk.Tk):
     def bulk_print_all_patients(self):
         """Modern bulk print all patients"""
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT PatientID, FirstName, LastName, MRN
@@ -824,23 +936,37 @@ class ModernGERDApp(tk.Tk):
         from bulk_print_dialog import ResponsiveBulkPrintDialog
         ResponsiveBulkPrintDialog(self, self.results_list)
 
+    def open_query_trace(self):
+        """Show the slow-query viewer"""
+        from query_trace_viewer import open_query_trace_viewer
+        open_query_trace_viewer(self)
+
+    def print_patient_summary(self):
+        """Print the current patient's clinical summary"""
+        import print_summary
+        print_summary.generate_pdf(self.patient_id)
+
     def load_recall_report(self):
         """Load modern recall report"""
+        import recall_report
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
         self.patient_id = None
+        query_trace.set_screen("recall_report")
         recall_report.build_report_view(self.content_frame)
 
     def load_barretts_report(self):
         """Load modern Barrett's report"""
+        import barretts_report
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
         self.patient_id = None
+        query_trace.set_screen("barretts_report")
         barretts_report.BarrettsReport(self.content_frame)
 
 
 if __name__ == "__main__":
-    app = ModernGERDApp()
+    app = ModernGERDApp(profile_startup="--profile-startup" in sys.argv)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,89 @@
+# measurements.py - Numeric values behind the free-text physiology and risk fields
+#
+# DeMeesterScore, PercentRetained4h and the risk scores are TEXT columns, so
+# "DeMeester > 14.72" meant casting every row in Python. schema.py adds a
+# numeric column next to each one, generated from the text by the SQL below
+# and indexed, so threshold filters and trend charts are index range scans:
+#
+#     SELECT ... FROM tblDiagnostics WHERE DeMeesterValue > 14.72
+#
+# The value is NULL when the text isn't a plain number within the valid
+# range. The forms validate with parse(), which follows the same rules, so
+# anything a form accepts gets a value.
+
+import re
+
+# (table, text column, numeric column, lowest valid, highest valid)
+NUMERIC_COLUMNS = [
+    ("tblDiagnostics", "DeMeesterScore", "DeMeesterValue", 0, 500),
+    ("tblDiagnostics", "PercentRetained4h", "PercentRetained4hValue", 0, 100),
+    ("tblPathology", "EosinophilCount", "EosinophilValue", 0, 1000),
+    ("tblPathology", "EsoPredictRisk", "EsoPredictRiskValue", 0, 100),
+    ("tblPathology", "TissueCypherRisk", "TissueCypherRiskValue", 0, 100),
+]
+
+# Risk results are often reported as a class rather than a score
+RISK_LEVELS = [("intermediate", 2), ("high", 3), ("low", 1)]
+RISK_COLUMNS = [
+    ("tblPathology", "EsoPredictRisk", "EsoPredictRiskLevel"),
+    ("tblPathology", "TissueCypherRisk", "TissueCypherRiskLevel"),
+]
+
+_NUMBER = re.compile(r"[0-9]*\.?[0-9]*")
+
+
+def parse(text, low=None, high=None):
+    """Number in text ("14.7", "12%", " 24 "), or None if it isn't one or is out of range"""
+    if text is None:
+        return None
+    value = str(text).replace("%", "").strip(" ")
+    if not value or not _NUMBER.fullmatch(value) or not any(c.isdigit() for c in value):
+        return None
+    number = float(value)
+    if (low is not None and number < low) or (high is not None and number > high):
+        return None
+    return number
+
+
+def risk_level(text):
+    """1 low, 2 intermediate, 3 high - from a class name in the text - or None"""
+    lowered = str(text).lower() if text is not None else ""
+    for word, level in RISK_LEVELS:
+        if word in lowered:
+            return level
+    return None
+
+
+def value_sql(column, low=None, high=None):
+    """SQL computing parse(column, low, high)"""
+    text = f"trim(replace(CAST({column} AS TEXT), '%', ''))"
+    checks = [f"{text} != ''", f"{text} NOT GLOB '*[^0-9.]*'", f"{text} NOT GLOB '*.*.*'",
+              f"{text} GLOB '*[0-9]*'"]
+    if low is not None:
+        checks.append(f"CAST({text} AS REAL) >= {low}")
+    if high is not None:
+        checks.append(f"CAST({text} AS REAL) <= {high}")
+    return f"CASE WHEN {' AND '.join(checks)} THEN CAST({text} AS REAL) END"
+
+
+def level_sql(column):
+    """SQL computing risk_level(column)"""
+    whens = " ".join(f"WHEN lower({column}) LIKE '%{word}%' THEN {level}" for word, level in RISK_LEVELS)
+    return f"CASE {whens} END"
+
+
+def column_upgrades():
+    """(table, column, declaration) for schema.COLUMN_UPGRADES"""
+    upgrades = [(table, value_column, f"REAL GENERATED ALWAYS AS ({value_sql(text_column, low, high)}) VIRTUAL")
+                for table, text_column, value_column, low, high in NUMERIC_COLUMNS]
+    upgrades += [(table, level_column, f"INTEGER GENERATED ALWAYS AS ({level_sql(text_column)}) VIRTUAL")
+                 for table, text_column, level_column in RISK_COLUMNS]
+    return upgrades
+
+
+def column_indexes():
+    """Partial indexes - rows without a value stay out of them"""
+    columns = [(table, column) for table, _, column, _, _ in NUMERIC_COLUMNS]
+    columns += [(table, column) for table, _, column in RISK_COLUMNS]
+    return [f"CREATE INDEX IF NOT EXISTS idx_{column.lower()} ON {table}({column}) WHERE {column} IS NOT NULL"
+            for table, column in columns]
@@ -0,0 +1,248 @@
+# outcomes.py - GERD-HRQL before and after surgery, by procedure and surgeon
+#
+# HRQL scores are recorded on recalls (tblRecall.HRQLScore, lower is better),
+# and read through vwRecallAll so recalls moved by archive.py keep counting.
+# Each surgery is paired with the patient's last score in the year before it
+# and the score closest to one year after it (3 to 21 months out, and before
+# any later operation), and the pair is kept in tblHRQLOutcomes - one row per
+# surgery. The pairing is done with pandas over the whole cohort at once.
+#
+# tblHRQLOutcomes is a cache: refresh() reads the change journal and redoes
+# only the patients whose recalls or surgeries changed since the last run, so
+# the per-procedure and per-surgeon summaries are a GROUP BY over one small
+# table.
+#
+#     outcomes.refresh(conn)
+#     outcomes.summary(conn, by="ProcedureGroup")
+#     python outcomes.py summary --by Surgeon
+
+import argparse
+
+import pandas as pd
+
+import archive
+import database
+import change_journal
+import procedures
+
+CONSUMER = "hrql_outcomes"
+SOURCE_TABLES = ["tblRecall", "tblSurgicalHistory"]
+# Scores outside this range are data-entry errors
+HRQL_RANGE = (0, 75)
+PRE_WINDOW_DAYS = 365
+# Post-op score: the one nearest FOLLOW_UP_DAYS after surgery, within FOLLOW_UP_TOLERANCE_DAYS of it
+FOLLOW_UP_DAYS = 365
+FOLLOW_UP_TOLERANCE_DAYS = 270
+# Past this many changed patients a full rebuild is cheaper than patient-by-patient
+REBUILD_THRESHOLD = 2000
+
+# Procedure group for a surgery, first match wins (Heller before Dor: a myotomy
+# with a Dor is reported as a myotomy)
+PROCEDURE_GROUPS = [
+    ("LINX", ["LINX"]),
+    ("TIF", ["TIF"]),
+    ("Nissen", ["Nissen"]),
+    ("Toupet", ["Toupet"]),
+    ("Heller", ["HellerMyotomy"]),
+    ("Dor", ["Dor"]),
+    ("POEM", procedures.POEMS),
+    ("Bariatric", procedures.BARIATRIC),
+    ("Stretta", ["Stretta"]),
+    ("Hernia repair", ["HiatalHernia", "ParaesophagealHernia"]),
+]
+OTHER_GROUP = "Other"
+
+OUTCOME_COLUMNS = ["SurgeryID", "PatientID", "SurgeryDate", "Surgeon", "ProcedureGroup",
+                   "PreScore", "PreDate", "PostScore", "PostDate", "Improvement"]
+GROUPINGS = {"ProcedureGroup": "Procedure", "Surgeon": "Surgeon"}
+
+
+def procedure_group(mask):
+    for group, columns in PROCEDURE_GROUPS:
+        if (mask or 0) & procedures.mask_of(columns):
+            return group
+    return OTHER_GROUP
+
+
+def _patient_filter(patient_ids):
+    if patient_ids is None:
+        return "", []
+    return f" AND PatientID IN ({', '.join('?' * len(patient_ids))})", list(patient_ids)
+
+
+def load(conn, patient_ids=None):
+    """(surgeries, scores) DataFrames, for everyone or just patient_ids"""
+    archive.attach(conn)
+    where, params = _patient_filter(patient_ids)
+    surgeries = pd.read_sql_query(f"""
+        SELECT SurgeryID, PatientID, SurgeryDate, SurgerySurgeon AS Surgeon, ProcedureMask
+        FROM tblSurgicalHistory
+        WHERE PatientID IS NOT NULL{where}
+    """, conn, params=params)
+    scores = pd.read_sql_query(f"""
+        SELECT PatientID, RecallDate AS ScoreDate, HRQLScore AS Score
+        FROM vwRecallAll
+        WHERE HRQLScore IS NOT NULL{where}
+    """, conn, params=params)
+    return surgeries, scores
+
+
+def align(surgeries, scores):
+    """One row per surgery with its pre- and post-op score (NaN where there is none)"""
+    surgeries = surgeries.copy()
+    surgeries["SurgeryDate"] = pd.to_datetime(surgeries["SurgeryDate"], errors="coerce")
+    surgeries = surgeries.dropna(subset=["SurgeryDate"]).sort_values(["PatientID", "SurgeryDate"])
+    surgeries["NextSurgery"] = surgeries.groupby("PatientID")["SurgeryDate"].shift(-1)
+    masks = surgeries["ProcedureMask"].fillna(0).astype(int)
+    surgeries["ProcedureGroup"] = masks.map({mask: procedure_group(mask) for mask in masks.unique()})
+
+    scores = scores.copy()
+    scores["ScoreDate"] = pd.to_datetime(scores["ScoreDate"], errors="coerce")
+    scores["Score"] = pd.to_numeric(scores["Score"], errors="coerce")
+    low, high = HRQL_RANGE
+    scores = scores[scores["Score"].between(low, high)].dropna(subset=["ScoreDate"]).sort_values("ScoreDate")
+
+    by_date = surgeries.sort_values("SurgeryDate")
+    pre = pd.merge_asof(by_date, scores.rename(columns={"ScoreDate": "PreDate", "Score": "PreScore"}),
+                        left_on="SurgeryDate", right_on="PreDate", by="PatientID",
+                        direction="backward", tolerance=pd.Timedelta(days=PRE_WINDOW_DAYS))
+    pre["Target"] = pre["SurgeryDate"] + pd.Timedelta(days=FOLLOW_UP_DAYS)
+    post = pd.merge_asof(pre.sort_values("Target"), scores.rename(columns={"ScoreDate": "PostDate", "Score": "PostScore"}),
+                         left_on="Target", right_on="PostDate", by="PatientID",
+                         direction="nearest", tolerance=pd.Timedelta(days=FOLLOW_UP_TOLERANCE_DAYS))
+    # A score taken after a revision belongs to the revision
+    after_next = post["NextSurgery"].notna() & (post["PostDate"] >= post["NextSurgery"])
+    post.loc[after_next, ["PostDate", "PostScore"]] = [pd.NaT, float("nan")]
+
+    post["Improvement"] = post["PreScore"] - post["PostScore"]
+    for column in ("SurgeryDate", "PreDate", "PostDate"):
+        post[column] = post[column].dt.strftime("%Y-%m-%d")
+    return post[OUTCOME_COLUMNS].sort_values("SurgeryID")
+
+
+def store(conn, outcomes, patient_ids=None):
+    """Replace tblHRQLOutcomes rows (all, or just patient_ids'); caller commits"""
+    where, params = _patient_filter(patient_ids)
+    conn.execute(f"DELETE FROM tblHRQLOutcomes WHERE 1{where}", params)
+    rows = outcomes.astype(object).where(outcomes.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f"""
+        INSERT INTO tblHRQLOutcomes ({', '.join(OUTCOME_COLUMNS)})
+        VALUES ({', '.join('?' * len(OUTCOME_COLUMNS))})
+    """, list(rows))
+
+
+def rebuild(conn):
+    """Recompute every surgery's outcome; returns the journal mark it is current to"""
+    mark = change_journal.latest_id(conn)
+    try:
+        store(conn, align(*load(conn)))
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    change_journal.set_cursor(conn, CONSUMER, mark)
+    return mark
+
+
+def refresh(conn):
+    """Bring tblHRQLOutcomes up to date with the journal; returns the journal mark.
+
+    Only patients with a recall or surgery change since the last refresh are
+    recomputed; the first run (or a large backlog) rebuilds everything.
+    """
+    if not conn.execute("SELECT 1 FROM tblJournalCursors WHERE Consumer = ?", (CONSUMER,)).fetchone():
+        return rebuild(conn)
+    since = change_journal.get_cursor(conn, CONSUMER)
+    mark = change_journal.latest_id(conn)
+    if mark == since:
+        return mark
+    patients = sorted({change.PatientID for change in change_journal.changes_since(conn, since, SOURCE_TABLES)
+                       if change.ActivityID <= mark and change.PatientID is not None})
+    if len(patients) > REBUILD_THRESHOLD:
+        return rebuild(conn)
+    try:
+        if patients:
+            store(conn, align(*load(conn, patients)), patients)
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    change_journal.set_cursor(conn, CONSUMER, mark)
+    return mark
+
+
+def date_filter(since=None, until=None):
+    clauses, params = "", []
+    if since:
+        clauses += " AND SurgeryDate >= ?"
+        params.append(str(since))
+    if until:
+        clauses += " AND SurgeryDate <= ?"
+        params.append(str(until))
+    return clauses, params
+
+
+def summary(conn, by="ProcedureGroup", since=None, until=None):
+    """Per-group DataFrame: Surgeries, Paired (have both scores), MeanPre, MeanPost,
+    MeanImprovement and PctHalved (post-op score at most half the pre-op score)"""
+    if by not in GROUPINGS:
+        raise ValueError(f"Can't summarize by {by}")
+    where, params = date_filter(since, until)
+    return pd.read_sql_query(f"""
+        SELECT COALESCE(NULLIF({by}, ''), 'Unknown') AS {GROUPINGS[by]},
+               COUNT(*) AS Surgeries,
+               COUNT(Improvement) AS Paired,
+               ROUND(AVG(CASE WHEN Improvement IS NOT NULL THEN PreScore END), 1) AS MeanPre,
+               ROUND(AVG(CASE WHEN Improvement IS NOT NULL THEN PostScore END), 1) AS MeanPost,
+               ROUND(AVG(Improvement), 1) AS MeanImprovement,
+               ROUND(100.0 * AVG(CASE WHEN Improvement IS NOT NULL THEN PostScore <= PreScore / 2.0 END), 1) AS PctHalved
+        FROM tblHRQLOutcomes
+        WHERE 1{where}
+        GROUP BY 1
+        ORDER BY Paired DESC, Surgeries DESC
+    """, conn, params=params)
+
+
+def by_year(conn, by="ProcedureGroup", since=None, until=None):
+    """Mean improvement per surgery year and group (paired surgeries only)"""
+    if by not in GROUPINGS:
+        raise ValueError(f"Can't summarize by {by}")
+    where, params = date_filter(since, until)
+    return pd.read_sql_query(f"""
+        SELECT substr(SurgeryDate, 1, 4) AS Year,
+               COALESCE(NULLIF({by}, ''), 'Unknown') AS {GROUPINGS[by]},
+               COUNT(*) AS Paired,
+               ROUND(AVG(Improvement), 1) AS MeanImprovement
+        FROM tblHRQLOutcomes
+        WHERE Improvement IS NOT NULL{where}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """, conn, params=params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GERD-HRQL outcomes by procedure and surgeon")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refresh", help="Update outcomes for patients changed since the last run")
+    sub.add_parser("rebuild", help="Recompute every surgery's outcome")
+    summary_parser = sub.add_parser("summary", help="Print pre/post scores per group")
+    summary_parser.add_argument("--by", choices=sorted(GROUPINGS), default="ProcedureGroup")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        if args.command == "rebuild":
+            rebuild(conn)
+        else:
+            refresh(conn)
+        if args.command == "summary":
+            print(summary(conn, args.by).to_string(index=False))
+        else:
+            count = conn.execute("SELECT COUNT(*), COUNT(Improvement) FROM tblHRQLOutcomes").fetchone()
+            print(f"{count[0]} surgeries, {count[1]} with pre- and post-op scores")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
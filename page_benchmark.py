@@ -0,0 +1,293 @@
+# page_benchmark.py - Headless render benchmark for streamlit_app views using AppTest
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import statistics
+import tempfile
+import subprocess
+
+from streamlit.testing.v1 import AppTest
+import streamlit as st
+
+import query_benchmark
+import query_trace
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "streamlit_app.py"))
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+# Budgets per rerun - a view fails if its median rerun goes over any of these.
+# "startup" covers a cold start: process_ms is a fresh interpreter rendering the
+# Search view, first_run_ms is that first script run alone (app imports included)
+DEFAULT_BUDGETS = {
+    "default": {"wall_ms": 3000, "queries": 80, "elements": 600},
+    "views": {
+        "Search": {"wall_ms": 1000, "queries": 20},
+        "Patient record": {"wall_ms": 2500, "queries": 40},
+    },
+    "startup": {"process_ms": 6000, "first_run_ms": 1500},
+}
+
+# Each view is the session state that routes streamlit_app to it
+VIEWS = {
+    "Search": lambda ctx: {"current_tab": "Search", "selected_patient": None, "patient_search": "son"},
+    "Patient record": lambda ctx: {"current_tab": "Demographics", "selected_patient": ctx["patient_id"]},
+    "Dashboard": lambda ctx: {"current_tab": "Dashboard", "selected_patient": None},
+    "Recalls": lambda ctx: {"current_tab": "Recalls", "selected_patient": None},
+    "Barrett's": lambda ctx: {"current_tab": "Barrett's", "selected_patient": None},
+}
+
+
+class QueryCounter:
+    """Counts the app's queries through query_trace.
+
+    Switches tracing on, so every connection database.connect() hands out
+    while the counter is active is a TracedConnection; the trace logs go to
+    log_dir.
+    """
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        self._saved = {}
+
+    @property
+    def count(self):
+        return query_trace.query_count()
+
+    def reset(self):
+        query_trace.reset()
+
+    def __enter__(self):
+        for name in (query_trace.TRACE_ENV, query_trace.LOG_DIR_ENV):
+            self._saved[name] = os.environ.get(name)
+        os.environ[query_trace.TRACE_ENV] = "1"
+        os.environ[query_trace.LOG_DIR_ENV] = self.log_dir
+        query_trace.reset()
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self._saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        return False
+
+
+def count_elements(node):
+    """Count every element and block below a node of the AppTest tree"""
+    children = getattr(node, "children", None)
+    if not isinstance(children, dict):
+        return 0
+    return sum(1 + count_elements(child) for child in children.values())
+
+
+def run_view(view_name, state, counter, reruns, timeout):
+    """Render one view headlessly and measure each rerun"""
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for key, value in state.items():
+        at.session_state[key] = value
+
+    samples = []
+    for _ in range(reruns + 1):
+        counter.reset()
+        start = time.perf_counter()
+        at.run()
+        wall_ms = (time.perf_counter() - start) * 1000
+        samples.append({
+            "wall_ms": round(wall_ms, 1),
+            "queries": counter.count,
+            "elements": count_elements(at.main) + count_elements(at.sidebar),
+            "exceptions": [e.value for e in at.exception],
+        })
+
+    # The first run pays for session initialisation, reruns are what users feel
+    first, rest = samples[0], samples[1:] or samples[:1]
+    return {
+        "first_run": first,
+        "reruns": rest,
+        "median": {
+            "wall_ms": round(statistics.median(s["wall_ms"] for s in rest), 1),
+            "queries": int(statistics.median(s["queries"] for s in rest)),
+            "elements": int(statistics.median(s["elements"] for s in rest)),
+        },
+        "exceptions": first["exceptions"],
+    }
+
+
+def cold_start_probe(timeout):
+    """Run in a fresh interpreter: render the Search view once and print the timing"""
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for key, value in VIEWS["Search"]({}).items():
+        at.session_state[key] = value
+    start = time.perf_counter()
+    at.run()
+    first_run_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({"first_run_ms": round(first_run_ms, 1),
+                      "exceptions": [e.value for e in at.exception]}))
+
+
+def measure_cold_start(work_dir, timeout):
+    """Time a cold start - new process, nothing imported or cached yet"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--cold-start-probe",
+                                "--timeout", str(timeout)],
+                               cwd=work_dir, capture_output=True, text=True, timeout=timeout * 2)
+    process_ms = (time.perf_counter() - start) * 1000
+    try:
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        probe = {"first_run_ms": None, "exceptions": [completed.stderr.strip()[-500:]]}
+    probe["process_ms"] = round(process_ms, 1)
+    return probe
+
+
+def merge_budgets(base, overrides):
+    """base with overrides applied key by key - a budgets file only lists what it changes"""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_budgets(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def budget_for(budgets, view_name):
+    """Merge the default budget with any per-view override"""
+    limits = dict(budgets.get("default", {}))
+    limits.update(budgets.get("views", {}).get(view_name, {}))
+    return limits
+
+
+def check_budgets(results, budgets):
+    """Return a list of budget violations"""
+    violations = []
+    for scale, views in results["scales"].items():
+        for view_name, data in views.items():
+            limits = budget_for(budgets, view_name)
+            for metric, limit in limits.items():
+                value = data["median"].get(metric)
+                if value is not None and value > limit:
+                    violations.append(f"[{scale}] {view_name}: {metric} {value} > budget {limit}")
+            if data["exceptions"]:
+                violations.append(f"[{scale}] {view_name}: raised {data['exceptions'][0]}")
+    for scale, startup in results.get("startup", {}).items():
+        for metric, limit in budgets.get("startup", {}).items():
+            value = startup.get(metric)
+            if value is not None and value > limit:
+                violations.append(f"[{scale}] startup: {metric} {value} > budget {limit}")
+        if startup.get("exceptions"):
+            violations.append(f"[{scale}] startup: raised {startup['exceptions'][0]}")
+    return violations
+
+
+def benchmark_scale(db_path, views, reruns, timeout, cold_start=True):
+    """Point the app at one seeded database, time a cold start and drive every view"""
+    conn = sqlite3.connect(db_path)
+    context = query_benchmark.build_context(conn)
+    conn.close()
+
+    # streamlit_app opens gerd_center.db from the working directory
+    work_dir = tempfile.mkdtemp(prefix="page_bench_")
+    shutil.copyfile(db_path, os.path.join(work_dir, "gerd_center.db"))
+    old_cwd = os.getcwd()
+    os.chdir(work_dir)
+
+    results = {}
+    startup = None
+    try:
+        if cold_start:
+            startup = measure_cold_start(work_dir, timeout)
+        with QueryCounter(work_dir) as counter:
+            # Cached connections from the previous scale point at the old file (and aren't traced)
+            st.cache_resource.clear()
+            st.cache_data.clear()
+            for view_name in views:
+                results[view_name] = run_view(view_name, VIEWS[view_name](context), counter, reruns, timeout)
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results, startup
+
+
+def format_report(results, budgets):
+    lines = [f"Page benchmark - median rerun per view ({results['generated']})"]
+    header = f"{'Scale':>10}  {'View':<16}{'Wall ms':>10}{'Queries':>10}{'Elements':>10}{'First ms':>10}"
+    lines.append(header)
+    lines.append("-" * len(header))
+    for scale, views in results["scales"].items():
+        for view_name, data in views.items():
+            m = data["median"]
+            limits = budget_for(budgets, view_name)
+            over = [k for k in ("wall_ms", "queries", "elements") if k in limits and m[k] > limits[k]]
+            flag = "  OVER: " + ", ".join(over) if over else ""
+            lines.append(f"{scale:>10}  {view_name:<16}{m['wall_ms']:>10}{m['queries']:>10}"
+                         f"{m['elements']:>10}{data['first_run']['wall_ms']:>10}{flag}")
+    if results.get("startup"):
+        limits = budgets.get("startup", {})
+        lines.append("")
+        lines.append(f"{'Scale':>10}  {'Cold start':<16}{'Process ms':>12}{'First run ms':>14}")
+        for scale, startup in results["startup"].items():
+            over = [k for k in ("process_ms", "first_run_ms")
+                    if k in limits and startup.get(k) is not None and startup[k] > limits[k]]
+            flag = "  OVER: " + ", ".join(over) if over else ""
+            lines.append(f"{scale:>10}  {'Search':<16}{startup['process_ms']:>12}"
+                         f"{str(startup.get('first_run_ms')):>14}{flag}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamlit_app views headlessly")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Patient counts of the seeded databases")
+    parser.add_argument("--views", nargs="+", choices=list(VIEWS), default=list(VIEWS),
+                        help="Views to drive")
+    parser.add_argument("--reruns", type=int, default=3, help="Measured reruns per view")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per script run")
+    parser.add_argument("--budgets", help="JSON file with budget overrides (same shape as DEFAULT_BUDGETS)")
+    parser.add_argument("--json", default="page_bench_results.json", help="Where to write raw results")
+    parser.add_argument("--no-cold-start", action="store_true", help="Skip the fresh-process startup timing")
+    parser.add_argument("--cold-start-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start_probe:
+        cold_start_probe(args.timeout)
+        return 0
+
+    budgets = DEFAULT_BUDGETS
+    if args.budgets:
+        with open(args.budgets) as f:
+            budgets = merge_budgets(DEFAULT_BUDGETS, json.load(f))
+
+    results = {"generated": time.strftime("%Y-%m-%d %H:%M:%S"), "scales": {}, "startup": {}}
+    for patients in args.scales:
+        db_path = os.path.abspath(query_benchmark.ensure_database(patients))
+        print(f"Rendering views against {db_path}")
+        views, startup = benchmark_scale(db_path, args.views, args.reruns, args.timeout,
+                                         cold_start=not args.no_cold_start)
+        results["scales"][str(patients)] = views
+        if startup is not None:
+            results["startup"][str(patients)] = startup
+
+    with open(args.json, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(format_report(results, budgets))
+    violations = check_budgets(results, budgets)
+    if violations:
+        print("\nBudget exceeded:")
+        for line in violations:
+            print(f"  {line}")
+        return 1
+
+    print("\nAll views within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
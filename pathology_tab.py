@@ -2,9 +2,25 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
+import database
+import reference_data
+import ui_profiler
 from add_pathology import open_add_pathology
+from record_list import RecordList
 
+PATHOLOGY_SQL = """
+    SELECT PathologyID, PathologyDate,
+           Biopsy, WATS3D, EsoPredict, TissueCypher,
+           Barretts, DysplasiaGrade, EoE, EosinophilCount,
+           Hpylori, AtrophicGastritis, OtherFinding,
+           EsoPredictRisk, TissueCypherRisk, Notes
+    FROM tblPathology
+    WHERE PatientID = ?
+    ORDER BY PathologyDate DESC
+"""
+
+
+@ui_profiler.profiled("tab:pathology")
 def build(tab_frame, patient_id, tabs=None):
     for widget in tab_frame.winfo_children():
         widget.destroy()
@@ -12,97 +28,75 @@ def build(tab_frame, patient_id, tabs=None):
     container = tk.Frame(tab_frame)
     container.pack(fill="both", expand=True)
 
-    canvas = tk.Canvas(container)
-    scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-    scrollable_frame = tk.Frame(canvas)
-
-    scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    def _on_mousewheel(event):
-        canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-    scrollable_frame.bind("<Enter>", lambda e: canvas.bind_all("<MouseWheel>", _on_mousewheel))
-    scrollable_frame.bind("<Leave>", lambda e: canvas.unbind_all("<MouseWheel>"))
-
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
+    toolbar = tk.Frame(container)
+    toolbar.pack(fill="x", padx=5)
+    tk.Button(toolbar, text="Add Pathology", command=lambda: open_add_pathology(
+        patient_id, refresh_callback=lambda: build(tab_frame, patient_id)
+    )).pack(side="left", pady=10)
+
+    records = RecordList(
+        container,
+        columns=[("date", "Date", 100), ("tests", "Test Types", 160),
+                 ("findings", "Findings", 360), ("risks", "Risk Scores", 140)],
+        actions=[
+            ("View", lambda rid: expand_entry(rid, editable=False)),
+            ("Edit", lambda rid: expand_entry(rid, editable=True)),
+            None,
+            ("Delete", lambda rid: delete_entry(rid)),
+        ],
+        on_open=lambda rid: expand_entry(rid, editable=False),
+        on_delete=lambda rid: delete_entry(rid),
+        empty_text="No pathology results recorded",
+    )
+    records.pack(fill="both", expand=True, padx=5, pady=(0, 5))
 
     expanded_frame = None
 
-    tk.Button(scrollable_frame, text="Add Pathology", command=lambda: open_add_pathology(
-        patient_id, refresh_callback=lambda: build(tab_frame, patient_id)
-    )).grid(row=0, column=0, columnspan=4, pady=10, sticky="w")
-
     def load_pathology():
-        nonlocal expanded_frame
-
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT PathologyID, PathologyDate,
-                   Biopsy, WATS3D, EsoPredict, TissueCypher,
-                   Barretts, DysplasiaGrade, EoE, EosinophilCount,
-                   Hpylori, AtrophicGastritis, OtherFinding,
-                   EsoPredictRisk, TissueCypherRisk, Notes
-            FROM tblPathology
-            WHERE PatientID = ?
-            ORDER BY PathologyDate DESC
-        """, (patient_id,))
+        cursor.execute(PATHOLOGY_SQL, (patient_id,))
         rows = cursor.fetchall()
+        ui_profiler.note(rows=len(rows))
         conn.close()
 
-        headers = ["Date", "Test Types", "Findings", "Risk Scores", "Actions"]
-        for col, header in enumerate(headers):
-            tk.Label(scrollable_frame, text=header, font=("Arial", 10, "bold"), width=20, anchor="w").grid(row=1, column=col, padx=5, pady=5, sticky="w")
-
-        for i, row in enumerate(rows, start=2):
+        list_rows = []
+        for row in rows:
             (pid, date, biopsy, wats, eso, tc,
              barretts, grade, eoe, eos,
              hp, gastritis, other,
              eso_risk, tc_risk, notes) = row
 
-            # Column 1: Date
-            tk.Label(scrollable_frame, text=date, width=20, anchor="w").grid(row=i, column=0, padx=5, pady=2, sticky="w")
-
-            # Column 2: Test Types
+            # Test Types
             test_types = []
             if biopsy: test_types.append("Biopsy")
             if wats: test_types.append("WATS3D")
             if eso: test_types.append("EsoPredict")
             if tc: test_types.append("TissueCypher")
-            tk.Label(scrollable_frame, text=", ".join(test_types), width=20, anchor="w").grid(row=i, column=1, padx=5, pady=2, sticky="w")
 
-            # Column 3: Findings
+            # Findings
             findings = []
             if barretts: findings.append(f"Barrett's ({grade})" if grade else "Barrett's")
             if eoe: findings.append(f"EoE ({eos})" if eos else "EoE")
             if hp: findings.append("H. pylori")
             if gastritis: findings.append("Atrophic Gastritis")
             if other: findings.append(f"Other: {other}")
-            if notes: findings.append(f"Notes: {notes.strip()}")
-            tk.Label(scrollable_frame, text=", ".join(findings), width=40, anchor="w", wraplength=350, justify="left").grid(
-                row=i, column=2, padx=5, pady=2, sticky="w"
-            )
+            if notes: findings.append(f"Notes: {' '.join(notes.split())}")
 
-            # Column 4: Risk Scores
+            # Risk Scores
             risks = []
             if eso_risk: risks.append(f"Eso: {eso_risk}")
             if tc_risk: risks.append(f"TC: {tc_risk}")
-            tk.Label(scrollable_frame, text=", ".join(risks), width=20, anchor="w").grid(row=i, column=3, padx=5, pady=2, sticky="w")
 
-            # Column 5: Buttons
-            action_frame = tk.Frame(scrollable_frame)
-            action_frame.grid(row=i, column=4, padx=5, pady=2, sticky="w")
-            tk.Button(action_frame, text="View", command=lambda rid=pid: expand_entry(rid, editable=False)).pack(side="left", padx=2)
-            tk.Button(action_frame, text="Edit", command=lambda rid=pid: expand_entry(rid, editable=True)).pack(side="left", padx=2)
-            tk.Button(action_frame, text="Delete", command=lambda rid=pid: delete_entry(rid)).pack(side="left", padx=2)
+            list_rows.append((pid, (date, ", ".join(test_types), ", ".join(findings), ", ".join(risks))))
+
+        records.set_rows(list_rows)
 
     def delete_entry(pathology_id):
         if not messagebox.askyesno("Confirm Delete", "Delete this pathology entry?"):
             return
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM tblPathology WHERE PathologyID = ?", (pathology_id,))
             conn.commit()
@@ -114,14 +108,10 @@ def build(tab_frame, patient_id, tabs=None):
 
     def expand_entry(pathology_id, editable=False):
         nonlocal expanded_frame
-        for w in scrollable_frame.winfo_children():
-            if isinstance(w, tk.LabelFrame) and w.cget("text") == "Pathology Details":
-                w.destroy()
-
-        expanded_frame = tk.LabelFrame(scrollable_frame, text="Pathology Details", padx=15, pady=15)
-        expanded_frame.grid(column=0, columnspan=5, padx=10, pady=10, sticky="ew")
+        records.select(pathology_id)
+        expanded_frame = records.show_detail("Pathology Details", padx=15, pady=15)
 
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM tblPathology WHERE PathologyID = ?", (pathology_id,))
         row = cursor.fetchone()
@@ -244,7 +234,7 @@ def build(tab_frame, patient_id, tabs=None):
         dysplasia_frame = tk.Frame(barrett_frame)
         dysplasia_frame.pack(fill="x", pady=2)
         add_dropdown(dysplasia_frame, "Dysplasia Grade:", "DysplasiaGrade", 
-                    ["", "NGIM", "No Dysplasia", "Indeterminate", "Low Grade", "High Grade"])
+                    reference_data.options("dysplasia_grade", blank=True))
 
         # EoE and Eosinophil Count
         eoe_frame = tk.Frame(findings_frame)
@@ -286,7 +276,7 @@ def build(tab_frame, patient_id, tabs=None):
 
         def save_changes():
             try:
-                conn = sqlite3.connect("gerd_center.db")
+                conn = database.connect()
                 cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE tblPathology SET
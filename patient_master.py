@@ -2,7 +2,8 @@
 
 import tkinter as tk
 from tkinter import ttk
-import sqlite3
+import database
+import ui_profiler
 import demographics_tab
 import diagnostics_tab
 import surgical_tab
@@ -10,8 +11,9 @@ import pathology_tab
 import surveillance_tab
 import recall_tab
 
+@ui_profiler.profiled("window:patient_master")
 def open_patient_master(patient_id, refresh_search_callback=None, window_size=None):
-    conn = sqlite3.connect("gerd_center.db")
+    conn = database.connect()
     cursor = conn.cursor()
     cursor.execute("SELECT FirstName, LastName, MRN, Gender, DOB FROM tblPatients WHERE PatientID = ?", (patient_id,))
     result = cursor.fetchone()
@@ -4,22 +4,90 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
-import sqlite3
+import database
+import procedures
 import os
 import tempfile
 import webbrowser
 from datetime import datetime, date
 import re
 
+PATIENT_SQL = "SELECT FirstName, LastName, MRN, DOB, Gender, BMI FROM tblPatients WHERE PatientID = ?"
+
+HIGH_GRADE_ALERT_SQL = """
+    SELECT PathologyDate, DysplasiaGrade
+    FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1 AND DysplasiaGrade LIKE '%High Grade%'
+    ORDER BY PathologyDate DESC LIMIT 1
+"""
+
+OVERDUE_SURVEILLANCE_ALERT_SQL = """
+    SELECT NextBarrettsEGD FROM tblSurveillance
+    WHERE PatientID = ? AND NextBarrettsEGD IS NOT NULL AND NextBarrettsEGD != ''
+    AND NextBarrettsEGD < date('now', '-30 days')
+    ORDER BY LastModified DESC LIMIT 1
+"""
+
+DYSPLASIA_ALERT_SQL = """
+    SELECT PathologyDate, DysplasiaGrade, Notes
+    FROM tblPathology
+    WHERE PatientID = ? AND PathologyDate > date('now', '-12 months')
+    AND (DysplasiaGrade LIKE '%Low Grade%' OR DysplasiaGrade LIKE '%Indeterminate%')
+    ORDER BY PathologyDate DESC LIMIT 1
+"""
+
+REVISION_ALERT_SQL = """
+    SELECT SurgeryDate, Notes FROM tblSurgicalHistory
+    WHERE PatientID = ? AND Revision = 1
+    ORDER BY SurgeryDate DESC LIMIT 1
+"""
+
+SURVEILLANCE_PLAN_SQL = """
+    SELECT NextBarrettsEGD, Undecided FROM tblSurveillance
+    WHERE PatientID = ?
+    ORDER BY LastModified DESC LIMIT 1
+"""
+
+RECENT_PATHOLOGY_SQL = """
+    SELECT PathologyDate, Biopsy, WATS3D, EsoPredict, TissueCypher,
+           Hpylori, Barretts, DysplasiaGrade, AtrophicGastritis,
+           EoE, EosinophilCount, OtherFinding, EsoPredictRisk, TissueCypherRisk, Notes
+    FROM tblPathology
+    WHERE PatientID = ?
+    ORDER BY PathologyDate DESC
+    LIMIT ?
+"""
+
+RECENT_DIAGNOSTICS_SQL = """
+    SELECT TestDate, Surgeon, Endoscopy, EsophagitisGrade, HiatalHerniaSize, EndoscopyFindings,
+           Bravo, pHImpedance, DeMeesterScore, pHFindings,
+           EndoFLIP, EndoFLIPFindings, Manometry, ManometryFindings,
+           GastricEmptying, PercentRetained4h, GastricEmptyingFindings,
+           Imaging, ImagingFindings, UpperGI, UpperGIFindings, DiagnosticNotes
+    FROM tblDiagnostics
+    WHERE PatientID = ?
+    ORDER BY TestDate DESC
+    LIMIT ?
+"""
+
+OPEN_RECALLS_SQL = """
+    SELECT RecallDate, RecallReason, Notes, Completed
+    FROM tblRecall
+    WHERE PatientID = ? AND Completed = 0
+    ORDER BY RecallDate ASC
+    LIMIT 3
+"""
+
+
 def generate_surgeon_optimized_summary(patient_id):
     """Generate a surgeon-optimized patient summary for clinical use"""
     
     # Get patient data
-    conn = sqlite3.connect("gerd_center.db")
+    conn = database.connect()
     cur = conn.cursor()
 
     # Get patient demographics
-    cur.execute("SELECT FirstName, LastName, MRN, DOB, Gender, BMI FROM tblPatients WHERE PatientID = ?", (patient_id,))
+    cur.execute(PATIENT_SQL, (patient_id,))
     patient_row = cur.fetchone()
     if not patient_row:
         conn.close()
@@ -190,45 +258,25 @@ def get_clinical_alerts(cur, patient_id):
     alerts = []
     
     # Check for high-grade dysplasia
-    cur.execute("""
-        SELECT PathologyDate, DysplasiaGrade 
-        FROM tblPathology 
-        WHERE PatientID = ? AND Barretts = 1 AND DysplasiaGrade LIKE '%High Grade%'
-        ORDER BY PathologyDate DESC LIMIT 1
-    """, (patient_id,))
+    cur.execute(HIGH_GRADE_ALERT_SQL, (patient_id,))
     hgd_result = cur.fetchone()
     if hgd_result:
         alerts.append(f"HIGH-GRADE DYSPLASIA: Last documented {hgd_result[0]} - Requires 3-month surveillance")
     
     # Check for overdue Barrett's surveillance
-    cur.execute("""
-        SELECT NextBarrettsEGD FROM tblSurveillance 
-        WHERE PatientID = ? AND NextBarrettsEGD IS NOT NULL AND NextBarrettsEGD != ''
-        AND NextBarrettsEGD < date('now', '-30 days')
-        ORDER BY LastModified DESC LIMIT 1
-    """, (patient_id,))
+    cur.execute(OVERDUE_SURVEILLANCE_ALERT_SQL, (patient_id,))
     overdue_result = cur.fetchone()
     if overdue_result:
         alerts.append(f"OVERDUE SURVEILLANCE: Barrett's EGD was due {overdue_result[0]}")
     
     # Check for recent concerning pathology
-    cur.execute("""
-        SELECT PathologyDate, DysplasiaGrade, Notes 
-        FROM tblPathology 
-        WHERE PatientID = ? AND PathologyDate > date('now', '-12 months')
-        AND (DysplasiaGrade LIKE '%Low Grade%' OR DysplasiaGrade LIKE '%Indeterminate%')
-        ORDER BY PathologyDate DESC LIMIT 1
-    """, (patient_id,))
+    cur.execute(DYSPLASIA_ALERT_SQL, (patient_id,))
     concerning_path = cur.fetchone()
     if concerning_path:
         alerts.append(f"DYSPLASIA DETECTED: {concerning_path[1]} on {concerning_path[0]} - Monitor closely")
     
     # Check for recent failed anti-reflux surgery
-    cur.execute("""
-        SELECT SurgeryDate, Notes FROM tblSurgicalHistory 
-        WHERE PatientID = ? AND Revision = 1 
-        ORDER BY SurgeryDate DESC LIMIT 1
-    """, (patient_id,))
+    cur.execute(REVISION_ALERT_SQL, (patient_id,))
     revision_surgery = cur.fetchone()
     if revision_surgery:
         alerts.append(f"REVISION SURGERY: Previous anti-reflux surgery revised on {revision_surgery[0]}")
@@ -252,11 +300,7 @@ def get_barretts_surveillance_status(cur, patient_id):
     path_date, dysplasia_grade, notes = barretts_result
     
     # Get current surveillance plan
-    cur.execute("""
-        SELECT NextBarrettsEGD, Undecided FROM tblSurveillance 
-        WHERE PatientID = ? 
-        ORDER BY LastModified DESC LIMIT 1
-    """, (patient_id,))
+    cur.execute(SURVEILLANCE_PLAN_SQL, (patient_id,))
     surveillance_result = cur.fetchone()
     
     status = f"<b>Barrett's Confirmed:</b> {path_date}<br/>"
@@ -301,15 +345,7 @@ def get_barretts_surveillance_status(cur, patient_id):
 
 def get_recent_pathology_summary(cur, patient_id, limit=2):
     """Get summary of recent pathology results"""
-    cur.execute("""
-        SELECT PathologyDate, Biopsy, WATS3D, EsoPredict, TissueCypher,
-               Hpylori, Barretts, DysplasiaGrade, AtrophicGastritis,
-               EoE, EosinophilCount, OtherFinding, EsoPredictRisk, TissueCypherRisk, Notes
-        FROM tblPathology
-        WHERE PatientID = ?
-        ORDER BY PathologyDate DESC
-        LIMIT ?
-    """, (patient_id, limit))
+    cur.execute(RECENT_PATHOLOGY_SQL, (patient_id, limit))
     
     results = cur.fetchall()
     if not results:
@@ -378,17 +414,7 @@ def get_recent_pathology_summary(cur, patient_id, limit=2):
 
 def get_recent_diagnostics_summary(cur, patient_id, limit=2):
     """Get summary of recent diagnostic studies"""
-    cur.execute("""
-        SELECT TestDate, Surgeon, Endoscopy, EsophagitisGrade, HiatalHerniaSize, EndoscopyFindings,
-               Bravo, pHImpedance, DeMeesterScore, pHFindings,
-               EndoFLIP, EndoFLIPFindings, Manometry, ManometryFindings,
-               GastricEmptying, PercentRetained4h, GastricEmptyingFindings,
-               Imaging, ImagingFindings, UpperGI, UpperGIFindings, DiagnosticNotes
-        FROM tblDiagnostics
-        WHERE PatientID = ?
-        ORDER BY TestDate DESC
-        LIMIT ?
-    """, (patient_id, limit))
+    cur.execute(RECENT_DIAGNOSTICS_SQL, (patient_id, limit))
     
     results = cur.fetchall()
     if not results:
@@ -485,10 +511,7 @@ def get_recent_diagnostics_summary(cur, patient_id, limit=2):
 def get_surgical_history_summary(cur, patient_id):
     """Get comprehensive surgical history"""
     cur.execute("""
-        SELECT SurgeryDate, SurgerySurgeon, Notes,
-               HiatalHernia, ParaesophagealHernia, MeshUsed, GastricBypass, SleeveGastrectomy,
-               Toupet, TIF, Nissen, Dor, HellerMyotomy, Stretta, Ablation, LINX,
-               GPOEM, EPOEM, ZPOEM, Pyloroplasty, Revision, GastricStimulator, Dilation, Other
+        SELECT SurgeryDate, SurgerySurgeon, Notes, ProcedureMask
         FROM tblSurgicalHistory
         WHERE PatientID = ?
         ORDER BY SurgeryDate DESC
@@ -498,13 +521,6 @@ def get_surgical_history_summary(cur, patient_id):
     if not results:
         return None
     
-    procedure_names = [
-        "Hiatal Hernia Repair", "Paraesophageal Hernia Repair", "Mesh Used", "Gastric Bypass", "Sleeve Gastrectomy",
-        "Toupet Fundoplication", "TIF", "Nissen Fundoplication", "Dor Fundoplication", "Heller Myotomy", 
-        "Stretta", "Ablation", "LINX Device", "G-POEM", "E-POEM", "Z-POEM", "Pyloroplasty", 
-        "Revision Surgery", "Gastric Stimulator", "Dilation", "Other Procedure"
-    ]
-    
     summary = ""
     for i, row in enumerate(results):
         if i > 0:
@@ -513,7 +529,6 @@ def get_surgical_history_summary(cur, patient_id):
         surgery_date = row[0]
         surgeon = row[1]
         notes = row[2]
-        procedures = row[3:]  # All the procedure flags
         
         summary += f"<b>{surgery_date}</b>"
         if surgeon:
@@ -521,10 +536,7 @@ def get_surgical_history_summary(cur, patient_id):
         summary += ":<br/>"
         
         # List procedures performed
-        performed_procedures = []
-        for j, performed in enumerate(procedures):
-            if performed:
-                performed_procedures.append(procedure_names[j])
+        performed_procedures = procedures.labels(row[3])
         
         if performed_procedures:
             summary += f"&nbsp;&nbsp;Procedures: {', '.join(performed_procedures)}<br/>"
@@ -536,13 +548,7 @@ def get_surgical_history_summary(cur, patient_id):
 
 def get_recall_summary(cur, patient_id):
     """Get current recall and follow-up status"""
-    cur.execute("""
-        SELECT RecallDate, RecallReason, Notes, Completed
-        FROM tblRecall
-        WHERE PatientID = ? AND Completed = 0
-        ORDER BY RecallDate ASC
-        LIMIT 3
-    """, (patient_id,))
+    cur.execute(OPEN_RECALLS_SQL, (patient_id,))
     
     results = cur.fetchall()
     if not results:
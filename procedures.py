@@ -0,0 +1,123 @@
+# procedures.py - Surgical procedure flags as one bitmask
+#
+# tblSurgicalHistory keeps one INTEGER flag column per procedure. schema.py
+# adds ProcedureMask, a generated column with bit i set when PROCEDURES[i]
+# was done, and indexes it. Labels for a surgery then come from one lookup
+# per mask rather than a walk over 21 columns, and procedure questions
+# become indexed queries:
+#
+#     procedures.surgeries(conn, all_of=["LINX", "Revision"])
+#     procedures.counts_by_year(conn, any_of=procedures.FUNDOPLICATIONS)
+#
+# Bits are fixed by position - append new procedures, never reorder.
+
+from functools import lru_cache
+
+# (column, short label for lists, full label for summaries)
+PROCEDURES = [
+    ("HiatalHernia", "Hiatal", "Hiatal Hernia Repair"),
+    ("ParaesophagealHernia", "Para", "Paraesophageal Hernia Repair"),
+    ("MeshUsed", "Mesh", "Mesh Used"),
+    ("GastricBypass", "Bypass", "Gastric Bypass"),
+    ("SleeveGastrectomy", "Sleeve", "Sleeve Gastrectomy"),
+    ("Toupet", "Toupet", "Toupet Fundoplication"),
+    ("TIF", "TIF", "TIF"),
+    ("Nissen", "Nissen", "Nissen Fundoplication"),
+    ("Dor", "Dor", "Dor Fundoplication"),
+    ("HellerMyotomy", "Heller", "Heller Myotomy"),
+    ("Stretta", "Stretta", "Stretta"),
+    ("Ablation", "Ablation", "Ablation"),
+    ("LINX", "LINX", "LINX Device"),
+    ("GPOEM", "G-POEM", "G-POEM"),
+    ("EPOEM", "E-POEM", "E-POEM"),
+    ("ZPOEM", "Z-POEM", "Z-POEM"),
+    ("Pyloroplasty", "Pyloro", "Pyloroplasty"),
+    ("Revision", "Revision", "Revision Surgery"),
+    ("GastricStimulator", "Stim", "Gastric Stimulator"),
+    ("Dilation", "Dilation", "Dilation"),
+    ("Other", "Other", "Other Procedure"),
+]
+
+COLUMNS = [column for column, _, _ in PROCEDURES]
+BITS = {column: 1 << i for i, column in enumerate(COLUMNS)}
+
+FUNDOPLICATIONS = ["Nissen", "Toupet", "Dor"]
+POEMS = ["GPOEM", "EPOEM", "ZPOEM"]
+BARIATRIC = ["GastricBypass", "SleeveGastrectomy"]
+
+
+MASKS_SQL = "SELECT DISTINCT ProcedureMask FROM tblSurgicalHistory"
+
+
+def mask_expression():
+    """SQL for the ProcedureMask generated column"""
+    return " | ".join(f"((COALESCE({column}, 0) != 0) << {i})" for i, column in enumerate(COLUMNS))
+
+
+def mask_of(columns):
+    """Bitmask for procedure column names"""
+    mask = 0
+    for column in columns:
+        mask |= BITS[column]
+    return mask
+
+
+def from_flags(row):
+    """Bitmask for a row (dict/Record) that has the flag columns"""
+    return mask_of(column for column in COLUMNS if row[column])
+
+
+@lru_cache(maxsize=None)
+def _labels(mask, style):
+    index = 1 if style == "short" else 2
+    return tuple(procedure[index] for i, procedure in enumerate(PROCEDURES) if mask & (1 << i))
+
+
+def labels(mask, style="long"):
+    """Procedure labels for a mask, in PROCEDURES order ("short" or "long")"""
+    return list(_labels(mask or 0, style))
+
+
+def matches(mask, all_of=(), any_of=(), none_of=()):
+    mask = mask or 0
+    need, want, exclude = mask_of(all_of), mask_of(any_of), mask_of(none_of)
+    return mask & need == need and (not want or mask & want) and not mask & exclude
+
+
+def matching_masks(conn, all_of=(), any_of=(), none_of=()):
+    """Masks in use that satisfy the procedure set.
+
+    Only a few dozen procedure combinations ever occur, so reading the
+    distinct masks off idx_surgical_procedures and filtering them here turns
+    a bit test into an IN (...) lookup on the index.
+    """
+    masks = [row[0] for row in conn.execute(MASKS_SQL)]
+    return [mask for mask in masks if matches(mask, all_of, any_of, none_of)]
+
+
+def where_clause(conn, all_of=(), any_of=(), none_of=(), alias=""):
+    """("ProcedureMask IN (...)", params) for use in a larger query"""
+    prefix = f"{alias}." if alias else ""
+    masks = matching_masks(conn, all_of, any_of, none_of)
+    if not masks:
+        return "0", []
+    return f"{prefix}ProcedureMask IN ({', '.join('?' * len(masks))})", masks
+
+
+def surgeries(conn, all_of=(), any_of=(), none_of=(), columns="SurgeryID, PatientID, SurgeryDate, ProcedureMask"):
+    """Surgeries with the procedure set, oldest first"""
+    where, params = where_clause(conn, all_of, any_of, none_of)
+    return conn.execute(f"SELECT {columns} FROM tblSurgicalHistory WHERE {where} ORDER BY SurgeryDate",
+                        params).fetchall()
+
+
+def counts_by_year(conn, all_of=(), any_of=(), none_of=()):
+    """[(year, surgeries)] for the procedure set"""
+    where, params = where_clause(conn, all_of, any_of, none_of)
+    return conn.execute(f"""
+        SELECT substr(SurgeryDate, 1, 4) AS Year, COUNT(*)
+        FROM tblSurgicalHistory
+        WHERE {where}
+        GROUP BY Year
+        ORDER BY Year
+    """, params).fetchall()
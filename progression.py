@@ -0,0 +1,218 @@
+# progression.py - Time to dysplasia progression in Barrett's surveillance
+#
+# Every Barrett's biopsy with a dysplasia grade is read once, sorted by
+# patient and date, into NumPy arrays. Patient boundaries in that sorted
+# order give each patient's baseline (first graded biopsy), last follow-up
+# and first biopsy at or above an endpoint grade, so the whole cohort's
+# times to progression come out of a handful of vectorized reductions.
+# Kaplan-Meier curves, incidence per 100 patient-years and the grade
+# transition counts are computed from those.
+#
+# Results are cached per endpoint and kept until tblPathology changes
+# (checked against the change journal), so reopening the review is instant.
+#
+#     result = progression.analyze(conn, "hgd")
+#     result["curves"]["Baseline no dysplasia"]["survival"]
+#     python progression.py --endpoint lgd
+
+import argparse
+
+import numpy as np
+
+import database
+import change_journal
+
+# Grade levels in order of severity; NGIM is non-dysplastic
+GRADE_LEVELS = {"no dysplasia": 0, "ngim": 0, "indeterminate": 1, "low grade": 2, "high grade": 3}
+LEVEL_NAMES = ["No dysplasia", "Indeterminate", "Low grade", "High grade"]
+LEVEL_SHORT = ["ND", "IND", "LGD", "HGD"]
+
+# Endpoint: (label, lowest grade level that counts as progression)
+ENDPOINTS = {
+    "lgd": ("Low-grade dysplasia or worse", 2),
+    "hgd": ("High-grade dysplasia", 3),
+}
+
+DAYS_PER_YEAR = 365.25
+
+# (database file, endpoint): (journal position, result)
+_cache = {}
+
+
+def level_sql(column):
+    """SQL mapping a DysplasiaGrade to its level (NULL when ungraded)"""
+    normalized = f"lower(replace(trim({column}), '-', ' '))"
+    whens = " ".join(f"WHEN '{grade}' THEN {level}" for grade, level in GRADE_LEVELS.items())
+    return f"CASE {normalized} {whens} END"
+
+
+def load(conn):
+    """(patient ids, days since 1970, grade levels) for graded Barrett's biopsies, sorted by
+    patient and date - worst grade first on a day, so a same-day HGD counts as baseline"""
+    rows = conn.execute(f"""
+        SELECT PatientID, julianday(PathologyDate) - 2440587.5 AS Day, {level_sql("DysplasiaGrade")} AS Level
+        FROM tblPathology
+        WHERE Barretts = 1 AND PatientID IS NOT NULL
+          AND Day IS NOT NULL AND Level IS NOT NULL
+        ORDER BY PatientID, Day, Level DESC
+    """).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+    patients, days, levels = zip(*rows)
+    return np.array(patients, dtype=np.int64), np.array(days, dtype=float), np.array(levels, dtype=np.int64)
+
+
+def patient_starts(patients):
+    """Index of each patient's first row in the sorted arrays"""
+    if not len(patients):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, patients[1:] != patients[:-1]])
+
+
+def times_to_event(patients, days, levels, endpoint_level):
+    """Per patient free of the endpoint at baseline: (patient id, baseline level,
+    years of follow-up until progression or last biopsy, progressed 0/1)"""
+    starts = patient_starts(patients)
+    if not len(starts):
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), empty, empty.astype(bool)
+    baseline_day, baseline_level = days[starts], levels[starts]
+    last_day = np.maximum.reduceat(days, starts)
+    event_day = np.minimum.reduceat(np.where(levels >= endpoint_level, days, np.inf), starts)
+    at_risk = baseline_level < endpoint_level
+    progressed = np.isfinite(event_day)
+    end_day = np.where(progressed, event_day, last_day)
+    years = (end_day - baseline_day) / DAYS_PER_YEAR
+    return patients[starts][at_risk], baseline_level[at_risk], years[at_risk], progressed[at_risk]
+
+
+def kaplan_meier(years, events):
+    """Kaplan-Meier estimate of staying free of the endpoint.
+
+    Returns {"time", "at_risk", "events", "survival", "lower", "upper"} as
+    arrays starting at time 0; lower/upper are the 95% Greenwood band.
+    """
+    years = np.asarray(years, dtype=float)
+    events = np.asarray(events, dtype=bool)
+    times = np.unique(years[events])
+    ordered = np.sort(years)
+    ordered_events = np.sort(years[events])
+    at_risk = len(ordered) - np.searchsorted(ordered, times, side="left")
+    failed = np.searchsorted(ordered_events, times, side="right") - np.searchsorted(ordered_events, times, side="left")
+    survival = np.cumprod(1 - failed / at_risk)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = survival ** 2 * np.cumsum(failed / (at_risk * (at_risk - failed)))
+    margin = 1.96 * np.sqrt(np.nan_to_num(variance, nan=0.0, posinf=0.0))
+    return {
+        "time": np.r_[0.0, times],
+        "at_risk": np.r_[len(ordered), at_risk],
+        "events": np.r_[0, failed],
+        "survival": np.r_[1.0, survival],
+        "lower": np.r_[1.0, np.clip(survival - margin, 0, 1)],
+        "upper": np.r_[1.0, np.clip(survival + margin, 0, 1)],
+    }
+
+
+def survival_at(curve, years):
+    """(survival, lower, upper) of a curve at the given follow-up time"""
+    i = np.searchsorted(curve["time"], years, side="right") - 1
+    return float(curve["survival"][i]), float(curve["lower"][i]), float(curve["upper"][i])
+
+
+def median_time(curve):
+    """Years until the curve falls to 50%, or None if it never does"""
+    below = np.flatnonzero(curve["survival"] <= 0.5)
+    return float(curve["time"][below[0]]) if len(below) else None
+
+
+def transitions(patients, levels):
+    """4x4 counts of grade at one biopsy (row) to grade at the patient's next biopsy (column)"""
+    matrix = np.zeros((len(LEVEL_NAMES), len(LEVEL_NAMES)), dtype=np.int64)
+    same_patient = patients[1:] == patients[:-1]
+    np.add.at(matrix, (levels[:-1][same_patient], levels[1:][same_patient]), 1)
+    return matrix
+
+
+def sequences(patients, levels, top=10):
+    """Most common grade paths, repeats collapsed ("ND > LGD > HGD"): [(path, patients)]"""
+    if not len(patients):
+        return []
+    starts = patient_starts(patients)
+    # Keep a row when it starts a patient or changes grade
+    changed = np.r_[True, (patients[1:] != patients[:-1]) | (levels[1:] != levels[:-1])]
+    kept = np.flatnonzero(changed)
+    owner = np.searchsorted(starts, kept, side="right") - 1
+    counts = {}
+    for chunk in np.split(levels[kept], np.flatnonzero(np.diff(owner)) + 1):
+        path = " > ".join(LEVEL_SHORT[level] for level in chunk)
+        counts[path] = counts.get(path, 0) + 1
+    return sorted(counts.items(), key=lambda item: -item[1])[:top]
+
+
+def compute(patients, days, levels, endpoint="hgd"):
+    """Full analysis for one endpoint from the loaded arrays"""
+    label, endpoint_level = ENDPOINTS[endpoint]
+    ids, baseline, years, progressed = times_to_event(patients, days, levels, endpoint_level)
+    person_years = float(years.sum())
+    curves = {"All patients": kaplan_meier(years, progressed)}
+    for level in range(endpoint_level):
+        chosen = baseline == level
+        if chosen.any():
+            curves[f"Baseline {LEVEL_NAMES[level].lower()}"] = kaplan_meier(years[chosen], progressed[chosen])
+    return {
+        "endpoint": label,
+        "patients": int(len(ids)),
+        "events": int(progressed.sum()),
+        "excluded": int(len(patient_starts(patients)) - len(ids)),
+        "person_years": person_years,
+        "rate_per_100py": 100.0 * progressed.sum() / person_years if person_years else None,
+        "median_years": median_time(curves["All patients"]),
+        "curves": curves,
+        "transitions": transitions(patients, levels),
+        "sequences": sequences(patients, levels),
+        "per_patient": (ids, baseline, years, progressed),
+    }
+
+
+def analyze(conn, endpoint="hgd"):
+    """compute() on the current data, cached until tblPathology changes"""
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+    key = (database.path_of(conn), endpoint)
+    cached = _cache.get(key)
+    latest = change_journal.latest_id(conn)
+    # A journal behind the cache has been rolled back (backup.restore) - recompute
+    if cached and cached[0] <= latest and (cached[0] == latest or
+                   not change_journal.changes_since(conn, cached[0], ["tblPathology"], limit=1)):
+        _cache[key] = (latest, cached[1])
+        return cached[1]
+    result = compute(*load(conn), endpoint=endpoint)
+    _cache[key] = (latest, result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to dysplasia progression in Barrett's surveillance")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="hgd")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        result = analyze(conn, args.endpoint)
+    finally:
+        conn.close()
+    print(f"Endpoint: {result['endpoint']}")
+    print(f"{result['patients']} patients at risk ({result['excluded']} already at the endpoint at baseline), "
+          f"{result['events']} progressed over {result['person_years']:.0f} patient-years")
+    if result["rate_per_100py"] is not None:
+        print(f"Incidence: {result['rate_per_100py']:.2f} per 100 patient-years")
+    for name, curve in result["curves"].items():
+        free = ", ".join(f"{year}y {survival_at(curve, year)[0]:.1%}" for year in (1, 3, 5))
+        print(f"  {name}: {free} progression-free")
+    print("Grade paths:")
+    for path, count in result["sequences"]:
+        print(f"  {count:6d}  {path}")
+
+
+if __name__ == "__main__":
+    main()
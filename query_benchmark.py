@@ -0,0 +1,648 @@
+# query_benchmark.py - Time every report/tab query against synthetic cohorts
+
+import sqlite3
+import os
+import json
+import time
+import argparse
+import statistics
+from datetime import date, datetime, timedelta
+
+import ast
+import schema
+import synthetic_cohort
+import barrett_length
+import barretts_report
+import cohort
+import demographics_tab
+import diagnostics_tab
+import main
+import pathology_tab
+import print_summary
+import procedures
+import recall_report
+import recall_tab
+import reference_data
+import surgery_cube
+import surgical_tab
+import surveillance_tab
+
+BENCH_DIR = "bench_dbs"
+DEFAULT_SCALES = [10000, 100000, 1000000]
+
+
+def script_constants(path):
+    """Module-level literal constants of a script, read without running it"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                constants[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+    return constants
+
+
+# Importing streamlit_app would run the app, so its query constants are read from the source
+APP_SQL = script_constants(os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py"))
+
+# Every read query the apps issue, taken from the constants (or query
+# builders) the call sites run, so the catalog can't drift from the code.
+# Clauses the call site appends are spelled out here as they are in its source.
+# "sql" may also be a function of the connection, for queries built per database.
+# "params" names values from the benchmark context (see build_context).
+# "per_row_of" marks queries the app runs once per row of another query,
+# so their effective cost is multiplied by that query's row count.
+QUERY_CATALOG = [
+    # streamlit_app.py - sidebar and patient record
+    {
+        "name": "st.search_patients",
+        "source": "streamlit_app",
+        "sql": APP_SQL["SEARCH_PATIENTS_SQL"],
+        "params": ("search_any", "search_any", "search_any"),
+    },
+    {
+        "name": "st.default_patient_list",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DEFAULT_PATIENT_LIST_SQL"],
+        "params": (),
+    },
+    # reference_data.py - picklists are cached; the version is re-read every CHECK_INTERVAL
+    {
+        "name": "ref.version",
+        "source": "reference_data",
+        "sql": reference_data.VERSION_SQL,
+        "params": (),
+    },
+    {
+        "name": "ref.surgeons",
+        "source": "reference_data",
+        "sql": reference_data.SURGEONS_SQL,
+        "params": (),
+    },
+    {
+        "name": "st.patient_header",
+        "source": "streamlit_app",
+        "sql": APP_SQL["PATIENT_HEADER_SQL"],
+        "params": ("patient_id",),
+    },
+    {
+        "name": "st.diagnostics_section",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DIAGNOSTICS_SQL"],
+        "params": ("patient_id",),
+    },
+    {
+        "name": "st.surgical_section",
+        "source": "streamlit_app",
+        "sql": APP_SQL["SURGERIES_SQL"],
+        "params": ("patient_id",),
+    },
+    {
+        "name": "st.pathology_section",
+        "source": "streamlit_app",
+        "sql": APP_SQL["PATHOLOGY_SQL"],
+        "params": ("patient_id",),
+    },
+    {
+        "name": "st.latest_barretts",
+        "source": "streamlit_app",
+        "sql": APP_SQL["LATEST_BARRETTS_SQL"],
+        "params": ("patient_id",),
+    },
+    {
+        "name": "st.surveillance_section",
+        "source": "streamlit_app",
+        "sql": APP_SQL["SURVEILLANCE_SQL"],
+        "params": ("patient_id",),
+    },
+    {
+        "name": "st.recalls_section",
+        "source": "streamlit_app",
+        "sql": APP_SQL["PATIENT_RECALLS_SQL"],
+        "params": ("patient_id",),
+    },
+    # streamlit_app.py - Dashboard
+    {
+        "name": "st.dash_total_patients",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DASH_TOTAL_PATIENTS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.dash_barretts_patients",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DASH_BARRETTS_PATIENTS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.dash_overdue_recalls",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DASH_OVERDUE_RECALLS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.dash_high_grade",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DASH_HIGH_GRADE_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.dash_recent_surgeries",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DASH_RECENT_SURGERIES_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.dash_surveillance_status",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DASH_SURVEILLANCE_STATUS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.export_all_patients",
+        "source": "streamlit_app",
+        "sql": APP_SQL["EXPORT_ALL_PATIENTS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.export_barretts",
+        "source": "streamlit_app",
+        "sql": APP_SQL["EXPORT_BARRETTS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.export_recalls",
+        "source": "streamlit_app",
+        "sql": APP_SQL["EXPORT_RECALLS_SQL"].format(table="tblRecall"),
+        "params": (),
+    },
+    # streamlit_app.py - Recalls and Barrett's views
+    {
+        "name": "st.recalls_view_overdue",
+        "source": "streamlit_app",
+        "sql": APP_SQL["RECALLS_VIEW_SQL"].format(table="tblRecall", archived="0",
+                                                  where=APP_SQL["RECALL_FILTER_SQL"]["Overdue"]),
+        "params": (),
+    },
+    {
+        "name": "st.recalls_view_barretts_check",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HAS_BARRETTS_SQL"],
+        "params": ("patient_id",),
+        "per_row_of": "st.recalls_view_overdue",
+    },
+    {
+        "name": "st.barretts_view",
+        "source": "streamlit_app",
+        "sql": APP_SQL["BARRETTS_VIEW_SQL"],
+        "params": (),
+    },
+    # streamlit_app.py - home page
+    {
+        "name": "st.home_new_patients",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HOME_NEW_PATIENTS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.home_recent_surgeries",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HOME_RECENT_SURGERIES_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.home_recent_pathology",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HOME_RECENT_PATHOLOGY_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.home_high_grade_overdue",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HOME_HIGH_GRADE_OVERDUE_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.home_overdue_recalls",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HOME_OVERDUE_RECALLS_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.home_recently_modified",
+        "source": "streamlit_app",
+        "sql": APP_SQL["HOME_RECENTLY_MODIFIED_SQL"],
+        "params": (),
+    },
+    {
+        "name": "st.footer_db_stats",
+        "source": "streamlit_app",
+        "sql": APP_SQL["DB_STATS_SQL"],
+        "params": (),
+    },
+    # recall_report.py
+    {
+        "name": "recall_report.run_filter",
+        "source": "recall_report",
+        "sql": (recall_report.RECALLS_SQL.format(table="tblRecall") + " AND R.Completed = 0"
+                + " AND R.RecallDate <= ?" + " ORDER BY R.RecallDate ASC, P.LastName ASC"),
+        "params": ("deadline",),
+    },
+    {
+        "name": "recall_report.get_recall_priority",
+        "source": "recall_report",
+        "sql": recall_report.RECALL_PRIORITY_SQL,
+        "params": ("patient_id",),
+        "per_row_of": "recall_report.run_filter",
+    },
+    {
+        "name": "recall_report.get_barrett_status",
+        "source": "recall_report",
+        "sql": recall_report.BARRETT_STATUS_SQL,
+        "params": ("patient_id",),
+        "per_row_of": "recall_report.run_filter",
+    },
+    # barretts_report.py
+    {
+        "name": "barretts_report.load_data",
+        "source": "barretts_report",
+        "sql": barretts_report.SURVEILLANCE_SQL + " ORDER BY pt.LastName, pt.FirstName",
+        "params": (),
+    },
+    # print_summary.py
+    {
+        "name": "print_summary.patient",
+        "source": "print_summary",
+        "sql": print_summary.PATIENT_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "print_summary.alert_high_grade",
+        "source": "print_summary",
+        "sql": print_summary.HIGH_GRADE_ALERT_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "print_summary.alert_overdue_surveillance",
+        "source": "print_summary",
+        "sql": print_summary.OVERDUE_SURVEILLANCE_ALERT_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "print_summary.alert_dysplasia",
+        "source": "print_summary",
+        "sql": print_summary.DYSPLASIA_ALERT_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "print_summary.alert_revision",
+        "source": "print_summary",
+        "sql": print_summary.REVISION_ALERT_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "print_summary.surveillance_plan",
+        "source": "print_summary",
+        "sql": print_summary.SURVEILLANCE_PLAN_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "print_summary.recent_pathology",
+        "source": "print_summary",
+        "sql": print_summary.RECENT_PATHOLOGY_SQL,
+        "params": ("patient_id", "summary_limit"),
+    },
+    {
+        "name": "print_summary.recent_diagnostics",
+        "source": "print_summary",
+        "sql": print_summary.RECENT_DIAGNOSTICS_SQL,
+        "params": ("patient_id", "summary_limit"),
+    },
+    {
+        "name": "print_summary.recall_summary",
+        "source": "print_summary",
+        "sql": print_summary.OPEN_RECALLS_SQL,
+        "params": ("patient_id",),
+    },
+    # Tk app - main window and per-patient tabs
+    {
+        "name": "main.search_patients",
+        "source": "main",
+        "sql": main.SEARCH_PATIENTS_SQL,
+        "params": ("search_prefix", "search_prefix", "search_prefix"),
+    },
+    {
+        "name": "demographics_tab.load_data",
+        "source": "demographics_tab",
+        "sql": demographics_tab.PATIENT_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "diagnostics_tab.load_diagnostics",
+        "source": "diagnostics_tab",
+        "sql": diagnostics_tab.DIAGNOSTICS_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "pathology_tab.load_pathology",
+        "source": "pathology_tab",
+        "sql": pathology_tab.PATHOLOGY_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "surgical_tab.load_surgeries",
+        "source": "surgical_tab",
+        "sql": surgical_tab.SURGERIES_SQL,
+        "params": ("patient_id",),
+    },
+    # procedures.py - procedure-set queries read the masks in use, then look them up
+    {
+        "name": "procedures.matching_masks",
+        "source": "procedures",
+        "sql": procedures.MASKS_SQL,
+        "params": (),
+    },
+    # cohort.py - a threshold criterion on a numeric shadow column (measurements.py)
+    {
+        "name": "cohort.demeester_over",
+        "source": "cohort",
+        "sql": lambda conn: cohort.criterion_sql(
+            conn, {"source": "diagnostics", "where": [("DeMeesterValue", ">", 14.72)]})[0],
+        "params": ("demeester_cutoff",),
+    },
+    {
+        "name": "recall_tab.load_recalls",
+        "source": "recall_tab",
+        "sql": recall_tab.RECALLS_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "recall_tab.get_recall_priority",
+        "source": "recall_tab",
+        "sql": recall_tab.RECALL_PRIORITY_SQL,
+        "params": ("patient_id",),
+        "per_row_of": "recall_tab.load_recalls",
+    },
+    {
+        "name": "surveillance_tab.check_barrett_history",
+        "source": "surveillance_tab",
+        "sql": surveillance_tab.BARRETT_HISTORY_SQL,
+        "params": ("patient_id",),
+    },
+    {
+        "name": "surgery_cube.surgeon_year",
+        "source": "surgery_cube",
+        "sql": surgery_cube.slice_sql(["Surgeon", "Year"], ["C.Month >= ?", "C.Month <= ?"]),
+        "params": ("cube_since", "cube_until"),
+    },
+    {
+        "name": "surveillance_tab.latest_egd_with_length",
+        "source": "barrett_length",
+        "sql": barrett_length.PATIENT_LENGTH_SQL,
+        "params": ("patient_id", "recent_egds"),
+    },
+    {
+        "name": "surveillance_tab.last_egd",
+        "source": "surveillance_tab",
+        "sql": surveillance_tab.LAST_EGD_SQL,
+        "params": ("patient_id",),
+    },
+]
+
+
+def build_context(conn):
+    """Pick benchmark parameters - the Barrett's patient with the longest history"""
+    row = conn.execute("""
+        SELECT p.PatientID, COUNT(*) AS n
+        FROM tblPathology p
+        JOIN tblDiagnostics d ON d.PatientID = p.PatientID
+        WHERE p.Barretts = 1
+        GROUP BY p.PatientID
+        ORDER BY n DESC
+        LIMIT 1
+    """).fetchone()
+    if not row:
+        row = conn.execute("SELECT PatientID FROM tblPatients LIMIT 1").fetchone()
+
+    return {
+        "patient_id": row[0] if row else 1,
+        "search_prefix": "Sm%",
+        "search_any": "%son%",
+        "deadline": (date.today() + timedelta(days=30)).strftime("%Y-%m-%d"),
+        "summary_limit": 2,
+        "cube_since": f"{date.today().year - 4}-01",
+        "cube_until": f"{date.today().year}-12",
+        "demeester_cutoff": 14.72,
+        "recent_egds": barrett_length.RECENT_ENDOSCOPIES,
+    }
+
+
+def explain(conn, sql, params):
+    """Return EXPLAIN QUERY PLAN detail lines"""
+    try:
+        return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+    except sqlite3.Error as e:
+        return [f"error: {e}"]
+
+
+def full_scans(plan):
+    """Plan lines that read a whole table or sort in a temp b-tree"""
+    flagged = []
+    for line in plan:
+        if line.startswith("SCAN ") and "USING" not in line and "CONSTANT ROW" not in line:
+            flagged.append(line)
+        elif "TEMP B-TREE" in line:
+            flagged.append(line)
+    return flagged
+
+
+def time_query(conn, sql, params, repeat, timeout):
+    """Run a query repeat times, returning (timings_ms, row_count) or raising on timeout"""
+    deadline = [0.0]
+
+    def check_timeout():
+        # Non-zero return aborts the running statement
+        return 1 if time.perf_counter() > deadline[0] else 0
+
+    conn.set_progress_handler(check_timeout, 10000)
+    timings = []
+    rows = 0
+    try:
+        # One untimed pass to warm the page cache
+        for i in range(repeat + 1):
+            deadline[0] = time.perf_counter() + timeout
+            start = time.perf_counter()
+            rows = len(conn.execute(sql, params).fetchall())
+            elapsed = (time.perf_counter() - start) * 1000
+            if i > 0:
+                timings.append(elapsed)
+    finally:
+        conn.set_progress_handler(None, 0)
+    return timings, rows
+
+
+def run_benchmark(db_path, repeat=5, timeout=30.0, names=None):
+    """Time every catalogued query against one database"""
+    conn = sqlite3.connect(db_path)
+    # Databases generated before a schema upgrade get it here, as the app would
+    schema.ensure_schema(conn)
+    context = build_context(conn)
+    results = {}
+
+    for spec in QUERY_CATALOG:
+        if names and spec["name"] not in names:
+            continue
+
+        params = tuple(context[key] for key in spec["params"])
+        sql = spec["sql"](conn) if callable(spec["sql"]) else spec["sql"]
+        entry = {
+            "source": spec["source"],
+            "per_row_of": spec.get("per_row_of"),
+            "plan": explain(conn, sql, params),
+        }
+        entry["full_scans"] = full_scans(entry["plan"])
+
+        try:
+            timings, rows = time_query(conn, sql, params, repeat, timeout)
+            entry.update({
+                "rows": rows,
+                "median_ms": round(statistics.median(timings), 3),
+                "min_ms": round(min(timings), 3),
+                "max_ms": round(max(timings), 3),
+            })
+        except sqlite3.OperationalError as e:
+            entry.update({"rows": None, "median_ms": None, "min_ms": None, "max_ms": None,
+                          "error": "timeout" if "interrupted" in str(e) else str(e)})
+        results[spec["name"]] = entry
+
+    conn.close()
+
+    # N+1 queries cost their median times the parent query's row count
+    for name, entry in results.items():
+        parent = results.get(entry["per_row_of"]) if entry["per_row_of"] else None
+        if parent and parent["rows"] is not None and entry["median_ms"] is not None:
+            entry["effective_ms"] = round(entry["median_ms"] * parent["rows"], 3)
+        else:
+            entry["effective_ms"] = entry["median_ms"]
+
+    return {"context": context, "queries": results}
+
+
+def ensure_database(patients, regenerate=False, seed=42):
+    """Generate (or reuse) the synthetic database for one scale"""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f"synthetic_{patients}.db")
+    if regenerate or not os.path.exists(path):
+        print(f"Generating {patients} patients -> {path}")
+        synthetic_cohort.generate_database(path, patients, seed=seed)
+    return path
+
+
+def format_ms(value):
+    return "timeout" if value is None else f"{value:.2f}"
+
+
+def format_report(results, baseline=None, threshold=0.25, min_delta_ms=1.0):
+    """Plain-text comparison report across scales (and against a baseline run)"""
+    lines = []
+    scales = list(results["scales"].keys())
+    names = [spec["name"] for spec in QUERY_CATALOG
+             if any(spec["name"] in results["scales"][s]["queries"] for s in scales)]
+
+    header = f"{'Query':<44}" + "".join(f"{s + ' pts':>16}" for s in scales) + "  Full scans"
+    lines.append(f"Query benchmark - {results['generated']}")
+    lines.append("Effective ms (median x per-row fan-out)")
+    lines.append(header)
+    lines.append("-" * len(header))
+
+    for name in names:
+        row = f"{name:<44}"
+        scans = []
+        for scale in scales:
+            entry = results["scales"][scale]["queries"].get(name)
+            row += f"{format_ms(entry['effective_ms']) if entry else '-':>16}"
+            if entry and entry["full_scans"] and not scans:
+                scans = entry["full_scans"]
+        lines.append(row + "  " + "; ".join(scans))
+
+    regressions = []
+    if baseline:
+        lines.append("")
+        lines.append(f"Compared with baseline from {baseline.get('generated', '?')} "
+                     f"(flagging > {threshold:.0%} slower or a changed plan)")
+        for scale in scales:
+            old_scale = baseline.get("scales", {}).get(scale)
+            if not old_scale:
+                continue
+            for name in names:
+                new = results["scales"][scale]["queries"].get(name)
+                old = old_scale["queries"].get(name)
+                if not new or not old:
+                    continue
+                notes = []
+                if new["effective_ms"] is None and old["effective_ms"] is not None:
+                    notes.append("now times out")
+                elif new["effective_ms"] is not None and old["effective_ms"]:
+                    change = (new["effective_ms"] - old["effective_ms"]) / old["effective_ms"]
+                    # Sub-millisecond jitter is not a regression
+                    if change > threshold and new["effective_ms"] - old["effective_ms"] >= min_delta_ms:
+                        notes.append(f"{change:+.0%} ({format_ms(old['effective_ms'])} -> {format_ms(new['effective_ms'])} ms)")
+                if new["plan"] != old["plan"]:
+                    notes.append("plan changed: " + " | ".join(new["plan"]))
+                if notes:
+                    regressions.append((scale, name, notes))
+                    lines.append(f"  [{scale}] {name}: " + "; ".join(notes))
+        if not regressions:
+            lines.append("  No regressions")
+
+    return "\n".join(lines), regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every app query against synthetic cohorts")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Patient counts to benchmark (default: 10k 100k 1M)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a query is abandoned")
+    parser.add_argument("--query", nargs="*", help="Only run these catalogue entries")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild cached synthetic databases")
+    parser.add_argument("--json", default="bench_results.json", help="Where to write raw results")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown ratio flagged as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--show-plans", action="store_true", help="Print EXPLAIN QUERY PLAN for every query")
+    args = parser.parse_args()
+
+    results = {"generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "scales": {}}
+    for patients in args.scales:
+        db_path = ensure_database(patients, regenerate=args.regenerate)
+        print(f"Benchmarking {db_path}")
+        results["scales"][str(patients)] = run_benchmark(db_path, args.repeat, args.timeout, args.query)
+
+    with open(args.json, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report, regressions = format_report(results, baseline, args.threshold, args.min_delta_ms)
+    print(report)
+
+    if args.show_plans:
+        largest = results["scales"][str(args.scales[-1])]["queries"]
+        for name, entry in largest.items():
+            print(f"\n{name}")
+            for line in entry["plan"]:
+                print(f"    {line}")
+
+    print(f"\nRaw results written to {args.json}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,339 @@
+# query_trace.py - Per-query timing, slow-query log and per-screen aggregates
+#
+# Switch on with GERD_QUERY_TRACE=1. database.connect() then hands out
+# TracedConnection objects, which time every statement, count the rows it
+# returns and attribute it to the calling module/function and current screen.
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+TRACE_ENV = "GERD_QUERY_TRACE"
+SLOW_MS_ENV = "GERD_SLOW_QUERY_MS"
+LOG_DIR_ENV = "GERD_QUERY_LOG_DIR"
+
+TRACE_LOG = "query_trace.log"
+SLOW_LOG = "slow_queries.log"
+DEFAULT_SLOW_MS = 100.0
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Frames in these files/functions are the data layer, not the caller we want to blame
+LAYER_FILES = {"query_trace.py", "database.py"}
+LAYER_FUNCTIONS = {"execute_query", "safe_database_operation", "get_database_connection"}
+
+_lock = threading.Lock()
+_local = threading.local()
+_recent = deque(maxlen=2000)
+_by_sql = {}
+_by_screen = {}
+_loggers = {}
+
+
+def enabled():
+    """True when tracing is switched on through the environment"""
+    return os.environ.get(TRACE_ENV, "").strip().lower() not in ("", "0", "false", "off", "no")
+
+
+def slow_threshold_ms():
+    try:
+        return float(os.environ.get(SLOW_MS_ENV, DEFAULT_SLOW_MS))
+    except ValueError:
+        return DEFAULT_SLOW_MS
+
+
+def set_screen(name):
+    """Attribute queries on this thread to a screen until changed"""
+    _local.screen = name
+
+
+def current_screen():
+    return getattr(_local, "screen", None) or "unknown"
+
+
+@contextmanager
+def screen(name):
+    """Attribute queries inside the block to a screen"""
+    previous = getattr(_local, "screen", None)
+    _local.screen = name
+    try:
+        yield
+    finally:
+        _local.screen = previous
+
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", sql or "").strip()
+
+
+def find_caller():
+    """First app frame outside the data layer, as module.function:line"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        path = os.path.abspath(code.co_filename)
+        filename = os.path.basename(path)
+        if (os.path.dirname(path) == APP_DIR and filename not in LAYER_FILES
+                and code.co_name not in LAYER_FUNCTIONS):
+            return f"{os.path.splitext(filename)[0]}.{code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _get_logger(name, filename):
+    """Rolling file logger, created on first use"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = logging.getLogger(f"gerd.{name}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            log_dir = os.environ.get(LOG_DIR_ENV, ".")
+            handler = RotatingFileHandler(os.path.join(log_dir, filename),
+                                          maxBytes=2 * 1024 * 1024, backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+        _loggers[name] = logger
+    return logger
+
+
+def _on_statement(statement):
+    """sqlite3 trace callback - counts every statement, including trigger bodies"""
+    record = getattr(_local, "active", None)
+    if record is not None:
+        record["statements"] += 1
+        if record["expanded"] is None:
+            record["expanded"] = statement
+
+
+def record_query(record):
+    """Fold a finished query into the aggregates and logs"""
+    key = normalize_sql(record["sql"])
+    ms = record["ms"]
+    slow = ms >= slow_threshold_ms()
+
+    with _lock:
+        _recent.append(record)
+
+        stats = _by_sql.get(key)
+        if stats is None:
+            stats = _by_sql[key] = {"sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                    "rows": 0, "slow": 0, "callers": {}}
+        stats["count"] += 1
+        stats["total_ms"] += ms
+        stats["max_ms"] = max(stats["max_ms"], ms)
+        stats["rows"] += record["rows"]
+        stats["slow"] += 1 if slow else 0
+        stats["callers"][record["caller"]] = stats["callers"].get(record["caller"], 0) + 1
+
+        screen_stats = _by_screen.get(record["screen"])
+        if screen_stats is None:
+            screen_stats = _by_screen[record["screen"]] = {"screen": record["screen"], "count": 0,
+                                                           "total_ms": 0.0, "max_ms": 0.0,
+                                                           "rows": 0, "slow": 0}
+        screen_stats["count"] += 1
+        screen_stats["total_ms"] += ms
+        screen_stats["max_ms"] = max(screen_stats["max_ms"], ms)
+        screen_stats["rows"] += record["rows"]
+        screen_stats["slow"] += 1 if slow else 0
+
+    line = (f"{ms:8.2f}ms rows={record['rows']} stmts={record['statements']} "
+            f"screen={record['screen']} caller={record['caller']} sql={key}")
+    _get_logger("trace", TRACE_LOG).info(line)
+    if slow:
+        _get_logger("slow", SLOW_LOG).info(line + f" expanded={normalize_sql(record['expanded'])}")
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times execute and fetch calls and counts rows returned"""
+
+    _record = None
+
+    def _begin(self, sql):
+        self._finish()
+        self._record = {
+            "sql": sql,
+            "expanded": None,
+            "ms": 0.0,
+            "rows": 0,
+            "statements": 0,
+            "caller": find_caller(),
+            "screen": current_screen(),
+            "time": time.time(),
+        }
+
+    def _timed(self, method, *args):
+        record = self._record
+        previous = getattr(_local, "active", None)
+        _local.active = record
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            if record is not None:
+                record["ms"] += (time.perf_counter() - start) * 1000
+            _local.active = previous
+
+    def _finish(self):
+        record = self._record
+        if record is None:
+            return
+        self._record = None
+        # Writes return no rows - report rows affected instead
+        if record["rows"] == 0 and self.rowcount > 0:
+            record["rows"] = self.rowcount
+        record_query(record)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        return self._timed(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        result = self._timed(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+        self._finish()
+        return result
+
+    def executescript(self, sql_script):
+        self._begin(sql_script)
+        result = self._timed(sqlite3.Cursor.executescript, sql_script)
+        self._finish()
+        return result
+
+    def fetchone(self):
+        row = self._timed(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._finish()
+        elif self._record is not None:
+            self._record["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(sqlite3.Cursor.fetchmany, size)
+        if self._record is not None:
+            self._record["rows"] += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(sqlite3.Cursor.fetchall)
+        if self._record is not None:
+            self._record["rows"] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(sqlite3.Cursor.__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._record is not None:
+            self._record["rows"] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors are traced; pass as factory= to sqlite3.connect"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_on_statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # The C implementations bypass cursor(), so route them explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def _with_averages(stats):
+    row = dict(stats)
+    row["total_ms"] = round(row["total_ms"], 2)
+    row["max_ms"] = round(row["max_ms"], 2)
+    row["avg_ms"] = round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0
+    return row
+
+
+def top_queries(limit=20, key="total_ms"):
+    """Worst queries by total time (or count/max_ms/avg_ms)"""
+    with _lock:
+        rows = [_with_averages(s) for s in _by_sql.values()]
+    for row in rows:
+        row["callers"] = ", ".join(f"{c} ({n})" for c, n in
+                                   sorted(row["callers"].items(), key=lambda item: -item[1]))
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:limit]
+
+
+def screen_summary():
+    """Aggregates per screen, busiest first"""
+    with _lock:
+        rows = [_with_averages(s) for s in _by_screen.values()]
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+def recent_queries(limit=200, slow_only=False):
+    """Most recent query records, newest first"""
+    threshold = slow_threshold_ms()
+    with _lock:
+        records = list(_recent)
+    records.reverse()
+    if slow_only:
+        records = [r for r in records if r["ms"] >= threshold]
+    return [dict(r, sql=normalize_sql(r["sql"]), ms=round(r["ms"], 2)) for r in records[:limit]]
+
+
+def query_count():
+    """Queries recorded since the last reset()"""
+    with _lock:
+        return sum(stats["count"] for stats in _by_sql.values())
+
+
+def reset():
+    """Clear all in-memory aggregates"""
+    with _lock:
+        _recent.clear()
+        _by_sql.clear()
+        _by_screen.clear()
+
+
+def export_json(path):
+    """Write aggregates and recent queries to a JSON file"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "exported": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "slow_threshold_ms": slow_threshold_ms(),
+            "top_queries": top_queries(limit=100),
+            "screens": screen_summary(),
+            "recent": recent_queries(limit=500),
+        }, f, indent=2)
+    return path
@@ -0,0 +1,97 @@
+# query_trace_viewer.py - Small Tk window showing the worst queries from query_trace
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import query_trace
+
+REFRESH_MS = 2000
+
+
+def open_query_trace_viewer(parent):
+    """Open (or raise) the query trace window"""
+    existing = getattr(parent, "_query_trace_window", None)
+    if existing is not None and existing.winfo_exists():
+        existing.lift()
+        return existing
+
+    win = tk.Toplevel(parent)
+    win.title("🐢 Query Trace")
+    win.geometry("1100x560")
+    parent._query_trace_window = win
+
+    if not query_trace.enabled():
+        tk.Label(win, text=f"Tracing is off. Start the app with {query_trace.TRACE_ENV}=1 to collect queries.",
+                 fg="#b45309", font=("Arial", 10, "bold")).pack(anchor="w", padx=10, pady=(10, 0))
+
+    toolbar = tk.Frame(win)
+    toolbar.pack(fill="x", padx=10, pady=8)
+    status_var = tk.StringVar()
+    tk.Label(toolbar, textvariable=status_var).pack(side="left")
+
+    notebook = ttk.Notebook(win)
+    notebook.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+    def make_tree(title, columns):
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text=title)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in columns], show="headings")
+        for key, heading, width in columns:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor="w" if key in ("sql", "callers", "screen", "caller") else "e",
+                        stretch=key in ("sql", "callers"))
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+        return tree
+
+    top_tree = make_tree("Top Queries", [
+        ("total_ms", "Total ms", 80), ("count", "Calls", 60), ("avg_ms", "Avg ms", 70),
+        ("max_ms", "Max ms", 70), ("rows", "Rows", 70), ("slow", "Slow", 50),
+        ("callers", "Callers", 260), ("sql", "SQL", 400),
+    ])
+    screen_tree = make_tree("By Screen", [
+        ("screen", "Screen", 200), ("count", "Queries", 80), ("total_ms", "Total ms", 90),
+        ("avg_ms", "Avg ms", 80), ("max_ms", "Max ms", 80), ("rows", "Rows", 80), ("slow", "Slow", 60),
+    ])
+    slow_tree = make_tree("Recent Slow", [
+        ("ms", "ms", 70), ("rows", "Rows", 60), ("screen", "Screen", 140),
+        ("caller", "Caller", 220), ("sql", "SQL", 560),
+    ])
+
+    def fill(tree, rows):
+        tree.delete(*tree.get_children())
+        keys = tree["columns"]
+        for row in rows:
+            tree.insert("", "end", values=[row.get(k, "") for k in keys])
+
+    def refresh():
+        fill(top_tree, query_trace.top_queries(limit=50))
+        fill(screen_tree, query_trace.screen_summary())
+        fill(slow_tree, query_trace.recent_queries(limit=100, slow_only=True))
+        status_var.set(f"Slow threshold: {query_trace.slow_threshold_ms():.0f} ms  •  "
+                       f"log: {query_trace.SLOW_LOG}")
+
+    def auto_refresh():
+        if win.winfo_exists():
+            refresh()
+            win.after(REFRESH_MS, auto_refresh)
+
+    def reset():
+        query_trace.reset()
+        refresh()
+
+    def export():
+        path = filedialog.asksaveasfilename(parent=win, defaultextension=".json",
+                                            initialfile="query_trace.json",
+                                            filetypes=[("JSON", "*.json")])
+        if path:
+            query_trace.export_json(path)
+            messagebox.showinfo("Exported", f"Query trace saved to {path}", parent=win)
+
+    ttk.Button(toolbar, text="Export JSON", command=export).pack(side="right")
+    ttk.Button(toolbar, text="Reset", command=reset).pack(side="right", padx=5)
+    ttk.Button(toolbar, text="Refresh", command=refresh).pack(side="right")
+
+    auto_refresh()
+    return win
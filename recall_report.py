@@ -1,11 +1,36 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkcalendar import DateEntry
-import sqlite3
+import database
+import reference_data
+import archive
 from datetime import datetime, timedelta, date
 import csv
 import patient_master
 
+# Base of the filtered recall list; run_filter appends the AND clauses and ORDER BY
+RECALLS_SQL = """
+    SELECT DISTINCT R.RecallID, R.RecallDate, R.RecallReason, R.Notes, R.Completed,
+           P.PatientID, P.FirstName, P.LastName, P.MRN
+    FROM {table} R
+    JOIN tblPatients P ON R.PatientID = P.PatientID
+    WHERE 1=1
+"""
+
+RECALL_PRIORITY_SQL = """
+    SELECT DysplasiaGrade FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1
+    ORDER BY PathologyDate DESC LIMIT 1
+"""
+
+BARRETT_STATUS_SQL = """
+    SELECT PathologyDate, DysplasiaGrade
+    FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1
+    ORDER BY PathologyDate DESC LIMIT 1
+"""
+
+
 class SuperchargedRecallReport:
     def __init__(self, parent_frame):
         self.parent_frame = parent_frame
@@ -60,8 +85,7 @@ class SuperchargedRecallReport:
         tk.Label(filter_row1, text="Reason:").pack(side="left")
         self.reason_var = tk.StringVar(value="All")
         reason_combo = ttk.Combobox(filter_row1, textvariable=self.reason_var,
-                                  values=["All", "Office Visit", "Endoscopy", "Barrett's Surveillance", 
-                                         "Surveillance Form", "Post-op Follow-up", "Other"],
+                                  values=["All"] + reference_data.options("recall_reason"),
                                   state="readonly", width=15)
         reason_combo.pack(side="left", padx=5)
 
@@ -88,6 +112,9 @@ class SuperchargedRecallReport:
         self.include_completed = tk.IntVar(value=0)
         tk.Checkbutton(filter_row2, text="Include completed", variable=self.include_completed).pack(side="left", padx=20)
 
+        self.include_archived = tk.IntVar(value=0)
+        tk.Checkbutton(filter_row2, text="Include archived", variable=self.include_archived).pack(side="left")
+
         self.barrett_only = tk.IntVar(value=0)
         tk.Checkbutton(filter_row2, text="Barrett's patients only", variable=self.barrett_only).pack(side="left", padx=20)
 
@@ -171,13 +198,9 @@ class SuperchargedRecallReport:
         has_barrett = False
         
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT DysplasiaGrade FROM tblPathology 
-                WHERE PatientID = ? AND Barretts = 1 
-                ORDER BY PathologyDate DESC LIMIT 1
-            """, (patient_id,))
+            cursor.execute(RECALL_PRIORITY_SQL, (patient_id,))
             result = cursor.fetchone()
             if result:
                 has_barrett = True
@@ -203,14 +226,9 @@ class SuperchargedRecallReport:
     def get_barrett_status(self, patient_id):
         """Get Barrett's status for patient"""
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT PathologyDate, DysplasiaGrade 
-                FROM tblPathology 
-                WHERE PatientID = ? AND Barretts = 1 
-                ORDER BY PathologyDate DESC LIMIT 1
-            """, (patient_id,))
+            cursor.execute(BARRETT_STATUS_SQL, (patient_id,))
             result = cursor.fetchone()
             conn.close()
             
@@ -312,14 +330,11 @@ class SuperchargedRecallReport:
         reason_filter = self.reason_var.get()
         priority_filter = self.priority_var.get()
 
+        # Archived recalls are all completed, so they only matter with completed included
+        use_archive = self.include_completed.get() and self.include_archived.get()
+
         # Build query
-        query = '''
-            SELECT DISTINCT R.RecallID, R.RecallDate, R.RecallReason, R.Notes, R.Completed,
-                   P.PatientID, P.FirstName, P.LastName, P.MRN
-            FROM tblRecall R
-            JOIN tblPatients P ON R.PatientID = P.PatientID
-            WHERE 1=1
-        '''
+        query = RECALLS_SQL.format(table="vwRecallAll" if use_archive else "tblRecall")
         params = []
 
         # Apply filters
@@ -349,7 +364,9 @@ class SuperchargedRecallReport:
 
         # Execute query
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
+            if use_archive:
+                archive.attach(conn)
             cursor = conn.cursor()
             cursor.execute(query, params)
             recalls = cursor.fetchall()
@@ -499,7 +516,7 @@ class SuperchargedRecallReport:
             return
 
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             
             for item in self.selected_recalls:
@@ -547,7 +564,7 @@ class SuperchargedRecallReport:
             try:
                 new_date = date_entry.get_date().strftime("%Y-%m-%d")
                 
-                conn = sqlite3.connect("gerd_center.db")
+                conn = database.connect()
                 cursor = conn.cursor()
                 
                 for item in self.selected_recalls:
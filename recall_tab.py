@@ -5,9 +5,33 @@ from tkinter import messagebox
 from tkinter import ttk
 from tkcalendar import DateEntry
 import sqlite3
+import database
+import reference_data
+import ui_profiler
+from record_list import RecordList
 from datetime import datetime, date, timedelta
 import re
 
+RECALL_PRIORITY_SQL = """
+    SELECT DysplasiaGrade FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1
+    ORDER BY PathologyDate DESC LIMIT 1
+"""
+
+RECALLS_SQL = """
+    SELECT RecallID, RecallDate, RecallReason, Notes, Completed
+    FROM tblRecall
+    WHERE PatientID = ?
+    ORDER BY
+        Completed ASC,
+        CASE
+            WHEN RecallDate IS NULL OR RecallDate = '' THEN 1
+            ELSE 0
+        END,
+        RecallDate ASC
+"""
+
+
 def get_recall_priority(reason, patient_id=None):
     """
     Determine recall priority based on reason and patient history
@@ -25,13 +49,9 @@ def get_recall_priority(reason, patient_id=None):
     
     if patient_id:
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT DysplasiaGrade FROM tblPathology 
-                WHERE PatientID = ? AND Barretts = 1 
-                ORDER BY PathologyDate DESC LIMIT 1
-            """, (patient_id,))
+            cursor.execute(RECALL_PRIORITY_SQL, (patient_id,))
             result = cursor.fetchone()
             if result:
                 has_barrett = True
@@ -190,6 +210,7 @@ def safe_database_operation(operation_name, operation_function):
         show_nice_error("Unexpected Problem", f"Something unexpected happened: {str(e)}")
         return False
 
+@ui_profiler.profiled("tab:recalls")
 def build(tab_frame, patient_id, tabs=None):
     """Build recall tab with clinical intelligence"""
     
@@ -197,143 +218,83 @@ def build(tab_frame, patient_id, tabs=None):
     for widget in tab_frame.winfo_children():
         widget.destroy()
 
+    recall_rows = {}
+
     def load_recalls():
         """Load recalls with priority and status analysis"""
-        for widget in list_frame.winfo_children():
-            widget.destroy()
-
         def get_recall_data():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT RecallID, RecallDate, RecallReason, Notes, Completed
-                FROM tblRecall
-                WHERE PatientID = ?
-                ORDER BY 
-                    Completed ASC,
-                    CASE 
-                        WHEN RecallDate IS NULL OR RecallDate = '' THEN 1
-                        ELSE 0
-                    END,
-                    RecallDate ASC
-            """, (patient_id,))
+            cursor.execute(RECALLS_SQL, (patient_id,))
             results = cursor.fetchall()
             conn.close()
             return results
 
         rows = safe_database_operation("Load recalls", get_recall_data) or []
+        ui_profiler.note(rows=len(rows))
+
+        # Priority only depends on the reason (plus this patient's history), so look it up once per reason
+        priorities = {}
+        recall_rows.clear()
+        list_rows = []
+        for recall_id, recall_date, reason, notes, completed in rows:
+            if reason not in priorities:
+                priorities[reason] = get_recall_priority(reason, patient_id)
+            priority_level, priority_text = priorities[reason]
+            overdue_level, overdue_text = get_overdue_severity(recall_date, reason)
+            notes = notes or ""
+
+            # Determine colors
+            if completed:
+                tag = "completed"
+            elif overdue_level >= 3:
+                tag = "urgent"  # Urgent overdue
+            elif overdue_level >= 2:
+                tag = "attention"  # Needs attention
+            elif overdue_level >= 1:
+                tag = "soon"  # Schedule soon
+            elif priority_level <= 2:
+                tag = "high"  # High priority
+            else:
+                tag = "normal"
 
-        # Create header
-        header_frame = tk.Frame(list_frame, bg="lightgray", relief="raised", bd=1)
-        header_frame.pack(fill="x", pady=(0, 2))
-        
-        tk.Label(header_frame, text="Priority", width=8, font=("Arial", 9, "bold"), bg="lightgray").pack(side="left", padx=2)
-        tk.Label(header_frame, text="Date", width=12, font=("Arial", 9, "bold"), bg="lightgray").pack(side="left", padx=2)
-        tk.Label(header_frame, text="Reason", width=15, font=("Arial", 9, "bold"), bg="lightgray").pack(side="left", padx=2)
-        tk.Label(header_frame, text="Status", width=20, font=("Arial", 9, "bold"), bg="lightgray").pack(side="left", padx=2)
-        tk.Label(header_frame, text="Notes", width=25, font=("Arial", 9, "bold"), bg="lightgray").pack(side="left", padx=2)
-        tk.Label(header_frame, text="Actions", width=15, font=("Arial", 9, "bold"), bg="lightgray").pack(side="left", padx=2)
-
-        for row in rows:
-            add_recall_row(*row)
-
-    def add_recall_row(recall_id, date, reason, notes, completed):
-        """Add a recall row with priority and status indicators"""
-        row = tk.Frame(list_frame, bd=1, relief="solid", padx=2, pady=2)
-        row.pack(fill="x", pady=1)
-
-        # Get priority and overdue status
-        priority_level, priority_text = get_recall_priority(reason, patient_id)
-        overdue_level, overdue_text = get_overdue_severity(date, reason)
-
-        # Determine colors
-        if completed:
-            color = "gray"
-            bg_color = "#f0f0f0"
-        elif overdue_level >= 3:
-            color = "white"
-            bg_color = "red"  # Urgent overdue
-        elif overdue_level >= 2:
-            color = "black"
-            bg_color = "orange"  # Needs attention
-        elif overdue_level >= 1:
-            color = "black"
-            bg_color = "yellow"  # Schedule soon
-        elif priority_level <= 2:
-            color = "black"
-            bg_color = "lightblue"  # High priority
-        else:
-            color = "black"
-            bg_color = "white"  # Normal
-
-        row.config(bg=bg_color)
-
-        # Priority indicator
-        priority_text_short = {1: "CRIT", 2: "HIGH", 3: "MED", 4: "LOW"}[priority_level]
-        lbl_priority = tk.Label(row, text=priority_text_short, width=8, anchor="w", 
-                               fg=color, bg=bg_color, font=("Arial", 8, "bold"))
-        lbl_priority.pack(side="left", padx=2)
-
-        # Date
-        lbl_date = tk.Label(row, text=f"{date}", width=12, anchor="w", 
-                           fg=color, bg=bg_color, font=("Arial", 9))
-        lbl_date.pack(side="left", padx=2)
-
-        # Reason
-        lbl_reason = tk.Label(row, text=reason, width=15, anchor="w", 
-                             fg=color, bg=bg_color, font=("Arial", 9))
-        lbl_reason.pack(side="left", padx=2)
-
-        # Status
-        if completed:
-            status_text = "✓ Completed"
-        else:
-            status_text = overdue_text
-        
-        lbl_status = tk.Label(row, text=status_text, width=20, anchor="w", 
-                             fg=color, bg=bg_color, font=("Arial", 8))
-        lbl_status.pack(side="left", padx=2)
-
-        # Notes (truncated)
-        notes_short = (notes[:35] + "...") if len(notes) > 35 else notes
-        lbl_notes = tk.Label(row, text=notes_short, width=25, anchor="w", 
-                            fg=color, bg=bg_color, font=("Arial", 8))
-        lbl_notes.pack(side="left", padx=2)
-
-        # Actions
-        action_frame = tk.Frame(row, bg=bg_color)
-        action_frame.pack(side="left", padx=2)
-
-        # Complete/Uncomplete toggle
-        var = tk.IntVar(value=completed)
-        cb = tk.Checkbutton(action_frame, variable=var, bg=bg_color,
-                           command=lambda: toggle_complete(recall_id, var, row))
-        cb.pack(side="left")
-
-        # Delete button
-        tk.Button(action_frame, text="Del", command=lambda: delete_recall(recall_id), 
-                 font=("Arial", 7), bg=bg_color).pack(side="left", padx=2)
-
-        # Click to see full details
-        def show_details():
-            detail_msg = f"Recall Details:\n\n"
-            detail_msg += f"Date: {date}\n"
-            detail_msg += f"Reason: {reason}\n"
-            detail_msg += f"Priority: {priority_text}\n"
-            detail_msg += f"Status: {status_text}\n"
-            detail_msg += f"Notes: {notes}\n"
-            show_nice_info("Recall Details", detail_msg)
-
-        for widget in [lbl_date, lbl_reason, lbl_notes]:
-            widget.bind("<Double-Button-1>", lambda e: show_details())
-
-    def toggle_complete(recall_id, var, row_widget):
+            status_text = "✓ Completed" if completed else f"☐ {overdue_text}"
+            notes_short = (notes[:35] + "...") if len(notes) > 35 else notes
+            priority_text_short = {1: "CRIT", 2: "HIGH", 3: "MED", 4: "LOW"}[priority_level]
+
+            recall_rows[recall_id] = {
+                "date": recall_date, "reason": reason, "notes": notes, "completed": completed,
+                "priority": priority_text, "status": status_text,
+            }
+            list_rows.append((recall_id, (priority_text_short, recall_date, reason, status_text, notes_short),
+                              (tag,)))
+
+        records.set_rows(list_rows)
+
+    def show_details(recall_id):
+        """Show the full recall record"""
+        recall = recall_rows.get(recall_id)
+        if not recall:
+            return
+        detail_msg = f"Recall Details:\n\n"
+        detail_msg += f"Date: {recall['date']}\n"
+        detail_msg += f"Reason: {recall['reason']}\n"
+        detail_msg += f"Priority: {recall['priority']}\n"
+        detail_msg += f"Status: {recall['status']}\n"
+        detail_msg += f"Notes: {recall['notes']}\n"
+        show_nice_info("Recall Details", detail_msg)
+
+    def toggle_complete(recall_id):
         """Toggle recall completion status"""
+        recall = recall_rows.get(recall_id)
+        if not recall:
+            return
+
         def do_toggle():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("UPDATE tblRecall SET Completed = ? WHERE RecallID = ?", 
-                          (var.get(), recall_id))
+                          (0 if recall["completed"] else 1, recall_id))
             conn.commit()
             conn.close()
             return True
@@ -341,6 +302,7 @@ def build(tab_frame, patient_id, tabs=None):
         success = safe_database_operation("Update recall status", do_toggle)
         if success:
             load_recalls()  # Refresh display
+            records.select(recall_id)
 
     def delete_recall(recall_id):
         """Delete recall with confirmation"""
@@ -348,7 +310,7 @@ def build(tab_frame, patient_id, tabs=None):
             return
         
         def do_delete():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM tblRecall WHERE RecallID = ?", (recall_id,))
             conn.commit()
@@ -395,7 +357,7 @@ def build(tab_frame, patient_id, tabs=None):
                 return
 
         def do_save():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO tblRecall (PatientID, RecallDate, RecallReason, Notes, Completed)
@@ -432,7 +394,7 @@ def build(tab_frame, patient_id, tabs=None):
     # Quick stats
     def get_recall_stats():
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT 
@@ -464,8 +426,7 @@ def build(tab_frame, patient_id, tabs=None):
     # Reason with smart suggestions
     tk.Label(entry_frame, text="Reason:", font=("Arial", 10)).grid(row=1, column=0, sticky="w", pady=2)
     cbo_reason = ttk.Combobox(entry_frame, 
-                             values=["Office Visit", "Endoscopy", "Barrett's Surveillance", 
-                                   "Surveillance Form", "Post-op Follow-up", "Lab Review", "Other"], 
+                             values=reference_data.options("recall_reason"), 
                              width=25)
     cbo_reason.grid(row=1, column=1, padx=5, pady=2, sticky="w")
     cbo_reason.bind("<<ComboboxSelected>>", on_reason_change)
@@ -504,7 +465,30 @@ def build(tab_frame, patient_id, tabs=None):
     # Recalls list
     tk.Label(tab_frame, text="📋 Current Recalls", font=("Arial", 11, "bold")).pack(anchor="w", padx=10, pady=(15, 5))
     
-    list_frame = tk.Frame(tab_frame)
-    list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+    records = RecordList(
+        tab_frame,
+        columns=[("priority", "Priority", 70), ("date", "Date", 100), ("reason", "Reason", 170),
+                 ("status", "Status", 220), ("notes", "Notes", 260)],
+        actions=[
+            ("Details", show_details),
+            ("Mark Complete / Reopen", toggle_complete),
+            None,
+            ("Delete", lambda r: delete_recall(r)),
+        ],
+        on_open=show_details,
+        on_delete=lambda r: delete_recall(r),
+        on_toggle=toggle_complete,
+        toggle_column="status",
+        empty_text="No recalls scheduled",
+    )
+    records.pack(fill="both", expand=True, padx=10, pady=5)
+    records.tag_configure("urgent", background="red", foreground="white")
+    records.tag_configure("attention", background="orange", foreground="black")
+    records.tag_configure("soon", background="yellow", foreground="black")
+    records.tag_configure("high", background="lightblue", foreground="black")
+    records.tag_configure("completed", background="#f0f0f0", foreground="gray")
+    tk.Label(tab_frame, text="Double-click a recall for details • double-click its status or press Space "
+                             "to complete/reopen • right-click for more",
+             font=("Arial", 8), fg="gray").pack(anchor="w", padx=10)
 
     load_recalls()
\ No newline at end of file
@@ -0,0 +1,156 @@
+# record_list.py - Treeview-based history list shared by the per-patient tabs
+
+import tkinter as tk
+from tkinter import ttk
+from scrollable_frame import ScrollableFrame
+
+
+class RecordList(ttk.Frame):
+    """History list backed by a ttk.Treeview.
+
+    Rows are Treeview items rather than widgets, so hundreds of entries cost
+    almost nothing to load. Row actions live in a right-click menu (and on
+    Enter/Delete), and the detail pane below the list is only created when a
+    record is opened.
+
+    columns: list of (key, heading, width)
+    actions: list of (label, callback) - callback receives the record id;
+             None inserts a separator
+    on_open: callback(record_id) for double-click / Enter
+    on_delete: callback(record_id) for the Delete key
+    on_toggle: callback(record_id) for the space bar, and for a double-click
+               in toggle_column - a one-step on/off such as completing a recall
+    """
+
+    def __init__(self, parent, columns, actions=None, on_open=None, on_delete=None,
+                 height=10, empty_text="No records found", on_toggle=None, toggle_column=None,
+                 *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+
+        self.columns = columns
+        self.actions = actions or []
+        self.on_open = on_open
+        self.on_delete = on_delete
+        self.on_toggle = on_toggle
+        self.toggle_column = toggle_column
+        self.detail = None
+        self.detail_visible = False
+
+        self.paned = ttk.PanedWindow(self, orient="vertical")
+        self.paned.pack(fill="both", expand=True)
+
+        list_frame = ttk.Frame(self.paned)
+        self.tree = ttk.Treeview(list_frame, columns=[c[0] for c in columns],
+                                 show="headings", height=height, selectmode="browse")
+        for key, heading, width in columns:
+            self.tree.heading(key, text=heading, anchor="w")
+            self.tree.column(key, width=width, minwidth=60, anchor="w", stretch=True)
+
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.paned.add(list_frame, weight=1)
+
+        self.empty_label = tk.Label(list_frame, text=empty_text, fg="gray",
+                                    font=("Arial", 10, "italic"), bg="white")
+
+        self.menu = tk.Menu(self, tearoff=0)
+        for action in self.actions:
+            if action is None:
+                self.menu.add_separator()
+            else:
+                label, callback = action
+                self.menu.add_command(label=label, command=lambda c=callback: self._run_action(c))
+
+        self.tree.bind("<Double-Button-1>", self._on_double_click)
+        self.tree.bind("<Return>", lambda e: self._run_action(self.on_open))
+        self.tree.bind("<Delete>", lambda e: self._run_action(self.on_delete))
+        self.tree.bind("<space>", lambda e: self._run_action(self.on_toggle))
+        # Button-3 on Windows/Linux, Button-2 on macOS
+        self.tree.bind("<Button-3>", self._show_menu)
+        self.tree.bind("<Button-2>", self._show_menu)
+
+    def tag_configure(self, tag, **options):
+        self.tree.tag_configure(tag, **options)
+
+    def set_rows(self, rows):
+        """Replace the list contents.
+
+        rows: iterable of (record_id, values) or (record_id, values, tags)
+        """
+        self.tree.delete(*self.tree.get_children())
+        count = 0
+        for row in rows:
+            record_id, values = row[0], row[1]
+            tags = row[2] if len(row) > 2 else ()
+            self.tree.insert("", "end", iid=str(record_id), values=values, tags=tags)
+            count += 1
+
+        if count:
+            self.empty_label.place_forget()
+        else:
+            self.empty_label.place(relx=0.5, rely=0.5, anchor="center")
+        return count
+
+    def selected_id(self):
+        selection = self.tree.selection()
+        return int(selection[0]) if selection else None
+
+    def select(self, record_id):
+        iid = str(record_id)
+        if self.tree.exists(iid):
+            self.tree.selection_set(iid)
+            self.tree.see(iid)
+
+    def _run_action(self, callback):
+        record_id = self.selected_id()
+        if callback and record_id is not None:
+            callback(record_id)
+
+    def _on_double_click(self, event):
+        if not self.tree.identify_row(event.y):
+            return
+        keys = [c[0] for c in self.columns]
+        if (self.on_toggle and self.toggle_column in keys
+                and self.tree.identify_column(event.x) == f"#{keys.index(self.toggle_column) + 1}"):
+            self._run_action(self.on_toggle)
+        else:
+            self._run_action(self.on_open)
+
+    def _show_menu(self, event):
+        row = self.tree.identify_row(event.y)
+        if not row or not self.actions:
+            return
+        self.tree.selection_set(row)
+        self.tree.focus(row)
+        try:
+            self.menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            self.menu.grab_release()
+
+    def show_detail(self, title, **options):
+        """Clear the detail pane (creating it on first use) and return a fresh LabelFrame"""
+        if self.detail is None:
+            self.detail = ScrollableFrame(self.paned, fit_width=True)
+        if not self.detail_visible:
+            self.paned.add(self.detail, weight=2)
+            self.detail_visible = True
+
+        self.detail.clear_children()
+        self.detail.canvas.yview_moveto(0)
+
+        options.setdefault("padx", 10)
+        options.setdefault("pady", 10)
+        index = self.detail.add_child(lambda parent: tk.LabelFrame(parent, text=title, **options),
+                                      height_hint=300, padx=10, pady=10)
+        return self.detail.child(index)
+
+    def clear_detail(self):
+        """Destroy the open detail pane contents and hide the pane"""
+        if self.detail is None:
+            return
+        self.detail.clear_children()
+        if self.detail_visible:
+            self.paned.forget(self.detail)
+            self.detail_visible = False
@@ -0,0 +1,100 @@
+# reference_data.py - Shared picklists (surgeons, grades, recall reasons) for both apps
+#
+# Lists live in tblReferenceData and surgeons in tblSurgeons. Both are cached
+# in-process; triggers bump tblReferenceVersion on every change (see schema.py)
+# and the cache reloads only when that number moves. The version itself is
+# re-read at most every CHECK_INTERVAL seconds, so opening a form normally
+# costs no database round trip at all.
+
+import time
+import threading
+
+import database
+
+CHECK_INTERVAL = 30
+
+# Seeded into tblReferenceData the first time the table is created.
+# Order here is the display order.
+DEFAULTS = {
+    "gender": ["Male", "Female", "Other"],
+    "referral_source": ["Self", "Physician", "Patient", "Other"],
+    "esophagitis_grade": ["None", "LA A", "LA B", "LA C", "LA D"],
+    "hiatal_hernia_size": ["None", "1 cm", "2 cm", "3 cm", "4 cm", "5 cm", "6 cm", ">6 cm"],
+    "dysplasia_grade": ["NGIM", "No Dysplasia", "Indeterminate", "Low Grade", "High Grade"],
+    "recall_reason": ["Office Visit", "Endoscopy", "Barrett's Surveillance", "Surveillance Form",
+                      "Post-op Follow-up", "Lab Review", "Other"],
+}
+
+_lock = threading.Lock()
+_lists = {}
+_surgeons = []
+_version = None
+_checked_at = 0.0
+
+
+VERSION_SQL = "SELECT Version FROM tblReferenceVersion WHERE ID = 1"
+
+SURGEONS_SQL = "SELECT DISTINCT SurgeonName FROM tblSurgeons ORDER BY SurgeonName"
+
+
+def _read_version(conn):
+    row = conn.execute(VERSION_SQL).fetchone()
+    return row[0] if row else 0
+
+
+def _load(conn):
+    """Read every list in two queries"""
+    lists = {}
+    for category, value in conn.execute("""
+        SELECT Category, Value FROM tblReferenceData
+        WHERE Active = 1
+        ORDER BY Category, SortOrder, Value
+    """):
+        lists.setdefault(category, []).append(value)
+    surgeons = [row[0] for row in conn.execute(SURGEONS_SQL)]
+    return lists, surgeons
+
+
+def _refresh():
+    """Reload the cache if the stored version moved since the last check"""
+    global _lists, _surgeons, _version, _checked_at
+    now = time.monotonic()
+    if _version is not None and now - _checked_at < CHECK_INTERVAL:
+        return
+    with _lock:
+        if _version is not None and now - _checked_at < CHECK_INTERVAL:
+            return
+        try:
+            conn = database.connect()
+            try:
+                version = _read_version(conn)
+                if version != _version:
+                    _lists, _surgeons = _load(conn)
+                    _version = version
+            finally:
+                conn.close()
+        except Exception:
+            # No database (or an old read-only one) - fall back to the built-in lists
+            if _version is None:
+                _lists, _surgeons = {}, []
+                _version = -1
+        _checked_at = now
+
+
+def invalidate():
+    """Force the next lookup to re-check the version (call after editing lists in this process)"""
+    global _checked_at
+    _checked_at = 0.0
+
+
+def options(category, blank=False):
+    """Values for one picklist; blank=True adds a leading "" for not set"""
+    _refresh()
+    values = list(_lists.get(category) or DEFAULTS.get(category, []))
+    return [""] + values if blank else values
+
+
+def surgeons(blank=False):
+    """Surgeon names from tblSurgeons"""
+    _refresh()
+    return [""] + _surgeons if blank else list(_surgeons)
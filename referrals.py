@@ -0,0 +1,122 @@
+# referrals.py - New consults by ZIP3 region, referral source and month
+#
+# tblReferralRollup counts patients per (consult month, referral source,
+# first three digits of the ZIP code). Triggers on tblPatients move a patient
+# between cells when they are added, deleted or their ZIP, source or consult
+# date is edited, so referral trends are read from a few thousand rollup rows
+# rather than a scan of every patient:
+#
+#     referrals.counts(conn, ["Month", "Source"], since="2024-01")
+#     referrals.counts(conn, ["Zip3"], sources=["Physician"])
+#
+# Patients without a consult date aren't counted; a missing or malformed ZIP
+# or source is counted under ''.
+
+import database
+
+ZIP3_SQL = """CASE WHEN substr(trim({row}.ZipCode), 1, 3) GLOB '[0-9][0-9][0-9]'
+                   THEN substr(trim({row}.ZipCode), 1, 3) ELSE '' END"""
+SOURCE_SQL = "COALESCE(trim({row}.ReferralSource), '')"
+MONTH_SQL = "substr({row}.InitialConsultDate, 1, 7)"
+ROLLUP_COLUMNS = ["ZipCode", "ReferralSource", "InitialConsultDate"]
+
+DIMENSIONS = {
+    "Zip3": "COALESCE(NULLIF(R.Zip3, ''), 'Unknown')",
+    "Source": "COALESCE(NULLIF(R.Source, ''), 'Unknown')",
+    "Month": "R.Month",
+    "Quarter": "substr(R.Month, 1, 4) || '-Q' || ((CAST(substr(R.Month, 6, 2) AS INTEGER) + 2) / 3)",
+    "Year": "substr(R.Month, 1, 4)",
+}
+
+
+def _count(row, delta):
+    """Statements adding delta consults to row's (NEW/OLD) cell"""
+    cell = f"{ZIP3_SQL.format(row=row)}, {SOURCE_SQL.format(row=row)}, {MONTH_SQL.format(row=row)}"
+    sql = f"""
+        INSERT INTO tblReferralRollup (Zip3, Source, Month, Consults)
+        VALUES ({cell}, {delta})
+        ON CONFLICT(Month, Source, Zip3) DO UPDATE SET Consults = Consults + ({delta});"""
+    if delta < 0:
+        sql += f"""
+        DELETE FROM tblReferralRollup
+        WHERE (Zip3, Source, Month) = ({cell}) AND Consults <= 0;"""
+    return sql
+
+
+def rollup_triggers():
+    """Triggers keeping tblReferralRollup in step with tblPatients"""
+    dated = "WHEN length({row}.InitialConsultDate) >= 7"
+    columns = ", ".join(ROLLUP_COLUMNS)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_referral_rollup_insert AFTER INSERT ON tblPatients
+            {dated.format(row="NEW")}
+            BEGIN {_count("NEW", 1)} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_referral_rollup_delete AFTER DELETE ON tblPatients
+            {dated.format(row="OLD")}
+            BEGIN {_count("OLD", -1)} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_referral_rollup_update_old AFTER UPDATE OF {columns} ON tblPatients
+            {dated.format(row="OLD")}
+            BEGIN {_count("OLD", -1)} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_referral_rollup_update_new AFTER UPDATE OF {columns} ON tblPatients
+            {dated.format(row="NEW")}
+            BEGIN {_count("NEW", 1)} END""",
+    ]
+
+
+def rebuild(conn):
+    """Recount the rollup from tblPatients; caller commits"""
+    conn.execute("DELETE FROM tblReferralRollup")
+    conn.execute(f"""
+        INSERT INTO tblReferralRollup (Zip3, Source, Month, Consults)
+        SELECT {ZIP3_SQL.format(row="P")}, {SOURCE_SQL.format(row="P")}, {MONTH_SQL.format(row="P")}, COUNT(*)
+        FROM tblPatients P
+        WHERE length(P.InitialConsultDate) >= 7
+        GROUP BY 1, 2, 3
+    """)
+
+
+def counts(conn, dimensions, sources=None, zip3s=None, since=None, until=None):
+    """[database.Record] with the dimension columns and Consults.
+
+    sources and zip3s filter on the stored values ('' for unknown);
+    since/until are "YYYY-MM" months, inclusive.
+    """
+    for dimension in dimensions:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+    clauses, params = ["1=1"], []
+    if sources:
+        clauses.append(f"R.Source IN ({', '.join('?' * len(sources))})")
+        params.extend(sources)
+    if zip3s:
+        clauses.append(f"R.Zip3 IN ({', '.join('?' * len(zip3s))})")
+        params.extend(zip3s)
+    if since:
+        clauses.append("R.Month >= ?")
+        params.append(since)
+    if until:
+        clauses.append("R.Month <= ?")
+        params.append(until)
+    select = ", ".join(f"{DIMENSIONS[dimension]} AS {dimension}" for dimension in dimensions)
+    group = ", ".join(str(i + 1) for i in range(len(dimensions)))
+    sql = f"""
+        SELECT {select}{", " if select else ""}SUM(R.Consults) AS Consults
+        FROM tblReferralRollup R
+        WHERE {" AND ".join(clauses)}
+        {f"GROUP BY {group} ORDER BY {group}" if group else ""}
+    """
+    return database.fetch_records(conn.execute(sql, params))
+
+
+def values(conn, column):
+    """Distinct stored Zip3 or Source values, most consults first"""
+    if column not in ("Zip3", "Source"):
+        raise ValueError(f"Unknown column: {column}")
+    return [row[0] for row in conn.execute(f"""
+        SELECT {column} FROM tblReferralRollup GROUP BY {column} ORDER BY SUM(Consults) DESC
+    """)]
+
+
+def month_range(conn):
+    """(first, last) consult month in the rollup, or (None, None)"""
+    return conn.execute("SELECT MIN(Month), MAX(Month) FROM tblReferralRollup").fetchone()
@@ -0,0 +1,385 @@
+# schema.py - Idempotent schema upgrades applied the first time a database is opened
+#
+# Every statement here is safe to re-run (IF NOT EXISTS), so older databases
+# pick up new tables, indexes and triggers without a separate migration step.
+# IF NOT EXISTS never replaces a trigger, so changed trigger bodies are
+# recreated behind TRIGGER_VERSION (PRAGMA user_version), and one-off
+# backfills are recorded in tblSchemaBackfills.
+
+import re
+
+import measurements
+import procedures
+
+# Bump whenever a trigger body changes; ensure_schema then drops and recreates them all
+TRIGGER_VERSION = 1
+
+# Clinical tables whose changes count as patient activity, with their key column
+ACTIVITY_TABLES = [
+    ("tblPatients", "PatientID"),
+    ("tblDiagnostics", "DiagnosticID"),
+    ("tblSurgicalHistory", "SurgeryID"),
+    ("tblPathology", "PathologyID"),
+    ("tblRecall", "RecallID"),
+    ("tblSurveillance", "SurveillanceID"),
+]
+
+ACTIVITY_TIME = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+
+
+def activity_triggers():
+    """Triggers appending to tblActivityLog and bumping tblPatientActivity"""
+    statements = []
+    for table, key in ACTIVITY_TABLES:
+        for action, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+            if table == "tblPatients" and action == "delete":
+                touch = "DELETE FROM tblPatientActivity WHERE PatientID = OLD.PatientID;"
+            else:
+                touch = f"""INSERT INTO tblPatientActivity (PatientID, LastActivity, LastTable)
+                    VALUES ({row}.PatientID, {ACTIVITY_TIME}, '{table}')
+                    ON CONFLICT(PatientID) DO UPDATE SET
+                        LastActivity = excluded.LastActivity, LastTable = excluded.LastTable;"""
+            statements.append(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_activity_{table}_{action}
+                AFTER {action.upper()} ON {table}
+                WHEN {row}.PatientID IS NOT NULL
+                BEGIN
+                    INSERT INTO tblActivityLog (PatientID, TableName, RecordID, Action, ActivityTime)
+                    VALUES ({row}.PatientID, '{table}', {row}.{key}, '{action}', {ACTIVITY_TIME});
+                    {touch}
+                END
+            """)
+    return statements
+
+
+# Tables whose changes invalidate the reference_data cache
+REFERENCE_TABLES = ["tblReferenceData", "tblSurgeons"]
+
+
+def reference_version_triggers():
+    """Triggers bumping tblReferenceVersion whenever a picklist changes"""
+    return [f"""
+        CREATE TRIGGER IF NOT EXISTS trg_refversion_{table}_{action}
+        AFTER {action.upper()} ON {table}
+        BEGIN
+            UPDATE tblReferenceVersion SET Version = Version + 1 WHERE ID = 1;
+        END
+    """ for table in REFERENCE_TABLES for action in ("insert", "update", "delete")]
+
+
+def barrett_segment_triggers():
+    """Drop a diagnostic's parsed segment when what it was parsed from changes;
+    barrett_length.extract_pending() parses it again"""
+    return [f"""
+        CREATE TRIGGER IF NOT EXISTS trg_barrett_segments_{action}
+        AFTER {event} ON tblDiagnostics
+        BEGIN
+            DELETE FROM tblBarrettSegments WHERE DiagnosticID = OLD.DiagnosticID;
+        END
+    """ for action, event in (("update", "UPDATE OF PatientID, TestDate, Endoscopy, EndoscopyFindings"),
+                              ("delete", "DELETE"))]
+
+
+# Columns added to existing tables: (table, column, declaration)
+COLUMN_UPGRADES = [
+    ("tblActivityLog", "Session", "TEXT"),
+    # Procedure flags as one bitmask (see procedures.py); VIRTUAL, so adding it rewrites nothing
+    ("tblSurgicalHistory", "ProcedureMask",
+     f"INTEGER GENERATED ALWAYS AS ({procedures.mask_expression()}) VIRTUAL"),
+    # Numeric values parsed from the physiology and risk text fields (see measurements.py)
+] + measurements.column_upgrades()
+
+# Indexes on COLUMN_UPGRADES columns, created once the columns exist
+COLUMN_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_surgical_procedures ON tblSurgicalHistory(ProcedureMask, SurgeryDate)",
+] + measurements.column_indexes()
+
+SCHEMA_UPGRADES = [
+    # Append-only log of every change to a patient's clinical records. It doubles
+    # as the change journal read by change_journal.py; Session is stamped by the
+    # connection that made the change (database.connect)
+    """
+    CREATE TABLE IF NOT EXISTS tblActivityLog (
+        ActivityID INTEGER PRIMARY KEY AUTOINCREMENT,
+        PatientID INTEGER NOT NULL,
+        TableName TEXT NOT NULL,
+        RecordID INTEGER,
+        Action TEXT NOT NULL,
+        ActivityTime TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_activity_time ON tblActivityLog(ActivityTime)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_patient_time ON tblActivityLog(PatientID, ActivityTime)",
+    # Per-section change marker for the Streamlit record caches (record_version)
+    "CREATE INDEX IF NOT EXISTS idx_activity_patient_table ON tblActivityLog(PatientID, TableName)",
+    # Lets change_journal.compact find superseded entries for the same row
+    "CREATE INDEX IF NOT EXISTS idx_activity_table_record ON tblActivityLog(TableName, RecordID)",
+    # Last change each journal consumer has processed
+    """
+    CREATE TABLE IF NOT EXISTS tblJournalCursors (
+        Consumer TEXT PRIMARY KEY,
+        LastActivityID INTEGER NOT NULL DEFAULT 0,
+        UpdatedAt TEXT
+    )
+    """,
+    # Workstation sync (see sync.py): settings and progress, cross-site row ids, conflicts
+    "CREATE TABLE IF NOT EXISTS tblSyncState (Key TEXT PRIMARY KEY, Value TEXT)",
+    """
+    CREATE TABLE IF NOT EXISTS tblSyncMap (
+        TableName TEXT NOT NULL,
+        OriginSite TEXT NOT NULL,
+        OriginID INTEGER NOT NULL,
+        LocalID INTEGER NOT NULL,
+        PRIMARY KEY (TableName, OriginSite, OriginID)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_syncmap_local ON tblSyncMap(TableName, LocalID)",
+    # Change time and site of the last version applied to each synced row
+    """
+    CREATE TABLE IF NOT EXISTS tblSyncVersions (
+        TableName TEXT NOT NULL,
+        LocalID INTEGER NOT NULL,
+        ChangedAt TEXT NOT NULL,
+        OriginSite TEXT NOT NULL,
+        PRIMARY KEY (TableName, LocalID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tblSyncConflicts (
+        ConflictID INTEGER PRIMARY KEY AUTOINCREMENT,
+        TableName TEXT NOT NULL,
+        LocalID INTEGER,
+        OriginSite TEXT,
+        OriginID INTEGER,
+        Kind TEXT NOT NULL,
+        LocalRow TEXT,
+        IncomingRow TEXT,
+        Resolution TEXT,
+        DetectedAt TEXT
+    )
+    """,
+    # Stored research cohorts (see cohort.py) and their members
+    """
+    CREATE TABLE IF NOT EXISTS tblCohorts (
+        CohortID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name TEXT,
+        DefinitionKey TEXT NOT NULL UNIQUE,
+        Definition TEXT NOT NULL,
+        JournalMark INTEGER,
+        PatientCount INTEGER,
+        BuiltAt TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tblCohortMembers (
+        CohortID INTEGER NOT NULL,
+        PatientID INTEGER NOT NULL,
+        PRIMARY KEY (CohortID, PatientID)
+    ) WITHOUT ROWID
+    """,
+    # Cohort criteria timed against a surgery join on this ("pre-op", "on follow-up")
+    "CREATE INDEX IF NOT EXISTS idx_surgical_patient_date ON tblSurgicalHistory(PatientID, SurgeryDate)",
+    # ...and the pathology and recall criteria read their PatientIDs (and dates) off these
+    "CREATE INDEX IF NOT EXISTS idx_pathology_patient_date ON tblPathology(PatientID, PathologyDate)",
+    "CREATE INDEX IF NOT EXISTS idx_recall_patient_date ON tblRecall(PatientID, RecallDate)",
+    # One row per patient with their latest activity - "recent patients" is a top-N walk of the index
+    """
+    CREATE TABLE IF NOT EXISTS tblPatientActivity (
+        PatientID INTEGER PRIMARY KEY,
+        LastActivity TEXT,
+        LastTable TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_patient_activity_time ON tblPatientActivity(LastActivity)",
+    # Shared picklists (see reference_data.py)
+    """
+    CREATE TABLE IF NOT EXISTS tblSurgeons (
+        SurgeonID INTEGER PRIMARY KEY AUTOINCREMENT,
+        SurgeonName TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tblReferenceData (
+        Category TEXT NOT NULL,
+        Value TEXT NOT NULL,
+        SortOrder INTEGER NOT NULL DEFAULT 0,
+        Active INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (Category, Value)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tblReferenceVersion (
+        ID INTEGER PRIMARY KEY CHECK (ID = 1),
+        Version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO tblReferenceVersion (ID, Version) VALUES (1, 0)",
+    # Barrett's segment length and Prague C/M parsed from EndoscopyFindings (see barrett_length.py)
+    """
+    CREATE TABLE IF NOT EXISTS tblBarrettSegments (
+        DiagnosticID INTEGER PRIMARY KEY,
+        PatientID INTEGER,
+        TestDate TEXT,
+        LengthCm REAL,
+        PragueC REAL,
+        PragueM REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_barrett_segments_patient ON tblBarrettSegments(PatientID, TestDate)",
+    "CREATE INDEX IF NOT EXISTS idx_barrett_segments_length ON tblBarrettSegments(LengthCm) WHERE LengthCm IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_diagnostics_patient_date ON tblDiagnostics(PatientID, TestDate)",
+    # Pre/post-op GERD-HRQL per surgery, refreshed from the change journal (see outcomes.py)
+    """
+    CREATE TABLE IF NOT EXISTS tblHRQLOutcomes (
+        SurgeryID INTEGER PRIMARY KEY,
+        PatientID INTEGER,
+        SurgeryDate TEXT,
+        Surgeon TEXT,
+        ProcedureGroup TEXT,
+        PreScore REAL,
+        PreDate TEXT,
+        PostScore REAL,
+        PostDate TEXT,
+        Improvement REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_hrql_outcomes_patient ON tblHRQLOutcomes(PatientID)",
+    "CREATE INDEX IF NOT EXISTS idx_recall_hrql ON tblRecall(PatientID, RecallDate) WHERE HRQLScore IS NOT NULL",
+    # Surgery counts per surgeon, month and procedure combination, kept by triggers (see surgery_cube.py)
+    """
+    CREATE TABLE IF NOT EXISTS tblSurgeryCube (
+        Surgeon TEXT NOT NULL,
+        Month TEXT NOT NULL,
+        ProcedureMask INTEGER NOT NULL,
+        Surgeries INTEGER NOT NULL,
+        PRIMARY KEY (Surgeon, Month, ProcedureMask)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_surgery_cube_month ON tblSurgeryCube(Month, Surgeon, ProcedureMask, Surgeries)",
+    # New consults per month, referral source and ZIP3, kept by triggers (see referrals.py)
+    """
+    CREATE TABLE IF NOT EXISTS tblReferralRollup (
+        Month TEXT NOT NULL,
+        Source TEXT NOT NULL,
+        Zip3 TEXT NOT NULL,
+        Consults INTEGER NOT NULL,
+        PRIMARY KEY (Month, Source, Zip3)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_referral_rollup_zip3 ON tblReferralRollup(Zip3, Month, Source, Consults)",
+    # Backfills that have finished on this database (see ensure_schema)
+    """
+    CREATE TABLE IF NOT EXISTS tblSchemaBackfills (
+        Name TEXT PRIMARY KEY,
+        CompletedAt TEXT NOT NULL
+    )
+    """,
+]
+
+
+def triggers():
+    """Every trigger, created after SCHEMA_UPGRADES.
+
+    surgery_cube and referrals import database (and so this module), so
+    their triggers are collected here rather than at import time.
+    """
+    import referrals
+    import surgery_cube
+    return (activity_triggers() + reference_version_triggers() + barrett_segment_triggers()
+            + surgery_cube.cube_triggers() + referrals.rollup_triggers())
+
+
+def upgrade_triggers(conn):
+    """Create missing triggers, and recreate them all when TRIGGER_VERSION has moved on"""
+    statements = triggers()
+    if conn.execute("PRAGMA user_version").fetchone()[0] < TRIGGER_VERSION:
+        for sql in statements:
+            name = re.search(r"CREATE TRIGGER IF NOT EXISTS (\w+)", sql).group(1)
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for sql in statements:
+        conn.execute(sql)
+    conn.execute(f"PRAGMA user_version = {TRIGGER_VERSION}")
+
+
+# The empty-table checks in the backfills below only matter for databases that
+# ran them before tblSchemaBackfills existed
+def backfill_patient_activity(conn):
+    """Seed tblPatientActivity from clinical dates the first time it is created"""
+    if conn.execute("SELECT 1 FROM tblPatientActivity LIMIT 1").fetchone():
+        return
+    conn.execute("""
+        INSERT INTO tblPatientActivity (PatientID, LastActivity, LastTable)
+        SELECT P.PatientID, MAX(A.ActivityDate), 'backfill'
+        FROM tblPatients P
+        JOIN (
+            SELECT PatientID, InitialConsultDate AS ActivityDate FROM tblPatients
+            UNION ALL SELECT PatientID, TestDate FROM tblDiagnostics
+            UNION ALL SELECT PatientID, SurgeryDate FROM tblSurgicalHistory
+            UNION ALL SELECT PatientID, PathologyDate FROM tblPathology
+        ) A ON A.PatientID = P.PatientID
+        GROUP BY P.PatientID
+    """)
+
+
+def seed_reference_data(conn):
+    """Fill tblReferenceData with the built-in picklists the first time it is created"""
+    if conn.execute("SELECT 1 FROM tblReferenceData LIMIT 1").fetchone():
+        return
+    import reference_data
+    conn.executemany(
+        "INSERT OR IGNORE INTO tblReferenceData (Category, Value, SortOrder) VALUES (?, ?, ?)",
+        [(category, value, order)
+         for category, values in reference_data.DEFAULTS.items()
+         for order, value in enumerate(values)])
+
+
+def backfill_barrett_segments(conn):
+    """Parse the endoscopies that have no tblBarrettSegments row yet"""
+    import barrett_length
+    barrett_length.extract_pending(conn)
+
+
+def backfill_surgery_cube(conn):
+    """Count the existing surgeries into tblSurgeryCube the first time it is created"""
+    if conn.execute("SELECT 1 FROM tblSurgeryCube LIMIT 1").fetchone():
+        return
+    import surgery_cube
+    surgery_cube.rebuild(conn)
+
+
+def backfill_referral_rollup(conn):
+    """Count the existing patients into tblReferralRollup the first time it is created"""
+    if conn.execute("SELECT 1 FROM tblReferralRollup LIMIT 1").fetchone():
+        return
+    import referrals
+    referrals.rebuild(conn)
+
+
+BACKFILLS = [backfill_patient_activity, seed_reference_data, backfill_barrett_segments, backfill_surgery_cube,
+             backfill_referral_rollup]
+
+
+def add_missing_columns(conn):
+    """ALTER TABLE ADD COLUMN has no IF NOT EXISTS, so check table_xinfo first
+    (table_info leaves out generated columns)"""
+    for table, column, declaration in COLUMN_UPGRADES:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def ensure_schema(conn):
+    """Apply all schema upgrades and any backfills not yet run to an open connection"""
+    for sql in SCHEMA_UPGRADES:
+        conn.execute(sql)
+    upgrade_triggers(conn)
+    add_missing_columns(conn)
+    for sql in COLUMN_INDEXES:
+        conn.execute(sql)
+    done = {row[0] for row in conn.execute("SELECT Name FROM tblSchemaBackfills")}
+    for backfill in BACKFILLS:
+        if backfill.__name__ not in done:
+            backfill(conn)
+            conn.execute("INSERT INTO tblSchemaBackfills (Name, CompletedAt) VALUES (?, datetime('now', 'localtime'))",
+                         (backfill.__name__,))
+    conn.commit()
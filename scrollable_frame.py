@@ -1,28 +1,160 @@
 import tkinter as tk
 from tkinter import ttk
 
+# How far outside the viewport (in pixels) lazy children are realized ahead of time
+REALIZE_MARGIN = 300
+
+
 class ScrollableFrame(ttk.Frame):
-    def __init__(self, container, *args, **kwargs):
+    """Canvas-backed scroll container.
+
+    Widgets packed/gridded into .scrollable_frame behave as before. Long content
+    can instead be added with add_child(factory, height_hint): each child gets
+    its own canvas window and is only built once it comes near the viewport.
+    Scrollregion updates are coalesced into one per idle cycle.
+    """
+
+    def __init__(self, container, *args, fit_width=False, **kwargs):
         super().__init__(container, *args, **kwargs)
 
+        self.fit_width = fit_width
         self.canvas = tk.Canvas(self, highlightthickness=0)
         self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
         self.scrollable_frame = ttk.Frame(self.canvas)
 
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self._frame_window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.canvas.configure(yscrollcommand=self._on_scroll)
 
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
 
+        # Lazy children: dicts with factory, height, widget and window id
+        self._children = []
+        self._layout_pending = None
+        self._last_view = None
+
         self.scrollable_frame.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<Configure>", self._on_configure)
+
+        # Route the mousewheel here only while the pointer is over the canvas
+        self.canvas.bind("<Enter>", self._bind_mousewheel)
+        self.canvas.bind("<Leave>", self._unbind_mousewheel)
+
+    def add_child(self, factory, height_hint=100, padx=0, pady=0):
+        """Queue a child below .scrollable_frame, built by factory(parent) when it nears the viewport"""
+        self._children.append({"factory": factory, "height": height_hint, "padx": padx, "pady": pady,
+                               "widget": None, "window": None})
+        self._schedule_layout()
+        return len(self._children) - 1
+
+    def child(self, index):
+        """Realize (if needed) and return a lazy child"""
+        entry = self._children[index]
+        if entry["widget"] is None:
+            self._realize(entry)
+            self._layout()
+        return entry["widget"]
+
+    def clear_children(self):
+        for entry in self._children:
+            if entry["widget"] is not None:
+                entry["widget"].destroy()
+        self._children = []
+        self.canvas.delete("lazy")
+        self._schedule_layout()
+
+    def _realize(self, entry):
+        widget = entry["factory"](self.canvas)
+        entry["widget"] = widget
+        entry["window"] = self.canvas.create_window((0, 0), window=widget, anchor="nw", tags=("lazy",))
+        # The height hint stands in until the widget's first <Configure> relays it out
+        widget.bind("<Configure>", self._on_configure, add="+")
 
-        # Bind mousewheel to canvas only when mouse is inside canvas area
-        self.canvas.bind("<Enter>", lambda e: self.canvas.bind("<MouseWheel>", self._on_mousewheel))
-        self.canvas.bind("<Leave>", lambda e: self.canvas.unbind("<MouseWheel>"))
+    def _schedule_layout(self):
+        if self._layout_pending is None:
+            self._layout_pending = self.after_idle(self._layout)
+
+    def _layout(self):
+        """Stack the lazy children under the inner frame and update the scrollregion"""
+        if self._layout_pending is not None:
+            self.after_cancel(self._layout_pending)
+            self._layout_pending = None
+        if not self.winfo_exists():
+            return
+
+        width = self.scrollable_frame.winfo_reqwidth()
+        if self.fit_width:
+            width = max(width, self.canvas.winfo_width())
+            self.canvas.itemconfigure(self._frame_window, width=width)
+
+        y = self.scrollable_frame.winfo_reqheight()
+        for entry in self._children:
+            if entry["widget"] is not None:
+                # Until Tk has measured a new widget its requested height is 1
+                if entry["widget"].winfo_reqheight() > 1:
+                    entry["height"] = entry["widget"].winfo_reqheight()
+                self.canvas.coords(entry["window"], entry["padx"], y + entry["pady"])
+                if self.fit_width:
+                    self.canvas.itemconfigure(entry["window"], width=max(width - 2 * entry["padx"], 1))
+                else:
+                    width = max(width, entry["widget"].winfo_reqwidth() + 2 * entry["padx"])
+            y += entry["height"] + 2 * entry["pady"]
+
+        self.canvas.configure(scrollregion=(0, 0, width, y))
+        self._realize_visible(y)
+
+    def _realize_visible(self, total_height):
+        """Build any pending children that are within REALIZE_MARGIN of the viewport"""
+        if not self._children:
+            return
+        first, last = self.canvas.yview()
+        top = first * total_height - REALIZE_MARGIN
+        bottom = max(last * total_height, self.canvas.winfo_height()) + REALIZE_MARGIN
+
+        y = self.scrollable_frame.winfo_reqheight()
+        realized = False
+        for entry in self._children:
+            if y > bottom:
+                break
+            if entry["widget"] is None and y + entry["height"] + 2 * entry["pady"] >= top:
+                self._realize(entry)
+                realized = True
+            y += entry["height"] + 2 * entry["pady"]
+
+        # Realized heights replace the hints, so lay out again
+        if realized:
+            self._schedule_layout()
 
     def _on_configure(self, event):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self._schedule_layout()
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Setting the scrollregion calls back here too, so only react to real movement
+        if (first, last) == self._last_view:
+            return
+        self._last_view = (first, last)
+        if any(entry["widget"] is None for entry in self._children):
+            self._schedule_layout()
+
+    def _bind_mousewheel(self, event):
+        self.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.bind_all("<Button-4>", self._on_mousewheel)
+        self.bind_all("<Button-5>", self._on_mousewheel)
+
+    def _unbind_mousewheel(self, event):
+        # Moving onto one of our own children also fires <Leave>
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is not None and (widget is self.canvas or str(widget).startswith(str(self.canvas) + ".")):
+            return
+        self.unbind_all("<MouseWheel>")
+        self.unbind_all("<Button-4>")
+        self.unbind_all("<Button-5>")
 
     def _on_mousewheel(self, event):
-        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        if event.num == 4:
+            self.canvas.yview_scroll(-1, "units")
+        elif event.num == 5:
+            self.canvas.yview_scroll(1, "units")
+        else:
+            self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
@@ -1,20 +1,237 @@
 import streamlit as st
-import sqlite3
+from streamlit.errors import StreamlitAPIException
+import database
+import reference_data
+import archive
+import barrett_length
+import cohort
+import outcomes
+import procedures
+import progression
+import query_trace
+import referrals
+import surgery_cube
 import pandas as pd
 from datetime import datetime, date, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import io
+import json
 import csv
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 import tempfile
 import os
 
+# plotly and reportlab are imported on first use (see plotly_express and
+# generate_patient_summary_pdf) - most reruns never draw a chart or a PDF
+
+# Page queries - query_benchmark.py reads these constants from this file to time them
+# {archived} is R.Archived when {table} is vwRecallAll, otherwise 0
+RECALLS_VIEW_SQL = """
+    SELECT R.RecallID, R.RecallDate, R.RecallReason, R.Notes, R.Completed, {archived} AS Archived,
+           P.FirstName, P.LastName, P.MRN, P.PatientID
+    FROM {table} R
+    JOIN tblPatients P ON R.PatientID = P.PatientID
+    WHERE {where}
+    ORDER BY R.RecallDate ASC
+"""
+
+RECALL_FILTER_SQL = {
+    "Overdue": "R.Completed = 0 AND R.RecallDate < date('now')",
+    "Due Today": "R.Completed = 0 AND R.RecallDate = date('now')",
+    "Due This Week": "R.Completed = 0 AND R.RecallDate BETWEEN date('now') AND date('now', '+7 days')",
+    "Completed": "R.Completed = 1",
+}
+
+HAS_BARRETTS_SQL = """
+    SELECT COUNT(*) as count FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1
+"""
+
+LATEST_BARRETTS_SQL = """
+    SELECT PathologyDate, DysplasiaGrade
+    FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1
+    ORDER BY PathologyDate DESC
+    LIMIT 1
+"""
+
+DIAGNOSTICS_SQL = """
+    SELECT DiagnosticID, TestDate, Surgeon, Endoscopy, Bravo, pHImpedance,
+           EndoFLIP, Manometry, GastricEmptying, Imaging, UpperGI,
+           EsophagitisGrade, HiatalHerniaSize, DeMeesterScore, EndoscopyFindings,
+           pHFindings, DiagnosticNotes
+    FROM tblDiagnostics
+    WHERE PatientID = ?
+    ORDER BY TestDate DESC
+"""
+
+SURGERIES_SQL = """
+    SELECT SurgeryID, SurgeryDate, SurgerySurgeon, Notes, ProcedureMask
+    FROM tblSurgicalHistory
+    WHERE PatientID = ?
+    ORDER BY SurgeryDate DESC
+"""
+
+PATHOLOGY_SQL = """
+    SELECT PathologyID, PathologyDate, Biopsy, WATS3D, EsoPredict, TissueCypher,
+           Barretts, DysplasiaGrade, EoE, EosinophilCount, Hpylori, AtrophicGastritis,
+           OtherFinding, EsoPredictRisk, TissueCypherRisk, Notes
+    FROM tblPathology
+    WHERE PatientID = ?
+    ORDER BY PathologyDate DESC
+"""
+
+SURVEILLANCE_SQL = """
+    SELECT SurveillanceID, NextBarrettsEGD, Undecided, LastModified
+    FROM tblSurveillance
+    WHERE PatientID = ?
+    ORDER BY LastModified DESC
+"""
+
+PATIENT_RECALLS_SQL = """
+    SELECT RecallID, RecallDate, RecallReason, Notes, Completed
+    FROM tblRecall
+    WHERE PatientID = ?
+    ORDER BY RecallDate ASC
+"""
+
+SEARCH_PATIENTS_SQL = """
+    SELECT PatientID, FirstName, LastName, MRN, DOB, Gender
+    FROM tblPatients
+    WHERE FirstName LIKE ? OR LastName LIKE ? OR MRN LIKE ?
+    ORDER BY LastName, FirstName
+"""
+
+DEFAULT_PATIENT_LIST_SQL = """
+    SELECT PatientID, FirstName, LastName, MRN, DOB, Gender
+    FROM tblPatients
+    ORDER BY LastName, FirstName
+    LIMIT 20
+"""
+
+PATIENT_HEADER_SQL = """
+    SELECT P.FirstName, P.LastName, P.MRN, P.DOB, P.Gender, P.BMI, P.ZipCode,
+           P.ReferralSource, P.ReferralDetails, A.LastActivity
+    FROM tblPatients P
+    LEFT JOIN tblPatientActivity A ON A.PatientID = P.PatientID
+    WHERE P.PatientID = ?
+"""
+
+DASH_TOTAL_PATIENTS_SQL = "SELECT COUNT(*) as count FROM tblPatients"
+
+DASH_BARRETTS_PATIENTS_SQL = "SELECT COUNT(DISTINCT PatientID) as count FROM tblPathology WHERE Barretts = 1"
+
+DASH_OVERDUE_RECALLS_SQL = "SELECT COUNT(*) as count FROM tblRecall WHERE Completed = 0 AND RecallDate < date('now')"
+
+DASH_HIGH_GRADE_SQL = "SELECT COUNT(DISTINCT PatientID) as count FROM tblPathology WHERE Barretts = 1 AND DysplasiaGrade LIKE '%High Grade%'"
+
+DASH_RECENT_SURGERIES_SQL = """
+    SELECT DATE(SurgeryDate) as date, COUNT(*) as count
+    FROM tblSurgicalHistory
+    WHERE SurgeryDate >= date('now', '-12 months')
+    GROUP BY DATE(SurgeryDate)
+    ORDER BY date
+"""
+
+DASH_SURVEILLANCE_STATUS_SQL = """
+    SELECT
+        CASE
+            WHEN Undecided = 1 THEN 'Undecided'
+            WHEN NextBarrettsEGD < date('now') THEN 'Overdue'
+            WHEN NextBarrettsEGD <= date('now', '+90 days') THEN 'Due Soon'
+            ELSE 'Future'
+        END as status,
+        COUNT(*) as count
+    FROM tblSurveillance
+    GROUP BY status
+"""
+
+EXPORT_ALL_PATIENTS_SQL = "SELECT * FROM tblPatients ORDER BY LastName, FirstName"
+
+EXPORT_BARRETTS_SQL = """
+    SELECT P.LastName, P.FirstName, P.MRN, Path.PathologyDate, Path.DysplasiaGrade,
+           S.NextBarrettsEGD, S.Undecided
+    FROM tblPatients P
+    JOIN tblPathology Path ON P.PatientID = Path.PatientID
+    LEFT JOIN tblSurveillance S ON P.PatientID = S.PatientID
+    WHERE Path.Barretts = 1
+    ORDER BY P.LastName, P.FirstName
+"""
+
+# {table} is vwRecallAll, so the export includes archived recalls
+EXPORT_RECALLS_SQL = """
+    SELECT P.LastName, P.FirstName, P.MRN, R.RecallDate, R.RecallReason,
+           R.Notes, R.Completed
+    FROM {table} R
+    JOIN tblPatients P ON R.PatientID = P.PatientID
+    ORDER BY R.RecallDate
+"""
+
+BARRETTS_VIEW_SQL = """
+    SELECT DISTINCT
+        P.PatientID, P.FirstName, P.LastName, P.MRN,
+        Path.PathologyDate, Path.DysplasiaGrade,
+        S.NextBarrettsEGD, S.Undecided
+    FROM tblPatients P
+    JOIN tblPathology Path ON P.PatientID = Path.PatientID
+    LEFT JOIN (
+        SELECT PatientID, NextBarrettsEGD, Undecided,
+               ROW_NUMBER() OVER (PARTITION BY PatientID ORDER BY LastModified DESC) as rn
+        FROM tblSurveillance
+    ) S ON P.PatientID = S.PatientID AND S.rn = 1
+    WHERE Path.Barretts = 1
+    ORDER BY P.LastName, P.FirstName
+"""
+
+HOME_NEW_PATIENTS_SQL = """
+    SELECT COUNT(*) as count
+    FROM tblPatients
+    WHERE InitialConsultDate >= date('now', '-30 days')
+"""
+
+HOME_RECENT_SURGERIES_SQL = """
+    SELECT COUNT(*) as count
+    FROM tblSurgicalHistory
+    WHERE SurgeryDate >= date('now', '-30 days')
+"""
+
+HOME_RECENT_PATHOLOGY_SQL = """
+    SELECT COUNT(*) as count
+    FROM tblPathology
+    WHERE PathologyDate >= date('now', '-30 days')
+"""
+
+HOME_HIGH_GRADE_OVERDUE_SQL = """
+    SELECT COUNT(DISTINCT P.PatientID) as count
+    FROM tblPatients P
+    JOIN tblPathology Path ON P.PatientID = Path.PatientID
+    LEFT JOIN tblSurveillance S ON P.PatientID = S.PatientID
+    WHERE Path.Barretts = 1
+    AND Path.DysplasiaGrade LIKE '%High Grade%'
+    AND (S.NextBarrettsEGD IS NULL OR S.NextBarrettsEGD < date('now'))
+"""
+
+HOME_OVERDUE_RECALLS_SQL = """
+    SELECT COUNT(*) as count
+    FROM tblRecall
+    WHERE Completed = 0 AND RecallDate <= date('now')
+"""
+
+HOME_RECENTLY_MODIFIED_SQL = """
+    SELECT P.PatientID, P.FirstName, P.LastName, P.MRN, A.LastActivity
+    FROM tblPatientActivity A
+    JOIN tblPatients P ON P.PatientID = A.PatientID
+    ORDER BY A.LastActivity DESC
+    LIMIT 10
+"""
+
+DB_STATS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM tblPatients) as patients,
+        (SELECT COUNT(*) FROM tblDiagnostics) as diagnostics,
+        (SELECT COUNT(*) FROM tblSurgicalHistory) as surgeries,
+        (SELECT COUNT(*) FROM tblPathology) as pathology
+"""
+
+
 # Configure page
 st.set_page_config(
     page_title="GERD Clinical Management System",
@@ -27,10 +244,15 @@ st.set_page_config(
 @st.cache_resource
 def get_database_connection():
     """Get database connection with caching"""
-    return sqlite3.connect("gerd_center.db", check_same_thread=False)
+    return database.connect(check_same_thread=False)
 
-def execute_query(query, params=None, fetch=True):
-    """Execute database query safely"""
+def execute_query(query, params=None, fetch=True, mode="frame"):
+    """Execute database query safely.
+
+    mode picks the shape of SELECT results: "frame" (DataFrame), "scalar"
+    (first value of the first row), "rows" (list of tuples) or "records"
+    (list of database.Record). Keep DataFrames for charts and exports.
+    """
     try:
         conn = get_database_connection()
         cursor = conn.cursor()
@@ -41,6 +263,13 @@ def execute_query(query, params=None, fetch=True):
         
         if fetch:
             if query.strip().upper().startswith("SELECT"):
+                if mode == "scalar":
+                    row = cursor.fetchone()
+                    return row[0] if row else None
+                if mode == "rows":
+                    return cursor.fetchall()
+                if mode == "records":
+                    return database.fetch_records(cursor)
                 columns = [description[0] for description in cursor.description]
                 data = cursor.fetchall()
                 return pd.DataFrame(data, columns=columns) if data else pd.DataFrame()
@@ -51,7 +280,11 @@ def execute_query(query, params=None, fetch=True):
             return True
     except Exception as e:
         st.error(f"Database error: {str(e)}")
-        return pd.DataFrame() if fetch else False
+        if not fetch:
+            return False
+        if mode == "frame":
+            return pd.DataFrame()
+        return None if mode == "scalar" else []
 
 # Initialize session state
 if 'selected_patient' not in st.session_state:
@@ -63,8 +296,11 @@ if 'edit_mode' not in st.session_state:
 if 'show_add_form' not in st.session_state:
     st.session_state.show_add_form = {}
 
+# Attribute this run's queries to the screen being shown (see query_trace)
+query_trace.set_screen("Patient record" if st.session_state.selected_patient else st.session_state.current_tab)
+
 # Custom CSS for better styling
-st.markdown("""
+APP_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #1e3a8a 0%, #3b82f6 100%);
@@ -99,7 +335,14 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+APP_HEADER = """
+<div class="main-header">
+    <h1>🏥 Minnesota Reflux & Heartburn Center</h1>
+    <p>Clinical Management System</p>
+</div>
+"""
 
 # Utility functions
 def validate_mrn(mrn):
@@ -115,9 +358,44 @@ def validate_date(date_obj, min_year=1900):
     return date_obj.year >= min_year and date_obj <= date.today()
 
 def get_surgeons():
-    """Get list of surgeons"""
-    surgeons_df = execute_query("SELECT DISTINCT SurgeonName FROM tblSurgeons ORDER BY SurgeonName")
-    return surgeons_df['SurgeonName'].tolist() if not surgeons_df.empty else []
+    """Get list of surgeons (cached by reference_data)"""
+    return reference_data.surgeons()
+
+def show_query_diagnostics():
+    """Hidden diagnostics page (?diagnostics=1) - worst queries from query_trace"""
+    st.header("🐢 Query Diagnostics")
+    if not query_trace.enabled():
+        st.warning(f"Tracing is off. Start Streamlit with {query_trace.TRACE_ENV}=1 to collect queries.")
+    
+    st.caption(f"Slow threshold: {query_trace.slow_threshold_ms():.0f} ms - rolling log in {query_trace.SLOW_LOG}")
+    
+    col1, col2 = st.columns([1, 5])
+    with col1:
+        if st.button("🔄 Reset"):
+            query_trace.reset()
+            st.rerun()
+    
+    st.subheader("Top offenders")
+    top = query_trace.top_queries(limit=50)
+    if top:
+        st.dataframe(pd.DataFrame(top)[["total_ms", "count", "avg_ms", "max_ms", "rows", "slow", "callers", "sql"]],
+                     use_container_width=True, hide_index=True)
+    else:
+        st.info("No queries recorded yet")
+    
+    st.subheader("Per screen")
+    screens = query_trace.screen_summary()
+    if screens:
+        st.dataframe(pd.DataFrame(screens)[["screen", "count", "total_ms", "avg_ms", "max_ms", "rows", "slow"]],
+                     use_container_width=True, hide_index=True)
+    
+    st.subheader("Recent slow queries")
+    slow = query_trace.recent_queries(limit=100, slow_only=True)
+    if slow:
+        st.dataframe(pd.DataFrame(slow)[["ms", "rows", "screen", "caller", "sql"]],
+                     use_container_width=True, hide_index=True)
+    else:
+        st.info("No slow queries")
 
 # Add Patient Form
 def show_add_patient_form():
@@ -131,13 +409,13 @@ def show_add_patient_form():
             first_name = st.text_input("First Name*", key="new_first_name")
             last_name = st.text_input("Last Name*", key="new_last_name")
             mrn = st.text_input("MRN*", key="new_mrn")
-            gender = st.selectbox("Gender", ["", "Male", "Female", "Other"], key="new_gender")
+            gender = st.selectbox("Gender", reference_data.options("gender", blank=True), key="new_gender")
         
         with col2:
             dob = st.date_input("Date of Birth", key="new_dob")
             zip_code = st.text_input("ZIP Code", key="new_zip")
             bmi = st.number_input("BMI", min_value=0.0, max_value=100.0, step=0.1, value=None, key="new_bmi")
-            referral_source = st.selectbox("Referral Source", ["", "Self", "Physician", "Patient", "Other"], key="new_referral")
+            referral_source = st.selectbox("Referral Source", reference_data.options("referral_source", blank=True), key="new_referral")
         
         referral_details = st.text_area("Referral Details", key="new_referral_details")
         consult_date = st.date_input("Initial Consult Date", key="new_consult_date")
@@ -163,8 +441,9 @@ def show_add_patient_form():
                     st.error(error)
             else:
                 # Check for duplicate MRN
-                existing = execute_query("SELECT COUNT(*) as count FROM tblPatients WHERE MRN = ?", (mrn.strip(),))
-                if not existing.empty and existing.iloc[0]['count'] > 0:
+                existing = execute_query("SELECT COUNT(*) as count FROM tblPatients WHERE MRN = ?", (mrn.strip(),),
+                                         mode="scalar")
+                if existing:
                     st.error("A patient with this MRN already exists!")
                 else:
                     # Insert patient
@@ -208,8 +487,8 @@ def show_add_diagnostic_form(patient_id):
         # Endoscopy findings
         if endoscopy:
             st.write("**Endoscopy Details:**")
-            esophagitis_grade = st.selectbox("Esophagitis Grade", ["", "None", "LA A", "LA B", "LA C", "LA D"])
-            hernia_size = st.selectbox("Hiatal Hernia Size", ["", "None", "1 cm", "2 cm", "3 cm", "4 cm", "5 cm", "6 cm", ">6 cm"])
+            esophagitis_grade = st.selectbox("Esophagitis Grade", reference_data.options("esophagitis_grade", blank=True))
+            hernia_size = st.selectbox("Hiatal Hernia Size", reference_data.options("hiatal_hernia_size", blank=True))
             endo_findings = st.text_area("Endoscopy Findings")
         else:
             esophagitis_grade = hernia_size = endo_findings = ""
@@ -284,9 +563,11 @@ def show_add_diagnostic_form(patient_id):
                 ), fetch=False)
                 
                 if success:
+                    if endoscopy:
+                        barrett_length.extract_pending(get_database_connection(), patient_id)
                     st.success("Diagnostic study saved successfully!")
                     st.session_state.show_add_form['diagnostic'] = False
-                    st.rerun()
+                    rerun_section()
 
 # Add Pathology Form
 def show_add_pathology_form(patient_id):
@@ -308,8 +589,7 @@ def show_add_pathology_form(patient_id):
         st.write("**Pathology Findings:**")
         barretts = st.checkbox("Barrett's Esophagus")
         if barretts:
-            dysplasia_grade = st.selectbox("Dysplasia Grade", 
-                ["", "NGIM", "No Dysplasia", "Indeterminate", "Low Grade", "High Grade"])
+            dysplasia_grade = st.selectbox("Dysplasia Grade", reference_data.options("dysplasia_grade", blank=True))
         else:
             dysplasia_grade = ""
         
@@ -362,6 +642,7 @@ def show_add_pathology_form(patient_id):
                         else:
                             st.info("ℹ️ Barrett's detected - surveillance planning recommended")
                     st.session_state.show_add_form['pathology'] = False
+                    # Barrett's status feeds the surveillance tab too
                     st.rerun()
 
 # Add Surgical Form
@@ -453,7 +734,7 @@ def show_add_surgical_form(patient_id):
                     if success:
                         st.success("Surgical procedure saved successfully!")
                         st.session_state.show_add_form['surgical'] = False
-                        st.rerun()
+                        rerun_section()
 
 # Add Surveillance Form
 def show_add_surveillance_form(patient_id):
@@ -461,28 +742,19 @@ def show_add_surveillance_form(patient_id):
     st.subheader("➕ Add Surveillance Plan")
     
     # Check Barrett's eligibility
-    barrett_check = execute_query("""
-        SELECT COUNT(*) as count FROM tblPathology 
-        WHERE PatientID = ? AND Barretts = 1
-    """, (patient_id,))
+    barrett_count = execute_query(HAS_BARRETTS_SQL, (patient_id,), mode="scalar")
     
-    has_barretts = not barrett_check.empty and barrett_check.iloc[0]['count'] > 0
+    has_barretts = bool(barrett_count)
     
     if not has_barretts:
         st.warning("⚠️ No Barrett's esophagus found in pathology history. Surveillance may not be appropriate.")
     
     # Get latest Barrett's info for recommendations
-    latest_barrett = execute_query("""
-        SELECT PathologyDate, DysplasiaGrade
-        FROM tblPathology
-        WHERE PatientID = ? AND Barretts = 1
-        ORDER BY PathologyDate DESC
-        LIMIT 1
-    """, (patient_id,))
-    
-    if not latest_barrett.empty:
-        grade = latest_barrett.iloc[0]['DysplasiaGrade'] or ""
-        st.info(f"Latest Barrett's: {latest_barrett.iloc[0]['PathologyDate']} - {grade}")
+    latest_barrett = execute_query(LATEST_BARRETTS_SQL, (patient_id,), mode="records")
+    
+    if latest_barrett:
+        grade = latest_barrett[0]['DysplasiaGrade'] or ""
+        st.info(f"Latest Barrett's: {latest_barrett[0]['PathologyDate']} - {grade}")
         
         # Provide recommendations
         if "high grade" in grade.lower():
@@ -510,7 +782,7 @@ def show_add_surveillance_form(patient_id):
                 next_egd = None
         
         with col2:
-            if has_barretts and not latest_barrett.empty:
+            if has_barretts and latest_barrett:
                 if st.button(f"🧠 Use Smart Interval ({recommended_months} months)"):
                     next_egd = date.today() + timedelta(days=30 * recommended_months)
         
@@ -543,6 +815,7 @@ def show_add_surveillance_form(patient_id):
                         st.success("Surveillance plan saved successfully!")
                     
                     st.session_state.show_add_form['surveillance'] = False
+                    # The plan may have added a recall
                     st.rerun()
 
 # Add Recall Form
@@ -552,9 +825,7 @@ def show_add_recall_form(patient_id):
     
     with st.form("add_recall_form"):
         recall_date = st.date_input("Recall Date*", value=date.today() + timedelta(days=30))
-        recall_reason = st.selectbox("Reason*", 
-            ["", "Office Visit", "Endoscopy", "Barrett's Surveillance", 
-             "Surveillance Form", "Post-op Follow-up", "Lab Review", "Other"])
+        recall_reason = st.selectbox("Reason*", reference_data.options("recall_reason", blank=True))
         notes = st.text_area("Notes")
         
         submitted = st.form_submit_button("💾 Save Recall", type="primary")
@@ -573,10 +844,10 @@ def show_add_recall_form(patient_id):
                 if success:
                     st.success("Recall saved successfully!")
                     st.session_state.show_add_form['recall'] = False
-                    st.rerun()
+                    rerun_section()
 
 # Delete confirmation
-def confirm_delete(item_type, item_id, item_name=""):
+def confirm_delete(item_type, item_id, item_name="", rerun=st.rerun):
     """Show delete confirmation"""
     key = f"delete_{item_type}_{item_id}"
     if key not in st.session_state:
@@ -585,7 +856,7 @@ def confirm_delete(item_type, item_id, item_name=""):
     if not st.session_state[key]:
         if st.button(f"🗑️ Delete", key=f"del_btn_{item_type}_{item_id}"):
             st.session_state[key] = True
-            st.rerun()
+            rerun()
     else:
         st.warning(f"Are you sure you want to delete this {item_type}?")
         col1, col2 = st.columns(2)
@@ -595,7 +866,7 @@ def confirm_delete(item_type, item_id, item_name=""):
         with col2:
             if st.button("❌ Cancel", key=f"cancel_{item_type}_{item_id}"):
                 st.session_state[key] = False
-                st.rerun()
+                rerun()
     return False
 
 # Export functions
@@ -605,15 +876,26 @@ def export_to_csv(data, filename):
     data.to_csv(csv_buffer, index=False)
     return csv_buffer.getvalue()
 
+@st.cache_resource
+def plotly_express():
+    """plotly.express, imported the first time a chart is drawn"""
+    import plotly.express as px
+    return px
+
 def generate_patient_summary_pdf(patient_id):
     """Generate patient summary PDF"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
+
     try:
         # Get patient data
-        patient = execute_query("SELECT * FROM tblPatients WHERE PatientID = ?", (patient_id,))
-        if patient.empty:
+        patient = execute_query("SELECT * FROM tblPatients WHERE PatientID = ?", (patient_id,), mode="records")
+        if not patient:
             return None
         
-        patient = patient.iloc[0]
+        patient = patient[0]
         
         # Create PDF
         buffer = io.BytesIO()
@@ -654,13 +936,453 @@ def generate_patient_summary_pdf(patient_id):
         st.error(f"Error generating PDF: {str(e)}")
         return None
 
-# Header
-st.markdown("""
-<div class="main-header">
-    <h1>🏥 Minnesota Reflux & Heartburn Center</h1>
-    <p>Clinical Management System</p>
-</div>
-""", unsafe_allow_html=True)
+# Patient record sections
+#
+# Each tab is a fragment: its buttons and forms rerun only that section. Section
+# data comes from loaders cached on (patient_id, record_version), so a section
+# that reruns without changes costs a single version lookup.
+# Writes from either app move the version on through the activity triggers,
+# so nothing has to clear these caches by hand.
+
+def rerun_section():
+    """Rerun just the calling section (the whole app if it ran as part of a full rerun)"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def record_version(patient_id, *tables):
+    """Latest activity-log entry for this patient's rows in tables (see schema.py)"""
+    version = execute_query(f"""
+        SELECT MAX(ActivityID) AS version FROM tblActivityLog
+        WHERE PatientID = ? AND TableName IN ({", ".join("?" * len(tables))})
+    """, (patient_id,) + tables, mode="scalar")
+    return version or 0
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def load_diagnostics(patient_id, version):
+    """Diagnostic studies for one patient"""
+    return execute_query(DIAGNOSTICS_SQL, (patient_id,), mode="records")
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def load_surgeries(patient_id, version):
+    """Surgical history for one patient"""
+    return execute_query(SURGERIES_SQL, (patient_id,), mode="records")
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def load_pathology(patient_id, version):
+    """Pathology results for one patient"""
+    return execute_query(PATHOLOGY_SQL, (patient_id,), mode="records")
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def load_barrett_status(patient_id, version):
+    """Latest Barrett's pathology for one patient"""
+    return execute_query(LATEST_BARRETTS_SQL, (patient_id,), mode="records")
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def load_surveillance(patient_id, version):
+    """Surveillance plans for one patient"""
+    return execute_query(SURVEILLANCE_SQL, (patient_id,), mode="records")
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def load_recalls(patient_id, version):
+    """Recalls for one patient"""
+    return execute_query(PATIENT_RECALLS_SQL, (patient_id,), mode="records")
+
+@st.cache_data(max_entries=50, show_spinner=False)
+def load_outcome_summary(by, since, version):
+    """HRQL pre/post summary per procedure or surgeon (version = journal mark from outcomes.refresh)"""
+    return outcomes.summary(get_database_connection(), by, since)
+
+@st.cache_data(max_entries=50, show_spinner=False)
+def load_outcome_trend(by, since, version):
+    """Mean HRQL improvement per surgery year"""
+    return outcomes.by_year(get_database_connection(), by, since)
+
+@st.cache_data(max_entries=100, show_spinner=False)
+def load_referral_counts(dimensions, sources, zip3s, since, until, version):
+    """Referral rollup slice as a DataFrame (version = latest journal entry)"""
+    cells = referrals.counts(get_database_connection(), list(dimensions), list(sources), list(zip3s), since, until)
+    return pd.DataFrame([tuple(cell) for cell in cells], columns=list(dimensions) + ["Consults"])
+
+@st.fragment
+def demographics_section(patient_id, patient):
+    """Demographics tab - editing reruns only this section"""
+    st.subheader("Demographics")
+    
+    if st.button("✏️ Edit Demographics"):
+        st.session_state.edit_mode = not st.session_state.edit_mode
+        rerun_section()
+    
+    if st.session_state.edit_mode:
+        # Edit mode
+        with st.form("edit_demographics"):
+            col1, col2 = st.columns(2)
+            with col1:
+                first_name = st.text_input("First Name", value=patient['FirstName'])
+                last_name = st.text_input("Last Name", value=patient['LastName'])
+                mrn = st.text_input("MRN", value=patient['MRN'])
+                genders = reference_data.options("gender", blank=True)
+                gender = st.selectbox("Gender", genders, 
+                                    index=genders.index(patient['Gender']) if patient['Gender'] in genders else 0)
+            with col2:
+                try:
+                    dob = st.date_input("DOB", value=datetime.strptime(patient['DOB'], "%Y-%m-%d").date())
+                except:
+                    dob = st.date_input("DOB")
+                bmi = st.number_input("BMI", value=float(patient['BMI']) if patient['BMI'] else None)
+                zip_code = st.text_input("ZIP Code", value=patient['ZipCode'] or "")
+                referral_sources = reference_data.options("referral_source", blank=True)
+                referral_source = st.selectbox("Referral Source", referral_sources,
+                                             index=referral_sources.index(patient['ReferralSource']) if patient['ReferralSource'] in referral_sources else 0)
+            
+            referral_details = st.text_area("Referral Details", value=patient['ReferralDetails'] or "")
+            
+            if st.form_submit_button("💾 Save Changes"):
+                success = execute_query("""
+                    UPDATE tblPatients SET
+                        FirstName = ?, LastName = ?, MRN = ?, Gender = ?, 
+                        DOB = ?, BMI = ?, ZipCode = ?, ReferralSource = ?, ReferralDetails = ?
+                    WHERE PatientID = ?
+                """, (first_name, last_name, mrn, gender, dob.strftime("%Y-%m-%d"), 
+                      bmi, zip_code, referral_source, referral_details, patient_id), fetch=False)
+                
+                if success:
+                    st.success("Demographics updated successfully!")
+                    st.session_state.edit_mode = False
+                    st.rerun()
+    else:
+        # View mode
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"**First Name:** {patient['FirstName']}")
+            st.write(f"**Last Name:** {patient['LastName']}")
+            st.write(f"**MRN:** {patient['MRN']}")
+            st.write(f"**Gender:** {patient['Gender'] or 'Not specified'}")
+        with col2:
+            st.write(f"**DOB:** {patient['DOB']}")
+            st.write(f"**BMI:** {patient['BMI'] or 'Not recorded'}")
+            st.write(f"**ZIP Code:** {patient['ZipCode'] or 'Not specified'}")
+            st.write(f"**Referral Source:** {patient['ReferralSource'] or 'Not specified'}")
+        
+        if patient['ReferralDetails']:
+            st.write(f"**Referral Details:** {patient['ReferralDetails']}")
+
+@st.fragment
+def diagnostics_section(patient_id):
+    """Diagnostics tab"""
+    version = record_version(patient_id, "tblDiagnostics")
+    
+    st.subheader("Diagnostic Studies")
+    
+    # Add/Show forms
+    if st.session_state.show_add_form.get('diagnostic', False):
+        show_add_diagnostic_form(patient_id)
+    else:
+        if st.button("➕ Add Diagnostic Study"):
+            st.session_state.show_add_form['diagnostic'] = True
+            rerun_section()
+    
+    # Load and display diagnostics
+    diagnostics = load_diagnostics(patient_id, version)
+    
+    if diagnostics:
+        for diag in diagnostics:
+            with st.expander(f"📅 {diag['TestDate']} - Dr. {diag['Surgeon'] or 'Unknown'}"):
+                col1, col2, col3 = st.columns([2, 2, 1])
+                
+                with col1:
+                    st.write("**Tests Performed:**")
+                    tests = []
+                    if diag['Endoscopy']: tests.append("Endoscopy")
+                    if diag['Bravo']: tests.append("Bravo")
+                    if diag['pHImpedance']: tests.append("pH Impedance")
+                    if diag['EndoFLIP']: tests.append("EndoFLIP")
+                    if diag['Manometry']: tests.append("Manometry")
+                    if diag['GastricEmptying']: tests.append("Gastric Emptying")
+                    if diag['Imaging']: tests.append("Imaging")
+                    if diag['UpperGI']: tests.append("Upper GI")
+                    
+                    for test in tests:
+                        st.write(f"• {test}")
+                
+                with col2:
+                    st.write("**Key Findings:**")
+                    if diag['EsophagitisGrade']:
+                        st.write(f"• Esophagitis: {diag['EsophagitisGrade']}")
+                    if diag['HiatalHerniaSize']:
+                        st.write(f"• Hiatal Hernia: {diag['HiatalHerniaSize']}")
+                    if diag['DeMeesterScore']:
+                        st.write(f"• DeMeester Score: {diag['DeMeesterScore']}")
+                    
+                    if diag['EndoscopyFindings']:
+                        st.write(f"**Endoscopy:** {diag['EndoscopyFindings']}")
+                    if diag['pHFindings']:
+                        st.write(f"**pH Study:** {diag['pHFindings']}")
+                    if diag['DiagnosticNotes']:
+                        st.write(f"**Notes:** {diag['DiagnosticNotes']}")
+                
+                with col3:
+                    if confirm_delete("diagnostic", diag['DiagnosticID'], rerun=rerun_section):
+                        execute_query("DELETE FROM tblDiagnostics WHERE DiagnosticID = ?", 
+                                    (diag['DiagnosticID'],), fetch=False)
+                        st.success("Diagnostic deleted!")
+                        rerun_section()
+    else:
+        st.info("No diagnostic studies recorded")
+
+@st.fragment
+def surgical_section(patient_id):
+    """Surgical history tab"""
+    version = record_version(patient_id, "tblSurgicalHistory")
+    
+    st.subheader("Surgical History")
+    
+    # Add/Show forms
+    if st.session_state.show_add_form.get('surgical', False):
+        show_add_surgical_form(patient_id)
+    else:
+        if st.button("➕ Add Surgery"):
+            st.session_state.show_add_form['surgical'] = True
+            rerun_section()
+    
+    # Load and display surgeries
+    surgeries = load_surgeries(patient_id, version)
+    
+    if surgeries:
+        for surgery in surgeries:
+            with st.expander(f"🏥 {surgery['SurgeryDate']} - Dr. {surgery['SurgerySurgeon'] or 'Unknown'}"):
+                col1, col2 = st.columns([3, 1])
+                
+                with col1:
+                    # List procedures performed
+                    performed = procedures.labels(surgery['ProcedureMask'])
+                    
+                    if performed:
+                        st.write("**Procedures:**")
+                        for proc in performed:
+                            st.write(f"• {proc}")
+                    
+                    if surgery['Notes']:
+                        st.write("**Notes:**")
+                        st.write(surgery['Notes'])
+                
+                with col2:
+                    if confirm_delete("surgery", surgery['SurgeryID'], rerun=rerun_section):
+                        execute_query("DELETE FROM tblSurgicalHistory WHERE SurgeryID = ?", 
+                                    (surgery['SurgeryID'],), fetch=False)
+                        st.success("Surgery deleted!")
+                        rerun_section()
+    else:
+        st.info("No surgical history recorded")
+
+@st.fragment
+def pathology_section(patient_id):
+    """Pathology tab"""
+    version = record_version(patient_id, "tblPathology")
+    
+    st.subheader("Pathology Results")
+    
+    # Add/Show forms
+    if st.session_state.show_add_form.get('pathology', False):
+        show_add_pathology_form(patient_id)
+    else:
+        if st.button("➕ Add Pathology"):
+            st.session_state.show_add_form['pathology'] = True
+            rerun_section()
+    
+    # Load and display pathology
+    pathology = load_pathology(patient_id, version)
+    
+    if pathology:
+        for path in pathology:
+            with st.expander(f"🧪 {path['PathologyDate']}"):
+                col1, col2, col3 = st.columns([2, 2, 1])
+                
+                with col1:
+                    st.write("**Tests:**")
+                    tests = []
+                    if path['Biopsy']: tests.append("Biopsy")
+                    if path['WATS3D']: tests.append("WATS3D")
+                    if path['EsoPredict']: tests.append("EsoPredict")
+                    if path['TissueCypher']: tests.append("TissueCypher")
+                    
+                    for test in tests:
+                        st.write(f"• {test}")
+                
+                with col2:
+                    st.write("**Findings:**")
+                    if path['Barretts']:
+                        grade = path['DysplasiaGrade'] or "No grade specified"
+                        if "high grade" in grade.lower():
+                            st.markdown(f"• **Barrett's:** <span class='status-urgent'>{grade}</span>", unsafe_allow_html=True)
+                        elif "low grade" in grade.lower():
+                            st.markdown(f"• **Barrett's:** <span class='status-warning'>{grade}</span>", unsafe_allow_html=True)
+                        else:
+                            st.markdown(f"• **Barrett's:** <span class='status-info'>{grade}</span>", unsafe_allow_html=True)
+                    
+                    if path['EoE']:
+                        eos_count = path['EosinophilCount'] or "Not specified"
+                        st.write(f"• **EoE:** {eos_count} eos/hpf")
+                    
+                    if path['Hpylori']:
+                        st.write("• **H. pylori:** Positive")
+                    
+                    if path['AtrophicGastritis']:
+                        st.write("• **Atrophic Gastritis:** Present")
+                    
+                    if path['OtherFinding']:
+                        st.write(f"• **Other:** {path['OtherFinding']}")
+                    
+                    if path['EsoPredictRisk']:
+                        st.write(f"• **EsoPredict:** {path['EsoPredictRisk']}")
+                    
+                    if path['TissueCypherRisk']:
+                        st.write(f"• **TissueCypher:** {path['TissueCypherRisk']}")
+                    
+                    if path['Notes']:
+                        st.write(f"• **Notes:** {path['Notes']}")
+                
+                with col3:
+                    if confirm_delete("pathology", path['PathologyID'], rerun=rerun_section):
+                        execute_query("DELETE FROM tblPathology WHERE PathologyID = ?", 
+                                    (path['PathologyID'],), fetch=False)
+                        st.success("Pathology deleted!")
+                        # Barrett's status feeds the surveillance tab too
+                        st.rerun()
+    else:
+        st.info("No pathology results recorded")
+
+@st.fragment
+def surveillance_section(patient_id):
+    """Surveillance tab"""
+    version = record_version(patient_id, "tblPathology", "tblSurveillance")
+    
+    st.subheader("Surveillance Plans")
+    
+    # Add/Show forms
+    if st.session_state.show_add_form.get('surveillance', False):
+        show_add_surveillance_form(patient_id)
+    else:
+        if st.button("➕ Add Surveillance Plan"):
+            st.session_state.show_add_form['surveillance'] = True
+            rerun_section()
+    
+    # Check Barrett's status
+    barrett_status = load_barrett_status(patient_id, version)
+    
+    if barrett_status:
+        latest_barrett = barrett_status[0]
+        st.success(f"✅ Barrett's confirmed: {latest_barrett['DysplasiaGrade'] or 'No grade'} ({latest_barrett['PathologyDate']})")
+        
+        # Load surveillance plans
+        plans = load_surveillance(patient_id, version)
+        
+        if plans:
+            for surv in plans:
+                col1, col2 = st.columns([3, 1])
+                
+                with col1:
+                    if surv['Undecided']:
+                        st.warning("⚠️ Surveillance plan undecided")
+                    else:
+                        next_date = surv['NextBarrettsEGD']
+                        try:
+                            egd_date = datetime.strptime(next_date, "%Y-%m-%d").date()
+                            today = date.today()
+                            days_until = (egd_date - today).days
+                            
+                            if days_until < 0:
+                                st.error(f"🚨 Surveillance OVERDUE: {next_date} ({abs(days_until)} days ago)")
+                            elif days_until <= 90:
+                                st.warning(f"⚠️ Surveillance due soon: {next_date} (in {days_until} days)")
+                            else:
+                                st.info(f"📅 Next surveillance: {next_date} (in {days_until} days)")
+                        except:
+                            st.write(f"📅 Next surveillance: {next_date}")
+                    
+                    st.caption(f"Last modified: {surv['LastModified']}")
+                
+                with col2:
+                    if confirm_delete("surveillance", surv['SurveillanceID'], rerun=rerun_section):
+                        execute_query("DELETE FROM tblSurveillance WHERE SurveillanceID = ?", 
+                                    (surv['SurveillanceID'],), fetch=False)
+                        st.success("Surveillance plan deleted!")
+                        rerun_section()
+        else:
+            st.warning("⚠️ No surveillance plan on file for Barrett's patient")
+    else:
+        st.info("ℹ️ No Barrett's esophagus in pathology history")
+
+@st.fragment
+def recalls_section(patient_id):
+    """Recalls tab"""
+    version = record_version(patient_id, "tblRecall")
+    
+    st.subheader("Recalls & Follow-up")
+    
+    # Add/Show forms
+    if st.session_state.show_add_form.get('recall', False):
+        show_add_recall_form(patient_id)
+    else:
+        if st.button("➕ Add Recall"):
+            st.session_state.show_add_form['recall'] = True
+            rerun_section()
+    
+    # Load recalls
+    recalls = load_recalls(patient_id, version)
+    
+    if recalls:
+        for recall in recalls:
+            col1, col2 = st.columns([3, 1])
+            
+            with col1:
+                if recall['Completed']:
+                    st.success(f"✅ {recall['RecallReason']} - {recall['RecallDate']} (Completed)")
+                else:
+                    try:
+                        recall_date = datetime.strptime(recall['RecallDate'], "%Y-%m-%d").date()
+                        today = date.today()
+                        days_until = (recall_date - today).days
+                        
+                        if days_until < 0:
+                            st.error(f"🚨 OVERDUE: {recall['RecallReason']} - {recall['RecallDate']} ({abs(days_until)} days ago)")
+                        elif days_until == 0:
+                            st.warning(f"⚠️ DUE TODAY: {recall['RecallReason']} - {recall['RecallDate']}")
+                        elif days_until <= 7:
+                            st.warning(f"⚠️ Due soon: {recall['RecallReason']} - {recall['RecallDate']} (in {days_until} days)")
+                        else:
+                            st.info(f"📅 {recall['RecallReason']} - {recall['RecallDate']} (in {days_until} days)")
+                    except:
+                        st.write(f"📅 {recall['RecallReason']} - {recall['RecallDate']}")
+                
+                if recall['Notes']:
+                    st.caption(recall['Notes'])
+                
+                # Toggle completion
+                if not recall['Completed']:
+                    if st.button(f"Mark Complete", key=f"complete_{recall['RecallID']}"):
+                        execute_query("UPDATE tblRecall SET Completed = 1 WHERE RecallID = ?", 
+                                    (recall['RecallID'],), fetch=False)
+                        st.success("Recall marked complete!")
+                        rerun_section()
+            
+            with col2:
+                if confirm_delete("recall", recall['RecallID'], rerun=rerun_section):
+                    execute_query("DELETE FROM tblRecall WHERE RecallID = ?", 
+                                (recall['RecallID'],), fetch=False)
+                    st.success("Recall deleted!")
+                    rerun_section()
+    else:
+        st.info("No recalls scheduled")
+
+# Hidden diagnostics page - not linked from the UI
+if st.query_params.get("diagnostics") == "1":
+    show_query_diagnostics()
+    st.stop()
+
+# Styles and header go out as a single element
+st.markdown(APP_CSS + APP_HEADER, unsafe_allow_html=True)
 
 # Sidebar - Patient Search and Navigation
 with st.sidebar:
@@ -678,23 +1400,13 @@ with st.sidebar:
     
     # Load patients
     if search_term:
-        patients_df = execute_query("""
-            SELECT PatientID, FirstName, LastName, MRN, DOB, Gender
-            FROM tblPatients
-            WHERE FirstName LIKE ? OR LastName LIKE ? OR MRN LIKE ?
-            ORDER BY LastName, FirstName
-        """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
+        patients = execute_query(SEARCH_PATIENTS_SQL, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"), mode="records")
     else:
-        patients_df = execute_query("""
-            SELECT PatientID, FirstName, LastName, MRN, DOB, Gender
-            FROM tblPatients
-            ORDER BY LastName, FirstName
-            LIMIT 20
-        """)
-    
-    if not patients_df.empty:
+        patients = execute_query(DEFAULT_PATIENT_LIST_SQL, mode="records")
+    
+    if patients:
         st.subheader("Patients")
-        for _, patient in patients_df.iterrows():
+        for patient in patients:
             patient_display = f"{patient['LastName']}, {patient['FirstName']} ({patient['MRN']})"
             if st.button(patient_display, key=f"patient_{patient['PatientID']}", use_container_width=True):
                 st.session_state.selected_patient = patient['PatientID']
@@ -723,6 +1435,36 @@ with st.sidebar:
         st.session_state.current_tab = "Dashboard"
         st.session_state.show_add_form = {}
         st.rerun()
+    
+    if st.button("🧬 Cohort Builder", use_container_width=True):
+        st.session_state.selected_patient = None
+        st.session_state.current_tab = "Cohorts"
+        st.session_state.show_add_form = {}
+        st.rerun()
+    
+    if st.button("📉 HRQL Outcomes", use_container_width=True):
+        st.session_state.selected_patient = None
+        st.session_state.current_tab = "Outcomes"
+        st.session_state.show_add_form = {}
+        st.rerun()
+    
+    if st.button("🩺 Surgeon Analytics", use_container_width=True):
+        st.session_state.selected_patient = None
+        st.session_state.current_tab = "Surgeons"
+        st.session_state.show_add_form = {}
+        st.rerun()
+    
+    if st.button("🗺️ Referral Trends", use_container_width=True):
+        st.session_state.selected_patient = None
+        st.session_state.current_tab = "Referrals"
+        st.session_state.show_add_form = {}
+        st.rerun()
+    
+    if st.button("⏱️ Dysplasia Progression", use_container_width=True):
+        st.session_state.selected_patient = None
+        st.session_state.current_tab = "Progression"
+        st.session_state.show_add_form = {}
+        st.rerun()
 
 # Main content area
 if st.session_state.current_tab == "Add Patient":
@@ -733,18 +1475,17 @@ elif st.session_state.selected_patient:
     patient_id = st.session_state.selected_patient
     
     # Get patient info
-    patient_info = execute_query("""
-        SELECT FirstName, LastName, MRN, DOB, Gender, BMI, ZipCode, ReferralSource, ReferralDetails
-        FROM tblPatients WHERE PatientID = ?
-    """, (patient_id,))
+    patient_info = execute_query(PATIENT_HEADER_SQL, (patient_id,), mode="records")
     
-    if not patient_info.empty:
-        patient = patient_info.iloc[0]
+    if patient_info:
+        patient = patient_info[0]
         
         # Patient header
         col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
         with col1:
             st.header(f"👤 {patient['LastName']}, {patient['FirstName']}")
+            if patient['LastActivity']:
+                st.caption(f"Last activity: {patient['LastActivity']}")
         with col2:
             st.write(f"**MRN:** {patient['MRN']}")
         with col3:
@@ -771,417 +1512,22 @@ elif st.session_state.selected_patient:
         ])
         
         with tab1:
-            st.subheader("Demographics")
-            
-            if st.button("✏️ Edit Demographics"):
-                st.session_state.edit_mode = not st.session_state.edit_mode
-                st.rerun()
-            
-            if st.session_state.edit_mode:
-                # Edit mode
-                with st.form("edit_demographics"):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        first_name = st.text_input("First Name", value=patient['FirstName'])
-                        last_name = st.text_input("Last Name", value=patient['LastName'])
-                        mrn = st.text_input("MRN", value=patient['MRN'])
-                        gender = st.selectbox("Gender", ["", "Male", "Female", "Other"], 
-                                            index=["", "Male", "Female", "Other"].index(patient['Gender']) if patient['Gender'] else 0)
-                    with col2:
-                        try:
-                            dob = st.date_input("DOB", value=datetime.strptime(patient['DOB'], "%Y-%m-%d").date())
-                        except:
-                            dob = st.date_input("DOB")
-                        bmi = st.number_input("BMI", value=float(patient['BMI']) if patient['BMI'] else None)
-                        zip_code = st.text_input("ZIP Code", value=patient['ZipCode'] or "")
-                        referral_source = st.selectbox("Referral Source", 
-                                                     ["", "Self", "Physician", "Patient", "Other"],
-                                                     index=["", "Self", "Physician", "Patient", "Other"].index(patient['ReferralSource']) if patient['ReferralSource'] else 0)
-                    
-                    referral_details = st.text_area("Referral Details", value=patient['ReferralDetails'] or "")
-                    
-                    if st.form_submit_button("💾 Save Changes"):
-                        success = execute_query("""
-                            UPDATE tblPatients SET
-                                FirstName = ?, LastName = ?, MRN = ?, Gender = ?, 
-                                DOB = ?, BMI = ?, ZipCode = ?, ReferralSource = ?, ReferralDetails = ?
-                            WHERE PatientID = ?
-                        """, (first_name, last_name, mrn, gender, dob.strftime("%Y-%m-%d"), 
-                              bmi, zip_code, referral_source, referral_details, patient_id), fetch=False)
-                        
-                        if success:
-                            st.success("Demographics updated successfully!")
-                            st.session_state.edit_mode = False
-                            st.rerun()
-            else:
-                # View mode
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write(f"**First Name:** {patient['FirstName']}")
-                    st.write(f"**Last Name:** {patient['LastName']}")
-                    st.write(f"**MRN:** {patient['MRN']}")
-                    st.write(f"**Gender:** {patient['Gender'] or 'Not specified'}")
-                with col2:
-                    st.write(f"**DOB:** {patient['DOB']}")
-                    st.write(f"**BMI:** {patient['BMI'] or 'Not recorded'}")
-                    st.write(f"**ZIP Code:** {patient['ZipCode'] or 'Not specified'}")
-                    st.write(f"**Referral Source:** {patient['ReferralSource'] or 'Not specified'}")
-                
-                if patient['ReferralDetails']:
-                    st.write(f"**Referral Details:** {patient['ReferralDetails']}")
+            demographics_section(patient_id, patient)
         
         with tab2:
-            st.subheader("Diagnostic Studies")
-            
-            # Add/Show forms
-            if st.session_state.show_add_form.get('diagnostic', False):
-                show_add_diagnostic_form(patient_id)
-            else:
-                if st.button("➕ Add Diagnostic Study"):
-                    st.session_state.show_add_form['diagnostic'] = True
-                    st.rerun()
-            
-            # Load and display diagnostics
-            diagnostics_df = execute_query("""
-                SELECT DiagnosticID, TestDate, Surgeon, Endoscopy, Bravo, pHImpedance, 
-                       EndoFLIP, Manometry, GastricEmptying, Imaging, UpperGI,
-                       EsophagitisGrade, HiatalHerniaSize, DeMeesterScore, EndoscopyFindings,
-                       pHFindings, DiagnosticNotes
-                FROM tblDiagnostics
-                WHERE PatientID = ?
-                ORDER BY TestDate DESC
-            """, (patient_id,))
-            
-            if not diagnostics_df.empty:
-                for _, diag in diagnostics_df.iterrows():
-                    with st.expander(f"📅 {diag['TestDate']} - Dr. {diag['Surgeon'] or 'Unknown'}"):
-                        col1, col2, col3 = st.columns([2, 2, 1])
-                        
-                        with col1:
-                            st.write("**Tests Performed:**")
-                            tests = []
-                            if diag['Endoscopy']: tests.append("Endoscopy")
-                            if diag['Bravo']: tests.append("Bravo")
-                            if diag['pHImpedance']: tests.append("pH Impedance")
-                            if diag['EndoFLIP']: tests.append("EndoFLIP")
-                            if diag['Manometry']: tests.append("Manometry")
-                            if diag['GastricEmptying']: tests.append("Gastric Emptying")
-                            if diag['Imaging']: tests.append("Imaging")
-                            if diag['UpperGI']: tests.append("Upper GI")
-                            
-                            for test in tests:
-                                st.write(f"• {test}")
-                        
-                        with col2:
-                            st.write("**Key Findings:**")
-                            if diag['EsophagitisGrade']:
-                                st.write(f"• Esophagitis: {diag['EsophagitisGrade']}")
-                            if diag['HiatalHerniaSize']:
-                                st.write(f"• Hiatal Hernia: {diag['HiatalHerniaSize']}")
-                            if diag['DeMeesterScore']:
-                                st.write(f"• DeMeester Score: {diag['DeMeesterScore']}")
-                            
-                            if diag['EndoscopyFindings']:
-                                st.write(f"**Endoscopy:** {diag['EndoscopyFindings']}")
-                            if diag['pHFindings']:
-                                st.write(f"**pH Study:** {diag['pHFindings']}")
-                            if diag['DiagnosticNotes']:
-                                st.write(f"**Notes:** {diag['DiagnosticNotes']}")
-                        
-                        with col3:
-                            if confirm_delete("diagnostic", diag['DiagnosticID']):
-                                execute_query("DELETE FROM tblDiagnostics WHERE DiagnosticID = ?", 
-                                            (diag['DiagnosticID'],), fetch=False)
-                                st.success("Diagnostic deleted!")
-                                st.rerun()
-            else:
-                st.info("No diagnostic studies recorded")
+            diagnostics_section(patient_id)
         
         with tab3:
-            st.subheader("Surgical History")
-            
-            # Add/Show forms
-            if st.session_state.show_add_form.get('surgical', False):
-                show_add_surgical_form(patient_id)
-            else:
-                if st.button("➕ Add Surgery"):
-                    st.session_state.show_add_form['surgical'] = True
-                    st.rerun()
-            
-            # Load and display surgeries
-            surgical_df = execute_query("""
-                SELECT SurgeryID, SurgeryDate, SurgerySurgeon, Notes,
-                       HiatalHernia, ParaesophagealHernia, MeshUsed, GastricBypass, SleeveGastrectomy,
-                       Toupet, TIF, Nissen, Dor, HellerMyotomy, Stretta, Ablation, LINX,
-                       GPOEM, EPOEM, ZPOEM, Pyloroplasty, Revision, GastricStimulator, Dilation, Other
-                FROM tblSurgicalHistory
-                WHERE PatientID = ?
-                ORDER BY SurgeryDate DESC
-            """, (patient_id,))
-            
-            if not surgical_df.empty:
-                for _, surgery in surgical_df.iterrows():
-                    with st.expander(f"🏥 {surgery['SurgeryDate']} - Dr. {surgery['SurgerySurgeon'] or 'Unknown'}"):
-                        col1, col2 = st.columns([3, 1])
-                        
-                        with col1:
-                            # List procedures performed
-                            procedures = []
-                            procedure_map = {
-                                'HiatalHernia': 'Hiatal Hernia Repair',
-                                'ParaesophagealHernia': 'Paraesophageal Hernia Repair',
-                                'MeshUsed': 'Mesh Used',
-                                'GastricBypass': 'Gastric Bypass',
-                                'SleeveGastrectomy': 'Sleeve Gastrectomy',
-                                'Toupet': 'Toupet Fundoplication',
-                                'TIF': 'TIF',
-                                'Nissen': 'Nissen Fundoplication',
-                                'Dor': 'Dor Fundoplication',
-                                'HellerMyotomy': 'Heller Myotomy',
-                                'Stretta': 'Stretta',
-                                'Ablation': 'Ablation',
-                                'LINX': 'LINX Device',
-                                'GPOEM': 'G-POEM',
-                                'EPOEM': 'E-POEM',
-                                'ZPOEM': 'Z-POEM',
-                                'Pyloroplasty': 'Pyloroplasty',
-                                'Revision': 'Revision Surgery',
-                                'GastricStimulator': 'Gastric Stimulator',
-                                'Dilation': 'Dilation',
-                                'Other': 'Other'
-                            }
-                            
-                            for key, name in procedure_map.items():
-                                if surgery[key]:
-                                    procedures.append(name)
-                            
-                            if procedures:
-                                st.write("**Procedures:**")
-                                for proc in procedures:
-                                    st.write(f"• {proc}")
-                            
-                            if surgery['Notes']:
-                                st.write("**Notes:**")
-                                st.write(surgery['Notes'])
-                        
-                        with col2:
-                            if confirm_delete("surgery", surgery['SurgeryID']):
-                                execute_query("DELETE FROM tblSurgicalHistory WHERE SurgeryID = ?", 
-                                            (surgery['SurgeryID'],), fetch=False)
-                                st.success("Surgery deleted!")
-                                st.rerun()
-            else:
-                st.info("No surgical history recorded")
+            surgical_section(patient_id)
         
         with tab4:
-            st.subheader("Pathology Results")
-            
-            # Add/Show forms
-            if st.session_state.show_add_form.get('pathology', False):
-                show_add_pathology_form(patient_id)
-            else:
-                if st.button("➕ Add Pathology"):
-                    st.session_state.show_add_form['pathology'] = True
-                    st.rerun()
-            
-            # Load and display pathology
-            pathology_df = execute_query("""
-                SELECT PathologyID, PathologyDate, Biopsy, WATS3D, EsoPredict, TissueCypher,
-                       Barretts, DysplasiaGrade, EoE, EosinophilCount, Hpylori, AtrophicGastritis,
-                       OtherFinding, EsoPredictRisk, TissueCypherRisk, Notes
-                FROM tblPathology
-                WHERE PatientID = ?
-                ORDER BY PathologyDate DESC
-            """, (patient_id,))
-            
-            if not pathology_df.empty:
-                for _, path in pathology_df.iterrows():
-                    with st.expander(f"🧪 {path['PathologyDate']}"):
-                        col1, col2, col3 = st.columns([2, 2, 1])
-                        
-                        with col1:
-                            st.write("**Tests:**")
-                            tests = []
-                            if path['Biopsy']: tests.append("Biopsy")
-                            if path['WATS3D']: tests.append("WATS3D")
-                            if path['EsoPredict']: tests.append("EsoPredict")
-                            if path['TissueCypher']: tests.append("TissueCypher")
-                            
-                            for test in tests:
-                                st.write(f"• {test}")
-                        
-                        with col2:
-                            st.write("**Findings:**")
-                            if path['Barretts']:
-                                grade = path['DysplasiaGrade'] or "No grade specified"
-                                if "high grade" in grade.lower():
-                                    st.markdown(f"• **Barrett's:** <span class='status-urgent'>{grade}</span>", unsafe_allow_html=True)
-                                elif "low grade" in grade.lower():
-                                    st.markdown(f"• **Barrett's:** <span class='status-warning'>{grade}</span>", unsafe_allow_html=True)
-                                else:
-                                    st.markdown(f"• **Barrett's:** <span class='status-info'>{grade}</span>", unsafe_allow_html=True)
-                            
-                            if path['EoE']:
-                                eos_count = path['EosinophilCount'] or "Not specified"
-                                st.write(f"• **EoE:** {eos_count} eos/hpf")
-                            
-                            if path['Hpylori']:
-                                st.write("• **H. pylori:** Positive")
-                            
-                            if path['AtrophicGastritis']:
-                                st.write("• **Atrophic Gastritis:** Present")
-                            
-                            if path['OtherFinding']:
-                                st.write(f"• **Other:** {path['OtherFinding']}")
-                            
-                            if path['EsoPredictRisk']:
-                                st.write(f"• **EsoPredict:** {path['EsoPredictRisk']}")
-                            
-                            if path['TissueCypherRisk']:
-                                st.write(f"• **TissueCypher:** {path['TissueCypherRisk']}")
-                            
-                            if path['Notes']:
-                                st.write(f"• **Notes:** {path['Notes']}")
-                        
-                        with col3:
-                            if confirm_delete("pathology", path['PathologyID']):
-                                execute_query("DELETE FROM tblPathology WHERE PathologyID = ?", 
-                                            (path['PathologyID'],), fetch=False)
-                                st.success("Pathology deleted!")
-                                st.rerun()
-            else:
-                st.info("No pathology results recorded")
+            pathology_section(patient_id)
         
         with tab5:
-            st.subheader("Surveillance Plans")
-            
-            # Add/Show forms
-            if st.session_state.show_add_form.get('surveillance', False):
-                show_add_surveillance_form(patient_id)
-            else:
-                if st.button("➕ Add Surveillance Plan"):
-                    st.session_state.show_add_form['surveillance'] = True
-                    st.rerun()
-            
-            # Check Barrett's status
-            barrett_status = execute_query("""
-                SELECT PathologyDate, DysplasiaGrade
-                FROM tblPathology
-                WHERE PatientID = ? AND Barretts = 1
-                ORDER BY PathologyDate DESC
-                LIMIT 1
-            """, (patient_id,))
-            
-            if not barrett_status.empty:
-                latest_barrett = barrett_status.iloc[0]
-                st.success(f"✅ Barrett's confirmed: {latest_barrett['DysplasiaGrade'] or 'No grade'} ({latest_barrett['PathologyDate']})")
-                
-                # Load surveillance plans
-                surveillance_df = execute_query("""
-                    SELECT SurveillanceID, NextBarrettsEGD, Undecided, LastModified
-                    FROM tblSurveillance
-                    WHERE PatientID = ?
-                    ORDER BY LastModified DESC
-                """, (patient_id,))
-                
-                if not surveillance_df.empty:
-                    for _, surv in surveillance_df.iterrows():
-                        col1, col2 = st.columns([3, 1])
-                        
-                        with col1:
-                            if surv['Undecided']:
-                                st.warning("⚠️ Surveillance plan undecided")
-                            else:
-                                next_date = surv['NextBarrettsEGD']
-                                try:
-                                    egd_date = datetime.strptime(next_date, "%Y-%m-%d").date()
-                                    today = date.today()
-                                    days_until = (egd_date - today).days
-                                    
-                                    if days_until < 0:
-                                        st.error(f"🚨 Surveillance OVERDUE: {next_date} ({abs(days_until)} days ago)")
-                                    elif days_until <= 90:
-                                        st.warning(f"⚠️ Surveillance due soon: {next_date} (in {days_until} days)")
-                                    else:
-                                        st.info(f"📅 Next surveillance: {next_date} (in {days_until} days)")
-                                except:
-                                    st.write(f"📅 Next surveillance: {next_date}")
-                            
-                            st.caption(f"Last modified: {surv['LastModified']}")
-                        
-                        with col2:
-                            if confirm_delete("surveillance", surv['SurveillanceID']):
-                                execute_query("DELETE FROM tblSurveillance WHERE SurveillanceID = ?", 
-                                            (surv['SurveillanceID'],), fetch=False)
-                                st.success("Surveillance plan deleted!")
-                                st.rerun()
-                else:
-                    st.warning("⚠️ No surveillance plan on file for Barrett's patient")
-            else:
-                st.info("ℹ️ No Barrett's esophagus in pathology history")
+            surveillance_section(patient_id)
         
         with tab6:
-            st.subheader("Recalls & Follow-up")
-            
-            # Add/Show forms
-            if st.session_state.show_add_form.get('recall', False):
-                show_add_recall_form(patient_id)
-            else:
-                if st.button("➕ Add Recall"):
-                    st.session_state.show_add_form['recall'] = True
-                    st.rerun()
-            
-            # Load recalls
-            recalls_df = execute_query("""
-                SELECT RecallID, RecallDate, RecallReason, Notes, Completed
-                FROM tblRecall
-                WHERE PatientID = ?
-                ORDER BY RecallDate ASC
-            """, (patient_id,))
-            
-            if not recalls_df.empty:
-                for _, recall in recalls_df.iterrows():
-                    col1, col2 = st.columns([3, 1])
-                    
-                    with col1:
-                        if recall['Completed']:
-                            st.success(f"✅ {recall['RecallReason']} - {recall['RecallDate']} (Completed)")
-                        else:
-                            try:
-                                recall_date = datetime.strptime(recall['RecallDate'], "%Y-%m-%d").date()
-                                today = date.today()
-                                days_until = (recall_date - today).days
-                                
-                                if days_until < 0:
-                                    st.error(f"🚨 OVERDUE: {recall['RecallReason']} - {recall['RecallDate']} ({abs(days_until)} days ago)")
-                                elif days_until == 0:
-                                    st.warning(f"⚠️ DUE TODAY: {recall['RecallReason']} - {recall['RecallDate']}")
-                                elif days_until <= 7:
-                                    st.warning(f"⚠️ Due soon: {recall['RecallReason']} - {recall['RecallDate']} (in {days_until} days)")
-                                else:
-                                    st.info(f"📅 {recall['RecallReason']} - {recall['RecallDate']} (in {days_until} days)")
-                            except:
-                                st.write(f"📅 {recall['RecallReason']} - {recall['RecallDate']}")
-                        
-                        if recall['Notes']:
-                            st.caption(recall['Notes'])
-                        
-                        # Toggle completion
-                        if not recall['Completed']:
-                            if st.button(f"Mark Complete", key=f"complete_{recall['RecallID']}"):
-                                execute_query("UPDATE tblRecall SET Completed = 1 WHERE RecallID = ?", 
-                                            (recall['RecallID'],), fetch=False)
-                                st.success("Recall marked complete!")
-                                st.rerun()
-                    
-                    with col2:
-                        if confirm_delete("recall", recall['RecallID']):
-                            execute_query("DELETE FROM tblRecall WHERE RecallID = ?", 
-                                        (recall['RecallID'],), fetch=False)
-                            st.success("Recall deleted!")
-                            st.rerun()
-            else:
-                st.info("No recalls scheduled")
+            recalls_section(patient_id)
 
 elif st.session_state.current_tab == "Dashboard":
     # Dashboard view
@@ -1191,8 +1537,8 @@ elif st.session_state.current_tab == "Dashboard":
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_patients = execute_query("SELECT COUNT(*) as count FROM tblPatients")
-        count = total_patients.iloc[0]['count'] if not total_patients.empty else 0
+        total_patients = execute_query(DASH_TOTAL_PATIENTS_SQL, mode="scalar")
+        count = total_patients or 0
         st.markdown(f"""
         <div class="metric-card">
             <h3>{count}</h3>
@@ -1201,8 +1547,8 @@ elif st.session_state.current_tab == "Dashboard":
         """, unsafe_allow_html=True)
     
     with col2:
-        barrett_patients = execute_query("SELECT COUNT(DISTINCT PatientID) as count FROM tblPathology WHERE Barretts = 1")
-        count = barrett_patients.iloc[0]['count'] if not barrett_patients.empty else 0
+        barrett_patients = execute_query(DASH_BARRETTS_PATIENTS_SQL, mode="scalar")
+        count = barrett_patients or 0
         st.markdown(f"""
         <div class="metric-card">
             <h3>{count}</h3>
@@ -1211,8 +1557,8 @@ elif st.session_state.current_tab == "Dashboard":
         """, unsafe_allow_html=True)
     
     with col3:
-        overdue_recalls = execute_query("SELECT COUNT(*) as count FROM tblRecall WHERE Completed = 0 AND RecallDate < date('now')")
-        count = overdue_recalls.iloc[0]['count'] if not overdue_recalls.empty else 0
+        overdue_recalls = execute_query(DASH_OVERDUE_RECALLS_SQL, mode="scalar")
+        count = overdue_recalls or 0
         st.markdown(f"""
         <div class="metric-card">
             <h3 class="status-urgent">{count}</h3>
@@ -1221,8 +1567,8 @@ elif st.session_state.current_tab == "Dashboard":
         """, unsafe_allow_html=True)
     
     with col4:
-        high_grade = execute_query("SELECT COUNT(DISTINCT PatientID) as count FROM tblPathology WHERE Barretts = 1 AND DysplasiaGrade LIKE '%High Grade%'")
-        count = high_grade.iloc[0]['count'] if not high_grade.empty else 0
+        high_grade = execute_query(DASH_HIGH_GRADE_SQL, mode="scalar")
+        count = high_grade or 0
         st.markdown(f"""
         <div class="metric-card">
             <h3 class="status-urgent">{count}</h3>
@@ -1239,16 +1585,10 @@ elif st.session_state.current_tab == "Dashboard":
         st.subheader("Recent Activity")
         
         # Recent procedures
-        recent_surgeries = execute_query("""
-            SELECT DATE(SurgeryDate) as date, COUNT(*) as count
-            FROM tblSurgicalHistory
-            WHERE SurgeryDate >= date('now', '-12 months')
-            GROUP BY DATE(SurgeryDate)
-            ORDER BY date
-        """)
+        recent_surgeries = execute_query(DASH_RECENT_SURGERIES_SQL)
         
         if not recent_surgeries.empty:
-            fig = px.line(recent_surgeries, x='date', y='count', 
+            fig = plotly_express().line(recent_surgeries, x='date', y='count', 
                          title="Surgical Procedures (Last 12 Months)")
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -1257,21 +1597,10 @@ elif st.session_state.current_tab == "Dashboard":
     with col2:
         st.subheader("Barrett's Surveillance Status")
         
-        surveillance_status = execute_query("""
-            SELECT 
-                CASE 
-                    WHEN Undecided = 1 THEN 'Undecided'
-                    WHEN NextBarrettsEGD < date('now') THEN 'Overdue'
-                    WHEN NextBarrettsEGD <= date('now', '+90 days') THEN 'Due Soon'
-                    ELSE 'Future'
-                END as status,
-                COUNT(*) as count
-            FROM tblSurveillance
-            GROUP BY status
-        """)
+        surveillance_status = execute_query(DASH_SURVEILLANCE_STATUS_SQL)
         
         if not surveillance_status.empty:
-            fig = px.pie(surveillance_status, values='count', names='status',
+            fig = plotly_express().pie(surveillance_status, values='count', names='status',
                         title="Surveillance Status Distribution")
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -1285,7 +1614,7 @@ elif st.session_state.current_tab == "Dashboard":
     
     with col1:
         if st.button("📄 Export All Patients"):
-            all_patients = execute_query("SELECT * FROM tblPatients ORDER BY LastName, FirstName")
+            all_patients = execute_query(EXPORT_ALL_PATIENTS_SQL)
             if not all_patients.empty:
                 csv_data = export_to_csv(all_patients, "all_patients.csv")
                 st.download_button(
@@ -1297,15 +1626,7 @@ elif st.session_state.current_tab == "Dashboard":
     
     with col2:
         if st.button("🔬 Export Barrett's Data"):
-            barrett_data = execute_query("""
-                SELECT P.LastName, P.FirstName, P.MRN, Path.PathologyDate, Path.DysplasiaGrade,
-                       S.NextBarrettsEGD, S.Undecided
-                FROM tblPatients P
-                JOIN tblPathology Path ON P.PatientID = Path.PatientID
-                LEFT JOIN tblSurveillance S ON P.PatientID = S.PatientID
-                WHERE Path.Barretts = 1
-                ORDER BY P.LastName, P.FirstName
-            """)
+            barrett_data = execute_query(EXPORT_BARRETTS_SQL)
             if not barrett_data.empty:
                 csv_data = export_to_csv(barrett_data, "barrett_surveillance.csv")
                 st.download_button(
@@ -1317,13 +1638,8 @@ elif st.session_state.current_tab == "Dashboard":
     
     with col3:
         if st.button("📞 Export Recalls"):
-            recalls_data = execute_query("""
-                SELECT P.LastName, P.FirstName, P.MRN, R.RecallDate, R.RecallReason, 
-                       R.Notes, R.Completed
-                FROM tblRecall R
-                JOIN tblPatients P ON R.PatientID = P.PatientID
-                ORDER BY R.RecallDate
-            """)
+            archive.attach(get_database_connection())
+            recalls_data = execute_query(EXPORT_RECALLS_SQL.format(table="vwRecallAll"))
             if not recalls_data.empty:
                 csv_data = export_to_csv(recalls_data, "recalls.csv")
                 st.download_button(
@@ -1342,25 +1658,24 @@ elif st.session_state.current_tab == "Recalls":
     with col1:
         recall_filter = st.selectbox("Filter by status:", ["All", "Overdue", "Due Today", "Due This Week", "Completed"])
     with col2:
-        reason_filter = st.selectbox("Filter by reason:", ["All", "Office Visit", "Endoscopy", "Barrett's Surveillance"])
+        reason_filter = st.selectbox("Filter by reason:", ["All"] + reference_data.options("recall_reason"))
     with col3:
         priority_filter = st.selectbox("Priority:", ["All", "Critical", "High", "Medium", "Low"])
     with col4:
         if st.button("🔄 Refresh"):
             st.rerun()
     
+    # Archived recalls are completed ones, so only those filters can show them
+    include_archived = recall_filter in ("All", "Completed") and st.checkbox("Include archived recalls")
+    if include_archived:
+        archive.attach(get_database_connection())
+    
     # Build query based on filters
     where_clauses = []
     params = []
     
-    if recall_filter == "Overdue":
-        where_clauses.append("R.Completed = 0 AND R.RecallDate < date('now')")
-    elif recall_filter == "Due Today":
-        where_clauses.append("R.Completed = 0 AND R.RecallDate = date('now')")
-    elif recall_filter == "Due This Week":
-        where_clauses.append("R.Completed = 0 AND R.RecallDate BETWEEN date('now') AND date('now', '+7 days')")
-    elif recall_filter == "Completed":
-        where_clauses.append("R.Completed = 1")
+    if recall_filter in RECALL_FILTER_SQL:
+        where_clauses.append(RECALL_FILTER_SQL[recall_filter])
     
     if reason_filter != "All":
         where_clauses.append("R.RecallReason = ?")
@@ -1368,27 +1683,27 @@ elif st.session_state.current_tab == "Recalls":
     
     where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
     
-    recalls_query = f"""
-        SELECT R.RecallID, R.RecallDate, R.RecallReason, R.Notes, R.Completed,
-               P.FirstName, P.LastName, P.MRN, P.PatientID
-        FROM tblRecall R
-        JOIN tblPatients P ON R.PatientID = P.PatientID
-        WHERE {where_clause}
-        ORDER BY R.RecallDate ASC
-    """
+    recalls_query = RECALLS_VIEW_SQL.format(table="vwRecallAll" if include_archived else "tblRecall",
+                                            archived="R.Archived" if include_archived else "0",
+                                            where=where_clause)
     
     recalls_df = execute_query(recalls_query, params)
     
+    # Plain dicts walk much faster than iterrows; the DataFrame is kept for export
+    recall_rows = recalls_df.to_dict("records")
+    recall_labels = {r['RecallID']: f"{r['LastName']}, {r['FirstName']} - {r['RecallReason']}" for r in recall_rows}
+    
     # Bulk actions
     if not recalls_df.empty:
         st.subheader("🔧 Bulk Actions")
         col1, col2, col3 = st.columns(3)
         
         with col1:
+            # Archived recalls live in the archive database - read only here
             selected_recalls = st.multiselect(
                 "Select recalls for bulk actions:",
-                options=recalls_df['RecallID'].tolist(),
-                format_func=lambda x: f"{recalls_df[recalls_df['RecallID']==x].iloc[0]['LastName']}, {recalls_df[recalls_df['RecallID']==x].iloc[0]['FirstName']} - {recalls_df[recalls_df['RecallID']==x].iloc[0]['RecallReason']}"
+                options=[r['RecallID'] for r in recall_rows if not r['Archived']],
+                format_func=lambda x: recall_labels[x]
             )
         
         with col2:
@@ -1422,7 +1737,7 @@ elif st.session_state.current_tab == "Recalls":
                 "text/csv"
             )
         
-        for _, recall in recalls_df.iterrows():
+        for recall in recall_rows:
             patient_name = f"{recall['LastName']}, {recall['FirstName']} ({recall['MRN']})"
             
             # Determine status color and priority
@@ -1436,11 +1751,7 @@ elif st.session_state.current_tab == "Recalls":
                     days_until = (recall_date - today).days
                     
                     # Check if patient has Barrett's for priority
-                    barrett_check = execute_query("""
-                        SELECT COUNT(*) as count FROM tblPathology 
-                        WHERE PatientID = ? AND Barretts = 1
-                    """, (recall['PatientID'],))
-                    has_barretts = not barrett_check.empty and barrett_check.iloc[0]['count'] > 0
+                    has_barretts = bool(execute_query(HAS_BARRETTS_SQL, (recall['PatientID'],), mode="scalar"))
                     
                     if days_until < 0:
                         status_class = "status-urgent"
@@ -1470,7 +1781,8 @@ elif st.session_state.current_tab == "Recalls":
             if priority_filter != "All" and priority != priority_filter:
                 continue
             
-            with st.expander(f"{patient_name} - {recall['RecallReason']} ({recall['RecallDate']}) - {priority}"):
+            archived_label = " - 🗄️ Archived" if recall['Archived'] else ""
+            with st.expander(f"{patient_name} - {recall['RecallReason']} ({recall['RecallDate']}) - {priority}{archived_label}"):
                 col1, col2, col3 = st.columns([2, 2, 1])
                 
                 with col1:
@@ -1479,6 +1791,8 @@ elif st.session_state.current_tab == "Recalls":
                     st.write(f"**Priority:** {priority}")
                     if recall['Notes']:
                         st.write(f"**Notes:** {recall['Notes']}")
+                    if recall['Archived']:
+                        st.write("**Archived:** yes (read only)")
                 
                 with col2:
                     if not recall['Completed']:
@@ -1503,7 +1817,7 @@ elif st.session_state.current_tab == "Recalls":
                         st.session_state.current_tab = "Demographics"
                         st.rerun()
                     
-                    if confirm_delete("recall", recall['RecallID']):
+                    if not recall['Archived'] and confirm_delete("recall", recall['RecallID']):
                         execute_query("DELETE FROM tblRecall WHERE RecallID = ?", 
                                     (recall['RecallID'],), fetch=False)
                         st.success("Recall deleted!")
@@ -1516,25 +1830,13 @@ elif st.session_state.current_tab == "Barrett's":
     st.header("🔬 Barrett's Surveillance Management")
     
     # Get Barrett's patients with surveillance status
-    barrett_query = """
-        SELECT DISTINCT
-            P.PatientID, P.FirstName, P.LastName, P.MRN,
-            Path.PathologyDate, Path.DysplasiaGrade,
-            S.NextBarrettsEGD, S.Undecided
-        FROM tblPatients P
-        JOIN tblPathology Path ON P.PatientID = Path.PatientID
-        LEFT JOIN (
-            SELECT PatientID, NextBarrettsEGD, Undecided,
-                   ROW_NUMBER() OVER (PARTITION BY PatientID ORDER BY LastModified DESC) as rn
-            FROM tblSurveillance
-        ) S ON P.PatientID = S.PatientID AND S.rn = 1
-        WHERE Path.Barretts = 1
-        ORDER BY P.LastName, P.FirstName
-    """
+    barrett_query = BARRETTS_VIEW_SQL
     
     barrett_df = execute_query(barrett_query)
     
     if not barrett_df.empty:
+        barrett_rows = barrett_df.to_dict("records")
+        
         # Summary metrics
         col1, col2, col3, col4 = st.columns(4)
         
@@ -1548,7 +1850,7 @@ elif st.session_state.current_tab == "Barrett's":
         
         with col3:
             overdue_count = 0
-            for _, row in barrett_df.iterrows():
+            for row in barrett_rows:
                 if not row['Undecided'] and row['NextBarrettsEGD']:
                     try:
                         egd_date = datetime.strptime(row['NextBarrettsEGD'], "%Y-%m-%d").date()
@@ -1589,7 +1891,7 @@ elif st.session_state.current_tab == "Barrett's":
         # Patient list
         st.subheader("Barrett's Patients")
         
-        for _, patient in barrett_df.iterrows():
+        for patient in barrett_rows:
             # Apply filters
             if grade_filter != "All" and patient['DysplasiaGrade'] != grade_filter:
                 continue
@@ -1671,6 +1973,370 @@ elif st.session_state.current_tab == "Barrett's":
     else:
         st.info("No Barrett's patients found in the database")
 
+elif st.session_state.current_tab == "Cohorts":
+    # Research cohorts - criteria compile to one query (cohort.py)
+    st.header("🧬 Cohort Builder")
+    st.caption("Combine criteria across demographics, surgeries, diagnostics, pathology and recalls")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        gender = st.selectbox("Gender:", ["Any"] + reference_data.options("gender"))
+    with col2:
+        min_age = st.number_input("Minimum age", min_value=0, max_value=120, value=0)
+    with col3:
+        max_age = st.number_input("Maximum age", min_value=0, max_value=120, value=120)
+    
+    st.subheader("🏥 Surgery")
+    procedure_names = {column: name for column, _, name in procedures.PROCEDURES}
+    chosen_procedures = st.multiselect("Had any of these procedures:", procedures.COLUMNS,
+                                       format_func=procedure_names.get)
+    timing_options = {"Any time": None, "Before the surgery": "before", "After the surgery": "after"}
+    
+    st.subheader("🧪 Diagnostics")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        demeester_above = st.number_input("DeMeester score above", min_value=0.0, max_value=500.0, value=0.0, step=0.1)
+    with col2:
+        retained_above = st.number_input("% retained at 4h above", min_value=0.0, max_value=100.0, value=0.0, step=1.0)
+    with col3:
+        diagnostic_timing = st.selectbox("Test timing:", list(timing_options), disabled=not chosen_procedures)
+    
+    st.subheader("🔬 Pathology")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        barretts = st.checkbox("Barrett's esophagus")
+        eoe = st.checkbox("Eosinophilic esophagitis")
+    with col2:
+        grades = st.multiselect("Dysplasia grade:", reference_data.options("dysplasia_grade"))
+    with col3:
+        pathology_timing = st.selectbox("Pathology timing:", list(timing_options), disabled=not chosen_procedures)
+    
+    st.subheader("📞 Recalls")
+    recall_rule = st.selectbox("Recall status:", ["Any", "Has an open recall", "No open recall"])
+    
+    # Build the cohort definition
+    patient_conditions = []
+    if gender != "Any":
+        patient_conditions.append(("Gender", "=", gender))
+    if min_age > 0:
+        patient_conditions.append(("Age", ">=", min_age))
+    if max_age < 120:
+        patient_conditions.append(("Age", "<=", max_age))
+    
+    criteria = []
+    surgery_set = {"any_of": chosen_procedures}
+    if chosen_procedures:
+        criteria.append({"source": "surgery", "procedures": surgery_set})
+    
+    def timed(criterion, timing_label):
+        relation = timing_options[timing_label] if chosen_procedures else None
+        if relation:
+            criterion["timing"] = {"relation": relation, "procedures": surgery_set}
+        return criterion
+    
+    if demeester_above > 0:
+        criteria.append(timed({"source": "diagnostics", "where": [("DeMeesterValue", ">", demeester_above)]},
+                              diagnostic_timing))
+    if retained_above > 0:
+        criteria.append(timed({"source": "diagnostics", "where": [("PercentRetained4hValue", ">", retained_above)]},
+                              diagnostic_timing))
+    pathology_conditions = []
+    if barretts:
+        pathology_conditions.append(("Barretts", "=", 1))
+    if eoe:
+        pathology_conditions.append(("EoE", "=", 1))
+    if grades:
+        pathology_conditions.append(("DysplasiaGrade", "in", grades))
+    if pathology_conditions:
+        criteria.append(timed({"source": "pathology", "where": pathology_conditions}, pathology_timing))
+    if recall_rule != "Any":
+        criteria.append({"source": "recall", "where": [("Completed", "=", 0)],
+                         "exclude": recall_rule == "No open recall"})
+    
+    spec = {"patient": patient_conditions, "criteria": criteria}
+    conn = get_database_connection()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📏 Estimate Size", use_container_width=True):
+            try:
+                guess = cohort.estimate(conn, spec)
+                st.info(f"About {guess['estimate']:,} of {guess['total']:,} patients "
+                        f"(at most {guess['upper_bound']:,})")
+                for label, matched in guess["criteria"]:
+                    st.caption(f"{label}: {matched:,} patients")
+            except Exception as e:
+                st.error(f"Could not estimate cohort: {str(e)}")
+    with col2:
+        if st.button("🧬 Build Cohort", type="primary", use_container_width=True):
+            try:
+                st.session_state.cohort_id = cohort.materialize(conn, spec)[0]
+            except Exception as e:
+                st.error(f"Could not build cohort: {str(e)}")
+    
+    cohort_id = st.session_state.get("cohort_id")
+    if cohort_id:
+        # Refreshes itself if the records it depends on changed since it was built
+        stored = execute_query("SELECT Definition FROM tblCohorts WHERE CohortID = ?", (cohort_id,), mode="scalar")
+        if stored:
+            cohort_id, patient_count = cohort.materialize(conn, json.loads(stored))
+            st.success(f"✅ Cohort: {patient_count:,} patients")
+            shown = cohort.members(conn, cohort_id, limit=500)
+            if shown:
+                members_df = pd.DataFrame([dict(zip(row.keys(), row)) for row in shown])
+                st.dataframe(members_df, use_container_width=True, hide_index=True)
+                if patient_count > len(shown):
+                    st.caption(f"Showing the first {len(shown)} - download the CSV for all {patient_count:,}")
+                all_members = execute_query("""
+                    SELECT P.PatientID, P.LastName, P.FirstName, P.MRN, P.DOB, P.Gender
+                    FROM tblCohortMembers C
+                    JOIN tblPatients P ON P.PatientID = C.PatientID
+                    WHERE C.CohortID = ?
+                    ORDER BY P.LastName, P.FirstName
+                """, (cohort_id,))
+                st.download_button("📥 Download Cohort CSV", all_members.to_csv(index=False),
+                                   file_name=f"cohort_{cohort_id}.csv", mime="text/csv")
+
+elif st.session_state.current_tab == "Outcomes":
+    # GERD-HRQL before vs after surgery - aggregates come from tblHRQLOutcomes (outcomes.py)
+    st.header("📉 HRQL Outcomes")
+    st.caption("GERD-HRQL in the year before surgery vs. about one year after (lower is better)")
+    
+    try:
+        version = outcomes.refresh(get_database_connection())
+    except Exception as e:
+        st.error(f"Database error: {str(e)}")
+        version = None
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        group_label = st.radio("Group by:", ["Procedure", "Surgeon"], horizontal=True)
+    with col2:
+        periods = {"All surgeries": None, "Last year": 1, "Last 3 years": 3, "Last 5 years": 5}
+        period = st.selectbox("Surgeries:", list(periods))
+    by = "ProcedureGroup" if group_label == "Procedure" else "Surgeon"
+    since = None
+    if periods[period]:
+        since = (date.today() - timedelta(days=365 * periods[period])).isoformat()
+    
+    summary = load_outcome_summary(by, since, version) if version is not None else pd.DataFrame()
+    paired = int(summary["Paired"].sum()) if not summary.empty else 0
+    
+    if not paired:
+        st.info("No surgeries with both a pre-op and a follow-up HRQL score yet")
+    else:
+        scored = summary[summary["Paired"] > 0]
+        weights = scored["Paired"] / paired
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Surgeries", f"{int(summary['Surgeries'].sum()):,}")
+        col2.metric("With pre/post scores", f"{paired:,}")
+        col3.metric("Mean improvement", f"{(scored['MeanImprovement'] * weights).sum():.1f}")
+        col4.metric("Score halved", f"{(scored['PctHalved'] * weights).sum():.0f}%")
+        
+        chart_data = scored.melt(id_vars=[group_label], value_vars=["MeanPre", "MeanPost"],
+                                 var_name="When", value_name="Mean HRQL")
+        chart_data["When"] = chart_data["When"].map({"MeanPre": "Pre-op", "MeanPost": "Post-op"})
+        fig = plotly_express().bar(chart_data, x=group_label, y="Mean HRQL", color="When", barmode="group",
+                                   title=f"Mean GERD-HRQL by {group_label.lower()}")
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.dataframe(summary.rename(columns={
+            "MeanPre": "Mean Pre-op", "MeanPost": "Mean Post-op",
+            "MeanImprovement": "Mean Improvement", "PctHalved": "% Score Halved",
+        }), use_container_width=True, hide_index=True)
+        
+        trend = load_outcome_trend(by, since, version)
+        if not trend.empty:
+            fig = plotly_express().line(trend, x="Year", y="MeanImprovement", color=group_label, markers=True,
+                                        hover_data=["Paired"], title="Mean HRQL improvement by surgery year")
+            st.plotly_chart(fig, use_container_width=True)
+
+elif st.session_state.current_tab == "Surgeons":
+    # Surgical volume and procedure mix - slices of tblSurgeryCube (surgery_cube.py)
+    st.header("🩺 Surgeon Analytics")
+    st.caption("Surgical volume by surgeon, procedure, month, hernia repair and mesh")
+    
+    conn = get_database_connection()
+    first_month, last_month = surgery_cube.month_range(conn)
+    if not first_month:
+        st.info("No dated surgeries recorded yet")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            chosen_surgeons = st.multiselect("Surgeons:", surgery_cube.surgeons(conn),
+                                             format_func=lambda name: name or "Unknown",
+                                             placeholder="All surgeons")
+        with col2:
+            first_year, last_year = int(first_month[:4]), int(last_month[:4])
+            if first_year < last_year:
+                years = st.slider("Years:", first_year, last_year, (max(first_year, last_year - 4), last_year))
+            else:
+                years = (first_year, last_year)
+        
+        col1, col2, col3 = st.columns(3)
+        procedure_names = {column: name for column, _, name in procedures.PROCEDURES}
+        with col1:
+            chosen_procedures = st.multiselect("Any of these procedures:", surgery_cube.PROCEDURE_COLUMNS,
+                                               format_func=procedure_names.get, placeholder="All procedures")
+        with col2:
+            hernia = st.selectbox("Hernia repair:", ["Any", "Hiatal", "Paraesophageal", "None"])
+        with col3:
+            mesh = st.selectbox("Mesh:", ["Any", "Mesh", "No mesh"])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            rows_by = st.selectbox("Show by:", ["Month", "Year", "Surgeon", "Procedure", "Hernia", "Mesh"], index=1)
+        with col2:
+            split_by = st.selectbox("Split by:", ["Nothing"] + [d for d in surgery_cube.DIMENSIONS if d not in ("Month", "Year", rows_by)],
+                                    index=1)
+        
+        dimensions = [rows_by] + ([split_by] if split_by != "Nothing" else [])
+        cells = surgery_cube.counts(
+            conn, dimensions, surgeons=chosen_surgeons or None,
+            since=f"{years[0]}-01", until=f"{years[1]}-12", any_of=chosen_procedures,
+            hernia=None if hernia == "Any" else hernia,
+            mesh=None if mesh == "Any" else mesh == "Mesh",
+        )
+        
+        if not cells:
+            st.info("No surgeries match these filters")
+        else:
+            volume = pd.DataFrame([tuple(cell) for cell in cells], columns=dimensions + ["Surgeries"])
+            total = surgery_cube.counts(
+                conn, [], surgeons=chosen_surgeons or None,
+                since=f"{years[0]}-01", until=f"{years[1]}-12", any_of=chosen_procedures,
+                hernia=None if hernia == "Any" else hernia,
+                mesh=None if mesh == "Any" else mesh == "Mesh",
+            )
+            st.metric("Surgeries", f"{total[0]['Surgeries'] or 0:,}")
+            if "Procedure" in dimensions:
+                st.caption("A surgery with several procedures is counted under each of them")
+            
+            color = split_by if split_by != "Nothing" else None
+            if rows_by in ("Month", "Year"):
+                fig = plotly_express().line(volume, x=rows_by, y="Surgeries", color=color, markers=True,
+                                            title=f"Surgeries by {rows_by.lower()}")
+            else:
+                fig = plotly_express().bar(volume, x=rows_by, y="Surgeries", color=color,
+                                           title=f"Surgeries by {rows_by.lower()}")
+            st.plotly_chart(fig, use_container_width=True)
+            
+            if color:
+                table = volume.pivot_table(index=rows_by, columns=color, values="Surgeries", fill_value=0)
+                st.dataframe(table, use_container_width=True)
+            else:
+                st.dataframe(volume, use_container_width=True, hide_index=True)
+
+elif st.session_state.current_tab == "Referrals":
+    # New consults by ZIP3, referral source and month - from tblReferralRollup (referrals.py)
+    st.header("🗺️ Referral Trends")
+    st.caption("New consults by referral source and ZIP3 region (first three digits of the ZIP code)")
+    
+    conn = get_database_connection()
+    version = execute_query("SELECT MAX(ActivityID) FROM tblActivityLog", mode="scalar") or 0
+    first_month, last_month = referrals.month_range(conn)
+    if not first_month:
+        st.info("No patients with an initial consult date yet")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            first_year, last_year = int(first_month[:4]), int(last_month[:4])
+            if first_year < last_year:
+                years = st.slider("Consult years:", first_year, last_year, (max(first_year, last_year - 2), last_year))
+            else:
+                years = (first_year, last_year)
+        with col2:
+            chosen_sources = st.multiselect("Referral sources:", referrals.values(conn, "Source"),
+                                            format_func=lambda value: value or "Unknown", placeholder="All sources")
+        with col3:
+            chosen_zip3s = st.multiselect("ZIP3 regions:", referrals.values(conn, "Zip3"),
+                                          format_func=lambda value: value or "Unknown", placeholder="All regions")
+        since, until = f"{years[0]}-01", f"{years[1]}-12"
+        filters = (tuple(chosen_sources), tuple(chosen_zip3s))
+        
+        total = load_referral_counts((), *filters, since, until, version)
+        consults = int(total["Consults"].iloc[0] or 0) if not total.empty else 0
+        
+        # Last 12 full months against the 12 before them
+        this_month = date.today().replace(day=1)
+        recent_start = (this_month - timedelta(days=365)).strftime("%Y-%m")
+        prior_start = (this_month - timedelta(days=730)).strftime("%Y-%m")
+        last_full = (this_month - timedelta(days=1)).strftime("%Y-%m")
+        before_recent = (date.fromisoformat(recent_start + "-01") - timedelta(days=1)).strftime("%Y-%m")
+        recent = load_referral_counts(("Zip3",), *filters, recent_start, last_full, version)
+        prior = load_referral_counts(("Zip3",), *filters, prior_start, before_recent, version)
+        recent_total, prior_total = int(recent["Consults"].sum()), int(prior["Consults"].sum())
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Consults in range", f"{consults:,}")
+        col2.metric("Last 12 months", f"{recent_total:,}",
+                    f"{(recent_total - prior_total) / prior_total:+.0%}" if prior_total else None)
+        col3.metric("Regions", f"{len(recent):,}")
+        
+        if consults:
+            granularity = st.radio("Show by:", ["Month", "Quarter", "Year"], horizontal=True)
+            trend = load_referral_counts((granularity, "Source"), *filters, since, until, version)
+            fig = plotly_express().line(trend, x=granularity, y="Consults", color="Source", markers=True,
+                                        title="New consults by referral source")
+            st.plotly_chart(fig, use_container_width=True)
+            
+            regions = load_referral_counts(("Zip3", "Source"), *filters, since, until, version)
+            top = regions.groupby("Zip3")["Consults"].sum().nlargest(15).index
+            fig = plotly_express().bar(regions[regions["Zip3"].isin(top)], x="Zip3", y="Consults", color="Source",
+                                       title="Top ZIP3 regions", category_orders={"Zip3": list(top)})
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.subheader("Regions: last 12 months vs. the 12 before")
+            change = recent.merge(prior, on="Zip3", how="outer", suffixes=(" (last 12 mo)", " (prior 12 mo)")).fillna(0)
+            change["Change"] = change["Consults (last 12 mo)"] - change["Consults (prior 12 mo)"]
+            st.dataframe(change.sort_values("Consults (last 12 mo)", ascending=False),
+                         use_container_width=True, hide_index=True)
+
+elif st.session_state.current_tab == "Progression":
+    # Time from first graded Barrett's biopsy to dysplasia (progression.py)
+    st.header("⏱️ Dysplasia Progression")
+    st.caption("Time from each patient's first graded Barrett's biopsy to the endpoint grade; "
+               "patients already at the endpoint at baseline are left out")
+    
+    endpoint = st.radio("Endpoint:", list(progression.ENDPOINTS), horizontal=True,
+                        format_func=lambda key: progression.ENDPOINTS[key][0])
+    result = progression.analyze(get_database_connection(), endpoint)
+    
+    if not result["patients"]:
+        st.info("No patients with a graded Barrett's biopsy below the endpoint")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Patients at risk", f"{result['patients']:,}")
+        col2.metric("Progressed", f"{result['events']:,}")
+        col3.metric("Per 100 patient-years",
+                    f"{result['rate_per_100py']:.2f}" if result["rate_per_100py"] is not None else "-")
+        col4.metric("Median time", f"{result['median_years']:.1f} yrs" if result["median_years"] is not None else "Not reached")
+        
+        curves = pd.concat([pd.DataFrame({"Years": curve["time"], "Progression-free": curve["survival"],
+                                          "At risk": curve["at_risk"], "Group": name})
+                            for name, curve in result["curves"].items()])
+        fig = plotly_express().line(curves, x="Years", y="Progression-free", color="Group", line_shape="hv",
+                                    hover_data=["At risk"], title=f"Free of {result['endpoint'].lower()} (Kaplan-Meier)")
+        fig.update_yaxes(tickformat=".0%", range=[0, 1.02])
+        st.plotly_chart(fig, use_container_width=True)
+        
+        overall = result["curves"]["All patients"]
+        milestones = []
+        for year in (1, 3, 5, 10):
+            survival, lower, upper = progression.survival_at(overall, year)
+            milestones.append({"Year": year, "Progression-free": f"{survival:.1%}", "95% CI": f"{lower:.1%} - {upper:.1%}"})
+        st.dataframe(pd.DataFrame(milestones), use_container_width=True, hide_index=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Grade at next biopsy")
+            st.dataframe(pd.DataFrame(result["transitions"], index=progression.LEVEL_NAMES,
+                                      columns=progression.LEVEL_NAMES), use_container_width=True)
+        with col2:
+            st.subheader("Most common grade paths")
+            st.dataframe(pd.DataFrame(result["sequences"], columns=["Path", "Patients"]),
+                         use_container_width=True, hide_index=True)
+
 else:
     # Default view - Search/Welcome
     st.header("🔍 Search for a Patient")
@@ -1683,79 +2349,42 @@ else:
         st.subheader("📊 Quick Statistics")
         
         # Recent activity
-        recent_patients = execute_query("""
-            SELECT COUNT(*) as count
-            FROM tblPatients
-            WHERE InitialConsultDate >= date('now', '-30 days')
-        """)
-        
-        recent_surgeries = execute_query("""
-            SELECT COUNT(*) as count
-            FROM tblSurgicalHistory
-            WHERE SurgeryDate >= date('now', '-30 days')
-        """)
-        
-        recent_pathology = execute_query("""
-            SELECT COUNT(*) as count
-            FROM tblPathology
-            WHERE PathologyDate >= date('now', '-30 days')
-        """)
-        
-        if not recent_patients.empty:
-            st.metric("New Patients (30 days)", recent_patients.iloc[0]['count'])
-        if not recent_surgeries.empty:
-            st.metric("Recent Surgeries (30 days)", recent_surgeries.iloc[0]['count'])
-        if not recent_pathology.empty:
-            st.metric("Recent Pathology (30 days)", recent_pathology.iloc[0]['count'])
+        recent_patients = execute_query(HOME_NEW_PATIENTS_SQL, mode="scalar")
+        
+        recent_surgeries = execute_query(HOME_RECENT_SURGERIES_SQL, mode="scalar")
+        
+        recent_pathology = execute_query(HOME_RECENT_PATHOLOGY_SQL, mode="scalar")
+        
+        if recent_patients is not None:
+            st.metric("New Patients (30 days)", recent_patients)
+        if recent_surgeries is not None:
+            st.metric("Recent Surgeries (30 days)", recent_surgeries)
+        if recent_pathology is not None:
+            st.metric("Recent Pathology (30 days)", recent_pathology)
     
     with col2:
         st.subheader("🚨 Urgent Items")
         
         # High-priority alerts
-        high_grade_overdue = execute_query("""
-            SELECT COUNT(DISTINCT P.PatientID) as count
-            FROM tblPatients P
-            JOIN tblPathology Path ON P.PatientID = Path.PatientID
-            LEFT JOIN tblSurveillance S ON P.PatientID = S.PatientID
-            WHERE Path.Barretts = 1 
-            AND Path.DysplasiaGrade LIKE '%High Grade%'
-            AND (S.NextBarrettsEGD IS NULL OR S.NextBarrettsEGD < date('now'))
-        """)
-        
-        overdue_recalls_today = execute_query("""
-            SELECT COUNT(*) as count
-            FROM tblRecall
-            WHERE Completed = 0 AND RecallDate <= date('now')
-        """)
-        
-        if not high_grade_overdue.empty:
-            count = high_grade_overdue.iloc[0]['count']
-            if count > 0:
-                st.error(f"🚨 {count} High-Grade Dysplasia patients need surveillance")
-        
-        if not overdue_recalls_today.empty:
-            count = overdue_recalls_today.iloc[0]['count']
-            if count > 0:
-                st.warning(f"⚠️ {count} Overdue recalls")
+        high_grade_overdue = execute_query(HOME_HIGH_GRADE_OVERDUE_SQL, mode="scalar")
+        
+        overdue_recalls_today = execute_query(HOME_OVERDUE_RECALLS_SQL, mode="scalar")
+        
+        if high_grade_overdue:
+            st.error(f"🚨 {high_grade_overdue} High-Grade Dysplasia patients need surveillance")
+        
+        if overdue_recalls_today:
+            st.warning(f"⚠️ {overdue_recalls_today} Overdue recalls")
     
     st.divider()
     
     # Recent patients for quick access
     st.subheader("📋 Recently Modified Patients")
-    recent_modified = execute_query("""
-        SELECT DISTINCT P.PatientID, P.FirstName, P.LastName, P.MRN,
-               MAX(COALESCE(D.TestDate, S.SurgeryDate, Path.PathologyDate, P.InitialConsultDate)) as LastActivity
-        FROM tblPatients P
-        LEFT JOIN tblDiagnostics D ON P.PatientID = D.PatientID
-        LEFT JOIN tblSurgicalHistory S ON P.PatientID = S.PatientID
-        LEFT JOIN tblPathology Path ON P.PatientID = Path.PatientID
-        GROUP BY P.PatientID, P.FirstName, P.LastName, P.MRN
-        ORDER BY LastActivity DESC
-        LIMIT 10
-    """)
-    
-    if not recent_modified.empty:
-        for _, patient in recent_modified.iterrows():
+    # tblPatientActivity is kept current by triggers (see schema.py), so this walks one index
+    recent_modified = execute_query(HOME_RECENTLY_MODIFIED_SQL, mode="records")
+    
+    if recent_modified:
+        for patient in recent_modified:
             patient_display = f"{patient['LastName']}, {patient['FirstName']} ({patient['MRN']}) - Last activity: {patient['LastActivity']}"
             if st.button(patient_display, key=f"recent_{patient['PatientID']}", use_container_width=True):
                 st.session_state.selected_patient = patient['PatientID']
@@ -1771,15 +2400,9 @@ with col1:
 with col2:
     # Database info
     try:
-        db_stats = execute_query("""
-            SELECT 
-                (SELECT COUNT(*) FROM tblPatients) as patients,
-                (SELECT COUNT(*) FROM tblDiagnostics) as diagnostics,
-                (SELECT COUNT(*) FROM tblSurgicalHistory) as surgeries,
-                (SELECT COUNT(*) FROM tblPathology) as pathology
-        """)
-        if not db_stats.empty:
-            stats = db_stats.iloc[0]
+        db_stats = execute_query(DB_STATS_SQL, mode="records")
+        if db_stats:
+            stats = db_stats[0]
             st.caption(f"Database: {stats['patients']} patients, {stats['diagnostics']} diagnostics, {stats['surgeries']} surgeries, {stats['pathology']} pathology")
     except:
         st.caption("Database connection active")
\ No newline at end of file
@@ -0,0 +1,168 @@
+# surgery_cube.py - Surgeon x procedure x month counts, kept current by triggers
+#
+# tblSurgeryCube holds one row per (surgeon, month, procedure combination)
+# with the number of surgeries in it. Triggers on tblSurgicalHistory (see
+# cube_triggers) add and remove counts as surgeries are saved, edited or
+# deleted, so the cube never needs a rebuild. The procedure combination is
+# the ProcedureMask, so hernia repair and mesh are part of it too.
+#
+# A slice is a GROUP BY over a few thousand cube rows instead of the whole
+# surgical history:
+#
+#     surgery_cube.counts(conn, ["Surgeon", "Year"], any_of=["Nissen", "Toupet"])
+#     surgery_cube.counts(conn, ["Procedure"], surgeons=["Smith"], mesh=True)
+
+import database
+import procedures
+
+# Hernia and mesh have their own dimensions; "Procedure" covers the rest
+HERNIA_COLUMNS = ["HiatalHernia", "ParaesophagealHernia"]
+MESH_COLUMN = "MeshUsed"
+PROCEDURE_COLUMNS = [column for column in procedures.COLUMNS
+                     if column not in HERNIA_COLUMNS and column != MESH_COLUMN]
+
+HIATAL, PARA, MESH = (procedures.BITS[column] for column in HERNIA_COLUMNS + [MESH_COLUMN])
+
+# Dimension: SQL over the cube row C (and B, the procedure a surgery is counted under)
+DIMENSIONS = {
+    "Surgeon": "COALESCE(NULLIF(C.Surgeon, ''), 'Unknown')",
+    "Month": "C.Month",
+    "Year": "substr(C.Month, 1, 4)",
+    "Procedure": "B.Label",
+    "Hernia": f"""CASE WHEN C.ProcedureMask & {PARA} THEN 'Paraesophageal'
+                       WHEN C.ProcedureMask & {HIATAL} THEN 'Hiatal' ELSE 'None' END""",
+    "Mesh": f"CASE WHEN C.ProcedureMask & {MESH} THEN 'Mesh' ELSE 'No mesh' END",
+}
+
+MONTH_SQL = "substr({row}.SurgeryDate, 1, 7)"
+CUBE_COLUMNS = ["ProcedureMask", "SurgerySurgeon", "SurgeryDate"] + procedures.COLUMNS
+
+
+def _count(row, delta):
+    """Statements adding delta surgeries to row's (NEW/OLD) cell"""
+    month = MONTH_SQL.format(row=row)
+    sql = f"""
+        INSERT INTO tblSurgeryCube (Surgeon, Month, ProcedureMask, Surgeries)
+        VALUES (COALESCE({row}.SurgerySurgeon, ''), {month}, {row}.ProcedureMask, {delta})
+        ON CONFLICT(Surgeon, Month, ProcedureMask) DO UPDATE SET Surgeries = Surgeries + ({delta});"""
+    if delta < 0:
+        sql += f"""
+        DELETE FROM tblSurgeryCube
+        WHERE Surgeon = COALESCE({row}.SurgerySurgeon, '') AND Month = {month}
+          AND ProcedureMask = {row}.ProcedureMask AND Surgeries <= 0;"""
+    return sql
+
+
+def cube_triggers():
+    """Triggers keeping tblSurgeryCube in step with tblSurgicalHistory"""
+    where = "WHEN {row}.SurgeryDate IS NOT NULL AND {row}.SurgeryDate != ''"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_surgery_cube_insert AFTER INSERT ON tblSurgicalHistory
+            {where.format(row="NEW")}
+            BEGIN {_count("NEW", 1)} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_surgery_cube_delete AFTER DELETE ON tblSurgicalHistory
+            {where.format(row="OLD")}
+            BEGIN {_count("OLD", -1)} END""",
+        # An edit moves the surgery from its old cell to its new one; the two
+        # halves are separate triggers so an undated side is simply skipped
+        f"""CREATE TRIGGER IF NOT EXISTS trg_surgery_cube_update_old
+            AFTER UPDATE OF {", ".join(CUBE_COLUMNS[1:])} ON tblSurgicalHistory
+            {where.format(row="OLD")}
+            BEGIN {_count("OLD", -1)} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_surgery_cube_update_new
+            AFTER UPDATE OF {", ".join(CUBE_COLUMNS[1:])} ON tblSurgicalHistory
+            {where.format(row="NEW")}
+            BEGIN {_count("NEW", 1)} END""",
+    ]
+
+
+def rebuild(conn):
+    """Recount the whole cube from tblSurgicalHistory; caller commits"""
+    conn.execute("DELETE FROM tblSurgeryCube")
+    conn.execute(f"""
+        INSERT INTO tblSurgeryCube (Surgeon, Month, ProcedureMask, Surgeries)
+        SELECT COALESCE(SurgerySurgeon, ''), {MONTH_SQL.format(row="tblSurgicalHistory")}, ProcedureMask, COUNT(*)
+        FROM tblSurgicalHistory
+        WHERE SurgeryDate IS NOT NULL AND SurgeryDate != ''
+        GROUP BY 1, 2, 3
+    """)
+
+
+def _procedure_labels():
+    """VALUES rows of (bit, label) for the Procedure dimension"""
+    return ", ".join(f"({procedures.BITS[column]}, '{label}')"
+                     for column, _, label in procedures.PROCEDURES if column in PROCEDURE_COLUMNS)
+
+
+def masks(conn, all_of=(), any_of=(), none_of=(), hernia=None, mesh=None):
+    """Cube masks for a procedure filter. hernia: "Hiatal", "Paraesophageal",
+    "None" or None for any; mesh: True, False or None for any"""
+    found = [row[0] for row in conn.execute("SELECT DISTINCT ProcedureMask FROM tblSurgeryCube")]
+    wanted = []
+    for mask in found:
+        if not procedures.matches(mask, all_of, any_of, none_of):
+            continue
+        kind = "Paraesophageal" if mask & PARA else "Hiatal" if mask & HIATAL else "None"
+        if hernia and kind != hernia:
+            continue
+        if mesh is not None and bool(mask & MESH) != mesh:
+            continue
+        wanted.append(mask)
+    return wanted
+
+
+def counts(conn, dimensions, surgeons=None, since=None, until=None,
+           all_of=(), any_of=(), none_of=(), hernia=None, mesh=None):
+    """[database.Record] with the dimension columns and Surgeries, for the filter.
+
+    since/until are "YYYY-MM" months (inclusive). With "Procedure" as a
+    dimension a surgery counts once under each procedure it included.
+    """
+    for dimension in dimensions:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+    clauses, params = ["1=1"], []
+    if surgeons:
+        clauses.append(f"C.Surgeon IN ({', '.join('?' * len(surgeons))})")
+        params.extend(surgeons)
+    if since:
+        clauses.append("C.Month >= ?")
+        params.append(since)
+    if until:
+        clauses.append("C.Month <= ?")
+        params.append(until)
+    if all_of or any_of or none_of or hernia or mesh is not None:
+        wanted = masks(conn, all_of, any_of, none_of, hernia, mesh)
+        if not wanted:
+            return []
+        clauses.append(f"C.ProcedureMask IN ({', '.join('?' * len(wanted))})")
+        params.extend(wanted)
+
+    return database.fetch_records(conn.execute(slice_sql(dimensions, clauses), params))
+
+
+def slice_sql(dimensions, clauses=("1=1",)):
+    """SELECT summing Surgeries by dimensions over the cube rows matching clauses"""
+    labels, join = "", ""
+    if "Procedure" in dimensions:
+        labels = f"WITH B(Bit, Label) AS (VALUES {_procedure_labels()})"
+        join = "JOIN B ON C.ProcedureMask & B.Bit"
+    select = ", ".join(f"{DIMENSIONS[dimension]} AS {dimension}" for dimension in dimensions)
+    group = ", ".join(str(i + 1) for i in range(len(dimensions)))
+    return f"""
+        {labels}
+        SELECT {select}{", " if select else ""}SUM(C.Surgeries) AS Surgeries
+        FROM tblSurgeryCube C {join}
+        WHERE {" AND ".join(clauses)}
+        {f"GROUP BY {group} ORDER BY {group}" if group else ""}
+    """
+
+
+def surgeons(conn):
+    """Surgeons with at least one surgery in the cube"""
+    return [row[0] for row in conn.execute("SELECT DISTINCT Surgeon FROM tblSurgeryCube ORDER BY Surgeon")]
+
+
+def month_range(conn):
+    """(first, last) month in the cube, or (None, None)"""
+    return conn.execute("SELECT MIN(Month), MAX(Month) FROM tblSurgeryCube").fetchone()
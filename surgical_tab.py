@@ -1,16 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
+import database
+import procedures
+import ui_profiler
 from add_surgical import open_add_surgical
-from scrollable_frame import ScrollableFrame
+from record_list import RecordList
 
+SURGERIES_SQL = """
+    SELECT SurgeryID, SurgeryDate, SurgerySurgeon, ProcedureMask
+    FROM tblSurgicalHistory
+    WHERE PatientID = ?
+    ORDER BY SurgeryDate DESC
+"""
+
+
+@ui_profiler.profiled("tab:surgical")
 def build(tab_frame, patient_id, tabs=None):
     for widget in tab_frame.winfo_children():
         widget.destroy()
 
-    scroll = ScrollableFrame(tab_frame)
-    scroll.pack(fill="both", expand=True)
-    scrollable_frame = scroll.scrollable_frame
     expanded_frame = None
 
     # Enhanced refresh callback for add surgical
@@ -26,61 +34,45 @@ def build(tab_frame, patient_id, tabs=None):
         
         open_add_surgical(tab_frame, patient_id, refresh_callback=refresh_callback)
 
-    tk.Button(scrollable_frame, text="Add Surgical", command=add_surgical_with_refresh).grid(row=0, column=0, columnspan=5, pady=10, sticky="w")
+    toolbar = tk.Frame(tab_frame)
+    toolbar.pack(fill="x", padx=5)
+    tk.Button(toolbar, text="Add Surgical", command=add_surgical_with_refresh).pack(side="left", pady=10)
+
+    records = RecordList(
+        tab_frame,
+        columns=[("date", "Date", 120), ("surgeon", "Surgeon", 150), ("procedures", "Procedures", 380)],
+        actions=[
+            ("View", lambda s: expand_entry(s, False)),
+            ("Edit", lambda s: expand_entry(s, True)),
+            None,
+            ("Delete", lambda s: delete_surgery(s)),
+        ],
+        on_open=lambda s: expand_entry(s, False),
+        on_delete=lambda s: delete_surgery(s),
+        empty_text="No surgical history recorded",
+    )
+    records.pack(fill="both", expand=True, padx=5, pady=(0, 5))
 
     def load_surgeries():
-        nonlocal expanded_frame
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT SurgeryID, SurgeryDate, SurgerySurgeon,
-                   HiatalHernia, ParaesophagealHernia, MeshUsed, GastricBypass, SleeveGastrectomy,
-                   Toupet, TIF, Nissen, Dor, HellerMyotomy, Stretta, Ablation, LINX,
-                   GPOEM, EPOEM, ZPOEM, Pyloroplasty, Revision, GastricStimulator, Dilation, Other,
-                   Notes
-            FROM tblSurgicalHistory
-            WHERE PatientID = ?
-            ORDER BY SurgeryDate DESC
-        """, (patient_id,))
+        cursor.execute(SURGERIES_SQL, (patient_id,))
         rows = cursor.fetchall()
+        ui_profiler.note(rows=len(rows))
         conn.close()
 
-        # Spacer to prevent column shifting
-        scrollable_frame.grid_columnconfigure(0, minsize=150)
-        scrollable_frame.grid_columnconfigure(1, minsize=150)
-        scrollable_frame.grid_columnconfigure(2, minsize=250)
-        scrollable_frame.grid_columnconfigure(3, minsize=180)
-
-        headers = ["Date", "Surgeon", "Procedures", "Actions"]
-        for col, header in enumerate(headers):
-            tk.Label(scrollable_frame, text=header, font=("Arial", 10, "bold")).grid(row=1, column=col, padx=5, pady=5, sticky="w")
+        list_rows = []
+        for sid, date, surgeon, mask in rows:
+            done = procedures.labels(mask, "short")
+            list_rows.append((sid, (date, surgeon or "", ", ".join(done))))
 
-        for i, row in enumerate(rows, start=2):
-            sid, date, surgeon, *checks, notes = row
-            labels = [
-                "Hiatal", "Para", "Mesh", "Bypass", "Sleeve", "Toupet", "TIF", "Nissen", "Dor",
-                "Heller", "Stretta", "Ablation", "LINX", "G-POEM", "E-POEM", "Z-POEM",
-                "Pyloro", "Revision", "Stim", "Dilation", "Other"
-            ]
-            done = [label for val, label in zip(checks[:-1], labels) if val]
-
-            tk.Label(scrollable_frame, text=date).grid(row=i, column=0, sticky="w", padx=5)
-            tk.Label(scrollable_frame, text=surgeon).grid(row=i, column=1, sticky="w", padx=5)
-            tk.Label(scrollable_frame, text=", ".join(done)).grid(row=i, column=2, sticky="w", padx=5)
-
-            btns = tk.Frame(scrollable_frame)
-            btns.grid(row=i, column=3, sticky="w", padx=5)
-            tk.Button(btns, text="View", command=lambda s=sid: expand_entry(s, False)).pack(side="left", padx=2)
-            tk.Button(btns, text="Edit", command=lambda s=sid: expand_entry(s, True)).pack(side="left", padx=2)
-            tk.Button(btns, text="Delete", command=lambda s=sid: delete_surgery(s)).pack(side="left", padx=2)
+        records.set_rows(list_rows)
 
     def expand_entry(surgery_id, editable):
         nonlocal expanded_frame
-        for w in scrollable_frame.winfo_children():
-            if isinstance(w, tk.LabelFrame) and w.cget("text") == "Surgical Details":
-                w.destroy()
+        records.select(surgery_id)
 
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM tblSurgicalHistory WHERE SurgeryID = ?", (surgery_id,))
         row = cursor.fetchone()
@@ -88,8 +80,7 @@ def build(tab_frame, patient_id, tabs=None):
         data = dict(zip(columns, row))
         conn.close()
 
-        expanded_frame = tk.LabelFrame(scrollable_frame, text="Surgical Details", padx=15, pady=15)
-        expanded_frame.grid(column=0, columnspan=4, sticky="ew", padx=10, pady=10)
+        expanded_frame = records.show_detail("Surgical Details", padx=15, pady=15)
 
         # Header - always show
         header_frame = tk.Frame(expanded_frame)
@@ -100,11 +91,7 @@ def build(tab_frame, patient_id, tabs=None):
         tk.Label(header_frame, text=f"👨‍⚕️ Surgeon: {data.get('SurgerySurgeon', 'Not specified')}", 
                 font=("Arial", 11)).pack(anchor="w")
 
-        procedure_names = [
-            "HiatalHernia", "ParaesophagealHernia", "MeshUsed", "GastricBypass", "SleeveGastrectomy", "Toupet", "TIF", "Nissen",
-            "Dor", "HellerMyotomy", "Stretta", "Ablation", "LINX", "GPOEM", "EPOEM", "ZPOEM", "Pyloroplasty",
-            "Revision", "GastricStimulator", "Dilation", "Other"
-        ]
+        procedure_names = procedures.COLUMNS
 
         check_labels = [name.replace("GPOEM", "G-POEM").replace("EPOEM", "E-POEM").replace("ZPOEM", "Z-POEM")
                         .replace("HiatalHernia", "Hiatal Hernia")
@@ -210,7 +197,7 @@ def build(tab_frame, patient_id, tabs=None):
 
         def save():
             try:
-                conn = sqlite3.connect("gerd_center.db")
+                conn = database.connect()
                 cursor = conn.cursor()
                 cursor.execute(f'''
                     UPDATE tblSurgicalHistory SET
@@ -247,7 +234,7 @@ def build(tab_frame, patient_id, tabs=None):
         if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this surgical record?"):
             return
         try:
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM tblSurgicalHistory WHERE SurgeryID = ?", (surgery_id,))
             conn.commit()
@@ -4,12 +4,29 @@ import tkinter as tk
 from tkinter import messagebox
 from tkcalendar import DateEntry
 import sqlite3
+import barrett_length
+import database
+import ui_profiler
 from datetime import datetime, timedelta
 import diagnostics_tab
 import pathology_tab
 import recall_tab
 
-def get_surveillance_recommendation(dysplasia_grade, patient_age=None, barrett_length=None):
+BARRETT_HISTORY_SQL = """
+    SELECT COUNT(*) FROM tblPathology
+    WHERE PatientID = ? AND Barretts = 1
+"""
+
+LAST_EGD_SQL = """
+    SELECT DiagnosticID, TestDate
+    FROM tblDiagnostics
+    WHERE PatientID = ? AND Endoscopy = 1
+    ORDER BY TestDate DESC
+    LIMIT 1
+"""
+
+
+def get_surveillance_recommendation(dysplasia_grade, patient_age=None, length_cm=None):
     """
     Get surveillance recommendation based on ACG/AGA guidelines
     Returns (months, explanation)
@@ -27,15 +44,10 @@ def get_surveillance_recommendation(dysplasia_grade, patient_age=None, barrett_l
         return 6, "Indeterminate dysplasia - requires 6-month intervals until clarified"
     elif dysplasia_grade in ["no dysplasia", "ngim"]:
         # Length-based recommendations for no dysplasia
-        if barrett_length and "cm" in barrett_length.lower():
-            try:
-                length_num = float(barrett_length.lower().replace("cm", "").replace(">", "").strip())
-                if length_num >= 3:
-                    return 36, "Barrett's ≥3cm without dysplasia - 3-year intervals"
-                else:
-                    return 60, "Barrett's <3cm without dysplasia - 5-year intervals"
-            except:
-                pass
+        if length_cm is not None:
+            if length_cm >= 3:
+                return 36, "Barrett's ≥3cm without dysplasia - 3-year intervals"
+            return 60, "Barrett's <3cm without dysplasia - 5-year intervals"
         return 36, "Barrett's without dysplasia - 3-year intervals (verify length)"
     else:
         return 36, f"Unrecognized dysplasia grade '{dysplasia_grade}' - default 3-year interval"
@@ -54,12 +66,9 @@ def is_good_surveillance_date(date_obj):
 def check_barrett_history(patient_id):
     """Check if patient has Barrett's history"""
     try:
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM tblPathology 
-            WHERE PatientID = ? AND Barretts = 1
-        """, (patient_id,))
+        cursor.execute(BARRETT_HISTORY_SQL, (patient_id,))
         count = cursor.fetchone()[0]
         conn.close()
         return count > 0
@@ -69,7 +78,7 @@ def check_barrett_history(patient_id):
 def get_latest_barrett_pathology(patient_id):
     """Get the most recent Barrett's pathology"""
     try:
-        conn = sqlite3.connect("gerd_center.db")
+        conn = database.connect()
         cursor = conn.cursor()
         cursor.execute("""
             SELECT PathologyDate, DysplasiaGrade, Notes
@@ -85,28 +94,15 @@ def get_latest_barrett_pathology(patient_id):
         return None
 
 def get_latest_egd_with_barrett_length(patient_id):
-    """Get the most recent EGD with Barrett's length info"""
+    """Get the most recent EGD with a Barrett's length (parsed when it was saved)
+    Returns (test_date, length_cm, prague_c, prague_m)"""
     try:
-        conn = sqlite3.connect("gerd_center.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT TestDate, EndoscopyFindings
-            FROM tblDiagnostics
-            WHERE PatientID = ? AND Endoscopy = 1
-            ORDER BY TestDate DESC
-            LIMIT 3
-        """, (patient_id,))
-        results = cursor.fetchall()
+        conn = database.connect()
+        result = barrett_length.latest(conn, patient_id)
         conn.close()
-        
-        # Look for Barrett's length in findings
-        for test_date, findings in results:
-            if findings and ("barrett" in findings.lower() or "cm" in findings.lower()):
-                return test_date, findings
-        
-        return None, None
+        return result or (None, None, None, None)
     except:
-        return None, None
+        return None, None, None, None
 
 def show_nice_error(title, message):
     """Show a nice error message"""
@@ -138,6 +134,7 @@ def safe_database_operation(operation_name, operation_function):
         show_nice_error("Unexpected Problem", f"Something unexpected happened: {str(e)}")
         return False
 
+@ui_profiler.profiled("tab:surveillance")
 def build(tab_frame, patient_id, tabs=None):
     """Build surveillance tab with enhanced refresh system"""
     
@@ -153,7 +150,7 @@ def build(tab_frame, patient_id, tabs=None):
         selected_ids.clear()
         
         def get_surveillance_data():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT SurveillanceID, NextBarrettsEGD, Undecided, LastModified
@@ -211,25 +208,18 @@ def build(tab_frame, patient_id, tabs=None):
         path_date, dysplasia_grade, notes = latest_path
         
         # Get Barrett's length from latest EGD
-        egd_date, egd_findings = get_latest_egd_with_barrett_length(patient_id)
-        barrett_length = None
-        if egd_findings:
-            # Try to extract length from findings
-            import re
-            length_match = re.search(r'(\d+(?:\.\d+)?)\s*cm', egd_findings.lower())
-            if length_match:
-                barrett_length = f"{length_match.group(1)}cm"
+        egd_date, length_cm, prague_c, prague_m = get_latest_egd_with_barrett_length(patient_id)
         
         # Get recommendation
-        months, explanation = get_surveillance_recommendation(dysplasia_grade, barrett_length=barrett_length)
+        months, explanation = get_surveillance_recommendation(dysplasia_grade, length_cm=length_cm)
         
         return {
             'months': months,
             'explanation': explanation,
             'last_path_date': path_date,
             'dysplasia_grade': dysplasia_grade,
-            'barrett_length': barrett_length,
-            'egd_findings': egd_findings
+            'barrett_length': barrett_length.describe(length_cm, prague_c, prague_m),
+            'egd_date': egd_date
         }, None
 
     def set_interval(years):
@@ -264,7 +254,7 @@ def build(tab_frame, patient_id, tabs=None):
             if recommendations['dysplasia_grade']:
                 details += f"Dysplasia grade: {recommendations['dysplasia_grade']}\n"
             if recommendations['barrett_length']:
-                details += f"Barrett's length: {recommendations['barrett_length']}\n"
+                details += f"Barrett's length: {recommendations['barrett_length']} (EGD {recommendations['egd_date']})\n"
             
             show_nice_info("Smart Interval Set", details)
 
@@ -341,7 +331,7 @@ def build(tab_frame, patient_id, tabs=None):
 
             last_modified = datetime.today().strftime("%Y-%m-%d")
 
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO tblSurveillance (PatientID, NextBarrettsEGD, Undecided, LastModified)
@@ -387,7 +377,7 @@ def build(tab_frame, patient_id, tabs=None):
         surveil_id = selected_ids[selected[0]]
 
         def get_plan_details():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("SELECT NextBarrettsEGD FROM tblSurveillance WHERE SurveillanceID = ?", (surveil_id,))
             result = cursor.fetchone()
@@ -400,7 +390,7 @@ def build(tab_frame, patient_id, tabs=None):
             return
 
         def do_the_delete():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM tblSurveillance WHERE SurveillanceID = ?", (surveil_id,))
             conn.commit()
@@ -442,15 +432,9 @@ def build(tab_frame, patient_id, tabs=None):
     def get_last_egd():
         """Get last EGD safely"""
         def get_egd():
-            conn = sqlite3.connect("gerd_center.db")
+            conn = database.connect()
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT DiagnosticID, TestDate
-                FROM tblDiagnostics
-                WHERE PatientID = ? AND Endoscopy = 1
-                ORDER BY TestDate DESC
-                LIMIT 1
-            """, (patient_id,))
+            cursor.execute(LAST_EGD_SQL, (patient_id,))
             result = cursor.fetchone()
             conn.close()
             return result
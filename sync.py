@@ -0,0 +1,485 @@
+# sync.py - Changeset sync between workstation copies of gerd_center.db
+#
+# Every workstation works on its own local database, so queries run at local
+# disk speed, and a shared folder (network share, synced drive, USB stick)
+# carries the changes. A sync run
+#   1. exports the local changes recorded in the change journal since the last
+#      run as one gzipped changeset in <folder>/<site id>/, and
+#   2. applies the changesets every other site has written since.
+#
+# Rows are identified across sites by (origin site, origin id); tblSyncMap
+# translates that to the local row id, so autoincrement keys never collide.
+# Patients are also matched on MRN. If both sides changed the same row since
+# they last heard from each other, the newer change wins and both versions go
+# to tblSyncConflicts for review.
+#
+# Changesets carry the set-up baseline and are rejected by a copy that was set
+# up from a different starting point. One that refers to a patient not
+# received yet waits (python sync.py deferred) for up to MAX_DEFERRED_RUNS
+# runs, then is applied without those rows, which are logged as conflicts.
+#
+# Set-up: copy the same gerd_center.db to every workstation and run
+#     python sync.py init
+# on each. After that run   python sync.py run --folder <shared folder>
+# by hand or from a scheduled task.
+
+import os
+import json
+import gzip
+import uuid
+import sqlite3
+import argparse
+from datetime import datetime
+
+import archive
+import barrett_length
+import database
+import change_journal
+import schema
+
+CONSUMER = "sync"
+# Journal entries written while applying a changeset carry this Session prefix,
+# so they are not exported back out
+SYNC_SESSION = "sync:"
+# Changes that stay on this workstation: applied changesets and archive moves
+LOCAL_ONLY_SESSIONS = (SYNC_SESSION, archive.ARCHIVE_SESSION)
+# Origin of rows that existed when the workstations were set up from one copy
+BASELINE = "base"
+TABLE_KEYS = dict(schema.ACTIVITY_TABLES)
+# Runs a changeset may wait on a missing patient before it is applied without those rows
+MAX_DEFERRED_RUNS = 5
+
+
+class Deferred(Exception):
+    """Changeset refers to a patient this database hasn't received yet"""
+
+
+class BaselineMismatch(Exception):
+    """Changeset comes from a copy set up from a different starting point"""
+
+
+def get_state(conn, key, default=None):
+    row = conn.execute("SELECT Value FROM tblSyncState WHERE Key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO tblSyncState (Key, Value) VALUES (?, ?)", (key, str(value)))
+
+
+def site_id(conn):
+    site = get_state(conn, "site_id")
+    if site is None:
+        raise RuntimeError("This database has not been set up for sync - run: python sync.py init")
+    return site
+
+
+def init(conn, new_site=False):
+    """Give this copy a site id and record the shared starting point"""
+    if get_state(conn, "site_id") is None or new_site:
+        set_state(conn, "site_id", uuid.uuid4().hex[:12])
+    for table, key in schema.ACTIVITY_TABLES:
+        if get_state(conn, f"baseline:{table}") is None:
+            row = conn.execute(f"SELECT MAX({key}) FROM {table}").fetchone()
+            set_state(conn, f"baseline:{table}", row[0] or 0)
+    # History before set-up is in every copy already
+    if get_state(conn, "export_seq") is None:
+        set_state(conn, "export_seq", 0)
+        change_journal.set_cursor(conn, CONSUMER, change_journal.latest_id(conn))
+    conn.commit()
+    return site_id(conn)
+
+
+def baselines(conn):
+    """{table: highest row id shared by every copy at set-up}"""
+    return {table: int(get_state(conn, f"baseline:{table}", 0)) for table in TABLE_KEYS}
+
+
+# Keyed by (database file, table)
+_columns = {}
+
+
+def table_columns(conn, table):
+    key = (database.path_of(conn), table)
+    if key not in _columns:
+        _columns[key] = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    return _columns[key]
+
+
+def identity_of(conn, table, local_id):
+    """(origin site, origin id) for a local row"""
+    row = conn.execute("SELECT OriginSite, OriginID FROM tblSyncMap WHERE TableName = ? AND LocalID = ?",
+                       (table, local_id)).fetchone()
+    if row:
+        return [row[0], row[1]]
+    if local_id <= int(get_state(conn, f"baseline:{table}", 0)):
+        return [BASELINE, local_id]
+    return [site_id(conn), local_id]
+
+
+def local_id_for(conn, table, identity):
+    """Local row id for (origin site, origin id), or None if it never arrived here"""
+    origin_site, origin_id = identity
+    if origin_site in (BASELINE, site_id(conn)):
+        return origin_id
+    row = conn.execute("SELECT LocalID FROM tblSyncMap WHERE TableName = ? AND OriginSite = ? AND OriginID = ?",
+                       (table, origin_site, origin_id)).fetchone()
+    return row[0] if row else None
+
+
+def map_identity(conn, table, identity, local_id):
+    conn.execute("""
+        INSERT OR REPLACE INTO tblSyncMap (TableName, OriginSite, OriginID, LocalID)
+        VALUES (?, ?, ?, ?)
+    """, (table, identity[0], identity[1], local_id))
+
+
+def read_row(conn, table, local_id):
+    cursor = conn.execute(f"SELECT * FROM {table} WHERE {TABLE_KEYS[table]} = ?", (local_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cursor.description], row))
+
+
+def encode_row(conn, table, row):
+    """Row as sent: no local key, PatientID as a patient identity"""
+    row = dict(row)
+    row.pop(TABLE_KEYS[table], None)
+    if table != "tblPatients" and row.get("PatientID") is not None:
+        row["PatientID"] = identity_of(conn, "tblPatients", row["PatientID"])
+    return row
+
+
+def decode_row(conn, table, row):
+    """Incoming row restricted to local columns, with PatientID translated"""
+    columns = set(table_columns(conn, table)) - {TABLE_KEYS[table]}
+    row = {k: v for k, v in row.items() if k in columns}
+    if table != "tblPatients" and isinstance(row.get("PatientID"), list):
+        patient_id = local_id_for(conn, "tblPatients", row["PatientID"])
+        if patient_id is None:
+            raise Deferred(row["PatientID"])
+        row["PatientID"] = patient_id
+    return row
+
+
+# Export
+
+def export_changes(conn, folder):
+    """Write local changes since the last export as one changeset; returns its path or None"""
+    site = site_id(conn)
+    pending = change_journal.read(conn, CONSUMER)
+    local = [c for c in pending if not (c.Session or "").startswith(LOCAL_ONLY_SESSIONS)]
+
+    changed_at = {}
+    for change in local:
+        changed_at[(change.TableName, change.RecordID)] = change.ActivityTime
+
+    entries = []
+    for (table, record_id), action in change_journal.changed_rows(local).items():
+        if table not in TABLE_KEYS or record_id is None:
+            continue
+        entry = {"table": table, "id": identity_of(conn, table, record_id),
+                 "at": changed_at[(table, record_id)]}
+        row = read_row(conn, table, record_id)
+        if row is None:
+            entry["op"] = "delete"
+        else:
+            entry["op"] = "upsert"
+            entry["row"] = encode_row(conn, table, row)
+        entries.append(entry)
+
+    path = None
+    if entries:
+        seq = int(get_state(conn, "export_seq", 0)) + 1
+        site_dir = os.path.join(folder, site)
+        os.makedirs(site_dir, exist_ok=True)
+        path = os.path.join(site_dir, f"{seq:08d}.json.gz")
+        # "seen" tells the receiver which of its own changesets we had applied,
+        # so its changes we already built on don't count as conflicts
+        seen = {key.split(":", 1)[1]: int(value) for key, value in
+                conn.execute("SELECT Key, Value FROM tblSyncState WHERE Key LIKE 'applied:%'")}
+        changeset = {"site": site, "seq": seq, "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                     "baseline": baselines(conn), "seen": seen, "changes": entries}
+        # Write then rename, so other sites never pick up half a file
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(changeset, f, separators=(",", ":"), default=str)
+        os.replace(path + ".tmp", path)
+        set_state(conn, "export_seq", seq)
+        set_state(conn, f"export_mark:{seq}", pending[-1].ActivityID)
+
+    change_journal.advance(conn, CONSUMER, pending)
+    conn.commit()
+    return path
+
+
+# Import
+
+def local_change_time(conn, table, local_id, since=0):
+    """Time of the newest edit made on this workstation to a row after journal entry since
+    (applied changesets and archive moves don't count)"""
+    local_only = " AND ".join(f"Session NOT LIKE '{session}%'" for session in LOCAL_ONLY_SESSIONS)
+    row = conn.execute(f"""
+        SELECT MAX(ActivityTime) FROM tblActivityLog
+        WHERE TableName = ? AND RecordID = ? AND ActivityID > ?
+          AND (Session IS NULL OR ({local_only}))
+    """, (table, local_id, since)).fetchone()
+    return row[0]
+
+
+def row_stamp(conn, table, local_id, origin, concurrent):
+    """(change time, site) of the newest version of a row held here that origin may not have built on.
+
+    Local edits only count if origin hadn't seen them (concurrent), and an
+    earlier version from origin itself never does - its changesets apply in
+    order - so a later edit wins even if the two clocks disagree.
+    """
+    stamps = []
+    local_at = local_change_time(conn, table, local_id) if concurrent else None
+    if local_at is not None:
+        stamps.append((local_at, site_id(conn)))
+    row = conn.execute("SELECT ChangedAt, OriginSite FROM tblSyncVersions WHERE TableName = ? AND LocalID = ?",
+                       (table, local_id)).fetchone()
+    if row and row[1] != origin:
+        stamps.append((row[0], row[1]))
+    return max(stamps) if stamps else None
+
+
+def record_conflict(conn, table, local_id, entry, kind, resolution):
+    local_row = read_row(conn, table, local_id) if local_id is not None else None
+    conn.execute("""
+        INSERT INTO tblSyncConflicts (TableName, LocalID, OriginSite, OriginID, Kind,
+                                      LocalRow, IncomingRow, Resolution, DetectedAt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
+    """, (table, local_id, entry["id"][0], entry["id"][1], kind,
+          json.dumps(local_row, default=str), json.dumps(entry.get("row"), default=str), resolution))
+
+
+def apply_entry(conn, origin, entry, mark):
+    """Apply one row change from site origin; mark is the journal position of our last import from it.
+
+    Of versions made without knowing about each other, every site keeps the one
+    with the newest (change time, site), whatever order changesets arrive in, so
+    all copies converge; an edit built on a version always replaces it.
+    """
+    table = entry["table"]
+    if table not in TABLE_KEYS:
+        return
+    key = TABLE_KEYS[table]
+    identity = entry["id"]
+    local_id = local_id_for(conn, table, identity)
+    row = decode_row(conn, table, entry["row"]) if entry["op"] == "upsert" else None
+
+    # A patient created on two workstations is the same patient if the MRN matches
+    if local_id is None and table == "tblPatients" and row and row.get("MRN") is not None:
+        match = conn.execute("SELECT PatientID FROM tblPatients WHERE MRN = ?", (row["MRN"],)).fetchone()
+        if match:
+            local_id = match[0]
+            map_identity(conn, table, identity, local_id)
+            record_conflict(conn, table, local_id, entry, "mrn", "merged")
+
+    if local_id is not None:
+        # Changed here since origin last heard from us - a real conflict, not just a late arrival
+        concurrent = local_change_time(conn, table, local_id, mark) is not None
+        current = row_stamp(conn, table, local_id, origin, concurrent)
+        if current is not None and current > (entry["at"], origin):
+            if concurrent:
+                record_conflict(conn, table, local_id, entry, "concurrent", "kept local")
+            return
+        if concurrent:
+            record_conflict(conn, table, local_id, entry, "concurrent", "took incoming")
+
+    if entry["op"] == "delete":
+        if local_id is not None:
+            conn.execute(f"DELETE FROM {table} WHERE {key} = ?", (local_id,))
+    elif local_id is not None and read_row(conn, table, local_id) is not None:
+        columns = list(row)
+        conn.execute(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in columns)} WHERE {key} = ?",
+                     [row[c] for c in columns] + [local_id])
+    else:
+        columns = list(row)
+        values = [row[c] for c in columns]
+        if local_id is not None:
+            # Our own (or a baseline) row that was deleted here - bring it back under its id
+            columns.insert(0, key)
+            values.insert(0, local_id)
+        cursor = conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                              values)
+        if local_id is None:
+            local_id = cursor.lastrowid
+            map_identity(conn, table, identity, local_id)
+
+    if local_id is not None:
+        conn.execute("""
+            INSERT OR REPLACE INTO tblSyncVersions (TableName, LocalID, ChangedAt, OriginSite)
+            VALUES (?, ?, ?, ?)
+        """, (table, local_id, entry["at"], origin))
+
+
+def apply_changeset(conn, path, skip_missing=False):
+    """Apply one changeset file in a single transaction.
+
+    Raises Deferred if it refers to a patient not received yet - unless
+    skip_missing, when those rows are skipped and recorded as conflicts.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        changeset = json.load(f)
+    origin = changeset["site"]
+    theirs = {table: int(value) for table, value in changeset.get("baseline", {}).items()}
+    if theirs != baselines(conn):
+        raise BaselineMismatch(f"{origin} was set up from a different copy of the database - "
+                               "copy one database to every workstation and run init again")
+    # Local changes up to here had reached origin before it wrote this changeset
+    seen_seq = changeset.get("seen", {}).get(site_id(conn), 0)
+    mark = max(int(get_state(conn, f"import_mark:{origin}", 0)),
+               int(get_state(conn, f"export_mark:{seen_seq}", 0)))
+    before = change_journal.latest_id(conn)
+    try:
+        for entry in changeset["changes"]:
+            try:
+                apply_entry(conn, origin, entry, mark)
+            except sqlite3.IntegrityError:
+                # e.g. an MRN already used by a different patient here
+                record_conflict(conn, entry["table"], local_id_for(conn, entry["table"], entry["id"]),
+                                entry, "integrity", "skipped")
+            except Deferred:
+                if not skip_missing:
+                    raise
+                record_conflict(conn, entry["table"], local_id_for(conn, entry["table"], entry["id"]),
+                                entry, "missing patient", "skipped")
+        conn.execute("UPDATE tblActivityLog SET Session = ? WHERE ActivityID > ?",
+                     (SYNC_SESSION + origin, before))
+        set_state(conn, f"applied:{origin}", changeset["seq"])
+        set_state(conn, f"import_mark:{origin}", change_journal.latest_id(conn))
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    return len(changeset["changes"])
+
+
+def pending_changesets(conn, folder):
+    """{site: [changeset paths not applied yet, in order]} for every other site"""
+    own = site_id(conn)
+    pending = {}
+    if not os.path.isdir(folder):
+        return pending
+    for site in sorted(os.listdir(folder)):
+        site_dir = os.path.join(folder, site)
+        if site == own or not os.path.isdir(site_dir):
+            continue
+        applied = int(get_state(conn, f"applied:{site}", 0))
+        files = sorted(name for name in os.listdir(site_dir) if name.endswith(".json.gz"))
+        paths = [os.path.join(site_dir, name) for name in files if int(name.split(".")[0]) > applied]
+        if paths:
+            pending[site] = paths
+    return pending
+
+
+def deferred_key(path):
+    return f"deferred:{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}"
+
+
+def deferred_changesets(conn):
+    """[(site/changeset, runs deferred so far)] for changesets waiting on a missing patient"""
+    return [(key.split(":", 1)[1], int(value)) for key, value in
+            conn.execute("SELECT Key, Value FROM tblSyncState WHERE Key LIKE 'deferred:%' ORDER BY Key")]
+
+
+def import_changes(conn, folder):
+    """Apply every other site's new changesets.
+
+    Returns (changesets applied, {site: changeset still deferred}, {site: reason rejected}).
+    """
+    pending = pending_changesets(conn, folder)
+    applied = 0
+    rejected = {}
+    # A changeset can refer to a patient another site created, so keep going
+    # round the sites while anything still applies
+    progress = True
+    while pending and progress:
+        progress = False
+        for site in list(pending):
+            while pending[site]:
+                path = pending[site][0]
+                # Waited long enough - take what applies and log the rest as conflicts
+                skip_missing = int(get_state(conn, deferred_key(path), 0)) >= MAX_DEFERRED_RUNS
+                try:
+                    apply_changeset(conn, path, skip_missing=skip_missing)
+                except Deferred:
+                    break
+                except BaselineMismatch as e:
+                    rejected[site] = str(e)
+                    pending[site] = []
+                    break
+                conn.execute("DELETE FROM tblSyncState WHERE Key = ?", (deferred_key(path),))
+                conn.commit()
+                pending[site].pop(0)
+                applied += 1
+                progress = True
+            if not pending[site]:
+                del pending[site]
+
+    # Whatever is left waited on a patient for one more run
+    waiting = {}
+    for site, paths in pending.items():
+        key = deferred_key(paths[0])
+        set_state(conn, key, int(get_state(conn, key, 0)) + 1)
+        waiting[site] = key.split(":", 1)[1]
+    conn.commit()
+
+    if applied:
+        # Applied diagnostics lost their parsed Barrett's length (see barrett_length.py)
+        barrett_length.extract_pending(conn)
+    return applied, waiting, rejected
+
+
+def run(conn, folder):
+    """One full sync: export, then import"""
+    exported = export_changes(conn, folder)
+    applied, waiting, rejected = import_changes(conn, folder)
+    return {"exported": exported, "applied": applied, "waiting": waiting, "rejected": rejected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync this workstation's gerd_center.db through a shared folder")
+    parser.add_argument("--db", default=None, help="Database path (default: GERD_DB_PATH or gerd_center.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    init_parser = sub.add_parser("init", help="Set this copy up for sync")
+    init_parser.add_argument("--new-site", action="store_true",
+                             help="Take a fresh site id (after copying a database that was already synced)")
+    run_parser = sub.add_parser("run", help="Export local changes and apply everyone else's")
+    run_parser.add_argument("--folder", required=True, help="Shared changeset folder")
+    sub.add_parser("conflicts", help="List recorded conflicts")
+    sub.add_parser("deferred", help="List changesets waiting on a patient not received yet")
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    try:
+        if args.command == "init":
+            print(f"Site id: {init(conn, new_site=args.new_site)}")
+        elif args.command == "run":
+            result = run(conn, args.folder)
+            print(f"Exported: {result['exported'] or 'nothing new'}")
+            print(f"Applied {result['applied']} changeset(s)")
+            runs = dict(deferred_changesets(conn))
+            for site, changeset in result["waiting"].items():
+                print(f"Deferred {changeset}: waiting on a patient not received yet "
+                      f"(run {runs[changeset]} of {MAX_DEFERRED_RUNS}, then applied without those rows)")
+            for site, reason in result["rejected"].items():
+                print(f"Rejected changesets from {site}: {reason}")
+        elif args.command == "conflicts":
+            for row in conn.execute("""
+                SELECT DetectedAt, TableName, LocalID, OriginSite, Kind, Resolution
+                FROM tblSyncConflicts ORDER BY ConflictID DESC
+            """):
+                print(" | ".join(str(v) for v in row))
+        elif args.command == "deferred":
+            for changeset, runs in deferred_changesets(conn):
+                print(f"{changeset} | deferred {runs} of {MAX_DEFERRED_RUNS} runs")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
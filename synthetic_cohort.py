@@ -0,0 +1,342 @@
+# synthetic_cohort.py - Generate a realistic synthetic gerd_center.db for benchmarking
+
+import sqlite3
+import random
+import os
+import argparse
+from datetime import date, timedelta
+
+import schema
+
+TEMPLATE_DB = "gerd_center.db"
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Daniel", "Nancy", "Matthew", "Lisa",
+    "Anthony", "Betty", "Mark", "Sandra", "Steven", "Ashley", "Paul", "Kimberly",
+    "Andrew", "Donna", "Joshua", "Emily", "Kenneth", "Michelle", "Kevin", "Carol"
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Anderson",
+    "Wilson", "Taylor", "Thomas", "Moore", "Martin", "Jackson", "Thompson", "White",
+    "Harris", "Clark", "Lewis", "Robinson", "Walker", "Young", "Allen", "King",
+    "Wright", "Scott", "Hill", "Green", "Adams", "Nelson", "Baker", "Hall",
+    "Olson", "Peterson", "Larson", "Hanson", "Nguyen", "Lee", "Schmidt", "Johansen"
+]
+
+SURGEONS = [
+    "Smith", "Johnson", "Anderson", "Nguyen", "Peterson", "Larson", "Garcia", "Olson"
+]
+
+# (value, weight) pairs - roughly what the clinic sees
+REFERRAL_SOURCES = [("Physician", 60), ("Self", 20), ("Patient", 12), ("Other", 8)]
+ESOPHAGITIS_GRADES = [("None", 55), ("LA A", 20), ("LA B", 15), ("LA C", 7), ("LA D", 3)]
+HERNIA_SIZES = [("None", 35), ("1 cm", 10), ("2 cm", 15), ("3 cm", 15), ("4 cm", 10),
+                ("5 cm", 7), ("6 cm", 4), (">6 cm", 4)]
+DYSPLASIA_GRADES = [("No Dysplasia", 62), ("NGIM", 10), ("Indeterminate", 8),
+                    ("Low Grade", 12), ("High Grade", 5), ("", 3)]
+RECALL_REASONS = [("Office Visit", 35), ("Endoscopy", 20), ("Barrett's Surveillance", 15),
+                  ("Surveillance Form", 5), ("Post-op Follow-up", 15), ("Lab Review", 5),
+                  ("Other", 5)]
+
+PROCEDURE_COLUMNS = [
+    "HiatalHernia", "ParaesophagealHernia", "MeshUsed", "GastricBypass", "SleeveGastrectomy",
+    "Toupet", "TIF", "Nissen", "Dor", "HellerMyotomy", "Stretta", "Ablation", "LINX",
+    "GPOEM", "EPOEM", "ZPOEM", "Pyloroplasty", "Revision", "GastricStimulator", "Dilation", "Other"
+]
+
+# Common operations as sets of procedure flags, with relative frequency
+SURGERY_PATTERNS = [
+    (("HiatalHernia", "Nissen"), 18),
+    (("HiatalHernia", "Toupet"), 22),
+    (("HiatalHernia", "MeshUsed", "Toupet"), 8),
+    (("ParaesophagealHernia", "MeshUsed", "Toupet"), 6),
+    (("HiatalHernia", "LINX"), 10),
+    (("TIF",), 8),
+    (("HiatalHernia", "TIF"), 5),
+    (("HellerMyotomy", "Dor"), 5),
+    (("EPOEM",), 3),
+    (("GPOEM",), 3),
+    (("ZPOEM",), 1),
+    (("Pyloroplasty",), 2),
+    (("GastricBypass",), 4),
+    (("GastricBypass", "HiatalHernia"), 2),
+    (("SleeveGastrectomy",), 3),
+    (("Stretta",), 2),
+    (("Ablation",), 3),
+    (("Dilation",), 5),
+    (("GastricStimulator",), 1),
+    (("HiatalHernia", "Nissen", "Revision"), 2),
+    (("Other",), 2),
+]
+
+# Batch size for executemany so memory stays flat at 1M patients
+BATCH_SIZE = 20000
+
+
+def weighted(rng, pairs):
+    """Pick a value from (value, weight) pairs"""
+    values = [p[0] for p in pairs]
+    weights = [p[1] for p in pairs]
+    return rng.choices(values, weights=weights)[0]
+
+
+def random_date(rng, start, end):
+    """Random ISO date between two dates"""
+    span = (end - start).days
+    return (start + timedelta(days=rng.randint(0, max(span, 0)))).isoformat()
+
+
+def copy_schema(template_path, conn):
+    """Copy tables from the template database, returning its index statements"""
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template database not found: {template_path}")
+
+    template = sqlite3.connect(template_path)
+    rows = template.execute("""
+        SELECT type, sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+    """).fetchall()
+    template.close()
+
+    deferred = []
+    for obj_type, sql in rows:
+        if obj_type == "table":
+            conn.execute(sql)
+        else:
+            # Indexes, triggers and views are created after the bulk load
+            deferred.append(sql)
+    return deferred
+
+
+def generate_patients(rng, count, today):
+    """Yield tblPatients rows"""
+    oldest_dob = today - timedelta(days=365 * 90)
+    youngest_dob = today - timedelta(days=365 * 18)
+    clinic_start = today - timedelta(days=365 * 8)
+
+    for i in range(count):
+        age_days = int(rng.gauss(56, 14) * 365)
+        dob = today - timedelta(days=age_days)
+        dob = min(max(dob, oldest_dob), youngest_dob)
+        source = weighted(rng, REFERRAL_SOURCES)
+        details = f"Dr. {rng.choice(LAST_NAMES)}" if source == "Physician" else ""
+        yield (
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            1000000 + i,
+            "Female" if rng.random() < 0.56 else "Male",
+            dob.isoformat(),
+            f"{rng.randint(550, 567)}{rng.randint(0, 99):02d}",
+            round(min(max(rng.gauss(30.5, 6), 16), 60), 1),
+            source,
+            details,
+            random_date(rng, clinic_start, today),
+        )
+
+
+def generate_history(rng, patient_id, consult_date, today, barretts):
+    """Build the clinical history rows for one patient"""
+    start = date.fromisoformat(consult_date)
+    diagnostics, pathology, surgeries, surveillance, recalls = [], [], [], [], []
+
+    # Diagnostics - most patients have a workup, some have many visits
+    for _ in range(min(int(rng.expovariate(1 / 2.2)), 25)):
+        test_date = random_date(rng, start, today)
+        endoscopy = 1 if rng.random() < 0.8 else 0
+        bravo = 1 if rng.random() < 0.35 else 0
+        impedance = 1 if not bravo and rng.random() < 0.25 else 0
+        endoflip = 1 if rng.random() < 0.2 else 0
+        manometry = 1 if rng.random() < 0.4 else 0
+        emptying = 1 if rng.random() < 0.15 else 0
+        imaging = 1 if rng.random() < 0.2 else 0
+        upper_gi = 1 if rng.random() < 0.25 else 0
+
+        findings = ""
+        if endoscopy and barretts:
+            c = rng.randint(0, 6)
+            m = c + rng.randint(0, 4)
+            findings = f"Barrett's segment C{c}M{m}, {m} cm. Biopsies taken."
+        elif endoscopy:
+            findings = rng.choice(["Normal EGD", "Irregular Z-line", "Mild gastritis", ""])
+
+        diagnostics.append((
+            patient_id, test_date, rng.choice(SURGEONS),
+            endoscopy,
+            weighted(rng, ESOPHAGITIS_GRADES) if endoscopy else "",
+            weighted(rng, HERNIA_SIZES) if endoscopy else "",
+            findings,
+            bravo, impedance,
+            f"{rng.uniform(2, 80):.1f}" if (bravo or impedance) else "",
+            "Abnormal acid exposure" if (bravo or impedance) and rng.random() < 0.6 else "",
+            endoflip, "Reduced distensibility" if endoflip and rng.random() < 0.3 else "",
+            manometry, "Ineffective motility" if manometry and rng.random() < 0.3 else "",
+            emptying,
+            f"{rng.uniform(0, 60):.0f}" if emptying else "",
+            "Delayed emptying" if emptying and rng.random() < 0.4 else "",
+            imaging, "", upper_gi, "",
+            "",
+        ))
+
+    # Pathology - Barrett's patients are biopsied repeatedly for surveillance
+    path_count = rng.randint(2, 8) if barretts else (1 if rng.random() < 0.45 else 0)
+    for _ in range(path_count):
+        grade = weighted(rng, DYSPLASIA_GRADES) if barretts else ""
+        eoe = 1 if not barretts and rng.random() < 0.06 else 0
+        esopredict = 1 if barretts and rng.random() < 0.2 else 0
+        tissuecypher = 1 if barretts and rng.random() < 0.2 else 0
+        pathology.append((
+            patient_id, random_date(rng, start, today),
+            1, 1 if rng.random() < 0.3 else 0, esopredict, tissuecypher,
+            1 if rng.random() < 0.08 else 0,
+            1 if barretts else 0,
+            grade,
+            1 if rng.random() < 0.05 else 0,
+            eoe,
+            rng.randint(15, 90) if eoe else None,
+            "",
+            rng.choice(["Low", "Intermediate", "High"]) if esopredict else "",
+            rng.choice(["Low", "Intermediate", "High"]) if tissuecypher else "",
+            "",
+        ))
+
+    # Surgeries - about a third of patients go on to an operation
+    if rng.random() < 0.33:
+        for _ in range(2 if rng.random() < 0.08 else 1):
+            pattern = weighted(rng, SURGERY_PATTERNS)
+            flags = [1 if col in pattern else 0 for col in PROCEDURE_COLUMNS]
+            surgeries.append(
+                (patient_id, random_date(rng, start, today), rng.choice(SURGEONS), "")
+                + tuple(flags)
+            )
+
+    # Surveillance plans for Barrett's patients
+    if barretts:
+        for _ in range(rng.randint(1, 3)):
+            modified = random_date(rng, start, today)
+            next_egd = (date.fromisoformat(modified) + timedelta(days=rng.choice([90, 180, 365, 1095]))).isoformat()
+            undecided = 1 if rng.random() < 0.05 else 0
+            surveillance.append((patient_id, "" if undecided else next_egd, undecided, modified))
+
+    # Recalls - completed in the past, open in the near future. HRQL scores come
+    # from their own generator so adding them left the rest of the data unchanged
+    hrql_rng = random.Random(f"hrql-{patient_id}")
+    baseline = hrql_rng.uniform(12, 40)
+    surgery_dates = sorted(surgery[1] for surgery in surgeries)
+    for _ in range(min(int(rng.expovariate(1 / 1.5)), 12)):
+        recall_date = random_date(rng, start, today + timedelta(days=365))
+        completed = 1 if recall_date < today.isoformat() and rng.random() < 0.85 else 0
+        score = None
+        if completed and hrql_rng.random() < 0.7:
+            operated = surgery_dates and surgery_dates[0] < recall_date
+            score = round(baseline * (hrql_rng.uniform(0.05, 0.6) if operated else hrql_rng.uniform(0.8, 1.2)))
+        recalls.append((
+            patient_id, recall_date, weighted(rng, RECALL_REASONS),
+            score, completed, "",
+        ))
+
+    return diagnostics, pathology, surgeries, surveillance, recalls
+
+
+def insert_batches(conn, batches):
+    """Flush accumulated rows for every clinical table"""
+    diag_sql = """
+        INSERT INTO tblDiagnostics (
+            PatientID, TestDate, Surgeon, Endoscopy, EsophagitisGrade, HiatalHerniaSize,
+            EndoscopyFindings, Bravo, pHImpedance, DeMeesterScore, pHFindings,
+            EndoFLIP, EndoFLIPFindings, Manometry, ManometryFindings,
+            GastricEmptying, PercentRetained4h, GastricEmptyingFindings,
+            Imaging, ImagingFindings, UpperGI, UpperGIFindings, DiagnosticNotes
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    path_sql = """
+        INSERT INTO tblPathology (
+            PatientID, PathologyDate, Biopsy, WATS3D, EsoPredict, TissueCypher, Hpylori,
+            Barretts, DysplasiaGrade, AtrophicGastritis, EoE, EosinophilCount, OtherFinding,
+            EsoPredictRisk, TissueCypherRisk, Notes
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    surg_sql = f"""
+        INSERT INTO tblSurgicalHistory (PatientID, SurgeryDate, SurgerySurgeon, Notes, {", ".join(PROCEDURE_COLUMNS)})
+        VALUES ({", ".join(["?"] * (4 + len(PROCEDURE_COLUMNS)))})
+    """
+    surv_sql = """
+        INSERT INTO tblSurveillance (PatientID, NextBarrettsEGD, Undecided, LastModified)
+        VALUES (?, ?, ?, ?)
+    """
+    recall_sql = """
+        INSERT INTO tblRecall (PatientID, RecallDate, RecallReason, HRQLScore, Completed, Notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    for sql, rows in zip((diag_sql, path_sql, surg_sql, surv_sql, recall_sql), batches):
+        if rows:
+            conn.executemany(sql, rows)
+            rows.clear()
+
+
+def generate_database(path, patients, seed=42, template_path=TEMPLATE_DB, barretts_rate=0.12):
+    """Create a synthetic database with the production schema at the given scale"""
+    if os.path.exists(path):
+        os.remove(path)
+
+    rng = random.Random(seed)
+    today = date.today()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    deferred_sql = copy_schema(template_path, conn)
+
+    conn.executemany("INSERT INTO tblSurgeons (SurgeonName) VALUES (?)", [(s,) for s in SURGEONS])
+
+    batches = ([], [], [], [], [])
+    patient_rows = []
+    next_id = 1
+
+    def flush():
+        conn.executemany("""
+            INSERT INTO tblPatients (FirstName, LastName, MRN, Gender, DOB, ZipCode, BMI,
+                                     ReferralSource, ReferralDetails, InitialConsultDate)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, patient_rows)
+        patient_rows.clear()
+        insert_batches(conn, batches)
+
+    for row in generate_patients(rng, patients, today):
+        patient_rows.append(row)
+        history = generate_history(rng, next_id, row[-1], today, rng.random() < barretts_rate)
+        for bucket, rows in zip(batches, history):
+            bucket.extend(rows)
+        next_id += 1
+
+        if len(patient_rows) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    for sql in deferred_sql:
+        conn.execute(sql)
+    # Tables/triggers the template may predate, plus their backfills
+    schema.ensure_schema(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic GERD center database")
+    parser.add_argument("--patients", type=int, default=10000, help="Number of patients to generate")
+    parser.add_argument("--out", default=None, help="Output database path")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--template", default=TEMPLATE_DB, help="Database to copy the schema from")
+    args = parser.parse_args()
+
+    out = args.out or f"synthetic_{args.patients}.db"
+    generate_database(out, args.patients, seed=args.seed, template_path=args.template)
+    print(f"Wrote {args.patients} patients to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# conftest.py - Shared fixtures: the repo modules on sys.path and a small synthetic database
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic_cohort
+
+
+@pytest.fixture(scope="session")
+def synthetic_db(tmp_path_factory):
+    """Path of a 1,500-patient synthetic database, generated once per run; copy it before writing"""
+    path = str(tmp_path_factory.mktemp("synthetic") / "synthetic.db")
+    synthetic_cohort.generate_database(path, 1500, seed=7)
+    return path
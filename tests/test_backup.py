@@ -0,0 +1,97 @@
+# test_backup.py - snapshots of the database and its archive, restore and rotation
+
+import os
+import shutil
+
+import pytest
+
+import archive
+import backup
+import database
+
+
+@pytest.fixture
+def db_path(synthetic_db, tmp_path):
+    path = str(tmp_path / "live.db")
+    shutil.copy(synthetic_db, path)
+    return path
+
+
+@pytest.fixture
+def dest(tmp_path):
+    return str(tmp_path / "backups")
+
+
+def counts(db_path):
+    conn = database.connect(db_path)
+    try:
+        archive.attach(conn)
+        return {
+            "patients": conn.execute("SELECT COUNT(*) FROM tblPatients").fetchone()[0],
+            "recalls": conn.execute("SELECT COUNT(*) FROM main.tblRecall").fetchone()[0],
+            "archived": conn.execute("SELECT COUNT(*) FROM archive.tblRecall").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def archive_recalls(db_path):
+    conn = database.connect(db_path)
+    try:
+        assert archive.archive_rows(conn, 365)["tblRecall"]
+    finally:
+        conn.close()
+
+
+def add_patient(db_path):
+    conn = database.connect(db_path)
+    try:
+        conn.execute("INSERT INTO tblPatients (FirstName, LastName, MRN) VALUES ('After', 'Snapshot', 'BK-1')")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_snapshot_then_restore_round_trips(db_path, dest):
+    archive_recalls(db_path)
+    expected = counts(db_path)
+    snapshot = backup.backup(db_path, dest, sleep=0)
+    assert os.path.exists(backup.archive_snapshot(snapshot))
+
+    add_patient(db_path)
+    conn = database.connect(db_path)
+    archive.attach(conn)
+    conn.execute("DELETE FROM archive.tblRecall WHERE RecallID IN (SELECT RecallID FROM archive.tblRecall LIMIT 10)")
+    conn.commit()
+    conn.close()
+    assert counts(db_path) != expected
+
+    backup.restore(snapshot, db_path, dest)
+    assert counts(db_path) == expected
+
+
+def test_pre_restore_copy_survives_rotation(db_path, dest):
+    snapshot = backup.backup(db_path, dest, sleep=0)
+    add_patient(db_path)
+    changed = counts(db_path)
+
+    safety = backup.restore(snapshot, db_path, dest)
+    assert os.path.exists(safety) and counts(safety) == changed
+
+    for label in ("one", "two", "three"):
+        backup.backup(db_path, dest, keep=1, label=label, sleep=0)
+    assert os.path.exists(safety)
+    assert not os.path.exists(snapshot)
+
+
+def test_snapshot_without_archive_empties_archive_on_restore(db_path, dest):
+    expected = counts(db_path)
+    # counts() created an empty archive file; snapshot a database without one
+    os.remove(archive.path_for(db_path))
+    snapshot = backup.backup(db_path, dest, sleep=0)
+    assert not os.path.exists(backup.archive_snapshot(snapshot))
+
+    archive_recalls(db_path)
+    backup.restore(snapshot, db_path, dest)
+    assert counts(db_path) == expected
+    assert expected["archived"] == 0
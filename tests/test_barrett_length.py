@@ -0,0 +1,55 @@
+# test_barrett_length.py - the report's and the surveillance tab's segment lengths agree
+
+import shutil
+
+import pytest
+
+import barrett_length
+import database
+
+
+@pytest.fixture
+def conn(synthetic_db, tmp_path):
+    path = str(tmp_path / "barrett.db")
+    shutil.copy(synthetic_db, path)
+    conn = database.connect(path)
+    yield conn
+    conn.close()
+
+
+def report_lengths(conn):
+    return {row[0]: tuple(row[1:]) for row in conn.execute(barrett_length.LATEST_LENGTH_SQL)}
+
+
+def endoscopy(conn, patient_id, test_date, findings):
+    diagnostic_id = conn.execute("""
+        INSERT INTO tblDiagnostics (PatientID, TestDate, Endoscopy, EndoscopyFindings) VALUES (?, ?, 1, ?)
+    """, (patient_id, test_date, findings)).lastrowid
+    barrett_length.extract(conn, diagnostic_id)
+    conn.commit()
+
+
+def test_report_matches_latest_for_every_patient(conn):
+    lengths = report_lengths(conn)
+    assert lengths
+    for (patient_id,) in conn.execute("SELECT DISTINCT PatientID FROM tblBarrettSegments").fetchall():
+        assert lengths.get(patient_id) == barrett_length.latest(conn, patient_id)
+
+
+def test_length_older_than_recent_endoscopies_is_dropped(conn):
+    patient_id = conn.execute("INSERT INTO tblPatients (FirstName, LastName, MRN) VALUES ('A', 'B', 'LEN1')").lastrowid
+    endoscopy(conn, patient_id, "2015-01-01", "Barrett's segment 2 cm")
+    assert barrett_length.latest(conn, patient_id)[1] == 2
+    assert report_lengths(conn)[patient_id][1] == 2
+
+    for year in range(2016, 2016 + barrett_length.RECENT_ENDOSCOPIES):
+        endoscopy(conn, patient_id, f"{year}-01-01", "Salmon-colored mucosa, no measurement")
+    assert barrett_length.latest(conn, patient_id) is None
+    assert patient_id not in report_lengths(conn)
+
+
+def test_latest_does_not_write(conn):
+    patient_id = conn.execute("SELECT PatientID FROM tblBarrettSegments LIMIT 1").fetchone()[0]
+    before = conn.total_changes
+    barrett_length.latest(conn, patient_id)
+    assert conn.total_changes == before
@@ -0,0 +1,46 @@
+# test_measurements.py - the generated numeric columns agree with measurements.parse()
+
+import shutil
+
+import pytest
+
+import database
+import measurements
+
+RAW_VALUES = [None, "", "   ", "<5", ">100", "12.3%", "12.3 %", " 24 ", "14.72", "0", "5.", ".5", ".",
+              "1.2.3", "-3", "1e3", "junk", "12 mm", "\t7", "100", "100.01", "501", "1000", 15, 12.5,
+              "High", "intermediate (4.2)", "low risk"]
+
+
+@pytest.fixture(scope="module")
+def conn(synthetic_db, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("measurements") / "measurements.db")
+    shutil.copy(synthetic_db, path)
+    conn = database.connect(path)
+    yield conn
+    conn.close()
+
+
+def generated(conn, table, text_column, column, raw):
+    """(stored text column, generated column) for a new row holding raw"""
+    patient_id = conn.execute("SELECT MIN(PatientID) FROM tblPatients").fetchone()[0]
+    row_id = conn.execute(f"INSERT INTO {table} (PatientID, {text_column}) VALUES (?, ?)", (patient_id, raw)).lastrowid
+    try:
+        return conn.execute(f"SELECT {text_column}, {column} FROM {table} WHERE rowid = ?", (row_id,)).fetchone()
+    finally:
+        conn.rollback()
+
+
+@pytest.mark.parametrize("raw", RAW_VALUES)
+@pytest.mark.parametrize("table, text_column, column, low, high", measurements.NUMERIC_COLUMNS)
+def test_value_column_matches_parse(conn, table, text_column, column, low, high, raw):
+    # EosinophilCount has INTEGER affinity, so "1e3" is stored as 1000 - parse what the row holds
+    stored, value = generated(conn, table, text_column, column, raw)
+    assert value == measurements.parse(stored, low, high)
+
+
+@pytest.mark.parametrize("raw", RAW_VALUES)
+@pytest.mark.parametrize("table, text_column, column", measurements.RISK_COLUMNS)
+def test_level_column_matches_risk_level(conn, table, text_column, column, raw):
+    stored, level = generated(conn, table, text_column, column, raw)
+    assert level == measurements.risk_level(stored)
@@ -0,0 +1,62 @@
+# test_outcomes.py - tblHRQLOutcomes keeps its score pairs when recalls are archived
+
+import shutil
+
+import pytest
+
+import archive
+import database
+import outcomes
+
+
+@pytest.fixture
+def copy_db(synthetic_db, tmp_path):
+    """Open a fresh copy of the synthetic database (and its own archive file)"""
+    connections = []
+
+    def open_copy(name):
+        path = str(tmp_path / f"{name}.db")
+        shutil.copy(synthetic_db, path)
+        connections.append(database.connect(path))
+        return connections[-1]
+
+    yield open_copy
+    for conn in connections:
+        conn.close()
+
+
+def pairs(conn):
+    return conn.execute("""
+        SELECT SurgeryID, PreScore, PreDate, PostScore, PostDate FROM tblHRQLOutcomes
+        WHERE PreScore IS NOT NULL OR PostScore IS NOT NULL
+        ORDER BY SurgeryID
+    """).fetchall()
+
+
+def archive_scores(conn):
+    moved = archive.archive_rows(conn, 365)
+    archived = conn.execute("SELECT COUNT(*) FROM archive.tblRecall WHERE HRQLScore IS NOT NULL").fetchone()[0]
+    assert moved["tblRecall"] and archived
+
+
+def test_archive_then_refresh_matches_unarchived(copy_db):
+    plain = copy_db("plain")
+    outcomes.refresh(plain)
+    expected = pairs(plain)
+    assert expected
+
+    archived = copy_db("archived")
+    archive_scores(archived)
+    outcomes.refresh(archived)
+    assert pairs(archived) == expected
+
+
+def test_refresh_after_archiving_keeps_scores(copy_db):
+    conn = copy_db("incremental")
+    outcomes.refresh(conn)
+    before = pairs(conn)
+
+    # The moves are journaled as recall deletes, so this refresh redoes those patients
+    archive_scores(conn)
+    outcomes.refresh(conn)
+    assert pairs(conn) == before
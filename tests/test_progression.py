@@ -0,0 +1,34 @@
+# test_progression.py - the analyze() cache follows tblPathology, including restores
+
+import shutil
+
+import database
+import progression
+
+
+def patients_in(result):
+    return len(result["per_patient"][0])
+
+
+def test_cache_dropped_when_the_journal_is_rolled_back(synthetic_db, tmp_path):
+    path = str(tmp_path / "progression.db")
+    snapshot = str(tmp_path / "snapshot.db")
+    shutil.copy(synthetic_db, path)
+    shutil.copy(synthetic_db, snapshot)
+    conn = database.connect(path)
+    before = progression.analyze(conn)
+
+    conn.execute("DELETE FROM tblPathology WHERE PatientID IN (SELECT PatientID FROM tblPathology LIMIT 200)")
+    conn.commit()
+    edited = progression.analyze(conn)
+    assert patients_in(edited) < patients_in(before)
+    assert progression.analyze(conn) is edited
+
+    # Put the older file back under the same path, as backup.restore does
+    conn.close()
+    shutil.copy(snapshot, path)
+    conn = database.connect(path)
+    try:
+        assert patients_in(progression.analyze(conn)) == patients_in(before)
+    finally:
+        conn.close()
@@ -0,0 +1,72 @@
+# test_query_catalog.py - query_benchmark.QUERY_CATALOG times the SQL the call sites run
+
+import ast
+import os
+import sqlite3
+
+import pytest
+
+import query_benchmark
+from conftest import ROOT
+
+
+def module_tree(module):
+    with open(os.path.join(ROOT, f"{module}.py"), encoding="utf-8") as f:
+        source = f.read()
+    return source, ast.parse(source)
+
+
+def catalog_entries():
+    """(name, source module, ast node of the "sql" value) for every catalog entry"""
+    _, tree = module_tree("query_benchmark")
+    catalog = next(node.value for node in tree.body
+                   if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "QUERY_CATALOG")
+    entries = []
+    for item in catalog.elts:
+        fields = {key.value: value for key, value in zip(item.keys, item.values)}
+        entries.append((fields["name"].value, fields["source"].value, fields["sql"]))
+    return entries
+
+
+ENTRIES = catalog_entries()
+
+
+def constants_used(node):
+    """(module, constant) pairs an entry's SQL is built from"""
+    used = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) and child.attr.isupper():
+            used.append((child.value.id, child.attr))
+        elif (isinstance(child, ast.Subscript) and isinstance(child.value, ast.Name)
+              and child.value.id == "APP_SQL"):
+            used.append(("streamlit_app", child.slice.value))
+    return used
+
+
+@pytest.mark.parametrize("name, source, node", ENTRIES, ids=[entry[0] for entry in ENTRIES])
+def test_entry_sql_comes_from_its_source(name, source, node):
+    assert not isinstance(node, ast.Constant), f"{name} has SQL copied into the catalog"
+    text, tree = module_tree(source)
+    # Clauses and arguments the catalog adds must be spelled exactly as in the source
+    for child in ast.walk(node):
+        if isinstance(child, ast.Constant) and isinstance(child.value, str):
+            assert child.value in text, f"{name}: {child.value!r} is not in {source}.py"
+
+    defined = {target.id for statement in tree.body if isinstance(statement, ast.Assign)
+               for target in statement.targets if isinstance(target, ast.Name)}
+    loaded = {child.id for child in ast.walk(tree) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+    for module, constant in constants_used(node):
+        assert module == source, f"{name} reads {module}.{constant} but is listed under {source}"
+        assert constant in defined, f"{source}.py has no {constant}"
+        assert constant in loaded, f"{source}.py defines {constant} but never runs it"
+
+
+def test_every_entry_runs(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    context = query_benchmark.build_context(conn)
+    try:
+        for spec in query_benchmark.QUERY_CATALOG:
+            sql = spec["sql"](conn) if callable(spec["sql"]) else spec["sql"]
+            conn.execute(sql, tuple(context[key] for key in spec["params"])).fetchall()
+    finally:
+        conn.close()
@@ -0,0 +1,64 @@
+# test_referrals.py - the trigger-maintained referral rollup agrees with a rebuild
+
+import random
+import shutil
+
+import pytest
+
+import database
+import referrals
+
+ZIPS = ["55901", " 55902 ", "559", "5590", "ABCDE", "12345-6789", "", None]
+SOURCES = ["Physician", " Physician ", "Self", "Web", "", None]
+DATES = ["2022-01-10", "2024-05-01", "2024-05-31", "2024-06", "2024", "", None]
+
+
+@pytest.fixture
+def conn(synthetic_db, tmp_path):
+    path = str(tmp_path / "referrals.db")
+    shutil.copy(synthetic_db, path)
+    conn = database.connect(path)
+    yield conn
+    conn.close()
+
+
+def rollup(conn):
+    return conn.execute("SELECT Zip3, Source, Month, Consults FROM tblReferralRollup "
+                        "ORDER BY Zip3, Source, Month").fetchall()
+
+
+def random_edit(conn, rng):
+    patient_ids = [row[0] for row in conn.execute("SELECT PatientID FROM tblPatients")]
+    patient_id = rng.choice(patient_ids)
+    kind = rng.choice(["zip", "source", "date", "several", "other", "delete", "insert"])
+    if kind == "zip":
+        conn.execute("UPDATE tblPatients SET ZipCode = ? WHERE PatientID = ?", (rng.choice(ZIPS), patient_id))
+    elif kind == "source":
+        conn.execute("UPDATE tblPatients SET ReferralSource = ? WHERE PatientID = ?", (rng.choice(SOURCES), patient_id))
+    elif kind == "date":
+        conn.execute("UPDATE tblPatients SET InitialConsultDate = ? WHERE PatientID = ?",
+                     (rng.choice(DATES), patient_id))
+    elif kind == "several":
+        conn.execute("UPDATE tblPatients SET ZipCode = ?, ReferralSource = ?, InitialConsultDate = ? "
+                     "WHERE PatientID = ?", (rng.choice(ZIPS), rng.choice(SOURCES), rng.choice(DATES), patient_id))
+    elif kind == "other":
+        # Not a rollup column - must leave the counts alone
+        conn.execute("UPDATE tblPatients SET LastName = LastName || 'x' WHERE PatientID = ?", (patient_id,))
+    elif kind == "delete":
+        conn.execute("DELETE FROM tblPatients WHERE PatientID = ?", (patient_id,))
+    else:
+        conn.execute("INSERT INTO tblPatients (FirstName, LastName, ZipCode, ReferralSource, InitialConsultDate) "
+                     "VALUES ('Random', 'Referral', ?, ?, ?)", (rng.choice(ZIPS), rng.choice(SOURCES), rng.choice(DATES)))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_edits_match_rebuild(conn, seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        random_edit(conn, rng)
+    conn.commit()
+
+    maintained = rollup(conn)
+    referrals.rebuild(conn)
+    assert maintained == rollup(conn)
+    assert all(row[3] > 0 for row in maintained)
@@ -0,0 +1,47 @@
+# test_schema.py - ensure_schema recreates stale triggers and runs each backfill once
+
+import shutil
+import sqlite3
+
+import pytest
+
+import barrett_length
+import schema
+
+
+@pytest.fixture
+def conn(synthetic_db, tmp_path):
+    path = str(tmp_path / "schema.db")
+    shutil.copy(synthetic_db, path)
+    conn = sqlite3.connect(path)
+    schema.ensure_schema(conn)
+    yield conn
+    conn.close()
+
+
+def test_backfills_recorded_and_not_rerun(conn, monkeypatch):
+    done = {row[0] for row in conn.execute("SELECT Name FROM tblSchemaBackfills")}
+    assert done == {backfill.__name__ for backfill in schema.BACKFILLS}
+
+    calls = []
+    monkeypatch.setattr(barrett_length, "extract_pending", lambda *args, **kwargs: calls.append(args))
+    schema.ensure_schema(conn)
+    assert calls == []
+
+
+def test_stale_trigger_recreated_when_version_moves_on(conn):
+    name = "trg_refversion_tblSurgeons_insert"
+    conn.execute(f"DROP TRIGGER {name}")
+    conn.execute(f"CREATE TRIGGER {name} AFTER INSERT ON tblSurgeons BEGIN SELECT 1; END")
+    conn.commit()
+
+    # Same version: the old body is left alone
+    schema.ensure_schema(conn)
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+    assert "tblReferenceVersion" not in sql
+
+    conn.execute("PRAGMA user_version = 0")
+    schema.ensure_schema(conn)
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+    assert "tblReferenceVersion" in sql
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == schema.TRIGGER_VERSION
@@ -0,0 +1,67 @@
+# test_surgery_cube.py - the trigger-maintained cube agrees with a rebuild
+
+import random
+import shutil
+
+import pytest
+
+import database
+import procedures
+import surgery_cube
+
+DATES = ["2021-03-15", "2023-11-02", "2024-05-01", "2024-05-30", "", None]
+
+
+@pytest.fixture
+def conn(synthetic_db, tmp_path):
+    path = str(tmp_path / "cube.db")
+    shutil.copy(synthetic_db, path)
+    conn = database.connect(path)
+    yield conn
+    conn.close()
+
+
+def cube(conn):
+    return conn.execute("SELECT Surgeon, Month, ProcedureMask, Surgeries FROM tblSurgeryCube "
+                        "ORDER BY Surgeon, Month, ProcedureMask").fetchall()
+
+
+def random_edit(conn, rng, surgeons):
+    surgery_ids = [row[0] for row in conn.execute("SELECT SurgeryID FROM tblSurgicalHistory")]
+    surgery_id = rng.choice(surgery_ids)
+    kind = rng.choice(["date", "surgeon", "procedure", "several", "delete", "insert"])
+    if kind == "date":
+        conn.execute("UPDATE tblSurgicalHistory SET SurgeryDate = ? WHERE SurgeryID = ?", (rng.choice(DATES), surgery_id))
+    elif kind == "surgeon":
+        conn.execute("UPDATE tblSurgicalHistory SET SurgerySurgeon = ? WHERE SurgeryID = ?",
+                     (rng.choice(surgeons), surgery_id))
+    elif kind == "procedure":
+        column = rng.choice(procedures.COLUMNS)
+        conn.execute(f"UPDATE tblSurgicalHistory SET {column} = 1 - COALESCE({column}, 0) WHERE SurgeryID = ?",
+                     (surgery_id,))
+    elif kind == "several":
+        column = rng.choice(procedures.COLUMNS)
+        conn.execute(f"UPDATE tblSurgicalHistory SET SurgeryDate = ?, SurgerySurgeon = ?, {column} = 1 "
+                     "WHERE SurgeryID = ?", (rng.choice(DATES), rng.choice(surgeons), surgery_id))
+    elif kind == "delete":
+        conn.execute("DELETE FROM tblSurgicalHistory WHERE SurgeryID = ?", (surgery_id,))
+    else:
+        column = rng.choice(procedures.COLUMNS)
+        conn.execute(f"""INSERT INTO tblSurgicalHistory (PatientID, SurgeryDate, SurgerySurgeon, {column})
+                         SELECT PatientID, ?, ?, 1 FROM tblSurgicalHistory WHERE SurgeryID = ?""",
+                     (rng.choice(DATES), rng.choice(surgeons), surgery_id))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_edits_match_rebuild(conn, seed):
+    rng = random.Random(seed)
+    surgeons = [row[0] for row in conn.execute("SELECT DISTINCT SurgerySurgeon FROM tblSurgicalHistory LIMIT 5")]
+    surgeons += [None, "", "New Surgeon"]
+    for _ in range(300):
+        random_edit(conn, rng, surgeons)
+    conn.commit()
+
+    maintained = cube(conn)
+    surgery_cube.rebuild(conn)
+    assert maintained == cube(conn)
+    assert all(row[3] > 0 for row in maintained)
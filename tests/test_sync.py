@@ -0,0 +1,203 @@
+# test_sync.py - changeset sync between workstation copies of one database
+
+import os
+import shutil
+
+import pytest
+
+import database
+import sync
+
+
+@pytest.fixture
+def share(tmp_path):
+    return str(tmp_path / "share")
+
+
+@pytest.fixture
+def make_site(synthetic_db, tmp_path):
+    """make_site(name, before_init=None) - a workstation copy of the synthetic database, set up for sync"""
+    connections = []
+
+    def make(name, before_init=None):
+        path = str(tmp_path / f"{name}.db")
+        shutil.copy(synthetic_db, path)
+        conn = database.connect(path)
+        if before_init:
+            before_init(conn)
+        sync.init(conn)
+        connections.append(conn)
+        return conn
+
+    yield make
+    for conn in connections:
+        conn.close()
+
+
+def add_patient(conn, mrn, last_name="Synced"):
+    patient_id = conn.execute("INSERT INTO tblPatients (FirstName, LastName, MRN) VALUES ('Test', ?, ?)",
+                              (last_name, mrn)).lastrowid
+    conn.commit()
+    return patient_id
+
+
+def add_diagnostic(conn, patient_id, test_date="2024-05-01"):
+    conn.execute("INSERT INTO tblDiagnostics (PatientID, TestDate, Surgeon) VALUES (?, ?, 'Sync')",
+                 (patient_id, test_date))
+    conn.commit()
+
+
+def patient_by_mrn(conn, mrn):
+    return conn.execute("SELECT PatientID, LastName FROM tblPatients WHERE MRN = ?", (mrn,)).fetchall()
+
+
+def diagnostics_of(conn, patient_id):
+    return conn.execute("SELECT TestDate, Surgeon FROM tblDiagnostics WHERE PatientID = ?", (patient_id,)).fetchall()
+
+
+def conflicts(conn):
+    return conn.execute("SELECT Kind, Resolution FROM tblSyncConflicts ORDER BY ConflictID").fetchall()
+
+
+def test_round_trip(make_site, share):
+    a, b = make_site("a"), make_site("b")
+    patient_id = add_patient(a, "SYNC-1")
+    add_diagnostic(a, patient_id)
+    sync.run(a, share)
+    assert sync.run(b, share)["applied"] == 1
+
+    [(b_patient, _)] = patient_by_mrn(b, "SYNC-1")
+    assert diagnostics_of(b, b_patient) == [("2024-05-01", "Sync")]
+
+    # And back: an edit on b lands on a's original row
+    b.execute("UPDATE tblDiagnostics SET Surgeon = 'Edited' WHERE PatientID = ?", (b_patient,))
+    b.commit()
+    sync.run(b, share)
+    sync.run(a, share)
+    assert diagnostics_of(a, patient_id) == [("2024-05-01", "Edited")]
+    assert conflicts(a) == [] and conflicts(b) == []
+
+
+def test_later_edit_wins_when_clocks_disagree(make_site, share):
+    a, b = make_site("a"), make_site("b")
+    patient_id = add_patient(a, "SYNC-9")
+    sync.run(a, share)
+    sync.run(b, share)
+    # a's clock runs ahead: its original stamp is newer than b's later edit
+    a.execute("UPDATE tblActivityLog SET ActivityTime = datetime(ActivityTime, '+1 hour')")
+    a.commit()
+
+    b.execute("UPDATE tblPatients SET LastName = 'Renamed' WHERE MRN = 'SYNC-9'")
+    b.commit()
+    sync.run(b, share)
+    sync.run(a, share)
+    assert patient_by_mrn(a, "SYNC-9") == [(patient_id, "Renamed")]
+    assert conflicts(a) == []
+
+
+def test_same_mrn_created_on_both_sites_is_merged(make_site, share):
+    a, b = make_site("a"), make_site("b")
+    add_patient(a, "SYNC-2", "FromA")
+    add_patient(b, "SYNC-2", "FromB")
+    sync.run(a, share)
+    sync.run(b, share)
+    sync.run(a, share)
+
+    assert len(patient_by_mrn(a, "SYNC-2")) == 1
+    assert len(patient_by_mrn(b, "SYNC-2")) == 1
+    assert ("mrn", "merged") in conflicts(a) + conflicts(b)
+
+
+def test_concurrent_edits_converge_on_the_newest(make_site, share):
+    a, b = make_site("a"), make_site("b")
+    patient_id = a.execute("SELECT MIN(PatientID) FROM tblPatients").fetchone()[0]
+    a.execute("UPDATE tblPatients SET LastName = 'EditedOnA' WHERE PatientID = ?", (patient_id,))
+    a.commit()
+    b.execute("UPDATE tblPatients SET LastName = 'EditedOnB' WHERE PatientID = ?", (patient_id,))
+    b.commit()
+
+    sync.run(a, share)
+    sync.run(b, share)
+    sync.run(a, share)
+
+    name = "SELECT LastName FROM tblPatients WHERE PatientID = ?"
+    assert a.execute(name, (patient_id,)).fetchone() == b.execute(name, (patient_id,)).fetchone()
+    # Both sides saw the other's edit arrive on a row they had changed too
+    assert [kind for kind, _ in conflicts(a)] == ["concurrent"]
+    assert [kind for kind, _ in conflicts(b)] == ["concurrent"]
+    assert {resolution for _, resolution in conflicts(a) + conflicts(b)} == {"kept local", "took incoming"}
+
+
+def hide_site(share, conn):
+    """Move a site's changesets out of the shared folder; returns a function putting them back"""
+    # Anywhere outside the share - every folder inside it is read as a site
+    site_dir = os.path.join(share, sync.site_id(conn))
+    hidden = os.path.join(os.path.dirname(share), "hidden-" + sync.site_id(conn))
+    os.rename(site_dir, hidden)
+    return lambda: os.rename(hidden, site_dir)
+
+
+def test_child_row_waits_for_its_patient(make_site, share):
+    a, b, c = make_site("a"), make_site("b"), make_site("c")
+    # b creates a patient, a receives it and adds a diagnostic
+    add_patient(b, "SYNC-3")
+    sync.run(b, share)
+    sync.run(a, share)
+    [(a_patient, _)] = patient_by_mrn(a, "SYNC-3")
+    add_diagnostic(a, a_patient)
+    sync.run(a, share)
+
+    # c sees a's diagnostic before b's patient
+    restore = hide_site(share, b)
+    result = sync.run(c, share)
+    assert result["waiting"] == {sync.site_id(a): f"{sync.site_id(a)}/00000001.json.gz"}
+    assert sync.deferred_changesets(c) == [(f"{sync.site_id(a)}/00000001.json.gz", 1)]
+
+    restore()
+    result = sync.run(c, share)
+    assert result["applied"] == 2 and result["waiting"] == {}
+    [(c_patient, _)] = patient_by_mrn(c, "SYNC-3")
+    assert diagnostics_of(c, c_patient) == [("2024-05-01", "Sync")]
+    assert sync.deferred_changesets(c) == [] and conflicts(c) == []
+
+
+def test_deferred_changeset_applied_without_missing_rows_after_cap(make_site, share):
+    a, b, c = make_site("a"), make_site("b"), make_site("c")
+    add_patient(b, "SYNC-4")
+    sync.run(b, share)
+    sync.run(a, share)
+    [(a_patient, _)] = patient_by_mrn(a, "SYNC-4")
+    add_diagnostic(a, a_patient)
+    add_patient(a, "SYNC-5")
+    sync.run(a, share)
+
+    hide_site(share, b)
+    for run in range(sync.MAX_DEFERRED_RUNS):
+        assert sync.run(c, share)["applied"] == 0
+    result = sync.run(c, share)
+    assert result["applied"] == 1 and result["waiting"] == {}
+
+    # The rest of the changeset went through; the orphaned diagnostic is logged, not applied
+    assert len(patient_by_mrn(c, "SYNC-5")) == 1
+    assert patient_by_mrn(c, "SYNC-4") == []
+    assert conflicts(c) == [("missing patient", "skipped")]
+    assert sync.deferred_changesets(c) == []
+
+
+def test_copy_with_a_different_baseline_is_rejected(make_site, share):
+    a = make_site("a")
+    # Set up from a copy that had already moved on
+    c = make_site("c", before_init=lambda conn: add_patient(conn, "SYNC-6"))
+    add_patient(a, "SYNC-7")
+    sync.run(a, share)
+
+    result = sync.run(c, share)
+    assert result["applied"] == 0
+    assert sync.site_id(a) in result["rejected"]
+    assert patient_by_mrn(c, "SYNC-7") == []
+
+    # And the other way round
+    add_patient(c, "SYNC-8")
+    sync.run(c, share)
+    assert sync.site_id(c) in sync.run(a, share)["rejected"]
+    assert patient_by_mrn(a, "SYNC-8") == []
@@ -0,0 +1,234 @@
+# ui_profiler.py - Render profiling for tab builds and form opens
+#
+# Switch on with GERD_UI_PROFILE=1. Every function wrapped with @profiled(name)
+# then records wall time, widgets created/destroyed and geometry passes
+# (<Configure> events) and the results are written to ui_profile.json on exit.
+
+import os
+import json
+import time
+import atexit
+import inspect
+import functools
+import tkinter as tk
+
+PROFILE_ENV = "GERD_UI_PROFILE"
+PROFILE_FILE_ENV = "GERD_UI_PROFILE_FILE"
+DEFAULT_PROFILE_FILE = "ui_profile.json"
+
+_results = []
+_stack = []
+# (probe, entry) of the last outermost profile, still counting the <Configure>
+# events its layout queued; closed by _settle once the event loop is idle
+_pending = None
+
+
+def enabled():
+    """True when UI profiling is switched on through the environment"""
+    return os.environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "off", "no")
+
+
+def _all_widgets(root):
+    """Every widget path below root (Tcl-level, so unnamed internals count too)"""
+    paths = set()
+    stack = [str(root)]
+    while stack:
+        path = stack.pop()
+        paths.add(path)
+        stack.extend(root.tk.splitlist(root.tk.call("winfo", "children", path)))
+    return paths
+
+
+class _Probe:
+    """Counts <Configure> and <Destroy> events app-wide while a profile is open"""
+
+    def __init__(self, root):
+        self.root = root
+        self.configures = 0
+        self.destroyed = set()
+        self._saved = {}
+        self._commands = []
+
+    def _on_configure(self, event):
+        self.configures += 1
+
+    def _on_destroy(self, event):
+        self.destroyed.add(str(event.widget))
+
+    def install(self):
+        for sequence, handler in (("<Configure>", self._on_configure), ("<Destroy>", self._on_destroy)):
+            self._saved[sequence] = self.root.tk.call("bind", "all", sequence)
+            command = self.root._register(handler, self.root._substitute, 1)
+            self._commands.append(command)
+            self.root.tk.call("bind", "all", sequence,
+                              f"+{command} {self.root._subst_format_str}")
+
+    def remove(self):
+        for sequence, script in self._saved.items():
+            self.root.tk.call("bind", "all", sequence, script)
+        for command in self._commands:
+            try:
+                self.root.deletecommand(command)
+            except tk.TclError:
+                pass
+
+
+def _settle():
+    """Close the pending profile's probe and record its geometry passes"""
+    global _pending
+    if _pending is None:
+        return
+    probe, entry = _pending
+    _pending = None
+    entry["geometry_passes"] = probe.configures
+    try:
+        probe.remove()
+    except tk.TclError:
+        pass
+
+
+def note(**fields):
+    """Attach extra fields (e.g. rows=len(rows)) to the innermost running profile"""
+    if _stack:
+        _stack[-1]["meta"].update(fields)
+
+
+def profiled(name):
+    """Decorator recording a render profile each time the function runs"""
+
+    def decorator(func):
+        try:
+            signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            signature = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+
+            meta = {}
+            if signature is not None and "patient_id" in signature.parameters:
+                try:
+                    meta["patient_id"] = signature.bind_partial(*args, **kwargs).arguments.get("patient_id")
+                except TypeError:
+                    pass
+            return run_profiled(name, func, args, kwargs, meta)
+
+        return wrapper
+
+    return decorator
+
+
+def run_profiled(name, func, args, kwargs, meta):
+    """Run func under a probe and store the profile"""
+    global _pending
+    root = tk._default_root
+    entry = {"name": name, "meta": meta}
+    outermost = not _stack
+    probe = None
+    before = set()
+
+    if root is not None:
+        if outermost:
+            # Two probes bound at once would restore each other's bindings out of order
+            _settle()
+        before = _all_widgets(root)
+        if outermost:
+            probe = _Probe(root)
+            probe.install()
+
+    _stack.append(entry)
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        build_ms = (time.perf_counter() - start) * 1000
+        _stack.pop()
+
+        layout_ms = 0.0
+        after = None
+        try:
+            if root is not None and outermost:
+                # Flush pending geometry work so it is charged to this screen.
+                # Only idle tasks run here - update() would dispatch queued
+                # events and run other handlers inside this one
+                layout_start = time.perf_counter()
+                root.update_idletasks()
+                layout_ms = (time.perf_counter() - layout_start) * 1000
+            if root is not None:
+                after = _all_widgets(root)
+        except tk.TclError:
+            pass
+
+        entry["build_ms"] = round(build_ms, 2)
+        entry["layout_ms"] = round(layout_ms, 2)
+        entry["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        if after is not None:
+            destroyed = (probe.destroyed if probe else set()) | (before - after)
+            entry["widgets_before"] = len(before)
+            entry["widgets_after"] = len(after)
+            # Widgets that came and went inside the build count as created too
+            entry["widgets_created"] = len(after - before) + len(destroyed - before)
+            entry["widgets_destroyed"] = len(destroyed)
+            entry["geometry_passes"] = probe.configures if probe else None
+        if probe:
+            # The <Configure> events the layout queued arrive once this handler
+            # returns; keep counting until the loop is idle, then unbind
+            _pending = (probe, entry)
+            try:
+                root.after_idle(_settle)
+            except tk.TclError:
+                _settle()
+        _results.append(entry)
+
+
+def results():
+    return list(_results)
+
+
+def summary():
+    """Per-screen aggregates, slowest average first"""
+    grouped = {}
+    for entry in _results:
+        stats = grouped.setdefault(entry["name"], {"name": entry["name"], "runs": 0, "total_ms": 0.0,
+                                                    "max_ms": 0.0, "max_widgets": 0, "max_rows": 0})
+        total = entry["build_ms"] + entry["layout_ms"]
+        stats["runs"] += 1
+        stats["total_ms"] += total
+        stats["max_ms"] = max(stats["max_ms"], total)
+        stats["max_widgets"] = max(stats["max_widgets"], entry.get("widgets_created") or 0)
+        stats["max_rows"] = max(stats["max_rows"], entry["meta"].get("rows") or 0)
+    rows = []
+    for stats in grouped.values():
+        stats["avg_ms"] = round(stats["total_ms"] / stats["runs"], 2)
+        stats["total_ms"] = round(stats["total_ms"], 2)
+        stats["max_ms"] = round(stats["max_ms"], 2)
+        rows.append(stats)
+    rows.sort(key=lambda s: s["avg_ms"], reverse=True)
+    return rows
+
+
+def reset():
+    _results.clear()
+
+
+def export_json(path=None):
+    """Write every recorded profile plus a summary to JSON"""
+    path = path or os.environ.get(PROFILE_FILE_ENV, DEFAULT_PROFILE_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"exported": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "summary": summary(),
+                   "profiles": _results}, f, indent=2, default=str)
+    return path
+
+
+def _export_at_exit():
+    if enabled() and _results:
+        try:
+            export_json()
+        except OSError:
+            pass
+
+
+atexit.register(_export_at_exit)